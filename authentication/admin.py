@@ -1,17 +1,28 @@
+import os
+
 from django.contrib import admin
+from django.contrib.admin import helpers
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import ReadOnlyPasswordHashField
 from django import forms
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
 from django.utils import timezone
 from django.utils.html import format_html
 from import_export import resources, fields
 from import_export.admin import ImportExportModelAdmin, ExportActionMixin
 from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
+from .admin_pagination import EstimatedCountAdminMixin
 from .models import (
     CustomUser, Country, PreferredCurrency, UserSession, RoleGroup,
     EmailOTP, Merchant, MerchantCategory, MerchantDocument, DocumentTypeModel,
-    WhitelabelPartner, AppKey, AppKeyUsageLog, Notification
+    WhitelabelPartner, AppKey, AppKeyUsageLog, Notification, OutboundEmail, OutboundEmailStatus,
+    DataTransferJob, DataTransferKind, DataTransferStatus
 )
+from .data_transfers import queue_export
 
 
 # ============ RESOURCES FOR IMPORT/EXPORT ============
@@ -320,10 +331,57 @@ class UserChangeForm(forms.ModelForm):
         return self.initial["password"]
 
 
+# ============ BACKGROUND IMPORT/EXPORT ============
+
+class BackgroundTransferMixin:
+    """Lets an import-export admin hand large exports and imports to the data transfer worker"""
+    
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if self.actions is not None and self.has_export_permission(request):
+            func, name, description = self.get_action('export_in_background')
+            actions[name] = (func, name, description)
+        return actions
+    
+    def export_in_background(self, request, queryset):
+        """Queue a CSV export of the selected rows for the data transfer worker"""
+        # Store the changelist filters, not the matching keys, so queueing stays cheap
+        select_across = request.POST.get('select_across') == '1'
+        job = queue_export(
+            self.get_export_resource_classes(request)[0], request.user,
+            changelist_query=request.GET.urlencode(),
+            selected_ids=None if select_across else request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        )
+        url = reverse('admin:authentication_datatransferjob_change', args=[job.pk])
+        self.message_user(request, format_html('Export queued. <a href="{}">Follow its progress</a>.', url))
+    export_in_background.short_description = 'Export selected in the background (CSV)'
+
+
+class DataTransferImportForm(forms.ModelForm):
+    """Upload form for a background import"""
+    resource_choices = []
+    resource = forms.ChoiceField(help_text='What the CSV file contains')
+
+    class Meta:
+        model = DataTransferJob
+        fields = ['resource', 'input_file']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['resource'].choices = self.resource_choices
+        self.fields['input_file'].required = True
+
+    def clean_input_file(self):
+        input_file = self.cleaned_data['input_file']
+        if not input_file.name.lower().endswith('.csv'):
+            raise forms.ValidationError('Only CSV files can be imported in the background.')
+        return input_file
+
+
 # ============ ADMIN CLASSES WITH IMPORT/EXPORT ============
 
 @admin.register(CustomUser)
-class UserAdmin(ImportExportModelAdmin, BaseUserAdmin):
+class UserAdmin(BackgroundTransferMixin, ImportExportModelAdmin, BaseUserAdmin):
     # Import/Export configuration
     resource_class = CustomUserResource
     
@@ -358,7 +416,7 @@ class UserAdmin(ImportExportModelAdmin, BaseUserAdmin):
 
 
 @admin.register(Country)
-class CountryAdmin(ImportExportModelAdmin):
+class CountryAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     resource_class = CountryResource
     
     list_display = ('name', 'code', 'phone_code', 'created_at')
@@ -369,7 +427,7 @@ class CountryAdmin(ImportExportModelAdmin):
 
 
 @admin.register(PreferredCurrency)
-class PreferredCurrencyAdmin(ImportExportModelAdmin):
+class PreferredCurrencyAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     resource_class = PreferredCurrencyResource
     
     list_display = ('name', 'code', 'symbol', 'is_active', 'created_at')
@@ -380,7 +438,7 @@ class PreferredCurrencyAdmin(ImportExportModelAdmin):
 
 
 @admin.register(UserSession)
-class UserSessionAdmin(ImportExportModelAdmin):
+class UserSessionAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     resource_class = UserSessionResource
     
     list_display = ('user', 'ip_address', 'is_active', 'created_at', 'expires_at')
@@ -425,7 +483,7 @@ class EmailOTPAdmin(ExportActionMixin, admin.ModelAdmin):
 
 
 @admin.register(MerchantCategory)
-class MerchantCategoryAdmin(ImportExportModelAdmin):
+class MerchantCategoryAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     """Admin for Merchant Categories"""
     resource_class = MerchantCategoryResource
     
@@ -436,7 +494,7 @@ class MerchantCategoryAdmin(ImportExportModelAdmin):
 
 
 @admin.register(DocumentTypeModel)
-class DocumentTypeAdmin(ImportExportModelAdmin):
+class DocumentTypeAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     """Admin interface for document types"""
     resource_class = DocumentTypeResource
     
@@ -508,7 +566,7 @@ class MerchantDocumentInline(admin.TabularInline):
 
 
 @admin.register(MerchantDocument)
-class MerchantDocumentAdmin(ImportExportModelAdmin):
+class MerchantDocumentAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     """Admin interface for merchant documents"""
     resource_class = MerchantDocumentResource
     
@@ -516,6 +574,7 @@ class MerchantDocumentAdmin(ImportExportModelAdmin):
         'merchant_business_name', 'document_type', 'title', 'status', 
         'is_required', 'expiry_date', 'file_size_display', 'uploaded_at'
     ]
+    list_select_related = ['merchant']
     list_filter = [
         'document_type', 'status', 'is_required', 'uploaded_at', 
         'expiry_date', 'verified_at'
@@ -593,7 +652,7 @@ class MerchantDocumentAdmin(ImportExportModelAdmin):
 
 
 @admin.register(Merchant)
-class MerchantAdmin(ImportExportModelAdmin):
+class MerchantAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     """Enhanced admin interface for merchants with document management"""
     resource_class = MerchantResource
     
@@ -601,6 +660,7 @@ class MerchantAdmin(ImportExportModelAdmin):
         'business_name', 'user_email', 'status', 'category', 
         'is_verified', 'document_count', 'verification_progress', 'created_at'
     ]
+    list_select_related = ['user', 'category']
     list_filter = [
         'status', 'is_verified', 'category', 'created_at', 
         'verified_at', 'updated_at'
@@ -658,10 +718,14 @@ class MerchantAdmin(ImportExportModelAdmin):
     user_email.short_description = 'User Email'
     user_email.admin_order_field = 'user__email'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_documents=Count('documents'))
+    
     def document_count(self, obj):
         """Display number of uploaded documents"""
-        return obj.documents.count()
+        return obj.num_documents if hasattr(obj, 'num_documents') else obj.documents.count()
     document_count.short_description = 'Documents'
+    document_count.admin_order_field = 'num_documents'
     
     def verification_progress(self, obj):
         """Display verification progress based on documents"""
@@ -728,7 +792,7 @@ class AppKeyInline(admin.TabularInline):
 
 
 @admin.register(WhitelabelPartner)
-class WhitelabelPartnerAdmin(ImportExportModelAdmin):
+class WhitelabelPartnerAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     """Admin interface for whitelabel partners"""
     resource_class = WhitelabelPartnerResource
     
@@ -761,7 +825,8 @@ class WhitelabelPartnerAdmin(ImportExportModelAdmin):
         }),
         ('Integration Settings', {
             'fields': (
-                'allowed_domains', 'webhook_url', 'formatted_webhook_url', 'webhook_secret'
+                'allowed_domains', 'webhook_url', 'formatted_webhook_url', 'webhook_secret',
+                'webhook_batching_enabled', 'webhook_batch_window'
             )
         }),
         ('API Limits & Quotas', {
@@ -869,7 +934,7 @@ class WhitelabelPartnerAdmin(ImportExportModelAdmin):
 
 
 @admin.register(AppKey)
-class AppKeyAdmin(ImportExportModelAdmin):
+class AppKeyAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     """Admin interface for app keys"""
     resource_class = AppKeyResource
     
@@ -877,6 +942,7 @@ class AppKeyAdmin(ImportExportModelAdmin):
         'partner_name', 'name', 'key_type', 'public_key', 'status', 
         'scopes_display', 'total_requests', 'last_used_at', 'expires_at'
     ]
+    list_select_related = ['partner']
     list_filter = [
         'key_type', 'status', 'created_at', 'expires_at', 'last_used_at'
     ]
@@ -990,7 +1056,7 @@ class AppKeyAdmin(ImportExportModelAdmin):
 
 
 @admin.register(AppKeyUsageLog)
-class AppKeyUsageLogAdmin(ImportExportModelAdmin):
+class AppKeyUsageLogAdmin(EstimatedCountAdminMixin, BackgroundTransferMixin, ImportExportModelAdmin):
     """Admin interface for app key usage logs"""
     resource_class = AppKeyUsageLogResource
     
@@ -998,6 +1064,7 @@ class AppKeyUsageLogAdmin(ImportExportModelAdmin):
         'app_key_name', 'partner_name', 'method', 'endpoint', 
         'status_code', 'response_time_ms', 'ip_address', 'created_at'
     ]
+    list_select_related = ['app_key__partner']
     list_filter = [
         'method', 'status_code', 'created_at', 
         'app_key__partner', 'app_key__key_type'
@@ -1054,7 +1121,7 @@ class AppKeyUsageLogAdmin(ImportExportModelAdmin):
 
 
 @admin.register(Notification)
-class NotificationAdmin(ImportExportModelAdmin):
+class NotificationAdmin(BackgroundTransferMixin, ImportExportModelAdmin):
     """Admin interface for notifications"""
     resource_class = NotificationResource
     
@@ -1062,6 +1129,7 @@ class NotificationAdmin(ImportExportModelAdmin):
         'title', 'user_email', 'type', 'priority', 'is_read', 
         'is_dismissed', 'created_at'
     ]
+    list_select_related = ['user']
     list_filter = [
         'type', 'priority', 'is_read', 'is_dismissed', 'created_at'
     ]
@@ -1097,18 +1165,26 @@ class NotificationAdmin(ImportExportModelAdmin):
     
     def mark_as_read(self, request, queryset):
         """Mark selected notifications as read"""
-        count = 0
-        for notification in queryset:
-            if not notification.is_read:
-                notification.mark_as_read()
-                count += 1
+        from .notifications import invalidate_notification_state
+        
+        unread = queryset.filter(is_read=False)
+        user_ids = set(unread.values_list('user_id', flat=True))
+        now = timezone.now()
+        count = unread.update(is_read=True, read_at=now, updated_at=now)
+        for user_id in user_ids:
+            invalidate_notification_state(user_id)
         
         self.message_user(request, f'{count} notifications marked as read.')
     mark_as_read.short_description = 'Mark selected notifications as read'
     
     def mark_as_dismissed(self, request, queryset):
         """Dismiss selected notifications"""
+        from .notifications import invalidate_notification_state
+        
+        user_ids = set(queryset.values_list('user_id', flat=True))
         count = queryset.update(is_dismissed=True)
+        for user_id in user_ids:
+            invalidate_notification_state(user_id)
         self.message_user(request, f'{count} notifications dismissed.')
     mark_as_dismissed.short_description = 'Dismiss selected notifications'
     
@@ -1117,3 +1193,104 @@ class NotificationAdmin(ImportExportModelAdmin):
         count = queryset.filter(is_read=True).delete()[0]
         self.message_user(request, f'{count} read notifications deleted.')
     delete_read_notifications.short_description = 'Delete read notifications'
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    """Admin interface for the email outbox"""
+    list_display = ['subject', 'recipients', 'purpose', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'purpose', 'created_at']
+    search_fields = ['subject', 'to']
+    readonly_fields = ['created_at', 'updated_at', 'sent_at', 'leased_until', 'attempts', 'last_error']
+    actions = ['retry_now']
+    
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+    recipients.short_description = 'To'
+    
+    def retry_now(self, request, queryset):
+        """Queue selected emails for immediate (re)delivery"""
+        count = queryset.exclude(status=OutboundEmailStatus.SENT).update(
+            status=OutboundEmailStatus.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{count} emails queued for delivery.')
+    retry_now.short_description = 'Retry selected emails now'
+
+
+@admin.register(DataTransferJob)
+class DataTransferJobAdmin(admin.ModelAdmin):
+    """Background import/export jobs; adding one uploads a CSV to import"""
+    list_display = ['kind', 'resource_name', 'status', 'progress', 'created_by', 'created_at', 'download_link']
+    list_filter = ['kind', 'status', 'created_at']
+    list_select_related = ['created_by']
+    readonly_fields = [
+        'kind', 'resource', 'changelist_query', 'status', 'progress', 'total_rows', 'processed_rows', 'totals', 'errors',
+        'error_message', 'download_link', 'created_by', 'started_at', 'finished_at', 'created_at',
+    ]
+    
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ['resource', 'input_file']
+        return self.readonly_fields
+    
+    def get_readonly_fields(self, request, obj=None):
+        return [] if obj is None else self.readonly_fields
+    
+    def get_form(self, request, obj=None, **kwargs):
+        if obj is None:
+            kwargs['form'] = type('DataTransferImportForm', (DataTransferImportForm,), {
+                'resource_choices': self.get_import_choices(request),
+            })
+        return super().get_form(request, obj, **kwargs)
+    
+    def get_import_choices(self, request):
+        """Resources of the admins the user may import into"""
+        choices = []
+        for model_admin in self.admin_site._registry.values():
+            if isinstance(model_admin, BackgroundTransferMixin) and model_admin.has_import_permission(request):
+                for resource_class in model_admin.get_import_resource_classes(request):
+                    path = f"{resource_class.__module__}.{resource_class.__qualname__}"
+                    choices.append((path, model_admin.model._meta.verbose_name_plural.title()))
+        return sorted(choices, key=lambda choice: choice[1])
+    
+    def has_change_permission(self, request, obj=None):
+        """Jobs are read-only once queued"""
+        return False
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.kind = DataTransferKind.IMPORT
+            obj.resource = form.cleaned_data['resource']
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+    
+    def get_urls(self):
+        urls = [
+            path(
+                '<uuid:object_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='authentication_datatransferjob_download',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def download_view(self, request, object_id):
+        job = get_object_or_404(DataTransferJob, pk=object_id)
+        if not self.has_view_permission(request, job):
+            raise PermissionDenied
+        if not job.output_file:
+            raise Http404('This job has no file to download')
+        return FileResponse(job.output_file.open('rb'), as_attachment=True, filename=os.path.basename(job.output_file.name))
+    
+    def progress(self, obj):
+        if obj.total_rows is None:
+            return '-'
+        return f"{obj.processed_rows}/{obj.total_rows} ({obj.progress_percentage}%)"
+    progress.short_description = 'Progress'
+    
+    def download_link(self, obj):
+        if obj.status != DataTransferStatus.COMPLETED or not obj.output_file:
+            return '-'
+        url = reverse('admin:authentication_datatransferjob_download', args=[obj.pk])
+        return format_html('<a href="{}">Download CSV</a>', url)
+    download_link.short_description = 'File'
@@ -0,0 +1,111 @@
+"""
+Estimated Counts for Large Admin Changelists
+
+The admin paginates with an exact ``COUNT(*)``, which scans the whole table
+for append-only logs (API usage logs, integration calls, transactions).
+``EstimatedCountPaginator`` avoids that:
+
+- An unfiltered changelist on PostgreSQL reads the planner's row estimate
+  from ``pg_class.reltuples`` (kept current by autovacuum/ANALYZE), as long
+  as it is at least ``ADMIN_ESTIMATED_COUNT_THRESHOLD`` rows; smaller tables
+  are still counted exactly.
+- Everything else is counted with a ``LIMIT`` of ``ADMIN_COUNT_LIMIT`` rows,
+  so a broad filter stops counting early instead of scanning every match.
+
+Estimated and capped counts are flagged on the paginator and shown as such
+(``~N`` / ``N+``) by the ``admin/pagination.html`` and ``admin/search_form.html``
+overrides, next to a link that adds ``?exact_count=1`` to count every row, which
+also makes the pages past the cap reachable.
+
+Admins opt in with ``EstimatedCountAdminMixin``, which also sets
+``show_full_result_count = False`` so the admin does not run a second
+unfiltered count for the "x of y" line.
+"""
+
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Query string parameter that asks for an exact count
+EXACT_COUNT_VAR = 'exact_count'
+
+
+def get_estimated_count(model, using: str = 'default') -> Optional[int]:
+    """Planner row estimate for ``model``'s table on PostgreSQL, or ``None`` if unavailable"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 until the table has been vacuumed or analysed
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates or caps the total instead of counting every row
+
+    ``count_is_estimated`` / ``count_is_capped`` tell whether ``count`` is
+    exact; pass ``exact=True`` to always count every row.
+    """
+
+    def __init__(self, *args, exact: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact = exact
+        self.count_is_estimated = False
+        self.count_is_capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if self.exact or not hasattr(queryset, 'query'):
+            return super().count
+
+        if not queryset.query.where:
+            estimate = get_estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000):
+                self.count_is_estimated = True
+                return estimate
+
+        # One row past the limit tells a capped count from an exact one
+        limit = getattr(settings, 'ADMIN_COUNT_LIMIT', 10000)
+        count = queryset.order_by()[:limit + 1].count()
+        if count > limit:
+            self.count_is_capped = True
+            return limit
+        return count
+
+
+class EstimatedCountChangeList(ChangeList):
+    """Changelist that keeps ``exact_count`` in its links without filtering on it"""
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(EXACT_COUNT_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.exact_count_url = self.get_query_string({EXACT_COUNT_VAR: '1'})
+
+
+class EstimatedCountAdminMixin:
+    """ModelAdmin mixin for changelists paginated with ``EstimatedCountPaginator``"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return EstimatedCountChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            exact=EXACT_COUNT_VAR in request.GET,
+        )
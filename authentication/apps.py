@@ -8,3 +8,6 @@ class AuthenticationConfig(AppConfig):
     def ready(self):
         """Import signal handlers when the app is ready"""
         import authentication.signals  # noqa
+        import authentication.notifications  # noqa
+        from authentication.merchant_snapshot import connect_signals
+        connect_signals()
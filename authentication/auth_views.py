@@ -117,18 +117,15 @@ def register_page(request):
                 from .models import EmailOTP
                 otp_instance = EmailOTP.generate_otp(user, purpose='registration', validity_minutes=15)
                 
-                # Try to send email in background, but don't block on it
+                # Queue the email; the outbox worker sends it, so registration never waits on SMTP
                 try:
-                    from django.core.mail import send_mail
-                    from django.conf import settings
+                    from .email_outbox import queue_email
                     
-                    # Simple OTP email without template rendering to avoid hanging
-                    send_mail(
+                    queue_email(
                         subject='PexiLabs - Email Verification Code',
-                        message=f'Your verification code is: {otp_instance.otp_code}\n\nThis code will expire in 15 minutes.',
-                        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@pexilabs.com'),
-                        recipient_list=[user.email],
-                        fail_silently=True,  # Don't fail if email doesn't work
+                        body=f'Your verification code is: {otp_instance.otp_code}\n\nThis code will expire in 15 minutes.',
+                        to=[user.email],
+                        purpose='otp_registration',
                     )
                 except Exception as email_error:
                     # Log the email error but continue
@@ -148,16 +145,13 @@ def register_page(request):
             # Send merchant creation email if merchant was created
             if merchant:
                 try:
-                    # Simple merchant email without template rendering
-                    from django.core.mail import send_mail
-                    from django.conf import settings
+                    from .email_outbox import queue_email
                     
-                    send_mail(
+                    queue_email(
                         subject='PexiLabs - Merchant Account Created',
-                        message=f'Congratulations! Your merchant account "{business_name}" has been created and is pending verification.',
-                        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@pexilabs.com'),
-                        recipient_list=[user.email],
-                        fail_silently=True,  # Don't fail if email doesn't work
+                        body=f'Congratulations! Your merchant account "{business_name}" has been created and is pending verification.',
+                        to=[user.email],
+                        purpose='merchant_created',
                     )
                 except Exception as e:
                     # Log the error for debugging
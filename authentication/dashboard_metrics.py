@@ -0,0 +1,216 @@
+"""
+Dashboard Metrics
+
+Headline numbers for the admin, staff and merchant verifier dashboards. Each
+dashboard's counters are computed with one conditional aggregate per table
+(``Count``/``Sum`` with ``filter=``) and the user growth chart with a single
+``TruncDate`` group-by, instead of a query per counter and per chart day.
+
+Results are cached in Django's cache for ``DASHBOARD_METRICS_CACHE_TTL``
+seconds. Once that expires, the stale result is still served for up to
+``DASHBOARD_METRICS_STALE_TTL`` seconds while one background thread
+recomputes it (stale-while-revalidate), so a dashboard load never waits on the
+aggregates unless nothing has been cached at all.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CustomUser, Merchant, MerchantStatus
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'dashboard_metrics'
+
+# Days shown on the admin user growth chart
+GROWTH_CHART_DAYS = 7
+
+
+def _start_of_day(days_ago: int = 0):
+    """Local midnight ``days_ago`` days back, as an aware datetime"""
+    midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight - timedelta(days=days_ago)
+
+
+def get_user_growth(days: int = GROWTH_CHART_DAYS) -> Dict[str, List]:
+    """Daily sign-ups for the last ``days`` days (today included), zero-filled"""
+    start = _start_of_day(days - 1)
+    per_day = dict(
+        CustomUser.objects.filter(created_at__gte=start)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(count=Count('id'))
+        .values_list('day', 'count')
+    )
+    dates = [(start + timedelta(days=offset)).date() for offset in range(days)]
+    return {
+        'labels': [date.strftime('%b %d') for date in dates],
+        'data': [per_day.get(date, 0) for date in dates],
+    }
+
+
+def compute_admin_metrics() -> Dict:
+    week_ago = _start_of_day(7)
+    month_ago = _start_of_day(30)
+
+    users = CustomUser.objects.aggregate(
+        total=Count('id'),
+        new_week=Count('id', filter=Q(created_at__gte=week_ago)),
+        new_month=Count('id', filter=Q(created_at__gte=month_ago)),
+        active=Count('id', filter=Q(is_active=True)),
+        verified=Count('id', filter=Q(is_verified=True)),
+    )
+    merchants = Merchant.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status=MerchantStatus.PENDING)),
+        approved=Count('id', filter=Q(status=MerchantStatus.APPROVED)),
+    )
+
+    metrics = {
+        'total_users': users['total'],
+        'new_users_week': users['new_week'],
+        'new_users_month': users['new_month'],
+        'active_users': users['active'],
+        'verified_users': users['verified'],
+        'total_merchants': merchants['total'],
+        'pending_merchants': merchants['pending'],
+        'active_merchants': merchants['approved'],
+        'total_transactions': 0,
+        'completed_transactions': 0,
+        'total_revenue': 0,
+        'active_integrations': 3,  # UBA, CyberSource, Corefy
+        'total_integrations': 3,
+        'user_growth': get_user_growth(),
+    }
+
+    if 'transactions' in settings.INSTALLED_APPS:
+        from transactions.models import Transaction, TransactionStatus
+
+        transactions = Transaction.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status=TransactionStatus.COMPLETED)),
+            revenue=Sum('amount', filter=Q(status=TransactionStatus.COMPLETED)),
+        )
+        metrics.update(
+            total_transactions=transactions['total'],
+            completed_transactions=transactions['completed'],
+            total_revenue=transactions['revenue'] or 0,
+        )
+
+    if 'integrations' in settings.INSTALLED_APPS:
+        from integrations.models import Integration, IntegrationStatus
+
+        integrations = Integration.objects.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status=IntegrationStatus.ACTIVE)),
+        )
+        metrics.update(active_integrations=integrations['active'], total_integrations=integrations['total'])
+
+    return metrics
+
+
+def compute_staff_metrics() -> Dict:
+    pending = Q(status=MerchantStatus.PENDING)
+    merchants = Merchant.objects.aggregate(
+        pending=Count('id', filter=pending, distinct=True),
+        need_review=Count('id', filter=pending | Q(documents__status='pending'), distinct=True),
+    )
+
+    if 'integrations' in settings.INSTALLED_APPS:
+        from integrations.models import Integration, IntegrationStatus
+
+        integrations_status = [
+            {'name': name, 'is_enabled': status == IntegrationStatus.ACTIVE, 'status': status}
+            for name, status in Integration.objects.values_list('name', 'status')
+        ]
+    else:
+        integrations_status = [
+            {'name': 'UBA', 'is_enabled': True, 'status': 'active'},
+            {'name': 'CyberSource', 'is_enabled': True, 'status': 'active'},
+            {'name': 'Corefy', 'is_enabled': True, 'status': 'active'},
+        ]
+
+    return {
+        'pending_merchants': merchants['pending'],
+        'merchants_need_review': merchants['need_review'],
+        'integrations_status': integrations_status,
+    }
+
+
+def compute_verifier_metrics() -> Dict:
+    week_ago = timezone.now() - timedelta(days=7)
+    return Merchant.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status=MerchantStatus.PENDING)),
+        approved=Count('id', filter=Q(status=MerchantStatus.APPROVED)),
+        rejected=Count('id', filter=Q(status=MerchantStatus.REJECTED)),
+        recent_approvals=Count('id', filter=Q(status=MerchantStatus.APPROVED, verified_at__gte=week_ago)),
+        recent_rejections=Count('id', filter=Q(status=MerchantStatus.REJECTED, updated_at__gte=week_ago)),
+    )
+
+
+DASHBOARDS: Dict[str, Callable[[], Dict]] = {
+    'admin': compute_admin_metrics,
+    'staff': compute_staff_metrics,
+    'verifier': compute_verifier_metrics,
+}
+
+
+def _cache_key(dashboard: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:{dashboard}"
+
+
+def refresh_dashboard_metrics(dashboard: str) -> Dict:
+    """Recompute a dashboard's metrics and store them in the cache"""
+    ttl = getattr(settings, 'DASHBOARD_METRICS_CACHE_TTL', 60)
+    stale_ttl = getattr(settings, 'DASHBOARD_METRICS_STALE_TTL', 300)
+    metrics = DASHBOARDS[dashboard]()
+    if ttl > 0:
+        cache.set(_cache_key(dashboard), {'computed_at': time.time(), 'metrics': metrics}, ttl + stale_ttl)
+    return metrics
+
+
+def _refresh_in_background(dashboard: str):
+    def run():
+        try:
+            refresh_dashboard_metrics(dashboard)
+        except Exception:
+            logger.exception("Failed to refresh %s dashboard metrics", dashboard)
+        finally:
+            cache.delete(f"{_cache_key(dashboard)}:refreshing")
+            connections.close_all()
+
+    threading.Thread(target=run, name=f"dashboard-metrics-{dashboard}", daemon=True).start()
+
+
+def get_dashboard_metrics(dashboard: str) -> Dict:
+    """Cached metrics for ``dashboard`` ('admin', 'staff' or 'verifier')"""
+    if dashboard not in DASHBOARDS:
+        raise ValueError(f"Unknown dashboard: {dashboard}")
+
+    ttl = getattr(settings, 'DASHBOARD_METRICS_CACHE_TTL', 60)
+    entry = cache.get(_cache_key(dashboard)) if ttl > 0 else None
+    if entry is None:
+        return refresh_dashboard_metrics(dashboard)
+
+    if time.time() - entry['computed_at'] >= ttl:
+        # Stale: serve it, and let a single request kick off the recompute
+        stale_ttl = getattr(settings, 'DASHBOARD_METRICS_STALE_TTL', 300)
+        if cache.add(f"{_cache_key(dashboard)}:refreshing", True, max(stale_ttl, 1)):
+            _refresh_in_background(dashboard)
+    return entry['metrics']
+
+
+def invalidate_dashboard_metrics(*dashboards: str):
+    """Drop cached metrics so the next load recomputes them (all if none given)"""
+    cache.delete_many([_cache_key(dashboard) for dashboard in dashboards or DASHBOARDS])
@@ -36,6 +36,8 @@ urlpatterns = [
     # Document API endpoints
     path('api/documents/', dashboard_views.upload_document_api, name='upload_document_api'),
     path('api/documents/<uuid:document_id>/', dashboard_views.delete_document_api, name='delete_document_api'),
+    path('api/documents/<uuid:document_id>/file/', dashboard_views.download_document_api, name='download_document_api'),
+    path('api/documents/<uuid:document_id>/preview/<str:size>/', dashboard_views.document_preview_api, name='document_preview_api'),
     
     # Profile management
     path('merchant/profile/', dashboard_views.merchant_profile_view, name='merchant_profile'),
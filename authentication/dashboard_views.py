@@ -1,13 +1,22 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, Prefetch, Q, Sum, prefetch_related_objects
 from django.utils import timezone
 from datetime import timedelta
 import json
+import os
 from .models import CustomUser, Merchant, UserRole, MerchantStatus
+from .dashboard_metrics import get_dashboard_metrics, invalidate_dashboard_metrics
+from .merchant_snapshot import get_merchant_snapshot
+from .documents import DocumentUploadError, release_document_file, store_upload
+from .document_previews import (
+    PREVIEW_SIZES, can_preview, get_preview, get_preview_format, get_preview_root, schedule_previews,
+)
+from .document_serving import get_document_etag, not_modified_response, serve_file
+from .notifications import get_etag, get_notification_state, invalidate_notification_state, is_unchanged
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
@@ -101,77 +110,29 @@ def admin_dashboard(request):
         messages.error(request, "Access denied. Admin privileges required.")
         return redirect('dashboard:dashboard_redirect')
     
-    # Get current date ranges
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-    
-    # User statistics
-    total_users = CustomUser.objects.count()
-    new_users_week = CustomUser.objects.filter(created_at__date__gte=week_ago).count()
-    new_users_month = CustomUser.objects.filter(created_at__date__gte=month_ago).count()
-    active_users = CustomUser.objects.filter(is_active=True).count()
-    verified_users = CustomUser.objects.filter(is_verified=True).count()
-    
-    # Merchant statistics
-    total_merchants = Merchant.objects.count()
-    pending_merchants = Merchant.objects.filter(status='pending_verification').count()
-    approved_merchants = Merchant.objects.filter(status='approved').count()
-    active_merchants = Merchant.objects.filter(status='approved').count()
-    
-    # Transaction statistics (if available)
-    if TRANSACTIONS_AVAILABLE:
-        total_transactions = Transaction.objects.count()
-        completed_transactions = Transaction.objects.filter(status='completed').count()
-        total_revenue = Transaction.objects.filter(
-            status='completed'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-    else:
-        total_transactions = 0
-        completed_transactions = 0
-        total_revenue = 0
-    
-    # Integration statistics (if available)
-    if INTEGRATIONS_AVAILABLE:
-        active_integrations = Integration.objects.filter(status='active').count()
-        total_integrations = Integration.objects.count()
-    else:
-        active_integrations = 3  # UBA, CyberSource, Corefy
-        total_integrations = 3
+    metrics = get_dashboard_metrics('admin')
+    total_users = metrics['total_users']
+    new_users_week = metrics['new_users_week']
     
     # Recent users
     recent_users = CustomUser.objects.order_by('-created_at')[:5]
     
-    # Chart data for user growth (last 7 days)
-    user_labels = []
-    user_data = []
-    
-    for i in range(6, -1, -1):
-        date = today - timedelta(days=i)
-        user_labels.append(date.strftime('%b %d'))
-        
-        daily_users = CustomUser.objects.filter(
-            created_at__date=date
-        ).count()
-        
-        user_data.append(daily_users)
-    
     context = {
         'page_title': 'Admin Dashboard - PexiLabs',
         'total_users': total_users,
-        'verified_users': verified_users,
+        'verified_users': metrics['verified_users'],
         'new_users_week': new_users_week,
-        'total_merchants': total_merchants,
-        'active_merchants': active_merchants,
-        'pending_merchants': pending_merchants,
-        'total_transactions': total_transactions,
-        'completed_transactions': completed_transactions,
-        'total_revenue': total_revenue,
-        'active_integrations': active_integrations,
-        'total_integrations': total_integrations,
+        'total_merchants': metrics['total_merchants'],
+        'active_merchants': metrics['active_merchants'],
+        'pending_merchants': metrics['pending_merchants'],
+        'total_transactions': metrics['total_transactions'],
+        'completed_transactions': metrics['completed_transactions'],
+        'total_revenue': metrics['total_revenue'],
+        'active_integrations': metrics['active_integrations'],
+        'total_integrations': metrics['total_integrations'],
         'recent_users': recent_users,
-        'user_labels': json.dumps(user_labels),
-        'user_data': json.dumps(user_data),
+        'user_labels': json.dumps(metrics['user_growth']['labels']),
+        'user_data': json.dumps(metrics['user_growth']['data']),
         'user_growth_percentage': round((new_users_week / max(total_users - new_users_week, 1)) * 100, 1),
     }
     
@@ -184,34 +145,20 @@ def staff_dashboard(request):
         messages.error(request, "Access denied. Staff privileges required.")
         return redirect('dashboard:dashboard_redirect')
     
-    # Merchant management statistics
-    pending_merchants = Merchant.objects.filter(status='pending').count()
-    merchants_need_review = Merchant.objects.filter(
-        Q(status='pending') | 
-        Q(merchantdocument__status='pending')
-    ).distinct().count()
+    # Merchant management statistics and integration health
+    metrics = get_dashboard_metrics('staff')
     
     # Recent merchant applications
     recent_applications = Merchant.objects.filter(
         status='pending'
     ).order_by('-created_at')[:10]
     
-    # Integration health
-    if INTEGRATIONS_AVAILABLE:
-        integrations_status = Integration.objects.values('name', 'is_enabled', 'status')
-    else:
-        integrations_status = [
-            {'name': 'UBA', 'is_enabled': True, 'status': 'active'},
-            {'name': 'CyberSource', 'is_enabled': True, 'status': 'active'},
-            {'name': 'Corefy', 'is_enabled': True, 'status': 'active'},
-        ]
-    
     context = {
         'page_title': 'Staff Dashboard - PexiLabs',
-        'pending_merchants': pending_merchants,
-        'merchants_need_review': merchants_need_review,
+        'pending_merchants': metrics['pending_merchants'],
+        'merchants_need_review': metrics['merchants_need_review'],
         'recent_applications': recent_applications,
-        'integrations_status': integrations_status,
+        'integrations_status': metrics['integrations_status'],
     }
     
     return render(request, 'dashboard/staff_dashboard.html', context)
@@ -245,83 +192,23 @@ def merchant_dashboard(request):
         return redirect('auth:user_dashboard')
     
     merchant = request.user.merchant_account
-    
-    # Transaction statistics (if transactions app is available)
-    try:
-        from transactions.models import Transaction
-        total_transactions = Transaction.objects.filter(merchant=merchant).count()
-        successful_transactions = Transaction.objects.filter(
-            merchant=merchant, 
-            status='completed'
-        ).count()
-        total_volume = Transaction.objects.filter(
-            merchant=merchant,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-    except ImportError:
-        total_transactions = 0
-        successful_transactions = 0
-        total_volume = 0
-    
-    # Integration status
-    if INTEGRATIONS_AVAILABLE:
-        merchant_integrations = MerchantIntegration.objects.filter(merchant=merchant)
-        # Recent API calls - filter by merchant_integration's merchant
-        recent_api_calls = IntegrationAPICall.objects.filter(
-            merchant_integration__merchant=merchant
-        ).order_by('-created_at')[:10]
-    else:
-        merchant_integrations = []
-        recent_api_calls = []
+    snapshot = get_merchant_snapshot(merchant)
     
     # Get available currencies for transaction forms
     from authentication.models import PreferredCurrency
     currencies = PreferredCurrency.objects.filter(is_active=True).order_by('code')
     
-    # Document statistics
-    from authentication.models import MerchantDocument, DocumentStatus
-    documents = {
-        'all': merchant.documents.all().order_by('-uploaded_at'),
-        'approved': merchant.documents.filter(status=DocumentStatus.APPROVED),
-        'pending': merchant.documents.filter(status=DocumentStatus.PENDING),
-        'rejected': merchant.documents.filter(status=DocumentStatus.REJECTED),
-    }
-    
-    # Checkout pages statistics (if checkout app is available)
-    checkout_pages_count = 0
-    try:
-        from checkout.models import CheckoutPage
-        checkout_pages_count = CheckoutPage.objects.filter(merchant=merchant).count()
-    except ImportError:
-        checkout_pages_count = 0
-    
-    # Check merchant information completeness
+    # Check merchant information completeness (reminders are created when the
+    # merchant is saved, see authentication.signals)
     is_info_complete = merchant.is_information_complete()
     missing_info = merchant.get_missing_information() if not is_info_complete else []
     
-    # Create notification for incomplete information
-    if not is_info_complete:
-        from authentication.models import Notification
-        Notification.create_info_completeness_reminder(merchant)
-    
     # Get unread notifications for the user
     unread_notifications = request.user.notifications.filter(
         is_read=False,
         is_dismissed=False
     ).order_by('-created_at')[:10]
     
-    # Get API keys for the merchant (for Test Integration section)
-    api_keys = []
-    if API_KEYS_AVAILABLE:
-        try:
-            partner, created = get_or_create_merchant_partner(merchant)
-            api_keys = AppKey.objects.filter(
-                partner=partner,
-                status=AppKeyStatus.ACTIVE
-            ).order_by('-created_at')
-        except Exception:
-            api_keys = []
-
     # Generate dynamic base URL from request
     scheme = 'https' if request.is_secure() else 'http'
     host = request.get_host()
@@ -330,21 +217,16 @@ def merchant_dashboard(request):
     context = {
         'page_title': f'{merchant.business_name} - Merchant Dashboard',
         'merchant': merchant,
-        'transaction_stats': {
-            'total': total_transactions,
-            'successful': successful_transactions,
-            'success_rate': (successful_transactions / total_transactions * 100) if total_transactions > 0 else 0,
-            'total_volume': total_volume,
-        },
-        'merchant_integrations': merchant_integrations,
-        'recent_api_calls': recent_api_calls,
+        'transaction_stats': snapshot.transaction_stats,
+        'merchant_integrations': snapshot.merchant_integrations,
+        'recent_api_calls': snapshot.recent_api_calls,
         'currencies': currencies,
-        'documents': documents,
-        'checkout_pages_count': checkout_pages_count,
+        'documents': snapshot.document_counts,
+        'checkout_pages_count': snapshot.checkout_pages_count,
         'is_info_complete': is_info_complete,
         'missing_info': missing_info,
         'notifications': unread_notifications,
-        'api_keys': api_keys,
+        'api_keys': snapshot.api_keys,
         'base_url': base_url,
     }
     
@@ -409,37 +291,24 @@ def merchant_verifier_dashboard(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Statistics
-    total_merchants = Merchant.objects.count()
-    pending_count = Merchant.objects.filter(status='pending').count()
-    approved_count = Merchant.objects.filter(status='approved').count()
-    rejected_count = Merchant.objects.filter(status='rejected').count()
-    
-    # Recent activity (last 7 days)
-    from datetime import timedelta
-    week_ago = timezone.now() - timedelta(days=7)
-    recent_approvals = Merchant.objects.filter(
-        status='approved',
-        verified_at__gte=week_ago
-    ).count()
-    recent_rejections = Merchant.objects.filter(
-        status='rejected',
-        updated_at__gte=week_ago
-    ).count()
+    # Thumbnails of each listed merchant's documents, loaded for this page only
+    from authentication.models import MerchantDocument
+    prefetch_related_objects(page_obj.object_list, Prefetch(
+        'documents',
+        queryset=MerchantDocument.objects.only(
+            'id', 'merchant_id', 'document_type', 'document_file', 'file_type', 'sha256', 'title'
+        ).order_by('document_type'),
+    ))
+    for merchant in page_obj.object_list:
+        for document in merchant.documents.all():
+            document.has_preview = can_preview(document)
     
     context = {
         'page_title': 'Merchant Verifier Dashboard - PexiLabs',
         'merchants': page_obj,
         'status_filter': status_filter,
         'search_query': search_query,
-        'stats': {
-            'total': total_merchants,
-            'pending': pending_count,
-            'approved': approved_count,
-            'rejected': rejected_count,
-            'recent_approvals': recent_approvals,
-            'recent_rejections': recent_rejections,
-        },
+        'stats': get_dashboard_metrics('verifier'),
         'status_choices': MerchantStatus.choices,
     }
     
@@ -463,9 +332,11 @@ def merchant_verification_detail(request, merchant_id):
     documents = []
     try:
         from authentication.models import MerchantDocument
-        documents = MerchantDocument.objects.filter(merchant=merchant).order_by('document_type')
+        documents = list(MerchantDocument.objects.filter(merchant=merchant).order_by('document_type'))
     except:
         pass
+    for document in documents:
+        document.has_preview = can_preview(document)
     
     # Handle POST requests (approval/rejection)
     if request.method == 'POST':
@@ -522,6 +393,8 @@ def merchant_verification_detail(request, merchant_id):
             merchant.save()
             messages.success(request, f"Merchant '{merchant.business_name}' has been reactivated.")
         
+        # The verifier should see their own decision reflected in the counts
+        invalidate_dashboard_metrics()
         return redirect('dashboard:merchant_verifier_dashboard')
     
     context = {
@@ -586,44 +459,18 @@ def merchant_transactions_view(request):
     page_number = request.GET.get('page')
     transactions = paginator.get_page(page_number)
     
-    # Calculate statistics
-    today = timezone.now().date()
-    
-    # Today's stats
-    today_transactions = Transaction.objects.filter(
-        merchant=merchant,
-        created_at__date=today
-    )
-    
-    # All-time stats for this merchant
-    all_transactions = Transaction.objects.filter(merchant=merchant)
-    
+    # Statistics come from the cached merchant snapshot
+    transaction_stats = get_merchant_snapshot(merchant).transaction_stats
     stats = {
-        'today_count': today_transactions.count(),
-        'today_volume': today_transactions.filter(
-            status=TransactionStatus.COMPLETED
-        ).aggregate(total=Sum('amount'))['total'] or 0,
-        
-        'total_count': all_transactions.count(),
-        'total_volume': all_transactions.filter(
-            status=TransactionStatus.COMPLETED
-        ).aggregate(total=Sum('amount'))['total'] or 0,
-        
-        'pending_count': all_transactions.filter(
-            status=TransactionStatus.PENDING
-        ).count(),
-        
-        'completed_count': all_transactions.filter(
-            status=TransactionStatus.COMPLETED
-        ).count(),
+        'today_count': transaction_stats['today_count'],
+        'today_volume': transaction_stats['today_volume'],
+        'total_count': transaction_stats['total'],
+        'total_volume': transaction_stats['total_volume'],
+        'pending_count': transaction_stats['pending'],
+        'completed_count': transaction_stats['successful'],
+        'success_rate': transaction_stats['success_rate'],
     }
     
-    # Calculate success rate
-    if stats['total_count'] > 0:
-        stats['success_rate'] = (stats['completed_count'] / stats['total_count']) * 100
-    else:
-        stats['success_rate'] = 0
-    
     # Get available currencies
     currencies = PreferredCurrency.objects.filter(is_active=True).order_by('code')
     
@@ -918,16 +765,6 @@ def upload_document_api(request):
         if not document_file:
             return JsonResponse({'error': 'No file uploaded'}, status=400)
         
-        # Validate file size (10MB limit)
-        if document_file.size > 10 * 1024 * 1024:
-            return JsonResponse({'error': 'File size too large. Maximum 10MB allowed.'}, status=400)
-        
-        # Validate file type
-        allowed_extensions = ['.pdf', '.jpg', '.jpeg', '.png']
-        file_extension = '.' + document_file.name.split('.')[-1].lower()
-        if file_extension not in allowed_extensions:
-            return JsonResponse({'error': 'Invalid file type. Only PDF, JPG, and PNG files are allowed.'}, status=400)
-        
         # Parse expiry date if provided
         expiry_date = None
         if request.POST.get('expiry_date'):
@@ -936,17 +773,38 @@ def upload_document_api(request):
             except ValueError:
                 return JsonResponse({'error': 'Invalid expiry date format'}, status=400)
         
+        # Validate (size, extension, magic bytes) and stream to content-addressed storage
+        try:
+            stored = store_upload(
+                request.user.merchant_account,
+                document_file,
+                allowed_extensions=['pdf', 'jpg', 'jpeg', 'png'],
+            )
+        except DocumentUploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
         # Create document
-        document = MerchantDocument.objects.create(
+        document = MerchantDocument(
             merchant=request.user.merchant_account,
             document_type=document_type,
-            document_file=document_file,
+            document_file=stored.name,
+            file_size=stored.size,
+            file_type=stored.mime_type,
+            sha256=stored.sha256,
             original_filename=document_file.name,
             title=request.POST.get('title'),
             description=request.POST.get('description', ''),
             expiry_date=expiry_date,
             status=DocumentStatus.PENDING
         )
+        try:
+            document.save()
+        except Exception:
+            # Don't leave a newly stored file behind without a document
+            if stored.created:
+                release_document_file(document)
+            raise
+        schedule_previews(document)
         
         return JsonResponse({
             'success': True,
@@ -973,9 +831,8 @@ def delete_document_api(request, document_id):
             merchant=request.user.merchant_account
         )
         
-        # Delete the file from storage
-        if document.document_file:
-            document.document_file.delete()
+        # Delete the file from storage unless another document shares it
+        release_document_file(document)
         
         # Delete the document record
         document.delete()
@@ -991,6 +848,79 @@ def delete_document_api(request, document_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def get_accessible_document(request, document_id, fields):
+    """A document the user may view (verifiers: any; merchants: their own), or an error response"""
+    from authentication.models import MerchantDocument
+    
+    documents = MerchantDocument.objects.only('id', 'merchant_id', *fields)
+    if not (request.user.is_staff or request.user.role in [UserRole.ADMIN, UserRole.STAFF]):
+        if not hasattr(request.user, 'merchant_account') or not request.user.merchant_account:
+            return None, JsonResponse({'error': 'Access denied'}, status=403)
+        documents = documents.filter(merchant=request.user.merchant_account)
+    
+    try:
+        return documents.get(id=document_id), None
+    except MerchantDocument.DoesNotExist:
+        return None, JsonResponse({'error': 'Document not found'}, status=404)
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def download_document_api(request, document_id):
+    """Serve a merchant document (inline, or as an attachment with ?download=1)"""
+    document, error = get_accessible_document(request, document_id, [
+        'document_file', 'original_filename', 'file_type', 'sha256', 'file_size', 'is_file_available', 'uploaded_at',
+    ])
+    if error:
+        return error
+    if not document.can_download:
+        return JsonResponse({'error': 'Document file not available'}, status=404)
+    
+    return serve_file(
+        request, 'media', document.document_file.name,
+        content_type=document.file_type or 'application/octet-stream',
+        etag=get_document_etag(document),
+        last_modified=document.uploaded_at,
+        filename=document.original_filename,
+        as_attachment=request.GET.get('download') == '1',
+    )
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def document_preview_api(request, document_id, size):
+    """Downscaled preview of a merchant document for verifiers and the owning merchant"""
+    document, error = get_accessible_document(request, document_id, [
+        'document_file', 'file_type', 'sha256', 'uploaded_at',
+    ])
+    if error:
+        return error
+    
+    if size not in PREVIEW_SIZES or not can_preview(document):
+        return JsonResponse({'error': 'Preview not available'}, status=404)
+    
+    # Previews are keyed by content hash, so they can be cached indefinitely
+    etag = f'"{document.sha256}-{size}"'
+    cache_control = f"private, max-age={getattr(settings, 'DOCUMENT_PREVIEW_CACHE_MAX_AGE', 31536000)}, immutable"
+    
+    # Revalidations are answered before get_preview, which may render the preview
+    response = not_modified_response(request, etag, document.uploaded_at, cache_control)
+    if response is not None:
+        return response
+    
+    path = get_preview(document, size)
+    if not path:
+        return JsonResponse({'error': 'Preview not available'}, status=404)
+    
+    return serve_file(
+        request, 'previews', os.path.relpath(path, get_preview_root()),
+        content_type=get_preview_format()[2],
+        etag=etag,
+        last_modified=document.uploaded_at,
+        cache_control=cache_control,
+    )
+
+
 @login_required
 def merchant_api_keys_view(request):
     """View for managing merchant API keys"""
@@ -1439,29 +1369,46 @@ def update_bank_details_api(request):
 
 @login_required
 def get_notifications_api(request):
-    """API endpoint to get user notifications"""
-    notifications = request.user.notifications.filter(
-        is_dismissed=False
-    ).order_by('-created_at')[:20]
-    
-    notification_data = []
-    for notif in notifications:
-        notification_data.append({
-            'id': str(notif.id),
-            'title': notif.title,
-            'message': notif.message,
-            'type': notif.type,
-            'priority': notif.priority,
-            'is_read': notif.is_read,
-            'action_url': notif.action_url,
-            'action_text': notif.action_text,
-            'created_at': notif.created_at.isoformat(),
+    """API endpoint to get user notifications
+    
+    Polls that send back the last ``ETag`` (``If-None-Match``) or ``since``
+    cursor get a 304 from the cached notification state when nothing changed.
+    ``?count=1`` returns only the unread count (for the badge poll).
+    """
+    state = get_notification_state(request.user)
+    if is_unchanged(request, state):
+        response = HttpResponseNotModified()
+    elif request.GET.get('count'):
+        response = JsonResponse({'unread_count': state['unread_count'], 'cursor': state['version']})
+    else:
+        notifications = request.user.notifications.filter(
+            is_dismissed=False
+        ).order_by('-created_at')[:20]
+        
+        notification_data = []
+        for notif in notifications:
+            notification_data.append({
+                'id': str(notif.id),
+                'title': notif.title,
+                'message': notif.message,
+                'type': notif.type,
+                'priority': notif.priority,
+                'is_read': notif.is_read,
+                'action_url': notif.action_url,
+                'action_text': notif.action_text,
+                'created_at': notif.created_at.isoformat(),
+            })
+        
+        response = JsonResponse({
+            'notifications': notification_data,
+            'unread_count': state['unread_count'],
+            'cursor': state['version'],
         })
     
-    return JsonResponse({
-        'notifications': notification_data,
-        'unread_count': request.user.notifications.filter(is_read=False, is_dismissed=False).count()
-    })
+    # Let the browser revalidate every poll with If-None-Match
+    response['ETag'] = get_etag(state)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 @login_required
 @require_http_methods(["POST"])
@@ -1489,10 +1436,14 @@ def dismiss_notification_api(request, notification_id):
 @require_http_methods(["POST"])
 def mark_all_notifications_read_api(request):
     """API endpoint to mark all notifications as read"""
+    now = timezone.now()
     count = request.user.notifications.filter(is_read=False).update(
         is_read=True,
-        read_at=timezone.now()
+        read_at=now,
+        updated_at=now
     )
+    if count:
+        invalidate_notification_state(request.user.pk)
     return JsonResponse({'success': True, 'marked_count': count})
 
 
@@ -2166,73 +2117,53 @@ def create_payment_intent_api(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 def uba_payment_webhook(request):
-    """Handle UBA/PayDock payment webhooks to update transaction status"""
+    """Handle UBA/PayDock payment webhooks to update transaction status
+
+    The event is verified and stored, then acknowledged immediately; the
+    ``process_webhooks`` worker applies it to the transaction.
+    """
+    if not INTEGRATIONS_AVAILABLE:
+        return JsonResponse({'error': 'Integration module not available'}, status=503)
+
+    from integrations.webhooks import WebhookSignatureError, check_signature, ingest_webhook
+
     try:
         # Parse webhook payload
         payload = json.loads(request.body)
         
-        # Extract payment information
-        event_type = payload.get('type')
         checkout_data = payload.get('data', {})
         checkout_id = checkout_data.get('_id')
-        status = checkout_data.get('status')
-        
         if not checkout_id:
             return JsonResponse({'error': 'Missing checkout ID'}, status=400)
         
-        # Update transaction if transactions app is available
-        if TRANSACTIONS_AVAILABLE:
-            try:
-                from transactions.models import Transaction, TransactionStatus
-                
-                # Find transaction by external reference (PayDock checkout ID)
-                transaction = Transaction.objects.get(external_reference=checkout_id)
-                
-                # Update transaction status based on webhook event
-                if event_type == 'transaction_success' or status == 'complete':
-                    transaction.status = TransactionStatus.COMPLETED
-                    transaction.mark_as_completed()
-                elif event_type == 'transaction_failure' or status == 'failed':
-                    transaction.status = TransactionStatus.FAILED
-                    transaction.mark_as_failed(
-                        reason=checkout_data.get('failure_reason', 'Payment failed'),
-                        code=checkout_data.get('failure_code', 'PAYMENT_FAILED')
-                    )
-                elif status == 'cancelled':
-                    transaction.status = TransactionStatus.CANCELLED
-                    transaction.save()
-                
-                # Update metadata with webhook information
-                transaction.metadata.update({
-                    'webhook_received': True,
-                    'webhook_event_type': event_type,
-                    'webhook_status': status,
-                    'webhook_timestamp': timezone.now().isoformat()
-                })
-                transaction.save()
-                
-                return JsonResponse({
-                    'success': True,
-                    'message': f'Transaction {transaction.reference} updated successfully',
-                    'transaction_id': str(transaction.id),
-                    'new_status': transaction.status
-                })
-                
-            except Transaction.DoesNotExist:
-                return JsonResponse({
-                    'success': False,
-                    'message': f'Transaction with checkout ID {checkout_id} not found'
-                }, status=404)
-            except Exception as e:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Error updating transaction: {str(e)}'
-                }, status=500)
-        else:
-            return JsonResponse({
-                'success': True,
-                'message': 'Webhook received but transactions app not available'
-            })
+        try:
+            is_verified = check_signature(
+                getattr(settings, 'UBA_WEBHOOK_SECRET', ''),
+                request.body,
+                request.META.get('HTTP_X_PAYDOCK_SIGNATURE', '')
+            )
+        except WebhookSignatureError as e:
+            return JsonResponse({'error': str(e)}, status=401)
+        
+        try:
+            webhook = ingest_webhook(
+                request, 'uba_kenya', payload.get('type'), payload, is_verified,
+                event_id=payload.get('id'),
+                reference=checkout_id,
+                status=f"{payload.get('type', '')}:{checkout_data.get('status', '')}",
+            )
+        except Integration.DoesNotExist:
+            # Nothing can be stored until the uba_kenya integration exists; ask the provider to retry
+            return JsonResponse({'error': 'UBA integration (uba_kenya) is not configured'}, status=503)
+        
+        if webhook is None:
+            return JsonResponse({'success': True, 'message': 'Duplicate webhook ignored'})
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Webhook received',
+            'webhook_id': str(webhook.id)
+        })
             
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON payload'}, status=400)
@@ -2270,7 +2201,14 @@ def integration_health_check_api(request):
                     'name': integration.integration.name,
                     'provider': integration.integration.provider_name,
                     'type': integration.integration.integration_type,
-                    'is_healthy': success_rate >= 95,  # Consider healthy if 95%+ success rate
+                    # Healthy only if the merchant's calls succeed 95%+ of the time AND the
+                    # provider passed its last health check. Provider health comes from the
+                    # background health check engine (integration_monitor --loop), so no
+                    # provider calls happen here
+                    'is_healthy': success_rate >= 95 and integration.integration.is_healthy,
+                    'provider_healthy': integration.integration.is_healthy,
+                    'last_health_check': integration.integration.last_health_check.isoformat() if integration.integration.last_health_check else None,
+                    'health_error_message': integration.integration.health_error_message,
                     'success_rate': round(success_rate, 2),
                     'total_requests': total_requests,
                     'successful_requests': successful_requests,
@@ -0,0 +1,292 @@
+"""
+Background Import/Export Jobs
+
+The django-import-export admin builds the whole tablib dataset in memory
+inside the request. For large tables (usage logs, merchants, users) the admin
+queues a ``DataTransferJob`` instead, and the ``run_data_transfers`` worker
+processes it:
+
+- Exports store the query string of the admin changelist they were queued
+  from (filters, search and ordering), plus the primary keys of the ticked
+  rows unless "select all" was used, so queueing never reads the matching
+  rows. The worker rebuilds the changelist queryset through the model admin,
+  joins the resource's foreign-key columns, prefetches its many-to-many
+  columns and streams it with ``.iterator()``, ``DATA_TRANSFER_EXPORT_CHUNK_SIZE``
+  rows at a time. Each row is written to a CSV file with the resource's own
+  header names and widgets, so the output matches the synchronous export.
+- Imports read the uploaded CSV in batches of ``DATA_TRANSFER_IMPORT_BATCH_SIZE``
+  rows. Each batch goes through ``Resource.import_data`` in its own
+  transaction. Where it is safe, ``use_bulk`` writes new and changed rows with
+  ``bulk_create``/``bulk_update``. Bulk mode skips ``save()``, save signals
+  and many-to-many columns, so resources whose model overrides ``save()`` or
+  has save signal receivers, or that import many-to-many columns, are
+  imported row by row instead (``supports_bulk_import``). A failing batch is
+  reported and the next batch continues.
+- Progress (``processed_rows`` of ``total_rows``), import totals and the first
+  row errors are saved on the job after every chunk, and the admin shows a
+  download link once an export has completed.
+
+Files live in ``DATA_TRANSFER_ROOT``, outside ``MEDIA_ROOT``, and are only
+downloadable through the admin.
+"""
+
+import csv
+import io
+import logging
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import tablib
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ALL_VAR, PAGE_VAR
+from django.contrib.auth.models import AnonymousUser
+from django.core.files import File
+from django.db import close_old_connections, models, transaction
+from django.db.models.signals import post_save, pre_save
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
+
+from .models import DataTransferJob, DataTransferKind, DataTransferStatus
+
+logger = logging.getLogger(__name__)
+
+# Row errors kept on a job; the totals still count every error
+MAX_STORED_ERRORS = 50
+
+
+def _resource_path(resource_class) -> str:
+    return f"{resource_class.__module__}.{resource_class.__qualname__}"
+
+
+def queue_export(resource_class, user=None, changelist_query: str = '', selected_ids=None) -> DataTransferJob:
+    """Queue a background export of an admin changelist with ``resource_class``
+
+    ``changelist_query`` is the changelist's query string; ``selected_ids``
+    limits the export to the rows ticked on its page (all matching rows when
+    empty).
+    """
+    query = QueryDict(changelist_query, mutable=True)
+    for param in (PAGE_VAR, ALL_VAR):
+        query.pop(param, None)
+    return DataTransferJob.objects.create(
+        kind=DataTransferKind.EXPORT,
+        resource=_resource_path(resource_class),
+        changelist_query=query.urlencode(),
+        selected_ids=[str(pk) for pk in selected_ids or []],
+        created_by=user,
+    )
+
+
+def queue_import(resource_class, uploaded_file, user=None) -> DataTransferJob:
+    """Queue a background import of an uploaded CSV file with ``resource_class``"""
+    job = DataTransferJob(kind=DataTransferKind.IMPORT, resource=_resource_path(resource_class), created_by=user)
+    job.input_file.save(os.path.basename(uploaded_file.name), uploaded_file, save=False)
+    job.save()
+    return job
+
+
+def _save_progress(job: DataTransferJob, *fields):
+    job.updated_at = timezone.now()
+    DataTransferJob.objects.filter(pk=job.pk).update(**{field: getattr(job, field) for field in (*fields, 'updated_at')})
+
+
+def get_changelist_queryset(job: DataTransferJob, model):
+    """The export's rows, as its admin changelist filtered and ordered them"""
+    model_admin = admin.site._registry.get(model)
+    if model_admin is None or not hasattr(model_admin, 'get_export_queryset'):
+        queryset = model.objects.order_by('pk')
+    else:
+        request = HttpRequest()
+        request.method = 'GET'
+        request.GET = QueryDict(job.changelist_query)
+        request.user = job.created_by or AnonymousUser()
+        queryset = model_admin.get_export_queryset(request)
+    if job.selected_ids:
+        queryset = queryset.filter(pk__in=job.selected_ids)
+    return queryset
+
+
+def add_export_relations(resource, queryset):
+    """``queryset`` joined and prefetched with the relations the resource renders"""
+    related, prefetched = [], []
+    for field in resource.get_export_fields():
+        if not field.attribute or '__' in field.attribute:
+            continue
+        if isinstance(field.widget, ForeignKeyWidget):
+            related.append(field.attribute)
+        elif isinstance(field.widget, ManyToManyWidget):
+            prefetched.append(field.attribute)
+    if related:
+        queryset = queryset.select_related(*related)
+    if prefetched:
+        queryset = queryset.prefetch_related(*prefetched)
+    return queryset
+
+
+def run_export(job: DataTransferJob):
+    """Stream the job's rows to a CSV file, chunk by chunk"""
+    resource = import_string(job.resource)()
+    queryset = add_export_relations(resource, get_changelist_queryset(job, resource._meta.model))
+    chunk_size = getattr(settings, 'DATA_TRANSFER_EXPORT_CHUNK_SIZE', 2000)
+
+    job.total_rows = queryset.count()
+    _save_progress(job, 'total_rows')
+
+    temp_dir = os.path.join(job.output_file.storage.location, 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    with tempfile.TemporaryFile(dir=temp_dir) as temp:
+        text = io.TextIOWrapper(temp, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(resource.get_export_headers())
+        for instance in queryset.iterator(chunk_size=chunk_size):
+            writer.writerow(resource.export_resource(instance))
+            job.processed_rows += 1
+            if job.processed_rows % chunk_size == 0:
+                _save_progress(job, 'processed_rows')
+        text.flush()
+
+        temp.seek(0)
+        name = f"{job.resource_name.lower()}-{timezone.localtime():%Y%m%d-%H%M%S}.csv"
+        job.output_file.save(name, File(temp), save=False)
+        text.detach()
+
+
+def supports_bulk_import(resource_class) -> bool:
+    """Whether importing with ``use_bulk`` gives the same rows as a row-by-row import"""
+    model = resource_class._meta.model
+    if model.save is not models.Model.save:
+        return False
+    if pre_save.has_listeners(model) or post_save.has_listeners(model):
+        return False
+    return not any(isinstance(field.widget, ManyToManyWidget) for field in resource_class.fields.values())
+
+
+def get_import_resource_class(resource_class):
+    """``resource_class`` configured for batched imports, with bulk queries where that is safe"""
+    meta = type('Meta', (), {
+        'use_bulk': supports_bulk_import(resource_class),
+        'batch_size': getattr(settings, 'DATA_TRANSFER_IMPORT_BATCH_SIZE', 1000),
+        'skip_diff': True,
+    })
+    return type(f"Bulk{resource_class.__name__}", (resource_class,), {'Meta': meta, '__module__': resource_class.__module__})
+
+
+def _collect_errors(job: DataTransferJob, result, offset: int):
+    for number, errors in result.row_errors():
+        for error in errors:
+            job.errors.append({'row': offset + number, 'error': str(error.error)})
+    for invalid in result.invalid_rows:
+        job.errors.append({'row': offset + invalid.number, 'error': invalid.error_dict})
+    for error in result.base_errors:
+        job.errors.append({'row': None, 'error': str(error.error)})
+    del job.errors[MAX_STORED_ERRORS:]
+
+
+def _import_batch(job: DataTransferJob, resource, headers: List[str], rows: List[List[str]], offset: int):
+    try:
+        result = resource.import_data(
+            tablib.Dataset(*rows, headers=headers), dry_run=False, raise_errors=False, use_transactions=True,
+        )
+    except Exception as e:
+        job.totals['error'] = job.totals.get('error', 0) + len(rows)
+        job.errors.append({'row': offset + 1, 'error': f"Batch of {len(rows)} rows failed: {e}"})
+        del job.errors[MAX_STORED_ERRORS:]
+        return
+    for outcome, count in result.totals.items():
+        job.totals[outcome] = job.totals.get(outcome, 0) + count
+    _collect_errors(job, result, offset)
+
+
+def run_import(job: DataTransferJob):
+    """Import the job's CSV file in batches"""
+    resource = get_import_resource_class(import_string(job.resource))()
+    batch_size = getattr(settings, 'DATA_TRANSFER_IMPORT_BATCH_SIZE', 1000)
+
+    with open(job.input_file.path, 'rb') as handle:
+        text = io.TextIOWrapper(handle, encoding='utf-8-sig', newline='')
+        job.total_rows = max(sum(1 for _ in csv.reader(text)) - 1, 0)
+        _save_progress(job, 'total_rows')
+
+        text.seek(0)
+        reader = csv.reader(text)
+        headers = next(reader, [])
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) >= batch_size:
+                _import_batch(job, resource, headers, rows, job.processed_rows)
+                job.processed_rows += len(rows)
+                _save_progress(job, 'processed_rows', 'totals', 'errors')
+                rows = []
+        if rows:
+            _import_batch(job, resource, headers, rows, job.processed_rows)
+            job.processed_rows += len(rows)
+
+
+def run_job(job: DataTransferJob) -> DataTransferJob:
+    """Run a claimed job to completion and record its outcome"""
+    try:
+        if job.kind == DataTransferKind.EXPORT:
+            run_export(job)
+        else:
+            run_import(job)
+        job.status = DataTransferStatus.COMPLETED
+    except Exception as e:
+        logger.error(f"❌ Data transfer job {job.id} failed: {str(e)}")
+        job.status = DataTransferStatus.FAILED
+        job.error_message = str(e)
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+class DataTransferWorker:
+    """Claim pending import/export jobs one at a time and run them"""
+
+    def claim(self) -> Optional[DataTransferJob]:
+        with transaction.atomic():
+            job = (
+                DataTransferJob.objects.filter(status=DataTransferStatus.PENDING)
+                .select_for_update(skip_locked=True)
+                .order_by('created_at')
+                .first()
+            )
+            if job:
+                job.status = DataTransferStatus.RUNNING
+                job.started_at = timezone.now()
+                job.save(update_fields=['status', 'started_at', 'updated_at'])
+        return job
+
+    def run_once(self) -> Optional[DataTransferJob]:
+        job = self.claim()
+        return run_job(job) if job else None
+
+    def run(self, max_jobs: Optional[int] = None) -> List[DataTransferJob]:
+        """Run pending jobs until none are left"""
+        results = []
+        while max_jobs is None or len(results) < max_jobs:
+            job = self.run_once()
+            if not job:
+                break
+            results.append(job)
+        return results
+
+    def run_forever(self, poll_interval: float = None, on_job=None):
+        """Worker loop: run jobs as they are queued, sleeping when idle"""
+        poll_interval = poll_interval or getattr(settings, 'DATA_TRANSFER_POLL_INTERVAL', 5)
+        while True:
+            close_old_connections()
+            try:
+                job = self.run_once()
+            except Exception as e:
+                logger.error(f"Data transfer worker failed: {str(e)}")
+                job = None
+            if job and on_job:
+                on_job(job)
+            if not job:
+                time.sleep(poll_interval)
@@ -0,0 +1,199 @@
+"""
+Document Previews
+
+Verifiers review documents from downscaled previews instead of the original
+scans. Two sizes are rendered for each document: a small ``thumb`` for lists
+and a larger ``preview`` for the review page. They are saved as WebP or JPEG
+(``DOCUMENT_PREVIEW_FORMAT``).
+
+- Images are decoded with Pillow. EXIF rotation is applied and the image is
+  downscaled with ``draft()`` first, so JPEG scans are decoded at reduced size.
+- The first page of a PDF is rasterised when PyMuPDF is installed; without it
+  PDFs simply have no preview.
+- Previews are written under ``DOCUMENT_PREVIEW_ROOT`` with the document's
+  SHA-256 in the name. Identical files share previews, and a preview never goes
+  stale, so it can be served with a long ``Cache-Control: immutable``. The
+  preview root sits outside ``MEDIA_ROOT``, so previews are only reachable
+  through the permission-checked view.
+- ``schedule_previews`` renders on a small thread pool
+  (``DOCUMENT_PREVIEW_WORKERS``) once the upload transaction commits. The view
+  renders on demand if a preview is requested before the pool gets to it, and
+  ``manage.py generate_document_previews`` backfills older documents.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .models import MerchantDocument
+
+try:
+    import fitz  # PyMuPDF
+    PDF_PREVIEWS_AVAILABLE = True
+except ImportError:
+    fitz = None
+    PDF_PREVIEWS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Bounding box of each preview size, in pixels
+PREVIEW_SIZES = {
+    'thumb': (320, 320),
+    'preview': (1400, 1400),
+}
+
+FORMATS = {
+    'WEBP': ('webp', 'image/webp'),
+    'JPEG': ('jpg', 'image/jpeg'),
+}
+
+IMAGE_TYPES = {'image/jpeg', 'image/png'}
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+
+
+def get_preview_root() -> str:
+    return str(getattr(settings, 'DOCUMENT_PREVIEW_ROOT', os.path.join(settings.BASE_DIR, 'document_previews')))
+
+
+def get_preview_format():
+    """``(PIL format, extension, content type)`` for rendered previews"""
+    name = str(getattr(settings, 'DOCUMENT_PREVIEW_FORMAT', 'WEBP')).upper()
+    if name not in FORMATS:
+        name = 'JPEG'
+    return (name, *FORMATS[name])
+
+
+def can_preview(document: MerchantDocument) -> bool:
+    """Whether a preview can be rendered for this document's type"""
+    if not document.sha256 or not document.document_file:
+        return False
+    if document.file_type in IMAGE_TYPES:
+        return True
+    return document.file_type == 'application/pdf' and PDF_PREVIEWS_AVAILABLE
+
+
+def preview_path(sha256: str, size: str) -> str:
+    _, extension, _ = get_preview_format()
+    return os.path.join(get_preview_root(), sha256[:2], f"{sha256}-{size}.{extension}")
+
+
+def _open_image(document: MerchantDocument) -> Image.Image:
+    largest = max(max(box) for box in PREVIEW_SIZES.values())
+    if document.file_type == 'application/pdf':
+        with default_storage.open(document.document_file.name, 'rb') as handle:
+            pdf = fitz.open(stream=handle.read(), filetype='pdf')
+        try:
+            page = pdf[0]
+            zoom = largest / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        finally:
+            pdf.close()
+
+    with default_storage.open(document.document_file.name, 'rb') as handle:
+        image = Image.open(handle)
+        # Let the JPEG decoder skip detail the previews will never show
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    return image
+
+
+def _save(image: Image.Image, path: str):
+    pil_format, _, _ = get_preview_format()
+    if image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write beside the target and rename, so readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            image.save(handle, pil_format, quality=getattr(settings, 'DOCUMENT_PREVIEW_QUALITY', 80))
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def generate_previews(document: MerchantDocument, force: bool = False) -> Dict[str, str]:
+    """Render every missing preview size for ``document``; return ``{size: path}``"""
+    if not can_preview(document):
+        return {}
+
+    paths = {size: preview_path(document.sha256, size) for size in PREVIEW_SIZES}
+    missing = [size for size, path in paths.items() if force or not os.path.exists(path)]
+    if missing:
+        source = _open_image(document)
+        for size in missing:
+            image = source.copy()
+            image.thumbnail(PREVIEW_SIZES[size], Image.LANCZOS)
+            _save(image, paths[size])
+    return paths
+
+
+def get_preview(document: MerchantDocument, size: str) -> Optional[str]:
+    """Path of a rendered preview, rendering it now if the worker has not yet"""
+    if size not in PREVIEW_SIZES or not can_preview(document):
+        return None
+    path = preview_path(document.sha256, size)
+    if not os.path.exists(path):
+        try:
+            generate_previews(document)
+        except Exception as e:
+            logger.warning(f"Could not render preview for document {document.id}: {str(e)}")
+            return None
+    return path
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'DOCUMENT_PREVIEW_WORKERS', 2),
+                thread_name_prefix='document-preview',
+            )
+        return _executor
+
+
+def _generate_in_background(document_id):
+    try:
+        document = MerchantDocument.objects.get(pk=document_id)
+        generate_previews(document)
+    except Exception as e:
+        logger.warning(f"Could not render previews for document {document_id}: {str(e)}")
+    finally:
+        with _executor_lock:
+            _in_flight.discard(document_id)
+        connections.close_all()
+
+
+def schedule_previews(document: MerchantDocument):
+    """Render ``document``'s previews on the worker pool after the current transaction commits"""
+    if not can_preview(document):
+        return
+
+    def submit():
+        with _executor_lock:
+            if document.pk in _in_flight:
+                return
+            _in_flight.add(document.pk)
+        _get_executor().submit(_generate_in_background, document.pk)
+
+    transaction.on_commit(submit)
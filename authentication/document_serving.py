@@ -0,0 +1,184 @@
+"""
+Document Serving
+
+Serves merchant documents and their previews after the view has checked
+permissions:
+
+- ``ETag`` is the stored SHA-256 (plus the preview size), and
+  ``Last-Modified`` is the upload time. Both change only when the content
+  does, so ``If-None-Match``/``If-Modified-Since`` revalidation never reads
+  the file.
+- Single ``Range: bytes=`` requests get a ``206`` (honouring ``If-Range``), so
+  large scans and PDFs can be resumed and viewed page by page. Multi-range
+  requests get the whole file, which the spec allows.
+- ``DOCUMENT_SERVE_MODE = 'x-accel'`` (nginx) or ``'x-sendfile'``
+  (Apache/lighttpd) hands the transfer to the web server once the view has
+  authorised it, so no Python worker is held for the download. For
+  ``x-accel``, ``DOCUMENT_ACCEL_REDIRECT_PREFIXES`` maps each root to an
+  ``internal`` nginx location. The web server then handles ranges itself.
+- Otherwise (``'django'``, the default) the file is memory-mapped and streamed
+  through ``FileResponse``, so only the requested slice is paged in.
+"""
+
+import mmap
+import os
+import re
+from datetime import datetime
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+SERVE_MODES = ('django', 'x-accel', 'x-sendfile')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_serve_mode() -> str:
+    mode = getattr(settings, 'DOCUMENT_SERVE_MODE', 'django')
+    return mode if mode in SERVE_MODES else 'django'
+
+
+def get_roots():
+    """Directories documents and previews are served from, by name"""
+    return {
+        'media': str(settings.MEDIA_ROOT),
+        'previews': str(getattr(settings, 'DOCUMENT_PREVIEW_ROOT', os.path.join(settings.BASE_DIR, 'document_previews'))),
+    }
+
+
+class _MappedRange:
+    """File-like view of ``[start, end]`` of a memory-mapped file"""
+
+    def __init__(self, path: str, start: int, end: int):
+        self.position = start
+        self.end = end + 1
+        with open(path, 'rb') as handle:
+            # The mapping keeps its own reference, so the file can be closed now
+            self.mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) if self.end > 0 else None
+
+    def read(self, size: int = -1) -> bytes:
+        if self.mapped is None:
+            return b''
+        stop = self.end if size is None or size < 0 else min(self.end, self.position + size)
+        data = self.mapped[self.position:stop]
+        self.position = stop
+        return data
+
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+
+
+def get_document_etag(document) -> str:
+    """Strong ETag for a document's content; legacy rows without a hash fall back to id, upload time and size"""
+    if document.sha256:
+        return f'"{document.sha256}"'
+    return f'"{document.id}-{int(document.uploaded_at.timestamp())}-{document.file_size}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """``(start, end)`` (inclusive) for a single byte range, or ``None`` to send the whole file
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        # Suffix range: the final N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        return None
+    if start >= size or start > end:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def is_not_modified(request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(last_modified and if_modified_since and int(last_modified.timestamp()) <= if_modified_since)
+
+
+def serve_file(request, root: str, name: str, content_type: str, etag: str,
+               last_modified: Optional[datetime] = None, filename: Optional[str] = None,
+               as_attachment: bool = False, cache_control: str = 'private, no-cache') -> HttpResponse:
+    """Respond with ``name`` (relative to the ``root`` directory), honouring conditionals and ranges"""
+    response = not_modified_response(request, etag, last_modified, cache_control)
+    if response is not None:
+        return response
+
+    path = os.path.join(get_roots()[root], name)
+    mode = get_serve_mode()
+    if mode == 'django':
+        response = _stream(request, path, content_type, etag)
+    else:
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel':
+            prefixes = getattr(settings, 'DOCUMENT_ACCEL_REDIRECT_PREFIXES', {})
+            prefix = prefixes.get(root, f'/protected/{root}/')
+            response['X-Accel-Redirect'] = quote(prefix.rstrip('/') + '/' + name.replace(os.sep, '/'))
+        else:
+            response['X-Sendfile'] = path
+    if filename and response.status_code != 416:
+        disposition = 'attachment' if as_attachment else 'inline'
+        response['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(filename)}"
+
+    return _set_validators(response, etag, last_modified, cache_control)
+
+
+def not_modified_response(request, etag: str, last_modified: Optional[datetime] = None,
+                          cache_control: str = 'private, no-cache') -> Optional[HttpResponse]:
+    """A 304 when the client's copy matches ``etag``/``last_modified``, else ``None``
+
+    Views call this before any expensive work needed to locate the file.
+    """
+    if not is_not_modified(request, etag, last_modified):
+        return None
+    return _set_validators(HttpResponseNotModified(), etag, last_modified, cache_control)
+
+
+def _set_validators(response: HttpResponse, etag: str, last_modified: Optional[datetime],
+                    cache_control: str) -> HttpResponse:
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _stream(request, path: str, content_type: str, etag: str) -> HttpResponse:
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        raise Http404('File not found')
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    response = FileResponse(_MappedRange(path, start, end), content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,205 @@
+"""
+Merchant Document Storage
+
+Upload pipeline for ``MerchantDocument`` files:
+
+- The upload is streamed chunk by chunk into a temporary file next to its
+  final location. Only uploads under ``FILE_UPLOAD_MAX_MEMORY_SIZE`` are ever
+  held in memory. The size limit is enforced while streaming.
+- A SHA-256 of the content is computed during the same pass. Files are stored
+  under a content-addressed path per merchant
+  (``merchant_documents/<merchant_id>/<ab>/<sha256>.<ext>``), so re-uploading
+  the same file stores it once. Rows sharing a file are counted before the
+  file is deleted.
+- The real type is sniffed from the first bytes, so a renamed executable is
+  rejected even with a ``.pdf`` name.
+- Size, type, hash and availability are saved on the row, so listing
+  documents never touches the filesystem. ``manage.py verify_document_files``
+  re-checks the stored flags against storage.
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .models import MerchantDocument
+
+# Leading bytes of every supported format and the MIME type they identify
+MAGIC_NUMBERS = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+    (b'PK\x03\x04', 'application/zip'),
+]
+
+# Extensions accepted for upload and the sniffed types each may contain
+ALLOWED_TYPES = {
+    'pdf': {'application/pdf'},
+    'jpg': {'image/jpeg'},
+    'jpeg': {'image/jpeg'},
+    'png': {'image/png'},
+    'doc': {'application/msword'},
+    'docx': {'application/zip'},
+}
+
+# Stored MIME type for each extension (docx is a zip container)
+EXTENSION_MIME_TYPES = {
+    'pdf': 'application/pdf',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'doc': 'application/msword',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DocumentUploadError(ValueError):
+    """The uploaded file is too large, of a disallowed type or not what it claims to be"""
+
+
+class StoredDocument:
+    """Where an upload ended up and what it turned out to be"""
+
+    def __init__(self, name: str, sha256: str, size: int, mime_type: str, created: bool):
+        self.name = name
+        self.sha256 = sha256
+        self.size = size
+        self.mime_type = mime_type
+        self.created = created
+
+    def __repr__(self):
+        return f"<StoredDocument {self.name} {self.size}B {self.mime_type}>"
+
+
+def get_max_upload_size() -> int:
+    return getattr(settings, 'DOCUMENT_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+
+
+def get_extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """MIME type identified by a file's leading bytes, if it is a supported format"""
+    for magic, mime_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime_type
+    return None
+
+
+def validate_upload(uploaded_file, allowed_extensions=None) -> str:
+    """Check size, extension and magic bytes; return the MIME type to store
+
+    Raises:
+        DocumentUploadError: If the file is rejected
+    """
+    max_size = get_max_upload_size()
+    if uploaded_file.size > max_size:
+        raise DocumentUploadError(f"File size too large. Maximum {max_size // (1024 * 1024)}MB allowed.")
+
+    extension = get_extension(uploaded_file.name)
+    allowed = allowed_extensions or ALLOWED_TYPES
+    if extension not in allowed:
+        names = ', '.join(sorted(ext.upper() for ext in allowed))
+        raise DocumentUploadError(f"Invalid file type. Only {names} files are allowed.")
+
+    uploaded_file.seek(0)
+    head = uploaded_file.read(16)
+    uploaded_file.seek(0)
+    if sniff_mime_type(head) not in ALLOWED_TYPES[extension]:
+        raise DocumentUploadError(f"File content does not match its .{extension} extension.")
+    return EXTENSION_MIME_TYPES[extension]
+
+
+def content_path(merchant_id, sha256: str, extension: str) -> str:
+    return os.path.join('merchant_documents', str(merchant_id), sha256[:2], f"{sha256}.{extension}")
+
+
+def store_upload(merchant, uploaded_file, allowed_extensions=None) -> StoredDocument:
+    """Validate and stream an upload to its content-addressed location"""
+    mime_type = validate_upload(uploaded_file, allowed_extensions)
+    extension = get_extension(uploaded_file.name)
+    max_size = get_max_upload_size()
+
+    temp_dir = os.path.join(settings.MEDIA_ROOT, 'merchant_documents', 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+        try:
+            for chunk in uploaded_file.chunks(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise DocumentUploadError(f"File size too large. Maximum {max_size // (1024 * 1024)}MB allowed.")
+                digest.update(chunk)
+                temp.write(chunk)
+        except Exception:
+            temp.close()
+            os.unlink(temp.name)
+            raise
+
+    sha256 = digest.hexdigest()
+    name = content_path(merchant.id, sha256, extension)
+    created = False
+    try:
+        if not default_storage.exists(name):
+            created = True
+            try:
+                target = default_storage.path(name)
+            except NotImplementedError:
+                target = None
+            if target is not None:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.chmod(temp.name, getattr(settings, 'FILE_UPLOAD_PERMISSIONS', None) or 0o644)
+                os.replace(temp.name, target)
+            else:
+                with open(temp.name, 'rb') as handle:
+                    name = default_storage.save(name, File(handle))
+    finally:
+        if os.path.exists(temp.name):
+            os.unlink(temp.name)
+
+    return StoredDocument(name=name, sha256=sha256, size=size, mime_type=mime_type, created=created)
+
+
+def release_document_file(document: MerchantDocument):
+    """Delete a document's file unless another document still references it"""
+    name = document.document_file.name
+    if not name:
+        return
+    still_used = MerchantDocument.objects.filter(document_file=name).exclude(pk=document.pk).exists()
+    if not still_used:
+        default_storage.delete(name)
+
+
+def hash_stored_file(name: str) -> str:
+    digest = hashlib.sha256()
+    with default_storage.open(name, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_document(document: MerchantDocument, compute_hash: bool = False) -> bool:
+    """Refresh a document's stored size, availability and (optionally) hash; return whether any changed"""
+    name = document.document_file.name
+    available = bool(name) and default_storage.exists(name)
+    changed = available != document.is_file_available
+    document.is_file_available = available
+    if available:
+        size = default_storage.size(name)
+        if size != document.file_size:
+            document.file_size = size
+            changed = True
+        if compute_hash and not document.sha256:
+            document.sha256 = hash_stored_file(name)
+            changed = True
+    return changed
@@ -0,0 +1,175 @@
+"""
+Email Outbox
+
+Request handlers and signals never talk to the mail server. ``queue_email``
+writes an ``OutboundEmail`` row instead. It runs inside the caller's database
+transaction, so an email exists only if the change that triggered it was
+committed. The ``send_emails`` worker then claims due rows in batches
+(``select_for_update(skip_locked=True)``, so several workers can run), leases
+them by setting ``leased_until`` and commits straight away. Each batch is sent
+over one connection from ``get_connection()`` outside any transaction, and the
+outcomes are written back in one bulk update. No row lock is held during SMTP
+I/O, and a worker that dies mid-batch cannot roll back the record of emails it
+already sent: the unsent rest becomes claimable again once
+``EMAIL_OUTBOX_LEASE`` expires.
+
+Failed messages are retried with exponential backoff
+(``EMAIL_OUTBOX_RETRY_BASE_DELAY`` doubling up to
+``EMAIL_OUTBOX_RETRY_MAX_DELAY``) until ``max_attempts``, then marked failed.
+``EMAIL_OUTBOX_BACKEND`` lets the worker use a different backend from the rest
+of the site, e.g. the console or file-based backend locally.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail, OutboundEmailStatus
+
+logger = logging.getLogger(__name__)
+
+SENT_FIELDS = ['status', 'attempts', 'next_attempt_at', 'leased_until', 'sent_at', 'last_error', 'updated_at']
+
+
+def queue_email(subject: str, body: str, to: Iterable[str], html_body: str = '',
+                from_email: Optional[str] = None, purpose: str = '') -> OutboundEmail:
+    """Add an email to the outbox; it is sent once the current transaction commits"""
+    return OutboundEmail.objects.create(
+        purpose=purpose,
+        subject=subject,
+        body=body,
+        html_body=html_body or '',
+        from_email=from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@pexilabs.com'),
+        to=list(to),
+    )
+
+
+def get_retry_delay(attempts: int) -> int:
+    """Seconds to wait before retrying after ``attempts`` failed sends"""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_BASE_DELAY', 60)
+    return min(base * 2 ** max(attempts - 1, 0), getattr(settings, 'EMAIL_OUTBOX_RETRY_MAX_DELAY', 3600))
+
+
+def build_message(email: OutboundEmail, connection) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+class EmailOutboxWorker:
+    """Send due outbox emails in batches over a reused connection"""
+
+    def __init__(self, batch_size: int = None, backend: str = None, lease_seconds: int = None):
+        self.batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+        self.backend = backend or getattr(settings, 'EMAIL_OUTBOX_BACKEND', None) or None
+        self.lease_seconds = lease_seconds or getattr(settings, 'EMAIL_OUTBOX_LEASE', 3600)
+
+    def claim_batch(self) -> List[OutboundEmail]:
+        """Lock and lease a batch of due emails, releasing the locks on return"""
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(
+                OutboundEmail.objects
+                .filter(status=OutboundEmailStatus.PENDING, next_attempt_at__lte=now)
+                .filter(Q(leased_until__isnull=True) | Q(leased_until__lte=now))
+                .select_for_update(skip_locked=True)
+                .order_by('next_attempt_at')[:self.batch_size]
+            )
+            if emails:
+                OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                    leased_until=now + timedelta(seconds=self.lease_seconds)
+                )
+        return emails
+
+    def send_batch(self, emails: List[OutboundEmail]):
+        """Send ``emails`` over one connection and record each outcome on the row"""
+        now = timezone.now()
+        connection = get_connection(self.backend, fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            for email in emails:
+                self._record_failure(email, f"Could not connect to mail server: {e}", now)
+            return
+
+        try:
+            for email in emails:
+                email.attempts += 1
+                try:
+                    # One message per call so a rejected recipient does not abort the rest
+                    connection.send_messages([build_message(email, connection)])
+                except Exception as e:
+                    self._record_failure(email, str(e), now, counted=True)
+                    continue
+                email.status = OutboundEmailStatus.SENT
+                email.sent_at = now
+                email.last_error = ''
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _record_failure(self, email: OutboundEmail, error: str, now, counted: bool = False):
+        if not counted:
+            email.attempts += 1
+        email.last_error = error
+        if email.attempts >= email.max_attempts:
+            email.status = OutboundEmailStatus.FAILED
+            logger.error(f"❌ Giving up on email {email.id} to {', '.join(email.to)}: {error}")
+        else:
+            email.next_attempt_at = now + timedelta(seconds=get_retry_delay(email.attempts))
+            logger.warning(f"Email {email.id} failed (attempt {email.attempts}), retrying: {error}")
+
+    def run_once(self) -> List[OutboundEmail]:
+        """Claim a batch of due emails, send it and record the outcomes"""
+        emails = self.claim_batch()
+        if emails:
+            self.send_batch(emails)
+            now = timezone.now()
+            for email in emails:
+                email.leased_until = None
+                email.updated_at = now
+            OutboundEmail.objects.bulk_update(emails, SENT_FIELDS)
+        return emails
+
+    def run(self, max_batches: Optional[int] = None) -> List[OutboundEmail]:
+        """Send due emails batch by batch until none are left"""
+        results = []
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            batch = self.run_once()
+            if not batch:
+                break
+            results.extend(batch)
+            batches += 1
+        return results
+
+    def run_forever(self, poll_interval: float = None, on_batch=None):
+        """Worker loop: send emails as they are queued, sleeping when idle"""
+        poll_interval = poll_interval or getattr(settings, 'EMAIL_OUTBOX_POLL_INTERVAL', 2)
+        while True:
+            close_old_connections()
+            try:
+                batch = self.run_once()
+            except Exception as e:
+                logger.error(f"Email outbox batch failed: {str(e)}")
+                batch = []
+            if on_batch and batch:
+                on_batch(batch)
+            if len(batch) < self.batch_size:
+                time.sleep(poll_interval)
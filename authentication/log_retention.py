@@ -0,0 +1,381 @@
+"""
+Retention and Archival for Request Logs
+
+``AppKeyUsageLog`` (one row per partner API request) and
+``IntegrationAPICall`` (one row per gateway call, with full bodies) are
+append-only and would otherwise grow forever. ``apply_log_retention`` keeps
+each table to its configured number of days:
+
+- Rows older than the cutoff are read in keyset order on
+  ``(created_at, id)``, ``LOG_RETENTION_BATCH_SIZE`` at a time, so every
+  batch is an index range scan. This also avoids walking the dead tuples
+  left behind by earlier batches, which ``OFFSET`` paging would do.
+- Each batch is appended to a gzip-compressed JSONL archive under
+  ``LOG_ARCHIVE_ROOT`` and flushed to disk before the batch is deleted.
+  After a crash a batch may be archived twice, but it is never deleted
+  without being archived.
+- The policy's rollups are brought up to date for the expiring window before
+  anything is deleted, so aggregate statistics survive the raw rows. A rollup
+  is called as ``rollup(start, end)`` and must be idempotent.
+- On PostgreSQL a table can be converted to monthly range partitions on
+  ``created_at`` (``manage_log_partitions --convert``). Retention then
+  archives each month that has fully expired and drops its partition,
+  instead of deleting the rows one batch at a time. Rows left in the
+  partially expired month and in the default partition are still deleted in
+  batches.
+
+A retention of ``0`` days keeps a table forever.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Tables under retention, by model label. ``rollups`` are dotted paths to
+# ``rollup(start, end)`` callables run before the window is deleted.
+RETENTION_POLICIES = {
+    'authentication.AppKeyUsageLog': {
+        'setting': 'APP_KEY_USAGE_LOG_RETENTION_DAYS',
+        'default_days': 90,
+        'rollups': ['authentication.usage_rollups.rollup_usage'],
+    },
+    'integrations.IntegrationAPICall': {
+        'setting': 'INTEGRATION_API_CALL_RETENTION_DAYS',
+        'default_days': 30,
+        'rollups': ['integrations.api_call_rollups.rollup_api_calls'],
+    },
+}
+
+PARTITION_SUFFIX_RE = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+class RetentionPolicy:
+    """Retention settings for one log table"""
+
+    def __init__(self, label: str, setting: str, default_days: int, rollups: List[str]):
+        self.label = label
+        self.model = apps.get_model(label)
+        self.days = int(getattr(settings, setting, default_days))
+        self.rollups = rollups
+
+    @property
+    def table(self) -> str:
+        return self.model._meta.db_table
+
+    def get_cutoff(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Rows created before this are expired, or ``None`` if the table is kept forever
+
+        The cutoff is on the hour, so a rollup bucket is never left half deleted.
+        """
+        if self.days <= 0:
+            return None
+        cutoff = (now or timezone.now()) - timedelta(days=self.days)
+        return cutoff.replace(minute=0, second=0, microsecond=0)
+
+
+def get_policies(labels: Optional[List[str]] = None) -> List[RetentionPolicy]:
+    """Retention policies, optionally limited to the given model labels"""
+    unknown = set(labels or []) - set(RETENTION_POLICIES)
+    if unknown:
+        raise ValueError(f"No retention policy for: {', '.join(sorted(unknown))}")
+    return [
+        RetentionPolicy(label, **options)
+        for label, options in RETENTION_POLICIES.items()
+        if not labels or label in labels
+    ]
+
+
+def run_rollups(policy: RetentionPolicy, start: datetime, end: datetime):
+    for path in policy.rollups:
+        import_string(path)(start, end)
+
+
+# =============================================================================
+# ARCHIVES
+# =============================================================================
+
+def get_archive_root() -> str:
+    return str(getattr(settings, 'LOG_ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'log_archives')))
+
+
+class ArchiveWriter:
+    """Gzip-compressed JSONL file that is flushed to disk after every batch"""
+
+    def __init__(self, policy: RetentionPolicy, start: datetime, end: datetime):
+        directory = os.path.join(get_archive_root(), policy.table)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{policy.table}-{start:%Y%m%d%H%M%S}-{end:%Y%m%d%H%M%S}-{timezone.now():%Y%m%d%H%M%S%f}.jsonl.gz"
+        self.path = os.path.join(directory, name)
+        self.file = open(self.path, 'wb')
+        self.gzip = gzip.GzipFile(fileobj=self.file, mode='wb')
+        self.rows = 0
+
+    def write(self, rows: List[dict]):
+        self.gzip.write(''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows).encode('utf-8'))
+        # Sync-flush the compressor so everything written so far can be read back
+        self.gzip.flush()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.rows += len(rows)
+
+    def close(self):
+        self.gzip.close()
+        self.file.close()
+
+
+def read_archive(path: str):
+    """Yield the rows stored in an archive file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            yield json.loads(line)
+
+
+# =============================================================================
+# BATCHED ARCHIVE AND DELETE
+# =============================================================================
+
+def iter_batches(policy: RetentionPolicy, start: Optional[datetime], end: datetime, batch_size: int):
+    """Yield rows created in ``[start, end)`` as lists of dicts, in keyset order"""
+    model = policy.model
+    fields = [field.attname for field in model._meta.concrete_fields]
+    queryset = model._base_manager.filter(created_at__lt=end).order_by('created_at', 'pk')
+    if start:
+        queryset = queryset.filter(created_at__gte=start)
+
+    last = None
+    while True:
+        batch = queryset
+        if last:
+            batch = batch.filter(
+                Q(created_at__gt=last['created_at']) | Q(created_at=last['created_at'], pk__gt=last['id'])
+            )
+        rows = list(batch.values(*fields)[:batch_size])
+        if not rows:
+            return
+        yield rows
+        last = rows[-1]
+
+
+def purge_rows(policy: RetentionPolicy, start: datetime, end: datetime,
+               batch_size: int, archive: bool = True, delete: bool = True) -> dict:
+    """Archive (and unless ``delete`` is off, delete) the rows created in ``[start, end)``"""
+    writer = ArchiveWriter(policy, start, end) if archive else None
+    deleted = 0
+    try:
+        for rows in iter_batches(policy, start, end, batch_size):
+            if writer:
+                writer.write(rows)
+            if delete:
+                deleted += policy.model._base_manager.filter(pk__in=[row['id'] for row in rows]).delete()[0]
+    finally:
+        if writer:
+            writer.close()
+
+    if writer and not writer.rows:
+        os.remove(writer.path)
+    return {
+        'archived': writer.rows if writer else 0,
+        'deleted': deleted,
+        'archive': writer.path if writer and writer.rows else None,
+    }
+
+
+def apply_retention(policy: RetentionPolicy, now: Optional[datetime] = None, batch_size: Optional[int] = None,
+                    archive: Optional[bool] = None, dry_run: bool = False) -> dict:
+    """Roll up, archive and remove the policy's expired rows"""
+    cutoff = policy.get_cutoff(now)
+    result = {'cutoff': cutoff, 'expired': 0, 'archived': 0, 'deleted': 0, 'archives': [], 'partitions_dropped': []}
+    if cutoff is None:
+        return result
+
+    manager = policy.model._base_manager
+    expired = manager.filter(created_at__lt=cutoff)
+    if dry_run:
+        result['expired'] = expired.count()
+        return result
+
+    oldest = expired.aggregate(oldest=Min('created_at'))['oldest']
+    if oldest is None:
+        return result
+    run_rollups(policy, oldest, cutoff)
+
+    batch_size = batch_size or getattr(settings, 'LOG_RETENTION_BATCH_SIZE', 5000)
+    if archive is None:
+        archive = getattr(settings, 'LOG_ARCHIVE_ENABLED', True)
+
+    def record(outcome):
+        result['archived'] += outcome['archived']
+        result['deleted'] += outcome['deleted']
+        if outcome['archive']:
+            result['archives'].append(outcome['archive'])
+
+    connection = connections[manager.db]
+    for partition, start, end in get_expired_partitions(policy, cutoff):
+        outcome = purge_rows(policy, start, end, batch_size, archive=archive, delete=False)
+        outcome['deleted'] = manager.filter(created_at__gte=start, created_at__lt=end).count()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {connection.ops.quote_name(partition)}')
+        logger.info(f"Dropped expired partition {partition} ({outcome['deleted']} rows)")
+        record(outcome)
+        result['partitions_dropped'].append(partition)
+
+    record(purge_rows(policy, oldest, cutoff, batch_size, archive=archive))
+    result['expired'] = result['deleted']
+    return result
+
+
+# =============================================================================
+# POSTGRESQL MONTHLY PARTITIONS
+# =============================================================================
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value: datetime) -> datetime:
+    return (_month_start(value) + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(model, using: str = 'default') -> bool:
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [model._meta.db_table])
+        return cursor.fetchone() is not None
+
+
+def get_partitions(model, using: str = 'default') -> Dict[str, datetime]:
+    """Monthly partitions of ``model``'s table, mapped to the (UTC) month they hold"""
+    if not is_partitioned(model, using):
+        return {}
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)',
+            [model._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_SUFFIX_RE.search(name)
+        if match:
+            partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+    return partitions
+
+
+def get_expired_partitions(policy: RetentionPolicy, cutoff: datetime):
+    """``(partition, start, end)`` for every partition whose whole month is before ``cutoff``"""
+    expired = []
+    for name, month in sorted(get_partitions(policy.model, policy.model._base_manager.db).items(), key=lambda item: item[1]):
+        end = _next_month(month)
+        if end <= cutoff:
+            expired.append((name, month, end))
+    return expired
+
+
+def create_partitions(model, months_ahead: Optional[int] = None, using: str = 'default') -> List[str]:
+    """Create the monthly partitions from the current month to ``months_ahead`` months from now"""
+    if not is_partitioned(model, using):
+        return []
+    if months_ahead is None:
+        months_ahead = getattr(settings, 'LOG_PARTITION_MONTHS_AHEAD', 2)
+    connection = connections[using]
+    table = model._meta.db_table
+    existing = get_partitions(model, using)
+
+    created = []
+    month = _month_start(timezone.now().astimezone(dt_timezone.utc))
+    with connection.cursor() as cursor:
+        for _ in range(months_ahead + 1):
+            name = partition_name(table, month)
+            if name not in existing:
+                cursor.execute(
+                    f'CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF {connection.ops.quote_name(table)} '
+                    'FOR VALUES FROM (%s) TO (%s)',
+                    [month, _next_month(month)],
+                )
+                created.append(name)
+            month = _next_month(month)
+    return created
+
+
+def convert_to_partitioned(model, using: str = 'default') -> List[str]:
+    """Rebuild ``model``'s table as monthly range partitions on ``created_at``
+
+    The rows are copied into the new table in one transaction, so run this in
+    a maintenance window (ideally after retention has trimmed the table). The
+    primary key becomes ``(id, created_at)``, because PostgreSQL requires the
+    partition key in every unique constraint.
+
+    Raises:
+        ValueError: If the database is not PostgreSQL or the table is already partitioned
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        raise ValueError('Partitioning is only supported on PostgreSQL')
+    if is_partitioned(model, using):
+        raise ValueError(f"{model._meta.db_table} is already partitioned")
+
+    table = model._meta.db_table
+    old_table = f"{table}_unpartitioned"
+    quote = connection.ops.quote_name
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}')
+        # Index names share a namespace with tables, so move the old ones aside
+        cursor.execute('SELECT indexname FROM pg_indexes WHERE tablename = %s', [old_table])
+        for (index,) in cursor.fetchall():
+            cursor.execute(f'ALTER INDEX {quote(index)} RENAME TO {quote(index[:50] + "_unpart")}')
+
+        cursor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old_table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, created_at)')
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for field in model._meta.local_fields:
+                if field.remote_field and field.db_constraint:
+                    schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+                if field.db_index and not field.unique and not field.primary_key:
+                    schema_editor.execute(schema_editor._create_index_sql(model, fields=[field]))
+            for index in model._meta.indexes:
+                schema_editor.add_index(model, index)
+
+        cursor.execute(f'CREATE TABLE {quote(table + "_default")} PARTITION OF {quote(table)} DEFAULT')
+        cursor.execute(f'SELECT MIN(created_at) FROM {quote(old_table)}')
+        oldest = cursor.fetchone()[0] or timezone.now()
+        month = _month_start(oldest.astimezone(dt_timezone.utc))
+        current = _month_start(timezone.now().astimezone(dt_timezone.utc))
+        while month < current:
+            cursor.execute(
+                f'CREATE TABLE {quote(partition_name(table, month))} PARTITION OF {quote(table)} '
+                'FOR VALUES FROM (%s) TO (%s)',
+                [month, _next_month(month)],
+            )
+            month = _next_month(month)
+        create_partitions(model, using=using)
+
+        cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old_table)}')
+        cursor.execute(f'DROP TABLE {quote(old_table)}')
+    return sorted(get_partitions(model, using))
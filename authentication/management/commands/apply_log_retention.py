@@ -0,0 +1,65 @@
+"""
+Archive and remove request logs past their retention period
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.log_retention import apply_retention, get_policies
+
+
+class Command(BaseCommand):
+    help = 'Roll up, archive and delete AppKeyUsageLog and IntegrationAPICall rows past their retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help='Only apply this policy (e.g. authentication.AppKeyUsageLog); can be repeated',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Rows archived and deleted per batch (default: LOG_RETENTION_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Delete expired rows without writing them to an archive file',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows have expired',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            policies = get_policies(options['models'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for policy in policies:
+            if policy.days <= 0:
+                self.stdout.write(f"{policy.label}: kept forever")
+                continue
+
+            result = apply_retention(
+                policy,
+                batch_size=options['batch_size'],
+                archive=False if options['no_archive'] else None,
+                dry_run=options['dry_run'],
+            )
+            cutoff = f"{result['cutoff']:%Y-%m-%d %H:%M}"
+            if options['dry_run']:
+                self.stdout.write(f"{policy.label}: {result['expired']} rows older than {cutoff} would be removed")
+                continue
+
+            self.stdout.write(self.style.SUCCESS(
+                f"🗄️  {policy.label}: {result['deleted']} rows older than {cutoff} removed, {result['archived']} archived"
+            ))
+            for partition in result['partitions_dropped']:
+                self.stdout.write(f"   dropped partition {partition}")
+            for path in result['archives']:
+                self.stdout.write(f"   archive: {path}")
@@ -0,0 +1,43 @@
+"""
+Render missing merchant document previews
+"""
+
+from django.core.management.base import BaseCommand
+
+from authentication.document_previews import PDF_PREVIEWS_AVAILABLE, can_preview, generate_previews
+from authentication.models import MerchantDocument
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnails and previews for documents that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render previews that already exist (e.g. after changing the preview format)',
+        )
+
+    def handle(self, *args, **options):
+        if not PDF_PREVIEWS_AVAILABLE:
+            self.stdout.write(self.style.WARNING('PyMuPDF is not installed; PDF documents will be skipped'))
+
+        documents = (
+            MerchantDocument.objects.exclude(sha256='')
+            .only('id', 'document_file', 'file_type', 'sha256')
+            .order_by('pk')
+        )
+        rendered = 0
+        failed = 0
+        for document in documents.iterator(chunk_size=500):
+            if not can_preview(document):
+                continue
+            try:
+                generate_previews(document, force=options['force'])
+                rendered += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(f"  ❌ Document {document.id}: {str(e)}")
+
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"🖼️  Previews ready for {rendered} document(s), {failed} failed"))
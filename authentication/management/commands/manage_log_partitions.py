@@ -0,0 +1,53 @@
+"""
+Maintain monthly PostgreSQL partitions for the request log tables
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from authentication.log_retention import convert_to_partitioned, create_partitions, get_policies, is_partitioned
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions for the request log tables, or convert a table to partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help='Only manage this table (e.g. integrations.IntegrationAPICall); can be repeated',
+        )
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Rebuild unpartitioned tables as monthly partitions (copies every row; run in a maintenance window)',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=None,
+            help='Future months to create partitions for (default: LOG_PARTITION_MONTHS_AHEAD)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Log partitioning requires PostgreSQL')
+        try:
+            policies = get_policies(options['models'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for policy in policies:
+            if not is_partitioned(policy.model):
+                if not options['convert']:
+                    self.stdout.write(self.style.WARNING(f"⚠️  {policy.table} is not partitioned (use --convert)"))
+                    continue
+                partitions = convert_to_partitioned(policy.model)
+                self.stdout.write(self.style.SUCCESS(f"✅ {policy.table} converted to {len(partitions)} monthly partitions"))
+
+            created = create_partitions(policy.model, months_ahead=options['months_ahead'])
+            if created:
+                self.stdout.write(self.style.SUCCESS(f"✅ {policy.table}: created {', '.join(created)}"))
+            else:
+                self.stdout.write(f"{policy.table}: partitions up to date")
@@ -0,0 +1,65 @@
+"""
+Roll API-key usage logs up into hourly buckets
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from authentication.usage_rollups import floor_hour, rollup_recent_usage, rollup_usage
+
+
+class Command(BaseCommand):
+    help = 'Recompute the AppKeyUsageHourly rollup for recently closed hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=None,
+            help='Closed hours to recompute (default: APP_KEY_USAGE_ROLLUP_LOOKBACK_HOURS)',
+        )
+        parser.add_argument(
+            '--backfill-days',
+            type=int,
+            default=None,
+            help='Recompute every hour of the last N days, one day at a time (hours whose logs '
+                 'retention has removed are kept as they are)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, rolling up every APP_KEY_USAGE_ROLLUP_INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill_days']:
+            end = floor_hour(timezone.now())
+            for days_ago in range(options['backfill_days'], 0, -1):
+                day_end = end - timedelta(days=days_ago - 1)
+                rows = rollup_usage(day_end - timedelta(days=1), day_end)
+                self.stdout.write(f"{day_end - timedelta(days=1):%Y-%m-%d %H:00}: {rows} hourly rows")
+            self.stdout.write(self.style.SUCCESS(f"✅ Backfilled {options['backfill_days']} days of hourly usage"))
+            return
+
+        if not options['loop']:
+            rows = rollup_recent_usage(options['hours'])
+            self.stdout.write(self.style.SUCCESS(f"✅ {rows} hourly usage rows written"))
+            return
+
+        interval = getattr(settings, 'APP_KEY_USAGE_ROLLUP_INTERVAL', 300)
+        self.stdout.write(self.style.SUCCESS('📊 Usage rollup worker started'))
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    rollup_recent_usage(options['hours'])
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"❌ Usage rollup failed: {str(e)}"))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Usage rollup worker stopped')
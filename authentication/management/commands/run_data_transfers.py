@@ -0,0 +1,56 @@
+"""
+Run queued background import/export jobs
+"""
+
+from django.core.management.base import BaseCommand
+
+from authentication.data_transfers import DataTransferWorker
+from authentication.models import DataTransferJob, DataTransferStatus
+
+
+class Command(BaseCommand):
+    help = 'Run background import/export jobs queued from the admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a worker instead of draining queued jobs once',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Seconds to sleep when no jobs are queued (with --loop)',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Stop after this many jobs (without --loop)',
+        )
+
+    def handle(self, *args, **options):
+        worker = DataTransferWorker()
+
+        if options['loop']:
+            self.stdout.write(self.style.SUCCESS('📦 Data transfer worker started'))
+            try:
+                worker.run_forever(poll_interval=options['poll_interval'], on_job=self.report_job)
+            except KeyboardInterrupt:
+                self.stdout.write('Data transfer worker stopped')
+            return
+
+        for job in worker.run(max_jobs=options['max_jobs']):
+            self.report_job(job)
+        pending = DataTransferJob.objects.filter(status=DataTransferStatus.PENDING).count()
+        self.stdout.write(f"Jobs still queued: {pending}")
+
+    def report_job(self, job):
+        if job.status == DataTransferStatus.COMPLETED:
+            totals = ', '.join(f"{count} {outcome}" for outcome, count in job.totals.items() if count)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {job.get_kind_display()} {job.resource_name}: {job.processed_rows} rows" + (f" ({totals})" if totals else '')
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(f"❌ {job.get_kind_display()} {job.resource_name} failed: {job.error_message}"))
@@ -0,0 +1,62 @@
+"""
+Send queued outbox emails
+"""
+
+from django.core.management.base import BaseCommand
+
+from authentication.email_outbox import EmailOutboxWorker
+from authentication.models import OutboundEmail, OutboundEmailStatus
+
+
+class Command(BaseCommand):
+    help = 'Send emails queued in the outbox over a reused mail connection (run several processes to scale out)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a worker instead of draining due emails once',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Emails sent per connection (default: EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Seconds to sleep when no emails are due (with --loop)',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches (without --loop)',
+        )
+
+    def handle(self, *args, **options):
+        worker = EmailOutboxWorker(batch_size=options['batch_size'])
+
+        if options['loop']:
+            self.stdout.write(self.style.SUCCESS('📧 Email outbox worker started'))
+            try:
+                worker.run_forever(poll_interval=options['poll_interval'], on_batch=self.report_batch)
+            except KeyboardInterrupt:
+                self.stdout.write('Email outbox worker stopped')
+            return
+
+        results = worker.run(max_batches=options['max_batches'])
+        if results:
+            self.report_batch(results)
+        pending = OutboundEmail.objects.filter(status=OutboundEmailStatus.PENDING).count()
+        self.stdout.write(f"Emails still pending: {pending}")
+
+    def report_batch(self, emails):
+        sent = [email for email in emails if email.status == OutboundEmailStatus.SENT]
+        failed = [email for email in emails if email.status != OutboundEmailStatus.SENT]
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"Sent {len(sent)} email(s), {len(failed)} not sent"))
+        for email in failed:
+            self.stdout.write(f"  ❌ {email.purpose or 'email'} to {', '.join(email.to)} ({email.id}): {email.last_error}")
@@ -0,0 +1,50 @@
+"""
+Re-check merchant document files against storage
+"""
+
+from django.core.management.base import BaseCommand
+
+from authentication.documents import verify_document
+from authentication.models import MerchantDocument
+
+UPDATE_FIELDS = ['is_file_available', 'file_size', 'sha256']
+
+
+class Command(BaseCommand):
+    help = 'Refresh the stored size and availability of merchant document files (and hash legacy uploads)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hash',
+            action='store_true',
+            help='Compute the SHA-256 of documents uploaded before hashes were stored',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Documents updated per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        documents = MerchantDocument.objects.only('id', 'document_file', *UPDATE_FIELDS).order_by('pk')
+
+        checked = 0
+        missing = 0
+        pending = []
+        for document in documents.iterator(chunk_size=batch_size):
+            checked += 1
+            if verify_document(document, compute_hash=options['hash']):
+                pending.append(document)
+            if not document.is_file_available:
+                missing += 1
+                self.stdout.write(f"  ❌ Missing file for document {document.id}: {document.document_file.name}")
+            if len(pending) >= batch_size:
+                MerchantDocument.objects.bulk_update(pending, UPDATE_FIELDS)
+                pending = []
+        if pending:
+            MerchantDocument.objects.bulk_update(pending, UPDATE_FIELDS)
+
+        style = self.style.SUCCESS if not missing else self.style.WARNING
+        self.stdout.write(style(f"📁 Checked {checked} document(s), {missing} missing"))
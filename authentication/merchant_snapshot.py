@@ -0,0 +1,229 @@
+"""
+Merchant Dashboard Snapshot
+
+Everything the merchant dashboard and transactions page show about a merchant
+that does not depend on the request: transaction totals (all-time and today),
+document counts, checkout page count, active API keys, integrations and recent
+API calls. It is computed with one aggregate per table and cached per merchant.
+
+The cached snapshot is dropped whenever one of its inputs changes (transaction
+saves and status transitions, document uploads/deletes, API key changes,
+merchant integration changes), and ``MERCHANT_DASHBOARD_CACHE_TTL`` bounds how
+long anything not covered by those events (recent API calls) can lag behind.
+A snapshot computed on a previous day is never served, since the "today"
+figures would be wrong.
+
+Building a snapshot never writes: API keys are looked up through the
+merchant's existing whitelabel partner rather than ``get_or_create``.
+
+The snapshot lives in the shared cache, so API keys, integrations and API
+calls are kept as plain dicts of the display fields the dashboard renders
+(``values()``), never as model instances: secret keys, stored credentials and
+logged request headers or bodies must not end up in Redis or memcached.
+"""
+
+import logging
+from datetime import timedelta
+from typing import Dict, List
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import AppKey, AppKeyStatus, DocumentStatus, Merchant, MerchantDocument
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'merchant_dashboard'
+
+# Display fields cached for the dashboard lists (nested with ``__``)
+API_KEY_FIELDS = ('id', 'name', 'public_key', 'key_type', 'created_at')
+MERCHANT_INTEGRATION_FIELDS = (
+    'id', 'is_enabled', 'status', 'total_requests', 'successful_requests', 'last_used_at',
+    'integration__name', 'integration__provider_name', 'integration__integration_type', 'integration__description',
+)
+API_CALL_FIELDS = (
+    'method', 'operation_type', 'is_successful', 'response_time_ms', 'created_at',
+    'merchant_integration__integration__name',
+)
+
+
+class MerchantDashboardSnapshot:
+    """Request-independent merchant dashboard data"""
+
+    def __init__(self, merchant_id, as_of, transaction_stats: Dict, document_counts: Dict,
+                 checkout_pages_count: int, api_keys: List, merchant_integrations: List,
+                 recent_api_calls: List):
+        self.merchant_id = merchant_id
+        self.as_of = as_of
+        self.transaction_stats = transaction_stats
+        self.document_counts = document_counts
+        self.checkout_pages_count = checkout_pages_count
+        self.api_keys = api_keys
+        self.merchant_integrations = merchant_integrations
+        self.recent_api_calls = recent_api_calls
+
+    @property
+    def is_current(self) -> bool:
+        return self.as_of == timezone.localdate()
+
+    def __repr__(self):
+        return f"<MerchantDashboardSnapshot merchant={self.merchant_id} as_of={self.as_of}>"
+
+
+def _cache_key(merchant_id) -> str:
+    return f"{CACHE_KEY_PREFIX}:{merchant_id}"
+
+
+def _display_rows(queryset, fields) -> List[Dict]:
+    """``values()`` rows with ``a__b`` lookups nested as ``{'a': {'b': ...}}`` for templates"""
+    rows = []
+    for row in queryset.values(*fields):
+        nested = {}
+        for key, value in row.items():
+            *parents, name = key.split('__')
+            target = nested
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[name] = value
+        rows.append(nested)
+    return rows
+
+
+def _get_transaction_stats(merchant: Merchant) -> Dict:
+    stats = {
+        'total': 0, 'successful': 0, 'pending': 0, 'total_volume': 0,
+        'today_count': 0, 'today_volume': 0, 'success_rate': 0,
+    }
+    if 'transactions' not in settings.INSTALLED_APPS:
+        return stats
+
+    from transactions.models import Transaction, TransactionStatus
+
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    completed = Q(status=TransactionStatus.COMPLETED)
+    is_today = Q(created_at__gte=today, created_at__lt=today + timedelta(days=1))
+    totals = Transaction.objects.filter(merchant=merchant).aggregate(
+        total=Count('id'),
+        successful=Count('id', filter=completed),
+        pending=Count('id', filter=Q(status=TransactionStatus.PENDING)),
+        total_volume=Sum('amount', filter=completed),
+        today_count=Count('id', filter=is_today),
+        today_volume=Sum('amount', filter=completed & is_today),
+    )
+    stats.update({key: value or 0 for key, value in totals.items()})
+    if stats['total']:
+        stats['success_rate'] = stats['successful'] / stats['total'] * 100
+    return stats
+
+
+def build_snapshot(merchant: Merchant) -> MerchantDashboardSnapshot:
+    """Compute a merchant's dashboard snapshot from the database"""
+    document_counts = MerchantDocument.objects.filter(merchant=merchant).aggregate(
+        total=Count('id'),
+        approved=Count('id', filter=Q(status=DocumentStatus.APPROVED)),
+        pending=Count('id', filter=Q(status=DocumentStatus.PENDING)),
+        rejected=Count('id', filter=Q(status=DocumentStatus.REJECTED)),
+    )
+
+    checkout_pages_count = 0
+    if 'checkout' in settings.INSTALLED_APPS:
+        from checkout.models import CheckoutPage
+        checkout_pages_count = CheckoutPage.objects.filter(merchant=merchant).count()
+
+    api_keys = _display_rows(
+        AppKey.objects.filter(partner__code=f"merchant_{merchant.id}", status=AppKeyStatus.ACTIVE)
+        .order_by('-created_at'),
+        API_KEY_FIELDS,
+    )
+
+    merchant_integrations = []
+    recent_api_calls = []
+    if 'integrations' in settings.INSTALLED_APPS:
+        from integrations.models import IntegrationAPICall, MerchantIntegration
+
+        merchant_integrations = _display_rows(
+            MerchantIntegration.objects.filter(merchant=merchant),
+            MERCHANT_INTEGRATION_FIELDS,
+        )
+        recent_api_calls = _display_rows(
+            IntegrationAPICall.objects.filter(merchant_integration__merchant=merchant).order_by('-created_at')[:10],
+            API_CALL_FIELDS,
+        )
+
+    return MerchantDashboardSnapshot(
+        merchant_id=merchant.id,
+        as_of=timezone.localdate(),
+        transaction_stats=_get_transaction_stats(merchant),
+        document_counts=document_counts,
+        checkout_pages_count=checkout_pages_count,
+        api_keys=api_keys,
+        merchant_integrations=merchant_integrations,
+        recent_api_calls=recent_api_calls,
+    )
+
+
+def get_merchant_snapshot(merchant: Merchant) -> MerchantDashboardSnapshot:
+    """Cached dashboard snapshot for ``merchant``"""
+    ttl = getattr(settings, 'MERCHANT_DASHBOARD_CACHE_TTL', 300)
+    snapshot = cache.get(_cache_key(merchant.id)) if ttl > 0 else None
+    if snapshot is not None and snapshot.is_current:
+        return snapshot
+
+    snapshot = build_snapshot(merchant)
+    if ttl > 0:
+        cache.set(_cache_key(merchant.id), snapshot, ttl)
+    return snapshot
+
+
+def invalidate_merchant_snapshot(merchant_id):
+    """Drop a merchant's cached snapshot so the next page view rebuilds it"""
+    if merchant_id is not None:
+        cache.delete(_cache_key(merchant_id))
+
+
+# Event-driven invalidation
+
+def _invalidate_for_instance(sender, instance, **kwargs):
+    invalidate_merchant_snapshot(getattr(instance, 'merchant_id', None))
+
+
+def _invalidate_for_app_key(sender, instance, **kwargs):
+    code = getattr(instance.partner, 'code', '') if instance.partner_id else ''
+    if code.startswith('merchant_'):
+        invalidate_merchant_snapshot(code[len('merchant_'):])
+
+
+def _invalidate_for_transition(sender, transaction, **kwargs):
+    invalidate_merchant_snapshot(transaction.merchant_id)
+
+
+def _invalidate_for_bulk_transition(sender, transactions, **kwargs):
+    for merchant_id in {txn.merchant_id for txn in transactions}:
+        invalidate_merchant_snapshot(merchant_id)
+
+
+def connect_signals():
+    """Hook snapshot invalidation up to the models it summarises"""
+    post_save.connect(_invalidate_for_app_key, sender=AppKey, dispatch_uid='merchant_snapshot_AppKey_save')
+    post_delete.connect(_invalidate_for_app_key, sender=AppKey, dispatch_uid='merchant_snapshot_AppKey_delete')
+
+    for label in ('authentication.MerchantDocument', 'transactions.Transaction',
+                  'integrations.MerchantIntegration', 'checkout.CheckoutPage'):
+        app_label, model_name = label.split('.')
+        if not apps.is_installed(app_label):
+            continue
+        model = apps.get_model(app_label, model_name)
+        post_save.connect(_invalidate_for_instance, sender=model, dispatch_uid=f'merchant_snapshot_{model_name}_save')
+        post_delete.connect(_invalidate_for_instance, sender=model, dispatch_uid=f'merchant_snapshot_{model_name}_delete')
+
+    if apps.is_installed('transactions'):
+        # Bulk transitions update rows without post_save
+        from transactions.signals import transaction_status_changed, transactions_status_changed
+        transaction_status_changed.connect(_invalidate_for_transition, dispatch_uid='merchant_snapshot_transition')
+        transactions_status_changed.connect(
+            _invalidate_for_bulk_transition, dispatch_uid='merchant_snapshot_bulk_transition'
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_alter_preferredcurrency_code_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whitelabelpartner',
+            name='webhook_batch_window',
+            field=models.PositiveIntegerField(default=5, help_text='Seconds to collect events before sending a batch (when batching is enabled)'),
+        ),
+        migrations.AddField(
+            model_name='whitelabelpartner',
+            name='webhook_batching_enabled',
+            field=models.BooleanField(default=False, help_text='Coalesce transaction events for the webhook URL into batched POSTs'),
+        ),
+    ]
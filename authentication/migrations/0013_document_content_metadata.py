@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0012_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchantdocument',
+            name='is_file_available',
+            field=models.BooleanField(default=True, help_text='Whether the file exists in storage (checked by verify_document_files)'),
+        ),
+        migrations.AddField(
+            model_name='merchantdocument',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file content', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='merchantdocument',
+            name='file_type',
+            field=models.CharField(blank=True, help_text='File MIME type', max_length=100),
+        ),
+    ]
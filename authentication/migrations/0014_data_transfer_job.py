@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:30
+
+import authentication.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0013_document_content_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataTransferJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('import', 'Import'), ('export', 'Export')], max_length=10)),
+                ('resource', models.CharField(help_text='Dotted path of the import-export resource class', max_length=255)),
+                ('query', models.BinaryField(blank=True, help_text='Pickled queryset query of the rows to export', null=True)),
+                ('input_file', models.FileField(blank=True, help_text='CSV file to import', storage=authentication.models.get_data_transfer_storage, upload_to='imports/')),
+                ('output_file', models.FileField(blank=True, help_text='Exported CSV file', storage=authentication.models.get_data_transfer_storage, upload_to='exports/')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('totals', models.JSONField(blank=True, default=dict, help_text='Import row counts by outcome (new, update, skip, error, invalid)')),
+                ('errors', models.JSONField(blank=True, default=list, help_text='First row errors of an import')),
+                ('error_message', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='data_transfer_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Data Transfer Job',
+                'verbose_name_plural': 'Data Transfer Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='authenticat_status_d46a96_idx')],
+            },
+        ),
+    ]
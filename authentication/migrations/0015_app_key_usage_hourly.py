@@ -0,0 +1,42 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0014_data_transfer_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppKeyUsageHourly',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('hour', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('endpoint', models.CharField(max_length=255)),
+                ('method', models.CharField(max_length=10)),
+                ('status_class', models.PositiveSmallIntegerField(help_text='First digit of the status code (2 = 2xx, ...)')),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('total_response_time_ms', models.BigIntegerField(default=0)),
+                ('min_response_time_ms', models.PositiveIntegerField(default=0)),
+                ('max_response_time_ms', models.PositiveIntegerField(default=0)),
+                ('request_bytes', models.BigIntegerField(default=0)),
+                ('response_bytes', models.BigIntegerField(default=0)),
+                ('latency_histogram', models.JSONField(default=list, help_text='Request counts per LATENCY_BUCKETS_MS bucket, with a final overflow bucket')),
+                ('app_key', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_usage', to='authentication.appkey')),
+            ],
+            options={
+                'verbose_name': 'App Key Hourly Usage',
+                'verbose_name_plural': 'App Key Hourly Usage',
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour'], name='authenticat_hour_32d13a_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='appkeyusagehourly',
+            constraint=models.UniqueConstraint(fields=('app_key', 'hour', 'endpoint', 'method', 'status_class'), name='unique_app_key_usage_hour_bucket'),
+        ),
+    ]
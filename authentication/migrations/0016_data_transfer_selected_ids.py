@@ -0,0 +1,22 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0015_app_key_usage_hourly'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='datatransferjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='datatransferjob',
+            name='selected_ids',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Primary keys of the rows to export, in order'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0016_data_transfer_selected_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, help_text='Set while a worker is sending the email; other workers skip it until then', null=True),
+        ),
+    ]
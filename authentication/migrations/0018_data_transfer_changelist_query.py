@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 06:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0017_outbound_email_leased_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datatransferjob',
+            name='changelist_query',
+            field=models.TextField(blank=True, editable=False, help_text='Query string (filters, search, ordering) of the admin changelist an export was queued from'),
+        ),
+        migrations.AlterField(
+            model_name='datatransferjob',
+            name='selected_ids',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Rows ticked on the changelist page; empty when every matching row is exported'),
+        ),
+    ]
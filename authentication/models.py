@@ -7,7 +7,9 @@ import string
 import os
 import hashlib
 import secrets
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
 
 
 def merchant_document_upload_path(instance, filename):
@@ -658,10 +660,20 @@ class MerchantDocument(models.Model):
         help_text='File size in bytes'
     )
     file_type = models.CharField(
-        max_length=20,
+        max_length=100,
         blank=True,
         help_text='File MIME type'
     )
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text='SHA-256 of the file content'
+    )
+    is_file_available = models.BooleanField(
+        default=True,
+        help_text='Whether the file exists in storage (checked by verify_document_files)'
+    )
     
     # Timestamps
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -683,12 +695,13 @@ class MerchantDocument(models.Model):
             if not self.original_filename:
                 self.original_filename = self.document_file.name
             
-            # Set file size
-            if hasattr(self.document_file, 'size'):
+            # Set file size from a fresh upload; stored files already carry it
+            # (reading it back from storage would cost a filesystem call per save)
+            if not self.document_file._committed:
                 self.file_size = self.document_file.size
             
             # Set file type based on extension
-            if self.document_file.name:
+            if self.document_file.name and not self.file_type:
                 ext = self.document_file.name.split('.')[-1].lower()
                 file_type_mapping = {
                     'pdf': 'application/pdf',
@@ -731,11 +744,12 @@ class MerchantDocument(models.Model):
         if not self.file_size:
             return "Unknown"
         
+        size = float(self.file_size)
         for unit in ['B', 'KB', 'MB', 'GB']:
-            if self.file_size < 1024.0:
-                return f"{self.file_size:.1f} {unit}"
-            self.file_size /= 1024.0
-        return f"{self.file_size:.1f} TB"
+            if size < 1024.0:
+                return f"{size:.1f} {unit}"
+            size /= 1024.0
+        return f"{size:.1f} TB"
     
     def get_verification_status_badge(self):
         """Return HTML badge for verification status"""
@@ -749,8 +763,8 @@ class MerchantDocument(models.Model):
     
     @property
     def can_download(self):
-        """Check if document can be downloaded"""
-        return self.document_file and os.path.exists(self.document_file.path)
+        """Check if document can be downloaded (from stored metadata, no file I/O)"""
+        return bool(self.document_file) and self.is_file_available
     
     @classmethod
     def get_required_documents_for_merchant(cls, merchant):
@@ -843,6 +857,14 @@ class WhitelabelPartner(models.Model):
         blank=True,
         help_text='Secret key for webhook signature verification'
     )
+    webhook_batching_enabled = models.BooleanField(
+        default=False,
+        help_text='Coalesce transaction events for the webhook URL into batched POSTs'
+    )
+    webhook_batch_window = models.PositiveIntegerField(
+        default=5,
+        help_text='Seconds to collect events before sending a batch (when batching is enabled)'
+    )
     
     # Limits and quotas
     daily_api_limit = models.PositiveIntegerField(
@@ -1161,27 +1183,52 @@ class AppKeyUsageLog(models.Model):
     
     @classmethod
     def get_usage_stats(cls, app_key, start_date, end_date):
-        """Get usage statistics for an app key within a date range"""
-        logs = cls.objects.filter(
-            app_key=app_key,
-            created_at__range=[start_date, end_date]
-        )
-        
-        total_requests = logs.count()
-        successful_requests = logs.filter(status_code__lt=400).count()
-        error_requests = logs.filter(status_code__gte=400).count()
-        
-        avg_response_time = logs.aggregate(
-            models.Avg('response_time_ms')
-        )['response_time_ms__avg'] or 0
-        
-        return {
-            'total_requests': total_requests,
-            'successful_requests': successful_requests,
-            'error_requests': error_requests,
-            'success_rate': (successful_requests / total_requests * 100) if total_requests > 0 else 0,
-            'avg_response_time_ms': round(avg_response_time, 2)
-        }
+        """Get usage statistics for an app key within a date range (served from the hourly rollup)"""
+        from .usage_rollups import get_usage_stats
+        return get_usage_stats(app_key, start_date, end_date)
+
+
+class AppKeyUsageHourly(models.Model):
+    """Hourly rollup of AppKeyUsageLog, filled by `manage.py rollup_app_key_usage`"""
+    id = models.BigAutoField(primary_key=True)
+    app_key = models.ForeignKey(
+        AppKey,
+        on_delete=models.CASCADE,
+        related_name='hourly_usage'
+    )
+    hour = models.DateTimeField(help_text='Start of the hour (UTC)')
+    endpoint = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    status_class = models.PositiveSmallIntegerField(help_text='First digit of the status code (2 = 2xx, ...)')
+    
+    # Aggregates
+    request_count = models.PositiveIntegerField(default=0)
+    total_response_time_ms = models.BigIntegerField(default=0)
+    min_response_time_ms = models.PositiveIntegerField(default=0)
+    max_response_time_ms = models.PositiveIntegerField(default=0)
+    request_bytes = models.BigIntegerField(default=0)
+    response_bytes = models.BigIntegerField(default=0)
+    latency_histogram = models.JSONField(
+        default=list,
+        help_text='Request counts per LATENCY_BUCKETS_MS bucket, with a final overflow bucket'
+    )
+    
+    class Meta:
+        verbose_name = 'App Key Hourly Usage'
+        verbose_name_plural = 'App Key Hourly Usage'
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['app_key', 'hour', 'endpoint', 'method', 'status_class'],
+                name='unique_app_key_usage_hour_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+    
+    def __str__(self):
+        return f"{self.app_key_id} {self.hour:%Y-%m-%d %H:00} {self.method} {self.endpoint} {self.status_class}xx"
 
 
 class NotificationType(models.TextChoices):
@@ -1304,3 +1351,141 @@ class Notification(models.Model):
             action_text='Complete Profile',
             priority=NotificationPriority.HIGH
         )
+
+
+class OutboundEmailStatus(models.TextChoices):
+    """Outbound email delivery status choices"""
+    PENDING = 'pending', 'Pending'
+    SENT = 'sent', 'Sent'
+    FAILED = 'failed', 'Failed'
+
+
+class OutboundEmail(models.Model):
+    """Email queued in the outbox, sent by the `send_emails` worker"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    # Message
+    purpose = models.CharField(max_length=50, blank=True, help_text='What triggered the email, e.g. otp or merchant_welcome')
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text='Plain text body')
+    html_body = models.TextField(blank=True, help_text='Optional HTML alternative')
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list, help_text='Recipient addresses')
+    
+    # Delivery tracking
+    status = models.CharField(
+        max_length=20,
+        choices=OutboundEmailStatus.choices,
+        default=OutboundEmailStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    leased_until = models.DateTimeField(null=True, blank=True, help_text='Set while a worker is sending the email; other workers skip it until then')
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        ordering = ['-created_at']
+        indexes = [
+            # The email worker claims due messages with this index
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class DataTransferStorage(FileSystemStorage):
+    """Private storage for import uploads and export files, rooted at DATA_TRANSFER_ROOT (outside MEDIA_ROOT)"""
+    
+    @property
+    def base_location(self):
+        return str(getattr(settings, 'DATA_TRANSFER_ROOT', os.path.join(settings.BASE_DIR, 'data_transfers')))
+    
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def get_data_transfer_storage():
+    return DataTransferStorage()
+
+
+class DataTransferKind(models.TextChoices):
+    """Background import/export job kinds"""
+    IMPORT = 'import', 'Import'
+    EXPORT = 'export', 'Export'
+
+
+class DataTransferStatus(models.TextChoices):
+    """Background import/export job status choices"""
+    PENDING = 'pending', 'Pending'
+    RUNNING = 'running', 'Running'
+    COMPLETED = 'completed', 'Completed'
+    FAILED = 'failed', 'Failed'
+
+
+class DataTransferJob(models.Model):
+    """Import or export of an import-export resource, run by the `run_data_transfers` worker"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    kind = models.CharField(max_length=10, choices=DataTransferKind.choices)
+    resource = models.CharField(max_length=255, help_text='Dotted path of the import-export resource class')
+    changelist_query = models.TextField(blank=True, editable=False, help_text='Query string (filters, search, ordering) of the admin changelist an export was queued from')
+    selected_ids = models.JSONField(default=list, blank=True, editable=False, help_text='Rows ticked on the changelist page; empty when every matching row is exported')
+    input_file = models.FileField(storage=get_data_transfer_storage, upload_to='imports/', blank=True, help_text='CSV file to import')
+    output_file = models.FileField(storage=get_data_transfer_storage, upload_to='exports/', blank=True, help_text='Exported CSV file')
+    
+    # Progress
+    status = models.CharField(
+        max_length=20,
+        choices=DataTransferStatus.choices,
+        default=DataTransferStatus.PENDING
+    )
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    totals = models.JSONField(default=dict, blank=True, help_text='Import row counts by outcome (new, update, skip, error, invalid)')
+    errors = models.JSONField(default=list, blank=True, help_text='First row errors of an import')
+    error_message = models.TextField(blank=True)
+    
+    created_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='data_transfer_jobs'
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Data Transfer Job'
+        verbose_name_plural = 'Data Transfer Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            # The worker claims pending jobs with this index
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.resource_name} ({self.get_status_display()})"
+    
+    @property
+    def resource_name(self):
+        return self.resource.rsplit('.', 1)[-1]
+    
+    @property
+    def progress_percentage(self):
+        if self.status == DataTransferStatus.COMPLETED:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(round(self.processed_rows / self.total_rows * 100), 100)
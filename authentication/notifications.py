@@ -0,0 +1,62 @@
+"""
+Notification Poll State
+
+The dashboard polls the notifications API every 30 seconds. Each user's
+unread count is cached together with a version token. Any change to a user's
+notifications replaces the token: creating, reading, dismissing or deleting
+one, and bulk updates through ``invalidate_notification_state``. The token is
+sent to clients as the response ``ETag`` and as a ``since`` cursor. A poll
+whose token still matches gets a ``304 Not Modified`` straight from the cache,
+without touching the notifications table.
+"""
+
+import uuid
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Notification
+
+CACHE_KEY_PREFIX = 'notification_state'
+
+
+def _cache_key(user_id) -> str:
+    return f"{CACHE_KEY_PREFIX}:{user_id}"
+
+
+def get_notification_state(user) -> Dict:
+    """``{'version': str, 'unread_count': int}`` for ``user``, from the cache when possible"""
+    state = cache.get(_cache_key(user.pk))
+    if state is None:
+        state = {
+            'version': uuid.uuid4().hex,
+            'unread_count': Notification.objects.filter(user=user, is_read=False, is_dismissed=False).count(),
+        }
+        cache.set(_cache_key(user.pk), state, getattr(settings, 'NOTIFICATION_STATE_CACHE_TTL', 3600))
+    return state
+
+
+def get_etag(state: Dict) -> str:
+    return f'"{state["version"]}"'
+
+
+def is_unchanged(request, state: Dict) -> bool:
+    """Whether the client already has this version (``If-None-Match`` or ``since``)"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if get_etag(state) in [tag.strip() for tag in if_none_match.split(',')]:
+        return True
+    return request.GET.get('since') == state['version']
+
+
+def invalidate_notification_state(user_id):
+    """Drop a user's cached state; the next poll recounts under a new version"""
+    cache.delete(_cache_key(user_id))
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    invalidate_notification_state(instance.user_id)
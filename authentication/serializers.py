@@ -8,6 +8,7 @@ from .models import (
     EmailOTP, Merchant, MerchantCategory, MerchantStatus, MerchantDocument,
     WhitelabelPartner, AppKey, AppKeyUsageLog
 )
+from .documents import DocumentUploadError, validate_upload
 from .utils import send_otp_email, send_merchant_creation_email
 
 
@@ -543,21 +544,11 @@ class MerchantDocumentSerializer(serializers.ModelSerializer):
         if not value:
             raise serializers.ValidationError("Document file is required.")
         
-        # Check file size (10MB limit)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if value.size > max_size:
-            raise serializers.ValidationError(
-                f"File size ({value.size} bytes) exceeds maximum allowed size (10MB)."
-            )
-        
-        # Check file extension
-        allowed_extensions = ['.pdf', '.jpg', '.jpeg', '.png', '.doc', '.docx']
-        file_extension = value.name.lower().split('.')[-1]
-        if f".{file_extension}" not in allowed_extensions:
-            raise serializers.ValidationError(
-                f"File type .{file_extension} is not allowed. "
-                f"Allowed types: {', '.join(allowed_extensions)}"
-            )
+        # Check size, extension and that the content matches the extension
+        try:
+            validate_upload(value)
+        except DocumentUploadError as e:
+            raise serializers.ValidationError(str(e))
         
         return value
     
@@ -653,21 +644,11 @@ class DocumentUploadSerializer(serializers.Serializer):
         if not value:
             raise serializers.ValidationError("Document file is required.")
         
-        # Check file size (10MB limit)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if value.size > max_size:
-            raise serializers.ValidationError(
-                f"File size exceeds maximum allowed size (10MB)."
-            )
-        
-        # Check file extension
-        allowed_extensions = ['.pdf', '.jpg', '.jpeg', '.png', '.doc', '.docx']
-        file_extension = value.name.lower().split('.')[-1]
-        if f".{file_extension}" not in allowed_extensions:
-            raise serializers.ValidationError(
-                f"File type .{file_extension} is not allowed. "
-                f"Allowed types: {', '.join(allowed_extensions)}"
-            )
+        # Check size, extension and that the content matches the extension
+        try:
+            validate_upload(value)
+        except DocumentUploadError as e:
+            raise serializers.ValidationError(str(e))
         
         return value
 
@@ -870,6 +851,13 @@ class AppKeyStatsSerializer(serializers.Serializer):
     error_requests = serializers.IntegerField()
     success_rate = serializers.FloatField()
     avg_response_time_ms = serializers.FloatField()
+    min_response_time_ms = serializers.IntegerField()
+    max_response_time_ms = serializers.IntegerField()
+    p50_response_time_ms = serializers.FloatField()
+    p95_response_time_ms = serializers.FloatField()
+    p99_response_time_ms = serializers.FloatField()
+    request_bytes = serializers.IntegerField()
+    response_bytes = serializers.IntegerField()
     start_date = serializers.DateField()
     end_date = serializers.DateField()
 
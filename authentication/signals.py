@@ -9,11 +9,11 @@ from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.conf import settings
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 import logging
 
+from .email_outbox import queue_email
 from .models import CustomUser, Merchant, MerchantCategory
 
 logger = logging.getLogger(__name__)
@@ -145,6 +145,23 @@ def log_merchant_status_changes(sender, instance, created, **kwargs):
             pass
 
 
+@receiver(post_save, sender=Merchant)
+def remind_incomplete_merchant_information(sender, instance, **kwargs):
+    """Create the profile completeness reminder when a merchant is saved incomplete
+    
+    This used to run on every merchant dashboard view; the reminder only needs
+    to be (re)checked when the merchant's information actually changes.
+    """
+    if instance.is_information_complete():
+        return
+    
+    try:
+        from .models import Notification
+        Notification.create_info_completeness_reminder(instance)
+    except Exception as e:
+        logger.error(f"❌ Failed to create completeness reminder for merchant {instance.id}: {e}")
+
+
 # Optional: Signal for cleanup when user is deleted
 @receiver(post_save, sender=CustomUser)
 def handle_user_deactivation(sender, instance, **kwargs):
@@ -237,20 +254,19 @@ def send_merchant_welcome_email(merchant):
         html_message = render_to_string('emails/merchant_welcome.html', context)
         plain_message = render_to_string('emails/merchant_welcome.txt', context)
         
-        # Send email
-        send_mail(
+        # Queue email in the same transaction as the merchant (sent by the outbox worker)
+        queue_email(
             subject=f'Welcome to {context["platform_name"]} - Your Merchant Account is Ready!',
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
+            body=plain_message,
+            to=[user.email],
+            html_body=html_message,
+            purpose='merchant_welcome',
         )
         
-        logger.info(f"📧 Welcome email sent to {user.email} for merchant account {merchant.id}")
+        logger.info(f"📧 Welcome email queued for {user.email} for merchant account {merchant.id}")
         
     except Exception as e:
-        logger.error(f"❌ Failed to send welcome email to {merchant.user.email}: {e}")
+        logger.error(f"❌ Failed to queue welcome email to {merchant.user.email}: {e}")
         # Don't raise the exception - we don't want email failures to break merchant creation
         
 
@@ -1,3 +1,755 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import csv
+import time
+from io import BytesIO, StringIO
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from transactions.models import PaymentMethod, Transaction, TransactionStatus
+from transactions.transitions import bulk_transition
+from . import (
+    dashboard_metrics, dashboard_views, data_transfers, document_previews, document_serving, documents, email_outbox,
+    log_retention, merchant_snapshot, usage_rollups,
+)
+from .models import (
+    AppKey, AppKeyUsageHourly, AppKeyUsageLog, CustomUser, DataTransferJob, DataTransferStatus, DocumentType, Merchant, MerchantDocument, MerchantStatus, Notification, OutboundEmail, OutboundEmailStatus, PreferredCurrency,
+    WhitelabelPartner,
+)
+
+
+class DashboardMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for index in range(3):
+            user = CustomUser.objects.create_user(
+                f'dash{index}@example.com', 'pass-1234', first_name='Dash', last_name=str(index)
+            )
+            Merchant.objects.create(
+                user=user,
+                business_name=f'Dash Shop {index}',
+                business_address='1 Test Street',
+                business_phone=f'+25470000010{index}',
+                business_email=f'dash-shop{index}@example.com',
+                status=MerchantStatus.APPROVED if index == 0 else MerchantStatus.PENDING,
+            )
+        CustomUser.objects.filter(email='dash2@example.com').update(created_at=timezone.now() - timezone.timedelta(days=3))
+
+    def test_admin_metrics_use_conditional_aggregates(self):
+        with self.assertNumQueries(5):
+            metrics = dashboard_metrics.compute_admin_metrics()
+
+        self.assertEqual(metrics['total_users'], 3)
+        self.assertEqual(metrics['total_merchants'], 3)
+        self.assertEqual(metrics['pending_merchants'], 2)
+        self.assertEqual(metrics['active_merchants'], 1)
+        self.assertEqual(len(metrics['user_growth']['data']), dashboard_metrics.GROWTH_CHART_DAYS)
+        self.assertEqual(metrics['user_growth']['data'][-1], 2)
+        self.assertEqual(metrics['user_growth']['data'][-4], 1)
+
+    def test_verifier_metrics_are_cached(self):
+        self.assertEqual(dashboard_metrics.get_dashboard_metrics('verifier')['pending'], 2)
+        Merchant.objects.update(status=MerchantStatus.REJECTED)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard_metrics.get_dashboard_metrics('verifier')['pending'], 2)
+
+        dashboard_metrics.invalidate_dashboard_metrics('verifier')
+        self.assertEqual(dashboard_metrics.get_dashboard_metrics('verifier')['rejected'], 3)
+
+    @override_settings(DASHBOARD_METRICS_CACHE_TTL=60, DASHBOARD_METRICS_STALE_TTL=300)
+    def test_stale_metrics_are_served_while_one_refresh_runs(self):
+        dashboard_metrics.get_dashboard_metrics('staff')
+        later = time.time() + 120
+
+        with mock.patch.object(dashboard_metrics.time, 'time', return_value=later), \
+                mock.patch.object(dashboard_metrics, '_refresh_in_background') as refresh:
+            first = dashboard_metrics.get_dashboard_metrics('staff')
+            dashboard_metrics.get_dashboard_metrics('staff')
+
+        self.assertEqual(first['pending_merchants'], 2)
+        refresh.assert_called_once_with('staff')
+
+
+class MerchantDashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user('snap@example.com', 'pass-1234', first_name='Snap', last_name='Shot')
+        self.merchant = Merchant.objects.create(
+            user=user,
+            business_name='Snapshot Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000200',
+            business_email='snap-shop@example.com',
+        )
+        self.currency = PreferredCurrency.objects.create(name='US Dollar', code='USD', symbol='$')
+
+    def create_transaction(self, amount):
+        return Transaction.objects.create(
+            merchant=self.merchant, currency=self.currency, amount=Decimal(amount), payment_method=PaymentMethod.CARD,
+        )
+
+    def test_incomplete_merchant_gets_reminder_on_save(self):
+        self.assertTrue(
+            Notification.objects.filter(user=self.merchant.user, title='Complete Your Business Information').exists()
+        )
+
+    def test_snapshot_is_cached_until_a_transaction_changes(self):
+        self.create_transaction('10.00')
+        self.assertEqual(merchant_snapshot.get_merchant_snapshot(self.merchant).transaction_stats['total'], 1)
+
+        with self.assertNumQueries(0):
+            merchant_snapshot.get_merchant_snapshot(self.merchant)
+
+        completed = self.create_transaction('25.00')
+        bulk_transition([completed.pk], TransactionStatus.COMPLETED)
+        stats = merchant_snapshot.get_merchant_snapshot(self.merchant).transaction_stats
+
+        self.assertEqual(stats['total'], 2)
+        self.assertEqual(stats['successful'], 1)
+        self.assertEqual(stats['today_volume'], Decimal('25.00'))
+        self.assertEqual(stats['success_rate'], 50)
+
+    def test_snapshot_from_a_previous_day_is_rebuilt(self):
+        snapshot = merchant_snapshot.get_merchant_snapshot(self.merchant)
+        snapshot.as_of -= timezone.timedelta(days=1)
+        cache.set(merchant_snapshot._cache_key(self.merchant.id), snapshot)
+
+        self.assertTrue(merchant_snapshot.get_merchant_snapshot(self.merchant).is_current)
+
+    def test_cached_snapshot_holds_display_fields_only(self):
+        import pickle
+        from integrations.models import Integration, IntegrationAPICall, MerchantIntegration
+
+        partner = WhitelabelPartner.objects.create(
+            name='Snapshot Shop', code=f"merchant_{self.merchant.id}", contact_email='snap-shop@example.com',
+        )
+        app_key = AppKey.objects.create(partner=partner, name='Live Key')
+        integration = Integration.objects.create(
+            name='Snapshot Gateway', code='snapshot_gw', provider_name='Snap', base_url='https://gw.example.com',
+        )
+        merchant_integration = MerchantIntegration.objects.create(
+            merchant=self.merchant, integration=integration, is_enabled=True, credentials='encrypted-credentials',
+        )
+        IntegrationAPICall.objects.create(
+            merchant_integration=merchant_integration, method='POST', endpoint='/pay',
+            request_headers={'Authorization': 'Bearer provider-token'}, request_body='{"card": "4111"}',
+            operation_type='create_payment', is_successful=True, response_time_ms=120,
+        )
+
+        snapshot = merchant_snapshot.get_merchant_snapshot(self.merchant)
+        cached = pickle.dumps(cache.get(merchant_snapshot._cache_key(self.merchant.id)))
+
+        for secret in [app_key.secret_key, 'encrypted-credentials', 'provider-token', '4111']:
+            self.assertNotIn(secret.encode(), cached)
+        self.assertEqual(snapshot.api_keys[0]['public_key'], app_key.public_key)
+        self.assertEqual(snapshot.merchant_integrations[0]['integration']['name'], 'Snapshot Gateway')
+        self.assertEqual(snapshot.recent_api_calls[0]['merchant_integration']['integration']['name'], 'Snapshot Gateway')
+
+        self.client.force_login(self.merchant.user)
+        self.assertContains(self.client.get(reverse('dashboard:merchant_dashboard')), 'Snapshot Gateway')
+
+    def test_dashboard_pages_render_from_snapshot(self):
+        self.create_transaction('10.00')
+        self.client.force_login(self.merchant.user)
+
+        self.assertEqual(self.client.get(reverse('dashboard:merchant_dashboard')).status_code, 200)
+        response = self.client.get(reverse('dashboard:merchant_transactions'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['stats']['total_count'], 1)
+
+
+class NotificationPollTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('poll@example.com', 'pass-1234', first_name='Poll', last_name='User')
+        for index in range(3):
+            Notification.objects.create(user=self.user, title=f'Notice {index}', message='Hello')
+        self.client.force_login(self.user)
+        self.url = reverse('dashboard:get_notifications_api')
+
+    def test_unchanged_poll_returns_304_from_cache(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['unread_count'], 3)
+        etag = response['ETag']
+
+        with self.assertNumQueries(2):  # session and user only
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        cursor = self.client.get(self.url, {'count': 1}).json()['cursor']
+        self.assertEqual(self.client.get(self.url, {'since': cursor}).status_code, 304)
+
+    def test_reading_a_notification_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Notification.objects.filter(user=self.user).first().mark_as_read()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_count'], 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_mark_all_read_is_one_update(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(3):  # session, user, update
+            response = self.client.post(reverse('dashboard:mark_all_notifications_read_api'))
+
+        self.assertEqual(response.json()['marked_count'], 3)
+        self.assertEqual(self.client.get(self.url, {'count': 1}).json()['unread_count'], 0)
+
+
+class EmailOutboxTests(TestCase):
+    def test_queued_email_is_discarded_with_its_transaction(self):
+        try:
+            with transaction.atomic():
+                email_outbox.queue_email('Hello', 'Body', ['a@example.com'])
+                raise RuntimeError('rollback')
+        except RuntimeError:
+            pass
+
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_worker_sends_batch_over_one_connection(self):
+        for index in range(3):
+            email_outbox.queue_email(f'Hello {index}', 'Body', [f'user{index}@example.com'], html_body='<p>Body</p>')
+
+        with mock.patch.object(email_outbox, 'get_connection', wraps=email_outbox.get_connection) as get_connection:
+            sent = email_outbox.EmailOutboxWorker().run()
+
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(sent), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives, [('<p>Body</p>', 'text/html')])
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmailStatus.SENT).exists())
+
+    @override_settings(EMAIL_OUTBOX_RETRY_BASE_DELAY=60)
+    def test_failed_send_is_retried_with_backoff_then_given_up(self):
+        email = email_outbox.queue_email('Hello', 'Body', ['a@example.com'])
+        email.max_attempts = 2
+        email.save()
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+            email_outbox.EmailOutboxWorker().run()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboundEmailStatus.PENDING, 1))
+            self.assertGreater(email.next_attempt_at, timezone.now() + timezone.timedelta(seconds=50))
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            email_outbox.EmailOutboxWorker().run()
+            email.refresh_from_db()
+
+        self.assertEqual((email.status, email.attempts), (OutboundEmailStatus.FAILED, 2))
+        self.assertEqual(email.last_error, 'refused')
+
+    def test_claimed_batch_is_leased_and_not_sent_again_after_crash(self):
+        email = email_outbox.queue_email('Hello', 'Body', ['a@example.com'])
+
+        worker = email_outbox.EmailOutboxWorker()
+        with mock.patch.object(worker, 'send_batch', side_effect=RuntimeError('worker died')):
+            with self.assertRaises(RuntimeError):
+                worker.run_once()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmailStatus.PENDING)
+        self.assertGreater(email.leased_until, timezone.now())
+        self.assertEqual(email_outbox.EmailOutboxWorker().run(), [])
+
+        OutboundEmail.objects.update(leased_until=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(len(email_outbox.EmailOutboxWorker().run()), 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.leased_until), (OutboundEmailStatus.SENT, None))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_merchant_welcome_email_is_queued_not_sent(self):
+        CustomUser.objects.create_user('welcome@example.com', 'pass-1234', first_name='Wel', last_name='Come', is_verified=True)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(OutboundEmail.objects.filter(purpose='merchant_welcome', to=['welcome@example.com']).exists())
+
+
+class DocumentStorageTests(TestCase):
+    PDF = b'%PDF-1.4\n' + b'x' * 1000
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        user = CustomUser.objects.create_user('docs@example.com', 'pass12345', first_name='Doc', last_name='Owner')
+        self.merchant = Merchant.objects.create(
+            user=user, business_name='Docs Ltd', business_address='1 Road',
+            business_phone='+100000000', business_email='docs@example.com',
+        )
+
+    def store(self, content=None, name='licence.pdf'):
+        upload = SimpleUploadedFile(name, content if content is not None else self.PDF)
+        stored = documents.store_upload(self.merchant, upload)
+        document = MerchantDocument.objects.create(
+            merchant=self.merchant, document_type=DocumentType.BUSINESS_LICENSE,
+            document_file=stored.name, original_filename=name, title=name,
+            file_size=stored.size, file_type=stored.mime_type, sha256=stored.sha256,
+        )
+        return stored, document
+
+    def test_identical_uploads_share_one_file(self):
+        first, first_document = self.store()
+        second, second_document = self.store(name='copy.pdf')
+
+        self.assertTrue(first.created)
+        self.assertFalse(second.created)
+        self.assertEqual(first.name, second.name)
+        self.assertEqual(first.size, len(self.PDF))
+        self.assertEqual(first_document.file_type, 'application/pdf')
+
+        # Deleting one row keeps the file the other still uses
+        documents.release_document_file(first_document)
+        first_document.delete()
+        self.assertTrue(default_storage.exists(second.name))
+        documents.release_document_file(second_document)
+        self.assertFalse(default_storage.exists(second.name))
+
+    def test_content_must_match_extension(self):
+        with self.assertRaises(documents.DocumentUploadError):
+            self.store(content=b'MZ\x90\x00 not a pdf')
+
+    @override_settings(DOCUMENT_UPLOAD_MAX_SIZE=100)
+    def test_size_limit_is_enforced(self):
+        with self.assertRaises(documents.DocumentUploadError):
+            self.store()
+
+        # A declared size that understates the content is caught while streaming
+        upload = SimpleUploadedFile('licence.pdf', self.PDF)
+        upload.size = 10
+        with self.assertRaises(documents.DocumentUploadError):
+            documents.store_upload(self.merchant, upload)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'merchant_documents', 'tmp')), [])
+
+    def test_verify_flags_missing_files_and_hashes_legacy_rows(self):
+        stored, document = self.store()
+        MerchantDocument.objects.filter(pk=document.pk).update(sha256='', file_size=0)
+        document.refresh_from_db()
+
+        self.assertTrue(documents.verify_document(document, compute_hash=True))
+        self.assertEqual(document.sha256, stored.sha256)
+        self.assertEqual(document.file_size, stored.size)
+
+        default_storage.delete(stored.name)
+        self.assertTrue(documents.verify_document(document))
+        self.assertFalse(document.is_file_available)
+        self.assertFalse(document.can_download)
+
+
+class DocumentPreviewTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            DOCUMENT_PREVIEW_ROOT=os.path.join(self.media_root, 'previews'),
+            DOCUMENT_PREVIEW_FORMAT='JPEG',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = CustomUser.objects.create_user('scan@example.com', 'pass12345', first_name='Scan', last_name='Owner')
+        self.merchant = Merchant.objects.create(
+            user=self.owner, business_name='Scans Ltd', business_address='1 Road',
+            business_phone='+100000000', business_email='scan@example.com',
+        )
+        self.verifier = CustomUser.objects.create_user('verifier@example.com', 'pass12345', first_name='Vera', last_name='Fier')
+        self.verifier.is_staff = True
+        self.verifier.save()
+
+        image = BytesIO()
+        Image.new('RGB', (2000, 1000), 'red').save(image, 'PNG')
+        stored = documents.store_upload(self.merchant, SimpleUploadedFile('id.png', image.getvalue()))
+        self.document = MerchantDocument.objects.create(
+            merchant=self.merchant, document_type=DocumentType.IDENTITY_DOCUMENT,
+            document_file=stored.name, original_filename='id.png', title='ID',
+            file_size=stored.size, file_type=stored.mime_type, sha256=stored.sha256,
+        )
+
+    def test_previews_are_downscaled_and_keyed_by_hash(self):
+        paths = document_previews.generate_previews(self.document)
+
+        with Image.open(paths['thumb']) as thumb:
+            self.assertEqual(thumb.format, 'JPEG')
+            self.assertEqual(thumb.size, (320, 160))
+        self.assertIn(self.document.sha256, paths['preview'])
+
+    def test_preview_view_serves_cacheable_image_to_verifiers_only(self):
+        url = reverse('dashboard:document_preview_api', args=[self.document.id, 'thumb'])
+        self.client.force_login(self.verifier)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        etag = response['ETag']
+        with mock.patch.object(dashboard_views, 'get_preview') as get_preview:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        get_preview.assert_not_called()
+
+        for page in [reverse('dashboard:merchant_verifier_dashboard'),
+                     reverse('dashboard:merchant_verification_detail', args=[self.merchant.id])]:
+            self.assertContains(self.client.get(page), url)
+
+        stranger = CustomUser.objects.create_user('other@example.com', 'pass12345', first_name='O', last_name='Ther')
+        Merchant.objects.create(
+            user=stranger, business_name='Other Ltd', business_address='2 Road',
+            business_phone='+100000001', business_email='other@example.com',
+        )
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_previews_are_scheduled_after_commit(self):
+        with mock.patch.object(document_previews, '_get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                document_previews.schedule_previews(self.document)
+                get_executor.assert_not_called()
+
+        get_executor.return_value.submit.assert_called_once_with(
+            document_previews._generate_in_background, self.document.pk,
+        )
+
+
+class DocumentServingTests(TestCase):
+    CONTENT = b'%PDF-1.4\n' + bytes(range(256)) * 20
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = CustomUser.objects.create_user('file@example.com', 'pass12345', first_name='File', last_name='Owner')
+        self.merchant = Merchant.objects.create(
+            user=self.owner, business_name='Files Ltd', business_address='1 Road',
+            business_phone='+100000000', business_email='file@example.com',
+        )
+        stored = documents.store_upload(self.merchant, SimpleUploadedFile('statement.pdf', self.CONTENT))
+        self.document = MerchantDocument.objects.create(
+            merchant=self.merchant, document_type=DocumentType.BANK_STATEMENT,
+            document_file=stored.name, original_filename='statement.pdf', title='Statement',
+            file_size=stored.size, file_type=stored.mime_type, sha256=stored.sha256,
+        )
+        self.url = reverse('dashboard:download_document_api', args=[self.document.id])
+        self.client.force_login(self.owner)
+
+    def test_full_download_with_validators(self):
+        response = self.client.get(self.url + '?download=1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        self.assertEqual(response['ETag'], f'"{self.document.sha256}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment;'))
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[-5:])
+
+        # A stale If-Range gets the whole (changed) file instead of a slice
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+
+    @override_settings(DOCUMENT_SERVE_MODE='x-accel', DOCUMENT_ACCEL_REDIRECT_PREFIXES={'media': '/internal/media/'})
+    def test_offload_to_web_server(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/internal/media/{self.document.document_file.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_other_merchants_cannot_download(self):
+        stranger = CustomUser.objects.create_user('nosy@example.com', 'pass12345', first_name='N', last_name='Osy')
+        Merchant.objects.create(
+            user=stranger, business_name='Nosy Ltd', business_address='2 Road',
+            business_phone='+100000001', business_email='nosy@example.com',
+        )
+        self.client.force_login(stranger)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_parse_range(self):
+        self.assertEqual(document_serving.parse_range('bytes=0-', 10), (0, 9))
+        self.assertEqual(document_serving.parse_range('bytes=5-100', 10), (5, 9))
+        self.assertIsNone(document_serving.parse_range('bytes=0-1,4-5', 10))
+        with self.assertRaises(ValueError):
+            document_serving.parse_range('bytes=8-2', 10)
+
+
+class DataTransferJobTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(
+            DATA_TRANSFER_ROOT=self.root, DATA_TRANSFER_EXPORT_CHUNK_SIZE=2, DATA_TRANSFER_IMPORT_BATCH_SIZE=2,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = CustomUser.objects.create_superuser('exports@example.com', 'pass12345', first_name='Ex', last_name='Port')
+        self.client.force_login(self.admin)
+        for code in ['USD', 'EUR', 'GBP', 'KES', 'NGN']:
+            PreferredCurrency.objects.create(name=f'Currency {code}', code=code, symbol=code[0])
+
+    def read_output(self, job):
+        with job.output_file.open('rb') as handle:
+            return list(csv.reader(handle.read().decode().splitlines()))
+
+    def test_admin_export_runs_in_background(self):
+        selected = PreferredCurrency.objects.filter(code__in=['USD', 'EUR', 'GBP'])
+        response = self.client.post(reverse('admin:authentication_preferredcurrency_changelist'), {
+            'action': 'export_in_background',
+            '_selected_action': [str(pk) for pk in selected.values_list('pk', flat=True)],
+        }, follow=True)
+        self.assertContains(response, 'Export queued.')
+
+        job = DataTransferJob.objects.get()
+        self.assertEqual(job.status, DataTransferStatus.PENDING)
+        data_transfers.DataTransferWorker().run()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, DataTransferStatus.COMPLETED)
+        self.assertEqual((job.processed_rows, job.total_rows), (3, 3))
+        rows = self.read_output(job)
+        self.assertIn('code', rows[0])
+        self.assertEqual(sorted(row[rows[0].index('code')] for row in rows[1:]), ['EUR', 'GBP', 'USD'])
+
+        download = self.client.get(reverse('admin:authentication_datatransferjob_download', args=[job.pk]))
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('attachment', download['Content-Disposition'])
+
+    def test_select_all_export_stores_changelist_filters_not_keys(self):
+        PreferredCurrency.objects.filter(code__in=['KES', 'NGN']).update(is_active=False)
+        url = reverse('admin:authentication_preferredcurrency_changelist')
+        self.client.post(f'{url}?is_active__exact=1&o=-2&p=1', {
+            'action': 'export_in_background',
+            'select_across': '1',
+            '_selected_action': [str(PreferredCurrency.objects.get(code='USD').pk)],
+        })
+
+        job = DataTransferJob.objects.get()
+        self.assertEqual(job.selected_ids, [])
+        self.assertEqual(job.changelist_query, 'is_active__exact=1&o=-2')
+        data_transfers.DataTransferWorker().run()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, DataTransferStatus.COMPLETED, job.error_message)
+        rows = self.read_output(job)
+        # Active currencies only, ordered by code descending as on the changelist
+        self.assertEqual([row[rows[0].index('code')] for row in rows[1:]], ['USD', 'GBP', 'EUR'])
+        self.assertEqual((job.processed_rows, job.total_rows), (3, 3))
+
+    def test_import_in_batches(self):
+        content = 'name,code,symbol,is_active\n' + ''.join(
+            f'Currency {code},{code},{code[0]},1\n' for code in ['ZAR', 'GHS', 'UGX']
+        )
+        from .admin import PreferredCurrencyResource
+        job = data_transfers.queue_import(
+            PreferredCurrencyResource, SimpleUploadedFile('currencies.csv', content.encode()), self.admin,
+        )
+
+        with mock.patch.object(
+            PreferredCurrencyResource, 'import_data', autospec=True, side_effect=PreferredCurrencyResource.import_data,
+        ) as import_data:
+            data_transfers.run_job(data_transfers.DataTransferWorker().claim())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DataTransferStatus.COMPLETED, job.error_message)
+        self.assertEqual(import_data.call_count, 2)
+        self.assertEqual(job.totals['new'], 3)
+        self.assertEqual((job.processed_rows, job.total_rows), (3, 3))
+        self.assertTrue(PreferredCurrency.objects.filter(code='UGX').exists())
+
+
+    def test_resources_that_need_save_are_imported_row_by_row(self):
+        from .admin import AppKeyResource, CustomUserResource, PreferredCurrencyResource
+        self.assertTrue(data_transfers.supports_bulk_import(PreferredCurrencyResource))
+        self.assertFalse(data_transfers.supports_bulk_import(AppKeyResource))
+        self.assertFalse(data_transfers.supports_bulk_import(CustomUserResource))
+
+        WhitelabelPartner.objects.create(name='Import Partner', code='IMPORT', contact_email='import@example.com')
+        content = 'partner,name,key_type,status\nImport Partner,Imported Key,live,active\n'
+        data_transfers.queue_import(AppKeyResource, SimpleUploadedFile('keys.csv', content.encode()), self.admin)
+        job = data_transfers.DataTransferWorker().run()[0]
+
+        self.assertEqual(job.totals.get('new'), 1, job.errors)
+        app_key = AppKey.objects.get(name='Imported Key')
+        self.assertTrue(app_key.public_key)
+        self.assertTrue(app_key.secret_key)
+
+@override_settings(APP_KEY_USAGE_LOG_RETENTION_DAYS=30, LOG_RETENTION_BATCH_SIZE=2)
+class LogRetentionTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(LOG_ARCHIVE_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        partner = WhitelabelPartner.objects.create(name='Retention Partner', code='RETAIN', contact_email='retain@example.com')
+        self.app_key = AppKey.objects.create(partner=partner, name='Retention Key')
+        now = timezone.now()
+        self.old_ids = []
+        for days in [45, 40, 35, 31, 1]:
+            log = AppKeyUsageLog.objects.create(
+                app_key=self.app_key, endpoint='/api/v1/payments/', method='POST', ip_address='127.0.0.1',
+                status_code=200, response_time_ms=days,
+            )
+            AppKeyUsageLog.objects.filter(pk=log.pk).update(created_at=now - timedelta(days=days))
+            if days > 30:
+                self.old_ids.append(str(log.pk))
+
+    def get_policy(self):
+        return log_retention.get_policies(['authentication.AppKeyUsageLog'])[0]
+
+    def test_archives_then_deletes_expired_rows_in_batches(self):
+        policy = self.get_policy()
+        policy.rollups = ['analytics.rollup_usage']
+        with mock.patch.object(log_retention, 'import_string') as import_string:
+            result = log_retention.apply_retention(policy)
+        rollup = import_string.return_value
+
+        self.assertEqual(result['deleted'], 4)
+        self.assertEqual(AppKeyUsageLog.objects.count(), 1)
+        start, end = rollup.call_args.args
+        self.assertEqual(end, result['cutoff'])
+        self.assertLess(start, end)
+
+        self.assertEqual(len(result['archives']), 1)
+        rows = list(log_retention.read_archive(result['archives'][0]))
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(self.old_ids))
+        self.assertEqual(rows[0]['app_key_id'], str(self.app_key.pk))
+
+    def test_dry_run_and_disabled_retention_keep_rows(self):
+        result = log_retention.apply_retention(self.get_policy(), dry_run=True)
+        self.assertEqual(result['expired'], 4)
+        self.assertEqual(AppKeyUsageLog.objects.count(), 5)
+
+        with override_settings(APP_KEY_USAGE_LOG_RETENTION_DAYS=0):
+            call_command('apply_log_retention', models=['authentication.AppKeyUsageLog'], stdout=StringIO())
+        self.assertEqual(AppKeyUsageLog.objects.count(), 5)
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_partitioning_requires_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command('manage_log_partitions', stdout=StringIO())
+        self.assertFalse(log_retention.is_partitioned(AppKeyUsageLog))
+
+
+class UsageRollupTests(TestCase):
+    def setUp(self):
+        partner = WhitelabelPartner.objects.create(name='Rollup Partner', code='ROLLUP', contact_email='rollup@example.com')
+        self.app_key = AppKey.objects.create(partner=partner, name='Rollup Key')
+        self.current_hour = usage_rollups.floor_hour(timezone.now())
+        # Two closed hours of traffic plus one request in the open hour
+        self.log(self.current_hour - timedelta(hours=2, minutes=-10), 200, 8)
+        self.log(self.current_hour - timedelta(hours=2, minutes=-20), 200, 40)
+        self.log(self.current_hour - timedelta(hours=2, minutes=-30), 500, 900)
+        self.log(self.current_hour - timedelta(hours=1, minutes=-5), 201, 30)
+        self.log(self.current_hour, 404, 3)
+
+    def log(self, created_at, status_code, response_time_ms):
+        log = AppKeyUsageLog.objects.create(
+            app_key=self.app_key, endpoint='/api/v1/payments/', method='POST', ip_address='127.0.0.1',
+            status_code=status_code, response_time_ms=response_time_ms, request_size_bytes=100,
+        )
+        AppKeyUsageLog.objects.filter(pk=log.pk).update(created_at=created_at)
+
+    def test_rollup_is_bucketed_and_repeatable(self):
+        call_command('rollup_app_key_usage', hours=3, stdout=StringIO())
+        call_command('rollup_app_key_usage', hours=3, stdout=StringIO())
+
+        buckets = AppKeyUsageHourly.objects.filter(app_key=self.app_key).order_by('hour', 'status_class')
+        self.assertEqual(
+            [(bucket.hour, bucket.status_class, bucket.request_count) for bucket in buckets],
+            [
+                (self.current_hour - timedelta(hours=2), 2, 2),
+                (self.current_hour - timedelta(hours=2), 5, 1),
+                (self.current_hour - timedelta(hours=1), 2, 1),
+            ],
+        )
+        first = buckets[0]
+        self.assertEqual((first.total_response_time_ms, first.min_response_time_ms, first.max_response_time_ms), (48, 8, 40))
+        self.assertEqual(first.request_bytes, 200)
+        self.assertEqual(sum(first.latency_histogram), 2)
+        self.assertEqual(len(first.latency_histogram), len(usage_rollups.LATENCY_BUCKETS_MS) + 1)
+
+    def test_stats_combine_rollup_with_open_hour(self):
+        usage_rollups.rollup_recent_usage(hours=3)
+        # Raw logs of rolled-up hours are no longer read
+        AppKeyUsageLog.objects.filter(created_at__lt=self.current_hour).delete()
+
+        today = timezone.now().date()
+        stats = AppKeyUsageLog.get_usage_stats(self.app_key, today - timedelta(days=1), today)
+        self.assertEqual(stats['total_requests'], 5)
+        self.assertEqual(stats['error_requests'], 2)
+        self.assertEqual(stats['successful_requests'], 3)
+        self.assertEqual(stats['max_response_time_ms'], 900)
+        self.assertEqual(stats['avg_response_time_ms'], round(981 / 5, 2))
+        self.assertLessEqual(stats['p50_response_time_ms'], 50)
+        self.assertGreater(stats['p99_response_time_ms'], 500)
+
+    def test_backfill_keeps_hours_whose_logs_were_purged(self):
+        usage_rollups.rollup_recent_usage(hours=3)
+        # Retention removed the oldest hour's raw logs
+        AppKeyUsageLog.objects.filter(created_at__lt=self.current_hour - timedelta(hours=1)).delete()
+
+        call_command('rollup_app_key_usage', backfill_days=2, stdout=StringIO())
+
+        self.assertEqual(
+            AppKeyUsageHourly.objects.filter(hour=self.current_hour - timedelta(hours=2)).count(), 2,
+        )
+
+    def test_stats_read_raw_logs_after_latest_rolled_up_hour(self):
+        today = timezone.now().date()
+        # Nothing rolled up yet
+        stats = AppKeyUsageLog.get_usage_stats(self.app_key, today - timedelta(days=1), today)
+        self.assertEqual(stats['total_requests'], 5)
+
+        # Only the oldest hour rolled up; the next hour is read from raw logs
+        usage_rollups.rollup_usage(self.current_hour - timedelta(hours=2), self.current_hour - timedelta(hours=1))
+        stats = AppKeyUsageLog.get_usage_stats(self.app_key, today - timedelta(days=1), today)
+        self.assertEqual(stats['total_requests'], 5)
+        self.assertEqual(stats['error_requests'], 2)
+
+    def test_percentile_interpolates_within_bucket(self):
+        histogram = [0] * (len(usage_rollups.LATENCY_BUCKETS_MS) + 1)
+        histogram[4] = 10  # ten requests between 50 and 100 ms
+        self.assertEqual(usage_rollups.estimate_percentile(histogram, 50), 75.0)
+        self.assertEqual(usage_rollups.estimate_percentile(histogram, 100, max_value=90), 90)
@@ -0,0 +1,246 @@
+"""
+Hourly API-Key Usage Rollups
+
+``AppKeyUsageLog`` has one row per partner API request, so statistics over
+a month of raw logs scan tens of millions of rows. ``AppKeyUsageHourly``
+keeps one row per key, hour (UTC), endpoint, method and status class. Each
+row holds counts, latency sum/min/max, bytes and a fixed-bucket latency
+histogram:
+
+- ``rollup_usage(start, end)`` recomputes every whole hour in the window
+  from the raw logs. It runs one grouped query, with the histogram built from
+  conditional counts, and replaces the hour's rows in one transaction, so it
+  can be re-run safely. Hours before the oldest remaining raw log are left
+  alone: their logs have been removed by retention and the rollup is all that
+  is left of them. ``manage.py rollup_app_key_usage`` runs it over the last
+  few closed hours. Retention runs it over the expiring window before the raw
+  logs are deleted.
+- ``get_usage_stats`` reads the rollup up to the key's latest rolled-up hour
+  and the raw logs after it, so hours the job has not reached yet (or history
+  that has not been backfilled) are still counted. Histograms merge by adding
+  buckets, so percentiles over any range are interpolated from the merged
+  histogram. They are accurate to a bucket, not exact.
+
+The authentication hook writes each log with placeholder status and timing,
+so the periodic job is what fills the rollup, not the request path.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import AppKeyUsageHourly, AppKeyUsageLog
+
+# Upper bounds (exclusive) of the latency histogram buckets; a final bucket counts slower requests
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+PERCENTILES = (50, 95, 99)
+
+
+def floor_hour(value: datetime) -> datetime:
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value: datetime) -> datetime:
+    floored = floor_hour(value)
+    return floored if floored == value else floored + timedelta(hours=1)
+
+
+# =============================================================================
+# HISTOGRAMS
+# =============================================================================
+
+def histogram_aggregates(field: str) -> dict:
+    """Conditional counts that build a latency histogram for ``field`` in SQL"""
+    aggregates, lower = {}, None
+    for index, upper in enumerate(LATENCY_BUCKETS_MS + [None]):
+        condition = Q()
+        if lower is not None:
+            condition &= Q(**{f"{field}__gte": lower})
+        if upper is not None:
+            condition &= Q(**{f"{field}__lt": upper})
+        aggregates[f"bucket_{index}"] = Count('pk', filter=condition)
+        lower = upper
+    return aggregates
+
+
+def pop_histogram(row: dict) -> List[int]:
+    return [row.pop(f"bucket_{index}") for index in range(len(LATENCY_BUCKETS_MS) + 1)]
+
+
+def merge_histograms(histograms) -> List[int]:
+    merged = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for histogram in histograms:
+        for index, count in enumerate(histogram or []):
+            merged[index] += count
+    return merged
+
+
+def estimate_percentile(histogram: List[int], percentile: float, max_value: Optional[int] = None) -> float:
+    """Latency at ``percentile``, interpolated linearly within its bucket"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    rank = total * percentile / 100
+    seen, lower = 0, 0
+    for index, count in enumerate(histogram):
+        upper = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else max(max_value or lower, lower)
+        if count and seen + count >= rank:
+            value = lower + (upper - lower) * (rank - seen) / count
+            return round(min(value, max_value) if max_value is not None else value, 2)
+        seen += count
+        lower = upper
+    return float(max_value or lower)
+
+
+# =============================================================================
+# ROLLUP
+# =============================================================================
+
+def aggregate_logs(queryset):
+    """Group raw logs into hourly buckets, one dict per bucket"""
+    return (
+        queryset
+        .annotate(
+            bucket_hour=TruncHour('created_at', tzinfo=dt_timezone.utc),
+            bucket_status=models.ExpressionWrapper(F('status_code') / 100, output_field=models.PositiveSmallIntegerField()),
+        )
+        .values('app_key_id', 'bucket_hour', 'endpoint', 'method', 'bucket_status')
+        .annotate(
+            request_count=Count('pk'),
+            total_response_time_ms=Sum('response_time_ms'),
+            min_response_time_ms=Min('response_time_ms'),
+            max_response_time_ms=Max('response_time_ms'),
+            request_bytes=Sum('request_size_bytes'),
+            response_bytes=Sum('response_size_bytes'),
+            **histogram_aggregates('response_time_ms'),
+        )
+        .order_by()
+    )
+
+
+def get_oldest_log_hour() -> Optional[datetime]:
+    """The hour of the oldest raw log still stored; earlier hours only exist in the rollup"""
+    oldest = AppKeyUsageLog.objects.aggregate(oldest=Min('created_at'))['oldest']
+    return floor_hour(oldest) if oldest else None
+
+
+def rollup_usage(start: datetime, end: datetime) -> int:
+    """Recompute the hourly rollup for every hour overlapping ``[start, end)``; returns the rows written
+
+    Hours before the oldest remaining raw log are skipped, so a long backfill
+    never replaces rolled-up history with nothing.
+    """
+    oldest_hour = get_oldest_log_hour()
+    if oldest_hour is None:
+        return 0
+    start, end = max(floor_hour(start), oldest_hour), ceil_hour(end)
+    if start >= end:
+        return 0
+    logs = AppKeyUsageLog.objects.filter(created_at__gte=start, created_at__lt=end)
+
+    rows = []
+    for row in aggregate_logs(logs):
+        histogram = pop_histogram(row)
+        rows.append(AppKeyUsageHourly(
+            app_key_id=row['app_key_id'],
+            hour=row['bucket_hour'],
+            endpoint=row['endpoint'],
+            method=row['method'],
+            status_class=row['bucket_status'],
+            request_count=row['request_count'],
+            total_response_time_ms=row['total_response_time_ms'] or 0,
+            min_response_time_ms=row['min_response_time_ms'] or 0,
+            max_response_time_ms=row['max_response_time_ms'] or 0,
+            request_bytes=row['request_bytes'] or 0,
+            response_bytes=row['response_bytes'] or 0,
+            latency_histogram=histogram,
+        ))
+
+    with transaction.atomic():
+        AppKeyUsageHourly.objects.filter(hour__gte=start, hour__lt=end).delete()
+        AppKeyUsageHourly.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rollup_recent_usage(hours: Optional[int] = None) -> int:
+    """Roll up the last ``hours`` closed hours"""
+    hours = hours or getattr(settings, 'APP_KEY_USAGE_ROLLUP_LOOKBACK_HOURS', 3)
+    end = floor_hour(timezone.now())
+    return rollup_usage(end - timedelta(hours=hours), end)
+
+
+# =============================================================================
+# STATISTICS
+# =============================================================================
+
+def _as_datetime(value, end: bool = False) -> datetime:
+    """Date bounds are inclusive days; datetimes are used as given"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        day = value + timedelta(days=1) if end else value
+        return timezone.make_aware(datetime.combine(day, time.min))
+    return value
+
+
+def get_raw_boundary(app_key) -> Optional[datetime]:
+    """Stats read ``app_key``'s rollup before this hour and its raw logs from it on
+
+    This is the hour after the key's latest rolled-up hour, and never later
+    than the current, still open, hour. ``None`` means nothing is rolled up.
+    """
+    latest = AppKeyUsageHourly.objects.filter(app_key=app_key).aggregate(latest=Max('hour'))['latest']
+    if latest is None:
+        return None
+    return min(latest + timedelta(hours=1), floor_hour(timezone.now()))
+
+
+def get_usage_stats(app_key, start, end) -> dict:
+    """Usage statistics for ``app_key`` between ``start`` and ``end`` (dates are whole days)"""
+    start, end = _as_datetime(start), _as_datetime(end, end=True)
+    boundary = get_raw_boundary(app_key)
+
+    buckets = []
+    if boundary is not None:
+        buckets = list(
+            AppKeyUsageHourly.objects
+            .filter(app_key=app_key, hour__gte=floor_hour(start), hour__lt=min(end, boundary))
+            .values('status_class', 'request_count', 'total_response_time_ms', 'min_response_time_ms',
+                    'max_response_time_ms', 'request_bytes', 'response_bytes', 'latency_histogram')
+        )
+    if boundary is None or end > boundary:
+        # Hours the rollup job has not reached yet
+        recent = AppKeyUsageLog.objects.filter(
+            app_key=app_key, created_at__gte=max(start, boundary) if boundary else start, created_at__lt=end,
+        )
+        for row in aggregate_logs(recent):
+            row['latency_histogram'] = pop_histogram(row)
+            row['status_class'] = row['bucket_status']
+            buckets.append(row)
+
+    total = sum(bucket['request_count'] for bucket in buckets)
+    errors = sum(bucket['request_count'] for bucket in buckets if bucket['status_class'] >= 4)
+    latency = sum(bucket['total_response_time_ms'] or 0 for bucket in buckets)
+    max_latency = max((bucket['max_response_time_ms'] or 0 for bucket in buckets), default=0)
+    histogram = merge_histograms(bucket['latency_histogram'] for bucket in buckets)
+
+    stats = {
+        'total_requests': total,
+        'successful_requests': total - errors,
+        'error_requests': errors,
+        'success_rate': ((total - errors) / total * 100) if total > 0 else 0,
+        'avg_response_time_ms': round(latency / total, 2) if total else 0,
+        'min_response_time_ms': min((bucket['min_response_time_ms'] or 0 for bucket in buckets), default=0),
+        'max_response_time_ms': max_latency,
+        'request_bytes': sum(bucket['request_bytes'] or 0 for bucket in buckets),
+        'response_bytes': sum(bucket['response_bytes'] or 0 for bucket in buckets),
+    }
+    for percentile in PERCENTILES:
+        stats[f"p{percentile}_response_time_ms"] = estimate_percentile(histogram, percentile, max_latency)
+    return stats
@@ -1,10 +1,11 @@
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from datetime import datetime
 import logging
 
+from .email_outbox import queue_email
+
 logger = logging.getLogger(__name__)
 
 
@@ -31,17 +32,16 @@ def send_otp_email(user, otp_instance, purpose='registration'):
         }
         subject = subject_map.get(purpose, 'PexiLabs - Email Verification')
         
-        # Send email
-        send_mail(
+        # Queue email (sent by the outbox worker)
+        queue_email(
             subject=subject,
-            message=plain_message,
-            from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@pexilabs.com'),
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
+            body=plain_message,
+            to=[user.email],
+            html_body=html_message,
+            purpose=f'otp_{purpose}',
         )
         
-        logger.info(f"OTP email sent successfully to {user.email} for {purpose}")
+        logger.info(f"OTP email queued for {user.email} for {purpose}")
         return True
         
     except Exception as e:
@@ -92,17 +92,16 @@ This email was sent from PexiLabs. Please do not reply to this email.
 © {datetime.now().year} PexiLabs. All rights reserved.
         """
         
-        # Send email
-        send_mail(
+        # Queue email (sent by the outbox worker)
+        queue_email(
             subject='PexiLabs - Merchant Account Created Successfully',
-            message=plain_message.strip(),
-            from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@pexilabs.com'),
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
+            body=plain_message.strip(),
+            to=[user.email],
+            html_body=html_message,
+            purpose='merchant_created',
         )
         
-        logger.info(f"Merchant creation email sent successfully to {user.email}")
+        logger.info(f"Merchant creation email queued for {user.email}")
         return True
         
     except Exception as e:
@@ -140,15 +139,14 @@ Best regards,
 PexiLabs Team
         """
         
-        send_mail(
+        queue_email(
             subject=subject,
-            message=message.strip(),
-            from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@pexilabs.com'),
-            recipient_list=[user.email],
-            fail_silently=False,
+            body=message.strip(),
+            to=[user.email],
+            purpose='merchant_status',
         )
         
-        logger.info(f"Merchant status update email sent to {user.email}: {old_status} -> {new_status}")
+        logger.info(f"Merchant status update email queued for {user.email}: {old_status} -> {new_status}")
         return True
         
     except Exception as e:
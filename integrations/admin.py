@@ -6,6 +6,8 @@ from django.http import HttpResponseRedirect
 from django.contrib import messages
 import json
 
+from authentication.admin_pagination import EstimatedCountAdminMixin
+from .health import HealthCheckEngine
 from .models import (
     Integration,
     MerchantIntegration,
@@ -59,7 +61,7 @@ class IntegrationAdmin(admin.ModelAdmin):
         'is_healthy', 'authentication_type', 'supports_webhooks'
     )
     search_fields = ('name', 'provider_name', 'code', 'description')
-    readonly_fields = ('id', 'created_at', 'updated_at', 'last_health_check')
+    readonly_fields = ('id', 'created_at', 'updated_at', 'last_health_check', 'duplicate_webhook_count')
     
     fieldsets = (
         ('Basic Information', {
@@ -75,7 +77,8 @@ class IntegrationAdmin(admin.ModelAdmin):
         }),
         ('Capabilities', {
             'fields': (
-                'supports_webhooks', 'supports_bulk_operations', 'supports_real_time'
+                'supports_webhooks', 'supports_bulk_operations', 'supports_real_time',
+                'duplicate_webhook_count'
             )
         }),
         ('Rate Limiting', {
@@ -132,15 +135,13 @@ class IntegrationAdmin(admin.ModelAdmin):
     
     def health_check(self, request, queryset):
         """Perform health check on selected integrations"""
-        for integration in queryset:
-            # Here you would implement actual health check logic
-            integration.is_healthy = True
-            integration.save(update_fields=['is_healthy'])
+        results = HealthCheckEngine(force=True, include_merchants=False).run(queryset)
+        healthy = sum(1 for result in results if result.is_healthy)
         
         self.message_user(
             request,
-            f'Health check completed for {queryset.count()} integration(s).',
-            messages.SUCCESS
+            f'Health check completed for {len(results)} integration(s): {healthy} healthy.',
+            messages.SUCCESS if healthy == len(results) else messages.WARNING
         )
     health_check.short_description = "Perform health check"
 
@@ -163,6 +164,7 @@ class MerchantIntegrationAdmin(admin.ModelAdmin):
     readonly_fields = (
         'id', 'total_requests', 'successful_requests', 'failed_requests',
         'consecutive_failures', 'last_used_at', 'last_error_at',
+        'last_health_check', 'health_check_passed', 'health_error_message',
         'created_at', 'updated_at', 'get_success_rate', 'credentials_preview'
     )
     
@@ -191,6 +193,10 @@ class MerchantIntegrationAdmin(admin.ModelAdmin):
             ),
             'classes': ('collapse',)
         }),
+        ('Health Monitoring', {
+            'fields': ('last_health_check', 'health_check_passed', 'health_error_message'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -307,12 +313,13 @@ class BankIntegrationAdmin(admin.ModelAdmin):
 
 
 @admin.register(IntegrationAPICall)
-class IntegrationAPICallAdmin(admin.ModelAdmin):
+class IntegrationAPICallAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """Admin interface for integration API calls"""
     list_display = (
         'merchant_integration', 'method', 'endpoint_short',
         'status_code', 'is_successful', 'response_time_ms', 'created_at'
     )
+    list_select_related = ('merchant_integration__merchant', 'merchant_integration__integration')
     list_filter = (
         'is_successful', 'method', 'operation_type',
         'merchant_integration__integration__provider_name', 'created_at'
@@ -341,6 +348,6 @@ class IntegrationWebhookAdmin(admin.ModelAdmin):
         'is_verified', 'is_processed', 'event_type',
         'integration__provider_name', 'created_at'
     )
-    search_fields = ('event_type', 'integration__name', 'source_ip')
-    readonly_fields = ('id', 'created_at', 'processed_at')
+    search_fields = ('event_type', 'integration__name', 'source_ip', 'dedupe_key')
+    readonly_fields = ('id', 'created_at', 'processed_at', 'dedupe_key', 'attempts', 'next_attempt_at')
     date_hierarchy = 'created_at'
@@ -0,0 +1,220 @@
+"""
+Per-Minute Integration API-Call Rollups
+
+Integration statistics used to count and average ``IntegrationAPICall`` rows
+directly, once per figure and once per day of a chart. ``IntegrationAPICallMinute``
+keeps one row per merchant integration, UTC minute and operation type. Each
+row holds call and success counts, latency sum/max and the same fixed-bucket
+latency histogram as the API-key usage rollup:
+
+- ``rollup_api_calls(start, end)`` recomputes every whole minute in the
+  window with one grouped query and replaces those minutes' rows in one
+  transaction. Minutes before the oldest remaining raw call are left alone,
+  since retention has removed their calls. ``manage.py rollup_integration_calls``
+  runs it every minute over the last few closed minutes, and retention runs
+  it over the expiring window before raw calls are deleted.
+- ``summarize_calls`` answers a statistics query from the rollup up to the
+  latest rolled-up minute, and at most up to the last
+  ``INTEGRATION_API_CALL_ROLLUP_LIVE_MINUTES`` minutes. Anything after that,
+  which the job has not reached yet, is read from the raw calls. Both sides are filtered
+  with ``created_at``/``minute`` ranges, never ``__date``, so the raw query
+  uses the ``(merchant_integration, created_at)`` index.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate, TruncMinute
+from django.utils import timezone
+
+from authentication.usage_rollups import estimate_percentile, histogram_aggregates, merge_histograms, pop_histogram
+from .models import IntegrationAPICall, IntegrationAPICallMinute
+
+PERCENTILES = (50, 95, 99)
+
+
+def floor_minute(value: datetime) -> datetime:
+    return value.astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+
+
+def ceil_minute(value: datetime) -> datetime:
+    floored = floor_minute(value)
+    return floored if floored == value else floored + timedelta(minutes=1)
+
+
+def get_live_boundary() -> Optional[datetime]:
+    """Statistics read raw calls from this point on, and the rollup before it
+
+    This is the minute after the latest rolled-up minute, and never later than
+    ``INTEGRATION_API_CALL_ROLLUP_LIVE_MINUTES`` ago. ``None`` means nothing
+    is rolled up yet.
+    """
+    latest = IntegrationAPICallMinute.objects.aggregate(latest=Max('minute'))['latest']
+    if latest is None:
+        return None
+    live_minutes = getattr(settings, 'INTEGRATION_API_CALL_ROLLUP_LIVE_MINUTES', 5)
+    return min(latest + timedelta(minutes=1), floor_minute(timezone.now()) - timedelta(minutes=live_minutes))
+
+
+def get_oldest_call_minute() -> Optional[datetime]:
+    """The minute of the oldest raw call still stored; earlier minutes only exist in the rollup"""
+    oldest = IntegrationAPICall.objects.aggregate(oldest=Min('created_at'))['oldest']
+    return floor_minute(oldest) if oldest else None
+
+
+# =============================================================================
+# ROLLUP
+# =============================================================================
+
+def rollup_api_calls(start: datetime, end: datetime) -> int:
+    """Recompute the minute rollup for every minute overlapping ``[start, end)``; returns the rows written
+
+    Minutes before the oldest remaining raw call are skipped, so a long
+    backfill never replaces rolled-up history with nothing.
+    """
+    oldest_minute = get_oldest_call_minute()
+    if oldest_minute is None:
+        return 0
+    start, end = max(floor_minute(start), oldest_minute), ceil_minute(end)
+    if start >= end:
+        return 0
+    buckets = (
+        IntegrationAPICall.objects
+        .filter(created_at__gte=start, created_at__lt=end)
+        .annotate(bucket_minute=TruncMinute('created_at', tzinfo=dt_timezone.utc))
+        .values('merchant_integration_id', 'bucket_minute', 'operation_type')
+        .annotate(
+            calls=Count('pk'),
+            successful=Count('pk', filter=Q(is_successful=True)),
+            timed=Count('response_time_ms'),
+            latency_total=Sum('response_time_ms'),
+            latency_max=Max('response_time_ms'),
+            **histogram_aggregates('response_time_ms'),
+        )
+        .order_by()
+    )
+
+    rows = []
+    for bucket in buckets:
+        rows.append(IntegrationAPICallMinute(
+            merchant_integration_id=bucket['merchant_integration_id'],
+            minute=bucket['bucket_minute'],
+            operation_type=bucket['operation_type'],
+            call_count=bucket['calls'],
+            success_count=bucket['successful'],
+            timed_count=bucket['timed'],
+            total_response_time_ms=bucket['latency_total'] or 0,
+            max_response_time_ms=bucket['latency_max'] or 0,
+            latency_histogram=pop_histogram(bucket),
+        ))
+
+    with transaction.atomic():
+        IntegrationAPICallMinute.objects.filter(minute__gte=start, minute__lt=end).delete()
+        IntegrationAPICallMinute.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rollup_recent_api_calls(minutes: Optional[int] = None) -> int:
+    """Roll up the last ``minutes`` closed minutes"""
+    minutes = minutes or getattr(settings, 'INTEGRATION_API_CALL_ROLLUP_LOOKBACK_MINUTES', 15)
+    end = floor_minute(timezone.now())
+    return rollup_api_calls(end - timedelta(minutes=minutes), end)
+
+
+# =============================================================================
+# STATISTICS
+# =============================================================================
+
+def _grouped(queryset, keys: List[str], **aggregates) -> List[dict]:
+    if keys:
+        return list(queryset.values(*keys).annotate(**aggregates).order_by())
+    row = queryset.aggregate(**aggregates)
+    return [row] if row['calls'] else []
+
+
+def _finish(summary: dict, histograms: bool) -> dict:
+    summary['failed'] = summary['calls'] - summary['successful']
+    summary['success_rate'] = round(summary['successful'] / summary['calls'] * 100, 2) if summary['calls'] else 0
+    summary['avg_response_time_ms'] = round(summary['latency_total'] / summary['timed'], 2) if summary['timed'] else 0
+    if not histograms:
+        summary.pop('histogram', None)
+        return summary
+    for percentile in PERCENTILES:
+        summary[f"p{percentile}_response_time_ms"] = estimate_percentile(
+            summary['histogram'], percentile, summary['latency_max'],
+        )
+    return summary
+
+
+def summarize_calls(start: datetime, end: datetime, group_by=(), by_day: bool = False,
+                    histograms: bool = False, **filters) -> List[dict]:
+    """Call statistics for ``[start, end)``, one dict per group
+
+    ``filters`` and ``group_by`` use lookups that exist on both models, such as
+    ``merchant_integration__merchant`` or ``operation_type``. With ``by_day``
+    the groups are also split by local date (``day``). With ``histograms`` the
+    latency histograms are merged, adding ``p50``/``p95``/``p99`` estimates.
+    """
+    keys = list(group_by) + (['day'] if by_day else [])
+    groups = {}
+
+    def add(row, histogram=None):
+        key = tuple(row[name] for name in keys)
+        summary = groups.setdefault(key, {
+            **{name: row[name] for name in keys},
+            'calls': 0, 'successful': 0, 'timed': 0, 'latency_total': 0, 'latency_max': 0,
+            'histogram': merge_histograms([]) if histograms else None,
+        })
+        summary['calls'] += row['calls']
+        summary['successful'] += row['successful']
+        summary['timed'] += row['timed']
+        summary['latency_total'] += row['latency_total'] or 0
+        summary['latency_max'] = max(summary['latency_max'], row['latency_max'] or 0)
+        if histograms:
+            summary['histogram'] = merge_histograms([summary['histogram'], histogram])
+
+    # With nothing rolled up yet, everything is read from the raw calls
+    boundary = get_live_boundary() or floor_minute(start)
+    rolled = IntegrationAPICallMinute.objects.filter(minute__gte=floor_minute(start), minute__lt=min(end, boundary), **filters)
+    if by_day:
+        rolled = rolled.annotate(day=TruncDate('minute'))
+    if histograms:
+        # Histograms are merged in Python, so fetch the minute rows themselves
+        for row in rolled.values(*keys, 'call_count', 'success_count', 'timed_count', 'total_response_time_ms',
+                                 'max_response_time_ms', 'latency_histogram').order_by():
+            add({
+                **row, 'calls': row['call_count'], 'successful': row['success_count'], 'timed': row['timed_count'],
+                'latency_total': row['total_response_time_ms'], 'latency_max': row['max_response_time_ms'],
+            }, row['latency_histogram'])
+    else:
+        for row in _grouped(
+            rolled, keys, calls=Sum('call_count'), successful=Sum('success_count'), timed=Sum('timed_count'),
+            latency_total=Sum('total_response_time_ms'), latency_max=Max('max_response_time_ms'),
+        ):
+            add(row)
+
+    if end > boundary:
+        recent = IntegrationAPICall.objects.filter(created_at__gte=max(start, boundary), created_at__lt=end, **filters)
+        if by_day:
+            recent = recent.annotate(day=TruncDate('created_at'))
+        for row in _grouped(
+            recent, keys, calls=Count('pk'), successful=Count('pk', filter=Q(is_successful=True)),
+            timed=Count('response_time_ms'), latency_total=Sum('response_time_ms'), latency_max=Max('response_time_ms'),
+            **(histogram_aggregates('response_time_ms') if histograms else {}),
+        ):
+            add(row, pop_histogram(row) if histograms else None)
+
+    return [_finish(summary, histograms) for summary in groups.values()]
+
+
+def total_calls(summaries: List[dict]) -> dict:
+    """Combine grouped summaries into one"""
+    total = {'calls': 0, 'successful': 0, 'timed': 0, 'latency_total': 0, 'latency_max': 0}
+    for summary in summaries:
+        for name in ('calls', 'successful', 'timed', 'latency_total'):
+            total[name] += summary[name]
+        total['latency_max'] = max(total['latency_max'], summary['latency_max'])
+    return _finish(total, histograms=False)
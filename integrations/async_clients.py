@@ -0,0 +1,386 @@
+"""
+Asynchronous Gateway Clients
+
+This module provides non-blocking counterparts of the TransVoucher, Uniwire
+and UBA gateway calls used on the payment initiation path, for async views
+served under ASGI.
+
+All clients share one pooled ``httpx.AsyncClient`` per event loop, so provider
+connections (and their TLS sessions) are kept alive and reused across requests
+instead of being opened per call. The pool lives as long as its loop is known
+to outlive the request: ``pexilabs.asgi`` wraps the application in
+``HTTPClientLifespan``, which keeps the server loop's client open until ASGI
+lifespan shutdown. Everywhere else (WSGI runs each async view on a fresh
+loop, and some ASGI servers skip lifespan events) the
+``releases_async_http_client`` view decorator closes the client when the
+request ends. Configuration, credentials and request
+payloads come from the existing synchronous services, which are built once per
+request off the event loop; only the provider HTTP round trip runs on the loop.
+API call logging and merchant integration counters are written the same way as
+the synchronous services, through ``sync_to_async``.
+
+Base URLs come from settings (``TRANSVOUCHER_API_BASE_URL``, ``UNIWIRE_API_URL``,
+UBA sandbox mode), so the clients can be pointed at a local stub provider.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import time
+import uuid
+import weakref
+from typing import Dict, Optional
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import IntegrationAPICall
+from .services import UBABankService, UBAAPIException
+from .transvoucher.service import TransVoucherService, TransVoucherAPIException
+from .uniwire.client import UniwireClient, UniwireAPIException
+
+logger = logging.getLogger(__name__)
+
+# One pooled client per running event loop (a client cannot be shared across loops)
+_http_clients = weakref.WeakKeyDictionary()
+
+# Loops whose client is closed on ASGI lifespan shutdown rather than per request
+_lifespan_loops = weakref.WeakSet()
+
+
+def build_async_http_client(**kwargs) -> httpx.AsyncClient:
+    """Build an ``httpx.AsyncClient`` with the configured pool limits and timeouts"""
+    limits = httpx.Limits(
+        max_connections=getattr(settings, 'INTEGRATION_HTTP_MAX_CONNECTIONS', 100),
+        max_keepalive_connections=getattr(settings, 'INTEGRATION_HTTP_MAX_KEEPALIVE_CONNECTIONS', 20),
+        keepalive_expiry=getattr(settings, 'INTEGRATION_HTTP_KEEPALIVE_EXPIRY', 30),
+    )
+    timeout = httpx.Timeout(
+        getattr(settings, 'INTEGRATION_HTTP_TIMEOUT', 30),
+        connect=getattr(settings, 'INTEGRATION_HTTP_CONNECT_TIMEOUT', 5),
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, **kwargs)
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Get the shared pooled client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = build_async_http_client()
+        _http_clients[loop] = client
+    return client
+
+
+async def close_async_http_client():
+    """Close the running loop's pooled client"""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def release_async_http_client():
+    """Close the running loop's pooled client unless ASGI lifespan owns it"""
+    if asyncio.get_running_loop() not in _lifespan_loops:
+        await close_async_http_client()
+
+
+def releases_async_http_client(view_func):
+    """Decorate an ``async def`` view so its pooled client is released afterwards"""
+    @functools.wraps(view_func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await view_func(*args, **kwargs)
+        finally:
+            await release_async_http_client()
+    return wrapper
+
+
+class HTTPClientLifespan:
+    """ASGI wrapper keeping the pooled client open for the server's lifetime
+
+    Handles ``lifespan`` events itself (Django's handler only accepts HTTP)
+    and passes every other connection to ``app``. On startup the server loop
+    is marked as long-lived, so requests reuse its client; on shutdown the
+    client is closed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                _lifespan_loops.add(loop)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                _lifespan_loops.discard(loop)
+                await close_async_http_client()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def _parse_response(response: httpx.Response) -> Dict:
+    try:
+        return response.json()
+    except ValueError:
+        return {'raw_response': response.text}
+
+
+class AsyncGatewayClient:
+    """Base class for async gateway clients wrapping a configured sync service
+
+    Subclasses set ``exception_class`` to the provider's API exception so
+    callers handle async and sync failures identically.
+    """
+
+    exception_class = Exception
+
+    def __init__(self, service, http_client: httpx.AsyncClient = None):
+        self.service = service
+        self.http_client = http_client
+
+    @property
+    def merchant_integration(self):
+        return getattr(self.service, 'merchant_integration', None)
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        endpoint: str,
+        headers: Dict = None,
+        data: Dict = None,
+        operation_type: str = 'general',
+        reference_id: str = None
+    ) -> httpx.Response:
+        """Send a request over the pooled client and log it"""
+        client = self.http_client or get_async_http_client()
+        started = time.monotonic()
+        try:
+            response = await client.request(method.upper(), url, headers=headers, json=data)
+        except httpx.HTTPError as e:
+            error_message = f"Request failed: {str(e)}"
+            logger.error(f"{self.__class__.__name__} {method.upper()} {endpoint} failed: {str(e)}")
+            await self._log_api_call(
+                method, endpoint, headers, data, operation_type, reference_id,
+                started=started, error_message=error_message
+            )
+            raise self.exception_class(message=error_message)
+
+        await self._log_api_call(
+            method, endpoint, headers, data, operation_type, reference_id,
+            started=started, response=response
+        )
+        return response
+
+    async def _log_api_call(self, *args, **kwargs):
+        if self.merchant_integration is None:
+            return
+        await sync_to_async(self._record_api_call)(*args, **kwargs)
+
+    def _record_api_call(
+        self,
+        method: str,
+        endpoint: str,
+        headers: Optional[Dict],
+        data: Optional[Dict],
+        operation_type: str,
+        reference_id: Optional[str],
+        started: float,
+        response: httpx.Response = None,
+        error_message: str = ''
+    ):
+        """Write the API call log and update merchant integration counters"""
+        is_successful = response is not None and response.status_code < 400
+        if response is not None and not is_successful:
+            error_message = f"HTTP {response.status_code}: {response.reason_phrase}"
+
+        IntegrationAPICall.objects.create(
+            merchant_integration=self.merchant_integration,
+            method=method.upper(),
+            endpoint=endpoint,
+            request_headers={k: v.decode() if isinstance(v, bytes) else v for k, v in (headers or {}).items()},
+            request_body=json.dumps(data or {}),
+            status_code=response.status_code if response is not None else None,
+            response_headers=dict(response.headers) if response is not None else {},
+            response_body=response.text if response is not None else '',
+            response_time_ms=int((time.monotonic() - started) * 1000),
+            operation_type=operation_type,
+            reference_id=reference_id or str(uuid.uuid4()),
+            is_successful=is_successful,
+            error_message=error_message,
+        )
+
+        if is_successful:
+            self.merchant_integration.record_success()
+        else:
+            self.merchant_integration.record_failure(error_message)
+
+
+class AsyncTransVoucherClient(AsyncGatewayClient):
+    """Async TransVoucher payment client"""
+
+    exception_class = TransVoucherAPIException
+
+    def __init__(self, service: TransVoucherService, http_client: httpx.AsyncClient = None):
+        super().__init__(service, http_client)
+
+    async def _request(self, method: str, endpoint: str, data: Dict = None,
+                       operation_type: str = 'general', reference_id: str = None) -> Dict:
+        url = f"{self.service.base_url}/{endpoint.lstrip('/')}"
+        response = await self._send(
+            method, url, endpoint, headers=self.service._get_headers(), data=data,
+            operation_type=operation_type, reference_id=reference_id
+        )
+        response_data = _parse_response(response)
+        if response.is_error:
+            raise TransVoucherAPIException(
+                message=response_data.get('message', f'HTTP {response.status_code} error'),
+                status_code=response.status_code,
+                error_code=response_data.get('error_code')
+            )
+        return response_data
+
+    async def create_payment(self, **kwargs) -> Dict:
+        """Create a new payment session (see ``TransVoucherService.create_payment``)"""
+        return await self._request(
+            'POST', 'v1.0/payment/create',
+            data=self.service._build_payment_payload(**kwargs),
+            operation_type='create_payment',
+            reference_id=kwargs.get('reference_id')
+        )
+
+    async def get_payment_status(self, reference_id: str) -> Dict:
+        """Get payment status by reference ID"""
+        return await self._request(
+            'GET', f'v1.0/payment/status/{reference_id}',
+            operation_type='get_payment_status',
+            reference_id=reference_id
+        )
+
+
+class AsyncUniwireClient(AsyncGatewayClient):
+    """Async Uniwire invoice client (requests are signed by ``UniwireClient``)"""
+
+    exception_class = UniwireAPIException
+
+    def __init__(self, client: UniwireClient, http_client: httpx.AsyncClient = None, merchant_integration=None):
+        super().__init__(client, http_client)
+        self._merchant_integration = merchant_integration
+
+    @property
+    def merchant_integration(self):
+        return self._merchant_integration
+
+    async def _request(self, endpoint: str, payload: Dict = None, method: str = 'GET',
+                       operation_type: str = 'general', reference_id: str = None) -> Dict:
+        request_path, headers = self.service._build_signed_request(endpoint, payload)
+        response = await self._send(
+            method, self.service.api_url + request_path, request_path, headers=headers,
+            operation_type=operation_type, reference_id=reference_id
+        )
+        try:
+            response_data = response.json() if response.text else {}
+        except ValueError:
+            raise UniwireAPIException("Invalid JSON response from API", status_code=response.status_code)
+        if response.status_code >= 400:
+            raise UniwireAPIException(
+                message=response_data.get('error', 'Unknown error'),
+                status_code=response.status_code,
+                error_code=response_data.get('error_code')
+            )
+        return response_data
+
+    async def create_invoice(self, profile_id: str, kind: str, **kwargs) -> Dict:
+        """Create a new invoice (see ``UniwireClient.create_invoice``)"""
+        payload = self.service._build_invoice_payload(profile_id, kind, **kwargs)
+        return await self._request('invoices', payload=payload, method='POST', operation_type='create_invoice')
+
+    async def get_invoice(self, invoice_id: str) -> Dict:
+        """Get details of a specific invoice"""
+        return await self._request(
+            f'invoices/{invoice_id}', operation_type='get_invoice', reference_id=invoice_id
+        )
+
+
+class AsyncUBAClient(AsyncGatewayClient):
+    """Async UBA (PayDock) checkout client"""
+
+    exception_class = UBAAPIException
+
+    def __init__(self, service: UBABankService, http_client: httpx.AsyncClient = None):
+        super().__init__(service, http_client)
+
+    async def _request(self, method: str, endpoint: str, data: Dict = None,
+                       operation_type: str = 'general', reference_id: str = None) -> Dict:
+        url = f"{self.service.base_url.rstrip('/')}/{endpoint.lstrip('/')}"
+        response = await self._send(
+            method, url, endpoint, headers=self.service._get_headers(), data=data,
+            operation_type=operation_type, reference_id=reference_id
+        )
+        response_data = _parse_response(response)
+        if response.status_code >= 400:
+            # PayDock API error structure: {"error": {"message": "...", "code": "..."}}
+            error_info = response_data.get('error', {})
+            if not isinstance(error_info, dict):
+                error_info = {}
+            raise UBAAPIException(
+                message=error_info.get('message', response_data.get('message', 'Unknown error')),
+                status_code=response.status_code,
+                error_code=error_info.get('code', response_data.get('code', str(response.status_code)))
+            )
+        return response_data
+
+    async def create_payment_page(self, **kwargs) -> Dict:
+        """Create a checkout intent (see ``UBABankService.create_payment_page``)
+
+        Unlike the synchronous service, provider errors are raised rather than
+        replaced with a mock payment page.
+        """
+        payload = self.service._build_payment_page_payload(**kwargs)
+        return await self._request(
+            'POST', '/checkouts/intent', data=payload,
+            operation_type='create_payment_page',
+            reference_id=payload['reference']
+        )
+
+    async def get_payment_status(self, payment_id: str) -> Dict:
+        """Get payment status by payment ID"""
+        return await self._request(
+            'GET', f'/payments/{payment_id}',
+            operation_type='payment_status',
+            reference_id=payment_id
+        )
+
+
+async def get_async_transvoucher_client(merchant=None, http_client: httpx.AsyncClient = None) -> AsyncTransVoucherClient:
+    """Build an async TransVoucher client from the merchant's service configuration"""
+    service = await sync_to_async(TransVoucherService)(merchant=merchant)
+    return AsyncTransVoucherClient(service, http_client=http_client)
+
+
+async def get_async_uba_client(merchant=None, http_client: httpx.AsyncClient = None) -> AsyncUBAClient:
+    """Build an async UBA client from the merchant's service configuration"""
+    service = await sync_to_async(UBABankService)(merchant=merchant)
+    return AsyncUBAClient(service, http_client=http_client)
+
+
+async def get_async_uniwire_client(merchant=None, http_client: httpx.AsyncClient = None) -> AsyncUniwireClient:
+    """Build an async Uniwire client, using the merchant's credentials when configured"""
+    if merchant is None:
+        return AsyncUniwireClient(UniwireClient(), http_client=http_client)
+
+    from .uniwire.service import UniwireService
+
+    service = await sync_to_async(UniwireService)(merchant=merchant)
+    return AsyncUniwireClient(
+        service.client, http_client=http_client, merchant_integration=service.merchant_integration
+    )
@@ -0,0 +1,168 @@
+"""
+Merchant Integration Credential Cache
+
+This module provides a process-local cache for decrypted merchant integration
+credentials and a shared lookup API for gateway service classes.
+
+A single Fernet instance is reused per process, and decrypted credentials are
+held for a short TTL keyed by the merchant integration id and a fingerprint of
+the encrypted token. Rotating credentials writes a new token, so stale entries
+are never served, while the request counters saved on every gateway call
+(which bump ``updated_at``) leave the key unchanged. Decrypted values are
+never written to Django's cache framework, which may be shared between hosts.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from copy import deepcopy
+from functools import lru_cache
+from typing import Dict, Optional
+
+from cryptography.fernet import Fernet
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on cached entries so a long-lived worker cannot grow unbounded
+MAX_CACHE_ENTRIES = 1024
+
+
+@lru_cache(maxsize=4)
+def _build_fernet(key: str) -> Fernet:
+    """Build a Fernet instance for the given key (memoized per process)"""
+    return Fernet(key.encode())
+
+
+def get_fernet() -> Fernet:
+    """Get the process-wide Fernet instance for ``settings.ENCRYPTION_KEY``"""
+    key = getattr(settings, 'ENCRYPTION_KEY', None)
+    if not key:
+        raise ValueError("ENCRYPTION_KEY not configured in settings")
+    return _build_fernet(key)
+
+
+def encrypt_payload(data: Dict) -> str:
+    """Encrypt a dictionary into a Fernet token string"""
+    return get_fernet().encrypt(json.dumps(data).encode()).decode()
+
+
+def decrypt_payload(token: str) -> Dict:
+    """Decrypt a Fernet token string back into a dictionary"""
+    if not token:
+        return {}
+    return json.loads(get_fernet().decrypt(token.encode()).decode())
+
+
+class CredentialCache:
+    """Thread-safe in-memory TTL cache for decrypted credentials"""
+
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, 'INTEGRATION_CREDENTIALS_CACHE_TTL', 300)
+
+    def get(self, key) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, credentials = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return credentials
+
+    def set(self, key, credentials: Dict):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[key] = (time.monotonic() + self.ttl, credentials)
+
+    def invalidate(self, integration_id=None):
+        """Drop cached credentials for one merchant integration (or all)"""
+        with self._lock:
+            if integration_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == integration_id]:
+                del self._entries[key]
+
+    def _evict(self):
+        """Remove expired entries, then the oldest ones if still full"""
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+
+credential_cache = CredentialCache()
+
+
+def credentials_fingerprint(token: str) -> str:
+    """Short hash of an encrypted credentials token; it changes only when the credentials are rewritten"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def get_merchant_credentials(merchant_integration) -> Dict:
+    """Get decrypted credentials for a merchant integration
+
+    Returns a copy so callers can never mutate the cached entry.
+
+    Raises:
+        ValueError: If the credentials cannot be decrypted
+    """
+    if merchant_integration is None or not merchant_integration.credentials:
+        return {}
+
+    key = (merchant_integration.id, credentials_fingerprint(merchant_integration.credentials))
+    credentials = credential_cache.get(key)
+    if credentials is None:
+        try:
+            credentials = decrypt_payload(merchant_integration.credentials)
+        except Exception as e:
+            raise ValueError(f"Failed to decrypt credentials: {str(e)}")
+        credential_cache.set(key, credentials)
+
+    return deepcopy(credentials)
+
+
+class MerchantCredentialsMixin:
+    """Unified merchant credential lookup for gateway service classes
+
+    Services set ``self.merchant_integration`` during construction and map
+    credential keys to their own attributes through ``credential_fields``.
+    Only gateways that authenticate with merchant-owned accounts (Uniwire)
+    use it; the platform gateways (UBA, CyberSource, Corefy, TransVoucher)
+    always authenticate with the credentials from settings.
+    """
+
+    # Mapping of credential key -> service attribute overridden by it
+    credential_fields: Dict[str, str] = {}
+
+    merchant_integration = None
+
+    def get_merchant_credentials(self) -> Dict:
+        """Get the merchant's decrypted credentials (empty if none)"""
+        try:
+            return get_merchant_credentials(self.merchant_integration)
+        except ValueError as e:
+            logger.error(f"Error loading merchant credentials for {self.__class__.__name__}: {str(e)}")
+            return {}
+
+    def _apply_merchant_credentials(self) -> Dict:
+        """Override default settings-based credentials with merchant ones"""
+        credentials = self.get_merchant_credentials()
+        for credential_key, attribute in self.credential_fields.items():
+            if credentials.get(credential_key):
+                setattr(self, attribute, credentials[credential_key])
+        return credentials
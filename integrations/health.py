@@ -0,0 +1,279 @@
+"""
+Integration Health Check Engine
+
+This module runs provider health checks concurrently on a thread pool. Every
+active ``Integration`` (and every enabled ``MerchantIntegration`` of a provider
+that has a service class) is checked in parallel with a per-check deadline, and
+the results are written back with one bulk update per model.
+
+A thread cannot be killed, so a check that misses its deadline keeps running in
+the background until its own HTTP timeout fires. The engine remembers these
+abandoned checks across runs: their targets are not checked again until they
+finish, and new checks only get the workers left over, so a hung provider
+cannot pile up threads in the scheduler loop (at most ``max_workers`` checks are
+ever in flight).
+
+The engine honours ``Integration.needs_health_check()`` unless forced, and can
+run once (management command / admin action) or as a long-lived scheduler loop.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Integration, IntegrationStatus, IntegrationType, MerchantIntegration
+
+logger = logging.getLogger(__name__)
+
+# Service classes with a ``test_connection()`` method, by integration code
+SERVICE_CLASSES_BY_CODE = {
+    'uba_kenya': 'integrations.services.UBABankService',
+    'cybersource': 'integrations.services.CyberSourceService',
+    'corefy': 'integrations.services.CorefyService',
+    'transvoucher': 'integrations.transvoucher.service.TransVoucherService',
+}
+
+# Fallback lookup by integration type for integrations with custom codes
+SERVICE_CLASSES_BY_TYPE = {
+    IntegrationType.UBA_BANK: 'integrations.services.UBABankService',
+    IntegrationType.CYBERSOURCE: 'integrations.services.CyberSourceService',
+    IntegrationType.COREFY: 'integrations.services.CorefyService',
+    IntegrationType.TRANSVOUCHER: 'integrations.transvoucher.service.TransVoucherService',
+    IntegrationType.UNIWIRE: 'integrations.uniwire.service.UniwireService',
+}
+
+# How often the collector wakes up to enforce per-check deadlines
+POLL_INTERVAL_SECONDS = 0.25
+
+
+def get_service_class(integration: Integration):
+    """Get the gateway service class used to health check an integration"""
+    path = SERVICE_CLASSES_BY_CODE.get(integration.code) or SERVICE_CLASSES_BY_TYPE.get(integration.integration_type)
+    return import_string(path) if path else None
+
+
+def _result_error(result: Dict) -> str:
+    """Extract an error message from a ``test_connection()`` result"""
+    return str(result.get('error') or result.get('message') or 'Health check failed')
+
+
+class HealthCheckResult:
+    """Outcome of a single health check"""
+
+    def __init__(self, target, is_healthy: bool, error_message: str = '', duration_ms: int = 0):
+        self.target = target
+        self.is_healthy = is_healthy
+        self.error_message = error_message
+        self.duration_ms = duration_ms
+
+    @property
+    def is_merchant_check(self) -> bool:
+        return isinstance(self.target, MerchantIntegration)
+
+    def __repr__(self):
+        return f"<HealthCheckResult {self.target} healthy={self.is_healthy}>"
+
+
+class HealthCheckEngine:
+    """Run integration health checks in parallel with per-check deadlines"""
+
+    def __init__(self, max_workers: int = None, timeout: float = None, force: bool = False,
+                 include_merchants: bool = True):
+        self.max_workers = max_workers or getattr(settings, 'INTEGRATION_HEALTH_CHECK_WORKERS', 8)
+        self.timeout = timeout or getattr(settings, 'INTEGRATION_HEALTH_CHECK_TIMEOUT', 10)
+        self.force = force
+        self.include_merchants = include_merchants
+        # Checks abandoned past their deadline that are still running, by target
+        self._abandoned = {}
+
+    # ------------------------------------------------------------------
+    # Target selection
+    # ------------------------------------------------------------------
+
+    def get_due_integrations(self, queryset=None) -> List[Integration]:
+        """Active integrations whose health check interval has elapsed"""
+        if queryset is None:
+            queryset = Integration.objects.filter(status=IntegrationStatus.ACTIVE)
+        integrations = list(queryset)
+        if self.force:
+            return integrations
+        return [integration for integration in integrations if integration.needs_health_check()]
+
+    def get_merchant_integrations(self, integrations: Iterable[Integration]) -> List[MerchantIntegration]:
+        """Enabled merchant configurations of the given (service-backed) integrations"""
+        integration_ids = [i.id for i in integrations if get_service_class(i)]
+        if not integration_ids:
+            return []
+        return list(
+            MerchantIntegration.objects.filter(
+                integration_id__in=integration_ids,
+                is_enabled=True,
+                status=IntegrationStatus.ACTIVE,
+            ).select_related('merchant', 'integration')
+        )
+
+    # ------------------------------------------------------------------
+    # Individual checks (run on worker threads)
+    # ------------------------------------------------------------------
+
+    def check_integration(self, integration: Integration) -> HealthCheckResult:
+        """Check a global integration with its service, or probe its base URL"""
+        service_class = get_service_class(integration)
+        if service_class is None:
+            return self._probe_base_url(integration)
+
+        result = service_class().test_connection()
+        if result.get('success'):
+            return HealthCheckResult(integration, True)
+        return HealthCheckResult(integration, False, _result_error(result))
+
+    def check_merchant_integration(self, merchant_integration: MerchantIntegration) -> HealthCheckResult:
+        """Check a merchant integration using the merchant's own credentials
+
+        Success/failure counters are recorded by the service itself.
+        """
+        service_class = get_service_class(merchant_integration.integration)
+        result = service_class(merchant=merchant_integration.merchant).test_connection()
+        if result.get('success'):
+            return HealthCheckResult(merchant_integration, True)
+        return HealthCheckResult(merchant_integration, False, _result_error(result))
+
+    def _probe_base_url(self, integration: Integration) -> HealthCheckResult:
+        """Reachability probe for integrations without a service class"""
+        try:
+            response = requests.head(integration.base_url, timeout=self.timeout, allow_redirects=True)
+        except requests.exceptions.RequestException as e:
+            return HealthCheckResult(integration, False, f"Request failed: {str(e)}")
+        if response.status_code >= 500:
+            return HealthCheckResult(integration, False, f"HTTP {response.status_code}: {response.reason}")
+        return HealthCheckResult(integration, True)
+
+    def _run_check(self, check, target, started: Dict) -> HealthCheckResult:
+        """Worker entry point: time the check and release the thread's DB connection"""
+        started[target.pk] = time.monotonic()
+        try:
+            result = check(target)
+        except Exception as e:
+            logger.error(f"Health check for {target} raised: {str(e)}")
+            result = HealthCheckResult(target, False, str(e))
+        finally:
+            connections.close_all()
+        result.duration_ms = int((time.monotonic() - started[target.pk]) * 1000)
+        return result
+
+    # ------------------------------------------------------------------
+    # Orchestration
+    # ------------------------------------------------------------------
+
+    def run(self, queryset=None) -> List[HealthCheckResult]:
+        """Run all due checks concurrently and persist the results"""
+        integrations = self.get_due_integrations(queryset)
+        merchant_integrations = self.get_merchant_integrations(integrations) if self.include_merchants else []
+
+        jobs = [(self.check_integration, integration) for integration in integrations]
+        jobs += [(self.check_merchant_integration, mi) for mi in merchant_integrations]
+        if not jobs:
+            return []
+
+        results = self._execute(jobs)
+        self.save_results(results)
+        return results
+
+    @staticmethod
+    def _target_key(target):
+        return target._meta.label, target.pk
+
+    def _execute(self, jobs) -> List[HealthCheckResult]:
+        self._abandoned = {key: future for key, future in self._abandoned.items() if not future.done()}
+        still_running = [target for _, target in jobs if self._target_key(target) in self._abandoned]
+        for target in still_running:
+            logger.warning(f"Skipping health check for {target}: the previous check is still running")
+        jobs = [(check, target) for check, target in jobs if self._target_key(target) not in self._abandoned]
+
+        if not jobs:
+            return []
+        free_workers = self.max_workers - len(self._abandoned)
+        if free_workers <= 0:
+            logger.error(f"Skipping {len(jobs)} health check(s): all {self.max_workers} workers are stuck on timed out checks")
+            return []
+
+        started = {}
+        executor = ThreadPoolExecutor(max_workers=min(free_workers, len(jobs)),
+                                      thread_name_prefix='integration-health')
+        futures = {
+            executor.submit(self._run_check, check, target, started): target
+            for check, target in jobs
+        }
+
+        results = []
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=POLL_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+
+                # Abandon checks that have been running past their deadline
+                now = time.monotonic()
+                for future in list(pending):
+                    target = futures[future]
+                    start = started.get(target.pk)
+                    if start is not None and now - start > self.timeout:
+                        pending.discard(future)
+                        self._abandoned[self._target_key(target)] = future
+                        results.append(HealthCheckResult(
+                            target, False, f"Health check timed out after {self.timeout}s",
+                            duration_ms=int((now - start) * 1000)
+                        ))
+        finally:
+            # Do not block on abandoned checks; their results are discarded
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return results
+
+    def save_results(self, results: List[HealthCheckResult]):
+        """Write integration and merchant integration results, one bulk update each"""
+        checked_at = timezone.now()
+        integrations = []
+        merchant_integrations = []
+        for result in results:
+            target = result.target
+            target.last_health_check = checked_at
+            target.health_error_message = '' if result.is_healthy else result.error_message
+            if result.is_merchant_check:
+                target.health_check_passed = result.is_healthy
+                merchant_integrations.append(target)
+            else:
+                target.is_healthy = result.is_healthy
+                integrations.append(target)
+
+        if integrations:
+            Integration.objects.bulk_update(
+                integrations, ['last_health_check', 'is_healthy', 'health_error_message']
+            )
+        if merchant_integrations:
+            MerchantIntegration.objects.bulk_update(
+                merchant_integrations, ['last_health_check', 'health_check_passed', 'health_error_message']
+            )
+
+    def run_forever(self, interval: float = None, max_iterations: Optional[int] = None, on_results=None):
+        """Scheduler loop: re-run due checks every ``interval`` seconds"""
+        interval = interval or getattr(settings, 'INTEGRATION_HEALTH_CHECK_TICK', 30)
+        iteration = 0
+        while max_iterations is None or iteration < max_iterations:
+            iteration += 1
+            close_old_connections()
+            try:
+                results = self.run()
+                if on_results:
+                    on_results(results)
+            except Exception as e:
+                logger.error(f"Integration health check run failed: {str(e)}")
+            if max_iterations is None or iteration < max_iterations:
+                time.sleep(interval)
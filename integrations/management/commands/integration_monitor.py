@@ -4,11 +4,10 @@ Enhanced integration monitoring and health check system
 
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.db import models
 from datetime import timedelta
-from integrations.models import Integration, IntegrationAPICall, IntegrationStatus
-from integrations.services import UBABankService, CyberSourceService, CorefyService
-from authentication.models import Merchant
+from integrations.api_call_rollups import summarize_calls
+from integrations.models import Integration, IntegrationStatus
+from integrations.health import HealthCheckEngine
 import json
 
 
@@ -31,6 +30,34 @@ class Command(BaseCommand):
             action='store_true',
             help='Perform health checks for all integrations',
         )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running health checks on a schedule instead of once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=None,
+            help='Seconds between scheduler iterations (default: INTEGRATION_HEALTH_CHECK_TICK)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of concurrent health checks',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=None,
+            help='Per-check deadline in seconds',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Check every integration, even if its health check interval has not elapsed',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(
@@ -44,8 +71,12 @@ class Command(BaseCommand):
         if options['api_stats']:
             self.show_api_statistics()
             
+        if options['loop']:
+            self.run_health_check_loop(options)
+            return
+            
         if options['health_check']:
-            self.perform_health_checks()
+            self.perform_health_checks(options)
             
         if not any([options['full_report'], options['api_stats'], options['health_check']]):
             self.show_quick_status()
@@ -98,110 +129,77 @@ class Command(BaseCommand):
         self.stdout.write('\n📈 API Call Statistics (Last 24 Hours)')
         self.stdout.write('-' * 40)
 
-        # Get API calls from last 24 hours
+        # Read the minute rollup for the last 24 hours, grouped by integration
         since = timezone.now() - timedelta(hours=24)
-        api_calls = IntegrationAPICall.objects.filter(
-            created_at__gte=since
+        summaries = summarize_calls(
+            since, timezone.now(),
+            group_by=['merchant_integration__integration__code', 'merchant_integration__integration__name'],
+            histograms=True,
         )
 
-        if not api_calls.exists():
+        if not summaries:
             self.stdout.write('   No API calls in the last 24 hours')
             return
 
-        # Group by integration
-        integrations = ['uba_kenya', 'cybersource', 'corefy']
-        
-        for integration_code in integrations:
-            integration_calls = api_calls.filter(
-                integration__code=integration_code
-            )
-            
-            if integration_calls.exists():
-                total_calls = integration_calls.count()
-                successful_calls = integration_calls.filter(
-                    status_code__gte=200,
-                    status_code__lt=300
-                ).count()
-                
-                success_rate = (successful_calls / total_calls * 100) if total_calls > 0 else 0
-                
-                self.stdout.write(f'\n🔌 {integration_code.replace("_", " ").title()}:')
-                self.stdout.write(f'   Total Calls: {total_calls}')
-                self.stdout.write(f'   Successful: {successful_calls}')
-                self.stdout.write(f'   Success Rate: {success_rate:.1f}%')
-                
-                # Average response time
-                avg_response_time = integration_calls.aggregate(
-                    avg_time=models.Avg('response_time')
-                )['avg_time']
-                
-                if avg_response_time:
-                    self.stdout.write(f'   Avg Response Time: {avg_response_time:.2f}ms')
-
-    def perform_health_checks(self):
+        for summary in sorted(summaries, key=lambda row: -row['calls']):
+            self.stdout.write(f"\n🔌 {summary['merchant_integration__integration__name']} ({summary['merchant_integration__integration__code']}):")
+            self.stdout.write(f"   Total Calls: {summary['calls']}")
+            self.stdout.write(f"   Successful: {summary['successful']}")
+            self.stdout.write(f"   Success Rate: {summary['success_rate']:.1f}%")
+            if summary['timed']:
+                self.stdout.write(f"   Avg Response Time: {summary['avg_response_time_ms']:.2f}ms")
+                self.stdout.write(
+                    f"   p50/p95/p99: {summary['p50_response_time_ms']:.0f}/"
+                    f"{summary['p95_response_time_ms']:.0f}/{summary['p99_response_time_ms']:.0f}ms"
+                )
+
+    def _get_health_engine(self, options):
+        return HealthCheckEngine(
+            max_workers=options.get('workers'),
+            timeout=options.get('timeout'),
+            force=options.get('force', False),
+        )
+
+    def perform_health_checks(self, options):
         """Perform health checks for all integrations"""
         self.stdout.write('\n🏥 Performing Health Checks')
         self.stdout.write('-' * 40)
 
-        # Get a test merchant
-        merchant = Merchant.objects.first()
-        if not merchant:
-            self.stdout.write(
-                self.style.ERROR('❌ No merchants found for testing')
-            )
-            return
+        results = self._get_health_engine(options).run()
+        self.report_health_results(results)
 
-        services = {
-            'UBA Bank': UBABankService(merchant=merchant),
-            'CyberSource': CyberSourceService(merchant=merchant),
-            'Corefy': CorefyService(merchant=merchant)
-        }
+    def run_health_check_loop(self, options):
+        """Run health checks continuously as a scheduler"""
+        self.stdout.write('\n🔁 Running health check scheduler (Ctrl+C to stop)')
+        try:
+            self._get_health_engine(options).run_forever(
+                interval=options.get('interval'),
+                on_results=self.report_health_results,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('\n👋 Health check scheduler stopped')
 
-        health_results = {}
+    def report_health_results(self, results):
+        """Print health check results and a summary"""
+        if not results:
+            self.stdout.write('   No integrations due for a health check')
+            return
 
-        for name, service in services.items():
-            self.stdout.write(f'\n🔍 Testing {name}...')
-            
-            try:
-                if hasattr(service, 'test_connection'):
-                    result = service.test_connection()
-                    is_healthy = result.get('success', False)
-                    error_message = result.get('error', '')
-                    
-                    # Update integration health status
-                    integration = service.integration
-                    integration.is_healthy = is_healthy
-                    integration.last_health_check = timezone.now()
-                    integration.health_error_message = error_message if not is_healthy else ''
-                    integration.status = IntegrationStatus.ACTIVE if is_healthy else IntegrationStatus.ERROR
-                    integration.save()
-                    
-                    health_results[name] = is_healthy
-                    
-                    if is_healthy:
-                        self.stdout.write(
-                            self.style.SUCCESS(f'   ✅ {name} is healthy')
-                        )
-                    else:
-                        self.stdout.write(
-                            self.style.ERROR(f'   ❌ {name} is unhealthy: {error_message}')
-                        )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f'   ⚠️  {name} has no health check method')
-                    )
-                    health_results[name] = None
-                    
-            except Exception as e:
+        for result in results:
+            name = str(result.target)
+            if result.is_healthy:
+                self.stdout.write(
+                    self.style.SUCCESS(f'   ✅ {name} is healthy ({result.duration_ms}ms)')
+                )
+            else:
                 self.stdout.write(
-                    self.style.ERROR(f'   ❌ {name} health check failed: {str(e)}')
+                    self.style.ERROR(f'   ❌ {name} is unhealthy: {result.error_message}')
                 )
-                health_results[name] = False
 
         # Summary
         self.stdout.write('\n📊 Health Check Summary:')
-        healthy_count = sum(1 for status in health_results.values() if status is True)
-        total_count = len([status for status in health_results.values() if status is not None])
+        healthy_count = sum(1 for result in results if result.is_healthy)
+        total_count = len(results)
         
         self.stdout.write(f'   Healthy Services: {healthy_count}/{total_count}')
         
@@ -233,3 +231,4 @@ class Command(BaseCommand):
         self.stdout.write('   --full-report    Complete integration details')
         self.stdout.write('   --api-stats      API call statistics')
         self.stdout.write('   --health-check   Perform health checks')
+        self.stdout.write('   --loop           Run health checks continuously')
@@ -0,0 +1,67 @@
+"""
+Process stored inbound provider webhooks
+"""
+
+from django.core.management.base import BaseCommand
+
+from integrations.models import IntegrationWebhook
+from integrations.webhooks import InboundWebhookProcessor
+
+
+class Command(BaseCommand):
+    help = 'Apply stored provider webhooks to transactions (run several processes to scale out)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a worker instead of draining pending webhooks once',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Webhooks processed per batch (default: INBOUND_WEBHOOK_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Seconds to sleep when no webhooks are pending (with --loop)',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches (without --loop)',
+        )
+
+    def handle(self, *args, **options):
+        processor = InboundWebhookProcessor(batch_size=options['batch_size'])
+
+        if options['loop']:
+            self.stdout.write(self.style.SUCCESS('📥 Inbound webhook worker started'))
+            try:
+                processor.run_forever(poll_interval=options['poll_interval'], on_batch=self.report_batch)
+            except KeyboardInterrupt:
+                self.stdout.write('Inbound webhook worker stopped')
+            return
+
+        results = processor.run(max_batches=options['max_batches'])
+        if results:
+            self.report_batch(results)
+        self.stdout.write(f"Webhooks still pending: {IntegrationWebhook.objects.filter(is_processed=False).count()}")
+
+    def report_batch(self, webhooks):
+        failed = [webhook for webhook in webhooks if webhook.processing_error]
+        retrying = [webhook for webhook in failed if not webhook.is_processed]
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(
+            f"Processed {len(webhooks)} webhook(s), {len(failed)} failed ({len(retrying)} will be retried)"
+        ))
+        for webhook in failed:
+            icon = '⏳' if not webhook.is_processed else '❌'
+            self.stdout.write(
+                f"  {icon} {webhook.integration.code} {webhook.event_type} ({webhook.id}, "
+                f"attempt {webhook.attempts}): {webhook.processing_error}"
+            )
@@ -0,0 +1,65 @@
+"""
+Roll integration API calls up into per-minute buckets
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from integrations.api_call_rollups import floor_minute, rollup_api_calls, rollup_recent_api_calls
+
+
+class Command(BaseCommand):
+    help = 'Recompute the IntegrationAPICallMinute rollup for recently closed minutes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes',
+            type=int,
+            default=None,
+            help='Closed minutes to recompute (default: INTEGRATION_API_CALL_ROLLUP_LOOKBACK_MINUTES)',
+        )
+        parser.add_argument(
+            '--backfill-days',
+            type=int,
+            default=None,
+            help='Recompute every minute of the last N days, one day at a time (minutes whose calls '
+                 'retention has removed are kept as they are)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, rolling up every INTEGRATION_API_CALL_ROLLUP_INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill_days']:
+            end = floor_minute(timezone.now())
+            for days_ago in range(options['backfill_days'], 0, -1):
+                day_end = end - timedelta(days=days_ago - 1)
+                rows = rollup_api_calls(day_end - timedelta(days=1), day_end)
+                self.stdout.write(f"{day_end - timedelta(days=1):%Y-%m-%d %H:%M}: {rows} minute rows")
+            self.stdout.write(self.style.SUCCESS(f"✅ Backfilled {options['backfill_days']} days of integration calls"))
+            return
+
+        if not options['loop']:
+            rows = rollup_recent_api_calls(options['minutes'])
+            self.stdout.write(self.style.SUCCESS(f"✅ {rows} minute rows written"))
+            return
+
+        interval = getattr(settings, 'INTEGRATION_API_CALL_ROLLUP_INTERVAL', 60)
+        self.stdout.write(self.style.SUCCESS('📊 Integration call rollup worker started'))
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    rollup_recent_api_calls(options['minutes'])
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"❌ Integration call rollup failed: {str(e)}"))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Integration call rollup worker stopped')
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0002_alter_integration_integration_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='integration',
+            name='duplicate_webhook_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='integrationwebhook',
+            name='dedupe_key',
+            field=models.CharField(blank=True, help_text='Hash of the provider event id (or reference and status) used to drop redeliveries', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='integrationwebhook',
+            constraint=models.UniqueConstraint(fields=('integration', 'dedupe_key'), name='unique_integration_webhook_event'),
+        ),
+    ]
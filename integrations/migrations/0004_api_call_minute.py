@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0003_webhook_dedupe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntegrationAPICallMinute',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('minute', models.DateTimeField(help_text='Start of the minute (UTC)')),
+                ('operation_type', models.CharField(max_length=50)),
+                ('call_count', models.PositiveIntegerField(default=0)),
+                ('success_count', models.PositiveIntegerField(default=0)),
+                ('timed_count', models.PositiveIntegerField(default=0, help_text='Calls with a recorded response time')),
+                ('total_response_time_ms', models.BigIntegerField(default=0)),
+                ('max_response_time_ms', models.PositiveIntegerField(default=0)),
+                ('latency_histogram', models.JSONField(default=list, help_text='Call counts per LATENCY_BUCKETS_MS bucket, with a final overflow bucket')),
+                ('merchant_integration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_call_minutes', to='integrations.merchantintegration')),
+            ],
+            options={
+                'verbose_name': 'Integration API Call Minute',
+                'verbose_name_plural': 'Integration API Call Minutes',
+                'ordering': ['-minute'],
+                'indexes': [models.Index(fields=['minute'], name='integration_minute_d24d0e_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='integrationapicallminute',
+            constraint=models.UniqueConstraint(fields=('merchant_integration', 'minute', 'operation_type'), name='unique_integration_call_minute_bucket'),
+        ),
+    ]
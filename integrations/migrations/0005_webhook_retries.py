@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0004_api_call_minute'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='integrationwebhook',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Failed processing attempts so far'),
+        ),
+        migrations.AddField(
+            model_name='integrationwebhook',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='When a webhook that failed processing is retried', null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0005_webhook_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchantintegration',
+            name='health_check_passed',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='merchantintegration',
+            name='health_error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='merchantintegration',
+            name='last_health_check',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -3,14 +3,13 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
 import uuid
-import json
 from decimal import Decimal
 from datetime import timedelta
-from cryptography.fernet import Fernet
-from django.conf import settings
+from .credentials import credential_cache, decrypt_payload, encrypt_payload, get_merchant_credentials
 
 # Import from authentication app
 from authentication.models import Merchant, PreferredCurrency
+from transactions.fees import FeeSchedule
 
 
 class IntegrationType(models.TextChoices):
@@ -136,6 +135,9 @@ class Integration(models.Model):
     is_healthy = models.BooleanField(default=True)
     health_error_message = models.TextField(blank=True)
     
+    # Inbound webhook redeliveries dropped by the dedupe layer
+    duplicate_webhook_count = models.PositiveIntegerField(default=0)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -212,6 +214,11 @@ class MerchantIntegration(models.Model):
     last_error_message = models.TextField(blank=True)
     last_error_at = models.DateTimeField(null=True, blank=True)
     
+    # Health monitoring (written by the health check engine)
+    last_health_check = models.DateTimeField(null=True, blank=True)
+    health_check_passed = models.BooleanField(default=True)
+    health_error_message = models.TextField(blank=True)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -231,30 +238,24 @@ class MerchantIntegration(models.Model):
     
     def encrypt_credentials(self, credentials_dict):
         """Encrypt and store credentials"""
-        if not hasattr(settings, 'ENCRYPTION_KEY'):
-            raise ValueError("ENCRYPTION_KEY not configured in settings")
-        
-        fernet = Fernet(settings.ENCRYPTION_KEY.encode())
-        credentials_json = json.dumps(credentials_dict)
-        encrypted_credentials = fernet.encrypt(credentials_json.encode())
-        self.credentials = encrypted_credentials.decode()
+        self.credentials = encrypt_payload(credentials_dict)
         self.save(update_fields=['credentials', 'updated_at'])
+        credential_cache.invalidate(self.id)
     
     def decrypt_credentials(self):
         """Decrypt and return credentials"""
         if not self.credentials:
             return {}
         
-        if not hasattr(settings, 'ENCRYPTION_KEY'):
-            raise ValueError("ENCRYPTION_KEY not configured in settings")
-        
         try:
-            fernet = Fernet(settings.ENCRYPTION_KEY.encode())
-            decrypted_data = fernet.decrypt(self.credentials.encode())
-            return json.loads(decrypted_data.decode())
+            return decrypt_payload(self.credentials)
         except Exception as e:
             raise ValueError(f"Failed to decrypt credentials: {str(e)}")
     
+    def get_decrypted_credentials(self):
+        """Return decrypted credentials through the in-process credential cache"""
+        return get_merchant_credentials(self)
+    
     def record_success(self):
         """Record a successful API call"""
         self.total_requests += 1
@@ -290,6 +291,7 @@ class MerchantIntegration(models.Model):
         return (
             self.is_enabled and
             self.status == IntegrationStatus.ACTIVE and
+            self.health_check_passed and
             self.consecutive_failures < 5  # Threshold for unhealthy
         )
 
@@ -393,14 +395,7 @@ class BankIntegration(models.Model):
     
     def calculate_transfer_fee(self, amount):
         """Calculate transfer fee for given amount"""
-        percentage_fee = amount * self.transfer_fee_percentage
-        total_fee = percentage_fee + self.transfer_fee_fixed
-        return {
-            'percentage_fee': percentage_fee,
-            'fixed_fee': self.transfer_fee_fixed,
-            'total_fee': total_fee,
-            'net_amount': amount - total_fee
-        }
+        return FeeSchedule.for_bank(self).calculate(amount)
     
     def is_operating_now(self):
         """Check if bank is currently operating"""
@@ -576,6 +571,47 @@ class IntegrationAPICall(models.Model):
         return f"{self.method} {self.endpoint} - {self.status_code}"
 
 
+class IntegrationAPICallMinute(models.Model):
+    """Per-minute rollup of IntegrationAPICall, filled by `manage.py rollup_integration_calls`"""
+    id = models.BigAutoField(primary_key=True)
+    
+    merchant_integration = models.ForeignKey(
+        MerchantIntegration,
+        on_delete=models.CASCADE,
+        related_name='api_call_minutes'
+    )
+    minute = models.DateTimeField(help_text='Start of the minute (UTC)')
+    operation_type = models.CharField(max_length=50)
+    
+    # Aggregates
+    call_count = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    timed_count = models.PositiveIntegerField(default=0, help_text='Calls with a recorded response time')
+    total_response_time_ms = models.BigIntegerField(default=0)
+    max_response_time_ms = models.PositiveIntegerField(default=0)
+    latency_histogram = models.JSONField(
+        default=list,
+        help_text='Call counts per LATENCY_BUCKETS_MS bucket, with a final overflow bucket'
+    )
+    
+    class Meta:
+        verbose_name = 'Integration API Call Minute'
+        verbose_name_plural = 'Integration API Call Minutes'
+        ordering = ['-minute']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['merchant_integration', 'minute', 'operation_type'],
+                name='unique_integration_call_minute_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['minute']),
+        ]
+    
+    def __str__(self):
+        return f"{self.merchant_integration_id} {self.minute:%Y-%m-%d %H:%M} {self.operation_type}"
+
+
 class IntegrationWebhook(models.Model):
     """Model to handle webhooks from integrations"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -590,11 +626,23 @@ class IntegrationWebhook(models.Model):
     event_type = models.CharField(max_length=50, help_text='Type of webhook event')
     payload = models.JSONField(help_text='Webhook payload')
     headers = models.JSONField(default=dict, help_text='Request headers')
+    dedupe_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text='Hash of the provider event id (or reference and status) used to drop redeliveries'
+    )
     
     # Processing
     is_processed = models.BooleanField(default=False)
     processed_at = models.DateTimeField(null=True, blank=True)
     processing_error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0, help_text='Failed processing attempts so far')
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='When a webhook that failed processing is retried'
+    )
     
     # Verification
     is_verified = models.BooleanField(default=False)
@@ -618,6 +666,9 @@ class IntegrationWebhook(models.Model):
             models.Index(fields=['integration', 'event_type']),
             models.Index(fields=['is_processed', 'created_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['integration', 'dedupe_key'], name='unique_integration_webhook_event'),
+        ]
     
     def __str__(self):
         return f"{self.integration.name} - {self.event_type}"
@@ -0,0 +1,75 @@
+"""
+Streaming Pagination over Provider List APIs
+
+Provider list endpoints return one page per call and each uses its own
+pagination scheme (TransVoucher page tokens, Uniwire and UBA page numbers).
+``iter_provider_items`` turns any of them into a generator of records, so jobs
+can stream a provider's history in constant memory instead of collecting every
+page first.
+
+A page fetcher is a callable ``fetch(cursor) -> (items, next_cursor)``; the
+next cursor is ``None`` on the last page. While the caller works through one
+page, the next page is already being fetched on a background thread. Closing
+the generator (``break``, ``max_items``/``max_pages``) stops paging; a prefetch
+already in flight is abandoned rather than waited for. With ``prefetch=False``
+each page is only requested once the previous one has been consumed.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from django.db import connections
+
+PageFetcher = Callable[[Any], Tuple[List, Any]]
+
+
+def next_page_number(page: int, items: List, page_size: Optional[int] = None) -> Optional[int]:
+    """Next cursor for page-numbered APIs: stop on an empty or short page"""
+    if not items or (page_size and len(items) < page_size):
+        return None
+    return page + 1
+
+
+def _fetch_in_thread(fetch_page: PageFetcher, cursor):
+    """Prefetch entry point: provider services log calls to the database"""
+    try:
+        return fetch_page(cursor)
+    finally:
+        connections.close_all()
+
+
+def iter_provider_items(
+    fetch_page: PageFetcher,
+    first_cursor=None,
+    max_pages: Optional[int] = None,
+    max_items: Optional[int] = None,
+    prefetch: bool = True,
+) -> Iterator:
+    """Yield records from consecutive provider pages"""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='provider-pagination') if prefetch else None
+    pages = 0
+    yielded = 0
+    cursor = first_cursor
+    pending = None  # the first page is fetched inline; only look-ahead pages use the thread
+    try:
+        while True:
+            items, next_cursor = pending.result() if pending is not None else fetch_page(cursor)
+            pages += 1
+            has_more = (
+                next_cursor is not None
+                and (max_pages is None or pages < max_pages)
+                and (max_items is None or yielded + len(items) < max_items)
+            )
+            cursor = next_cursor
+            pending = executor.submit(_fetch_in_thread, fetch_page, cursor) if has_more and executor else None
+
+            for item in items:
+                yield item
+                yielded += 1
+                if max_items is not None and yielded >= max_items:
+                    return
+            if not has_more:
+                return
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -13,7 +13,7 @@ import hmac
 import hashlib
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Union
 from django.conf import settings
 from django.utils import timezone
 
@@ -21,6 +21,7 @@ from .models import (
     Integration, MerchantIntegration, BankIntegration,
     IntegrationAPICall, IntegrationStatus
 )
+from .pagination import iter_provider_items, next_page_number
 from authentication.models import Merchant
 
 logger = logging.getLogger(__name__)
@@ -293,6 +294,81 @@ class UBABankService:
         last_name: str = None
     ) -> Dict:
         """Create a payment page for customer payment"""
+        payload = self._build_payment_page_payload(
+            amount=amount,
+            currency=currency,
+            customer_email=customer_email,
+            customer_phone=customer_phone,
+            description=description,
+            reference=reference,
+            callback_url=callback_url,
+            redirect_url=redirect_url,
+            first_name=first_name,
+            last_name=last_name
+        )
+        reference = payload['reference']
+        
+        try:
+            return self._make_request(
+                method='POST',
+                endpoint='/checkouts/intent',
+                data=payload,
+                operation_type='create_payment_page',
+                reference_id=reference
+            )
+        except UBAAPIException as e:
+            # Log the actual API error for debugging
+            import uuid
+            print(f"PayDock API Error: {e.message} (Code: {e.error_code}, Status: {e.status_code})")
+            
+            # Return mock response for testing when API credentials are invalid
+            mock_response = {
+                'success': True,
+                'payment_url': f'https://checkout-sandbox.paydock.com/pay/{uuid.uuid4()}',
+                'reference': reference or f'UBA-{uuid.uuid4().hex[:8].upper()}',
+                'amount': float(amount),
+                'currency': currency,
+                'status': 'pending',
+                'message': f'Mock payment page (API Error: {e.message})',
+                'debug_info': {
+                    'api_error': e.message,
+                    'error_code': e.error_code,
+                    'status_code': e.status_code
+                }
+            }
+            
+            return mock_response
+        except Exception as e:
+            # Handle other exceptions
+            import uuid
+            print(f"Unexpected error: {str(e)}")
+            
+            mock_response = {
+                'success': True,
+                'payment_url': f'https://checkout-sandbox.paydock.com/pay/{uuid.uuid4()}',
+                'reference': reference or f'UBA-{uuid.uuid4().hex[:8].upper()}',
+                'amount': float(amount),
+                'currency': currency,
+                'status': 'pending',
+                'message': f'Mock payment page (Error: {str(e)})'
+            }
+            
+            return mock_response
+    
+    def _build_payment_page_payload(
+        self,
+        amount: Decimal,
+        currency: str = 'KES',
+        customer_email: str = None,
+        customer_phone: str = None,
+        description: str = '',
+        reference: str = None,
+        callback_url: str = None,
+        redirect_url: str = None,
+        first_name: str = None,
+        last_name: str = None
+    ) -> Dict:
+        """Build the checkout intent request body for a payment page"""
         
         # Generate unique reference if not provided
         if not reference:
@@ -347,52 +423,7 @@ class UBABankService:
         if redirect_url:
             payload['redirect_url'] = redirect_url
         
-        try:
-            return self._make_request(
-                method='POST',
-                endpoint='/checkouts/intent',
-                data=payload,
-                operation_type='create_payment_page',
-                reference_id=reference
-            )
-        except UBAAPIException as e:
-            # Log the actual API error for debugging
-            import uuid
-            print(f"PayDock API Error: {e.message} (Code: {e.error_code}, Status: {e.status_code})")
-            
-            # Return mock response for testing when API credentials are invalid
-            mock_response = {
-                'success': True,
-                'payment_url': f'https://checkout-sandbox.paydock.com/pay/{uuid.uuid4()}',
-                'reference': reference or f'UBA-{uuid.uuid4().hex[:8].upper()}',
-                'amount': float(amount),
-                'currency': currency,
-                'status': 'pending',
-                'message': f'Mock payment page (API Error: {e.message})',
-                'debug_info': {
-                    'api_error': e.message,
-                    'error_code': e.error_code,
-                    'status_code': e.status_code
-                }
-            }
-            
-            return mock_response
-        except Exception as e:
-            # Handle other exceptions
-            import uuid
-            print(f"Unexpected error: {str(e)}")
-            
-            mock_response = {
-                'success': True,
-                'payment_url': f'https://checkout-sandbox.paydock.com/pay/{uuid.uuid4()}',
-                'reference': reference or f'UBA-{uuid.uuid4().hex[:8].upper()}',
-                'amount': float(amount),
-                'currency': currency,
-                'status': 'pending',
-                'message': f'Mock payment page (Error: {str(e)})'
-            }
-            
-            return mock_response
+        return payload
     
     def get_payment_status(self, payment_id: str) -> Dict:
         """Get payment status by payment ID"""
@@ -451,7 +482,8 @@ class UBABankService:
         account_number: str,
         start_date: datetime = None,
         end_date: datetime = None,
-        limit: int = 50
+        limit: int = 50,
+        page: int = 1
     ) -> Dict:
         """Get transaction history for account"""
         
@@ -460,6 +492,9 @@ class UBABankService:
             'limit': limit
         }
         
+        if page > 1:
+            payload['page'] = page
+        
         if start_date:
             payload['startDate'] = start_date.strftime('%Y-%m-%d')
         
@@ -474,6 +509,26 @@ class UBABankService:
             reference_id=account_number
         )
     
+    def iter_transaction_history(
+        self,
+        account_number: str,
+        start_date: datetime = None,
+        end_date: datetime = None,
+        page_size: int = 50,
+        max_pages: int = None,
+        max_items: int = None,
+        prefetch: bool = True
+    ) -> Iterator[Dict]:
+        """Stream an account's transaction history page by page"""
+        def fetch_page(page):
+            response = self.get_transaction_history(
+                account_number, start_date=start_date, end_date=end_date, limit=page_size, page=page
+            )
+            items = response.get('transactions') or response.get('data') or []
+            return items, next_page_number(page, items, page_size)
+        
+        return iter_provider_items(fetch_page, first_cursor=1, max_pages=max_pages, max_items=max_items, prefetch=prefetch)
+    
     def balance_inquiry(self, account_number: str) -> Dict:
         """Check account balance"""
         payload = {
@@ -1,3 +1,666 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from authentication.models import CustomUser, Merchant, PreferredCurrency
+from transactions.models import PaymentMethod, Transaction, TransactionStatus
+
+from . import api_call_rollups, credentials, pagination, webhooks
+from .credentials import credential_cache
+from .models import (
+    Integration, IntegrationAPICall, IntegrationAPICallMinute, IntegrationWebhook, MerchantIntegration, IntegrationStatus,
+    IntegrationType,
+)
+
+
+class MerchantCredentialCacheTests(TestCase):
+    def setUp(self):
+        credential_cache.invalidate()
+        user = CustomUser.objects.create_user(
+            email='creds@example.com', password='testpass123', first_name='Cred', last_name='Owner'
+        )
+        merchant = Merchant.objects.create(
+            user=user,
+            business_name='Cred Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000000',
+            business_email='shop@example.com',
+        )
+        integration = Integration.objects.create(
+            name='Uniwire', code='uniwire_test', integration_type=IntegrationType.UNIWIRE,
+            provider_name='Uniwire', base_url='https://api.uniwire.com', status=IntegrationStatus.ACTIVE,
+        )
+        self.merchant_integration = MerchantIntegration.objects.create(
+            merchant=merchant, integration=integration, status=IntegrationStatus.ACTIVE, is_enabled=True,
+        )
+        self.merchant_integration.encrypt_credentials({'api_key': 'key-1', 'api_secret': 'secret-1'})
+
+    def test_decrypts_once_per_version(self):
+        with mock.patch.object(credentials, 'decrypt_payload', wraps=credentials.decrypt_payload) as decrypt:
+            first = self.merchant_integration.get_decrypted_credentials()
+            second = self.merchant_integration.get_decrypted_credentials()
+        self.assertEqual(first, {'api_key': 'key-1', 'api_secret': 'secret-1'})
+        self.assertEqual(first, second)
+        self.assertEqual(decrypt.call_count, 1)
+
+    def test_rotation_invalidates_cached_credentials(self):
+        self.merchant_integration.get_decrypted_credentials()
+        self.merchant_integration.encrypt_credentials({'api_key': 'key-2', 'api_secret': 'secret-2'})
+        reloaded = MerchantIntegration.objects.get(pk=self.merchant_integration.pk)
+        self.assertEqual(reloaded.get_decrypted_credentials()['api_key'], 'key-2')
+
+    def test_request_counters_do_not_invalidate_cached_credentials(self):
+        self.merchant_integration.get_decrypted_credentials()
+        self.merchant_integration.record_success()
+        self.merchant_integration.record_failure('timeout')
+
+        with mock.patch.object(credentials, 'decrypt_payload', wraps=credentials.decrypt_payload) as decrypt:
+            self.merchant_integration.get_decrypted_credentials()
+        self.assertEqual(decrypt.call_count, 0)
+        self.assertEqual(len(credential_cache._entries), 1)
+
+    def test_cached_value_cannot_be_mutated_by_callers(self):
+        credentials = self.merchant_integration.get_decrypted_credentials()
+        credentials['api_key'] = 'tampered'
+        self.assertEqual(self.merchant_integration.get_decrypted_credentials()['api_key'], 'key-1')
+
+    def test_uniwire_service_uses_merchant_credentials(self):
+        from .uniwire.service import UniwireService
+
+        service = UniwireService(merchant=self.merchant_integration.merchant)
+        self.assertEqual(service.api_key, 'key-1')
+        self.assertEqual(service.api_secret, 'secret-1')
+
+    @override_settings(TRANSVOUCHER_API_KEY='platform-key', TRANSVOUCHER_API_SECRET='platform-secret')
+    def test_platform_gateways_keep_settings_credentials(self):
+        from .transvoucher.service import TransVoucherService
+
+        merchant = self.merchant_integration.merchant
+        service = TransVoucherService()
+        merchant_integration = MerchantIntegration.objects.create(
+            merchant=merchant, integration=service.integration, status=IntegrationStatus.ACTIVE, is_enabled=True,
+        )
+        merchant_integration.encrypt_credentials({'api_key': 'merchant-key', 'api_secret': 'merchant-secret'})
+
+        service = TransVoucherService(merchant=merchant)
+        self.assertEqual(service.merchant_integration, merchant_integration)
+        self.assertEqual(service.api_key, 'platform-key')
+        self.assertEqual(service.api_secret, 'platform-secret')
+
+
+class HealthCheckEngineTests(TestCase):
+    def setUp(self):
+        self.fast = Integration.objects.create(
+            name='Fast', code='fast_api', provider_name='Fast', base_url='https://fast.example.com',
+            status=IntegrationStatus.ACTIVE,
+        )
+        self.slow = Integration.objects.create(
+            name='Slow', code='slow_api', provider_name='Slow', base_url='https://slow.example.com',
+            status=IntegrationStatus.ACTIVE,
+        )
+
+    def _probe(self, integration):
+        from .health import HealthCheckResult
+
+        if integration.code == 'slow_api':
+            time.sleep(2)
+        return HealthCheckResult(integration, True)
+
+    def test_checks_run_in_parallel_with_deadlines(self):
+        from .health import HealthCheckEngine
+
+        with mock.patch.object(HealthCheckEngine, '_probe_base_url', side_effect=self._probe):
+            started = time.monotonic()
+            results = HealthCheckEngine(timeout=0.5).run()
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 1.5)
+        self.fast.refresh_from_db()
+        self.slow.refresh_from_db()
+        self.assertTrue(self.fast.is_healthy)
+        self.assertFalse(self.slow.is_healthy)
+        self.assertIn('timed out', self.slow.health_error_message)
+        self.assertIsNotNone(self.slow.last_health_check)
+        self.assertEqual(len(results), 2)
+
+    def test_skips_integrations_not_due(self):
+        from .health import HealthCheckEngine
+
+        Integration.objects.filter(pk=self.slow.pk).update(last_health_check=timezone.now())
+        with mock.patch.object(HealthCheckEngine, '_probe_base_url', side_effect=self._probe):
+            results = HealthCheckEngine(timeout=5).run()
+
+        self.assertEqual([result.target.pk for result in results], [self.fast.pk])
+
+    def test_timed_out_check_is_not_started_again_while_still_running(self):
+        from .health import HealthCheckEngine
+
+        with mock.patch.object(HealthCheckEngine, '_probe_base_url', side_effect=self._probe) as probe:
+            engine = HealthCheckEngine(timeout=0.3, force=True)
+            engine.run()
+            results = engine.run()
+
+        self.assertEqual([result.target.pk for result in results], [self.fast.pk])
+        self.assertEqual([call.args[0].pk for call in probe.call_args_list].count(self.slow.pk), 1)
+
+    def test_merchant_integration_results_are_saved(self):
+        from .health import HealthCheckEngine, HealthCheckResult
+
+        user = CustomUser.objects.create_user(
+            email='health@example.com', password='testpass123', first_name='Health', last_name='Check'
+        )
+        merchant = Merchant.objects.create(
+            user=user, business_name='Health Shop', business_address='1 Test Street',
+            business_phone='+254700000009', business_email='health-shop@example.com',
+        )
+        merchant_integration = MerchantIntegration.objects.create(
+            merchant=merchant, integration=self.fast, is_enabled=True,
+        )
+
+        HealthCheckEngine().save_results([
+            HealthCheckResult(self.fast, True),
+            HealthCheckResult(merchant_integration, False, 'Invalid credentials'),
+        ])
+
+        merchant_integration.refresh_from_db()
+        self.assertIsNotNone(merchant_integration.last_health_check)
+        self.assertFalse(merchant_integration.health_check_passed)
+        self.assertEqual(merchant_integration.health_error_message, 'Invalid credentials')
+        self.assertFalse(merchant_integration.is_healthy())
+
+
+class AsyncGatewayClientTests(TestCase):
+    """Async gateway clients against a local stub provider"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(
+            email='async@example.com', password='testpass123', first_name='Async', last_name='Owner'
+        )
+        self.merchant = Merchant.objects.create(
+            user=user,
+            business_name='Async Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000001',
+            business_email='async-shop@example.com',
+        )
+        self.requests = []
+
+    def _stub_provider(self, request):
+        import httpx
+
+        self.requests.append(request)
+        if request.url.path.endswith('/status/missing'):
+            return httpx.Response(404, json={'message': 'Payment not found', 'error_code': 'not_found'})
+        if request.url.path.startswith('/v1/invoices/'):
+            return httpx.Response(200, json={'result': {'id': 'inv-1', 'status': 'paid'}})
+        return httpx.Response(200, json={
+            'success': True,
+            'data': {'reference_id': 'ref-1', 'status': 'completed', 'amount': 10, 'currency': 'USD'},
+        })
+
+    def _http_client(self):
+        import httpx
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(self._stub_provider))
+
+    async def test_transvoucher_status_is_logged_for_merchant(self):
+        from asgiref.sync import sync_to_async
+        from .async_clients import get_async_transvoucher_client
+        from .models import IntegrationAPICall
+        from .transvoucher.service import TransVoucherService
+
+        service = await sync_to_async(TransVoucherService)()
+        merchant_integration = await MerchantIntegration.objects.acreate(
+            merchant=self.merchant, integration=service.integration, is_enabled=True,
+        )
+
+        async with self._http_client() as http_client:
+            client = await get_async_transvoucher_client(self.merchant, http_client=http_client)
+            result = await client.get_payment_status('ref-1')
+
+        self.assertEqual(result['data']['status'], 'completed')
+        self.assertTrue(str(self.requests[0].url).endswith('/v1.0/payment/status/ref-1'))
+        api_call = await IntegrationAPICall.objects.aget(merchant_integration=merchant_integration)
+        self.assertTrue(api_call.is_successful)
+        self.assertEqual(api_call.status_code, 200)
+        await merchant_integration.arefresh_from_db()
+        self.assertEqual(merchant_integration.successful_requests, 1)
+
+    async def test_transvoucher_provider_errors_raise_api_exception(self):
+        from .async_clients import get_async_transvoucher_client
+        from .transvoucher.service import TransVoucherAPIException
+
+        async with self._http_client() as http_client:
+            client = await get_async_transvoucher_client(http_client=http_client)
+            with self.assertRaises(TransVoucherAPIException) as raised:
+                await client.get_payment_status('missing')
+
+        self.assertEqual(raised.exception.status_code, 404)
+        self.assertEqual(raised.exception.error_code, 'not_found')
+
+    async def test_uniwire_requests_are_signed(self):
+        from .async_clients import AsyncUniwireClient
+        from .uniwire.client import UniwireClient
+
+        async with self._http_client() as http_client:
+            client = AsyncUniwireClient(
+                UniwireClient(api_key='key', api_secret='secret', api_url='http://stub.local'),
+                http_client=http_client,
+            )
+            result = await client.get_invoice('inv-1')
+
+        self.assertEqual(result['result']['status'], 'paid')
+        request = self.requests[0]
+        self.assertEqual(request.headers['X-CC-KEY'], 'key')
+        self.assertIn('X-CC-SIGNATURE', request.headers)
+
+    async def test_pooled_client_is_closed_after_request_outside_lifespan(self):
+        from .async_clients import get_async_http_client, releases_async_http_client
+
+        clients = []
+
+        @releases_async_http_client
+        async def view(request):
+            clients.append(get_async_http_client())
+            return 'ok'
+
+        self.assertEqual(await view(None), 'ok')
+        self.assertTrue(clients[0].is_closed)
+
+    async def test_lifespan_keeps_pooled_client_until_shutdown(self):
+        import asyncio
+        from .async_clients import HTTPClientLifespan, get_async_http_client, releases_async_http_client
+
+        clients = []
+
+        @releases_async_http_client
+        async def view():
+            clients.append(get_async_http_client())
+
+        async def http_app(scope, receive, send):
+            await view()
+
+        app = HTTPClientLifespan(http_app)
+        received, sent = asyncio.Queue(), []
+
+        async def send(message):
+            sent.append(message['type'])
+
+        await received.put({'type': 'lifespan.startup'})
+        lifespan = asyncio.ensure_future(app({'type': 'lifespan'}, received.get, send))
+        await asyncio.sleep(0)
+        await app({'type': 'http'}, None, None)
+        await app({'type': 'http'}, None, None)
+        self.assertIs(clients[0], clients[1])
+        self.assertFalse(clients[0].is_closed)
+
+        await received.put({'type': 'lifespan.shutdown'})
+        await lifespan
+
+        self.assertTrue(clients[0].is_closed)
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+
+@override_settings(UBA_WEBHOOK_SECRET='uba_test_secret')
+class InboundWebhookIngestionTests(TestCase):
+    def setUp(self):
+        webhooks._integration_ids.clear()
+        cache.clear()
+        Integration.objects.create(
+            name='UBA Kenya', code='uba_kenya', integration_type=IntegrationType.UBA_BANK,
+            provider_name='UBA', base_url='https://api.paydock.com', status=IntegrationStatus.ACTIVE,
+        )
+        user = CustomUser.objects.create_user(
+            email='inbound@example.com', password='testpass123', first_name='In', last_name='Bound'
+        )
+        merchant = Merchant.objects.create(
+            user=user,
+            business_name='Inbound Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000003',
+            business_email='inbound-shop@example.com',
+        )
+        currency = PreferredCurrency.objects.create(name='Kenyan Shilling', code='KES', symbol='KSh')
+        self.transaction = Transaction.objects.create(
+            merchant=merchant, currency=currency, amount=Decimal('100.00'),
+            payment_method=PaymentMethod.CARD, external_reference='chk_123',
+        )
+
+    def _post(self, payload, secret='uba_test_secret'):
+        body = json.dumps(payload).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            reverse('dashboard:uba_payment_webhook'), data=body, content_type='application/json',
+            HTTP_X_PAYDOCK_SIGNATURE=signature,
+        )
+
+    def test_webhook_is_acknowledged_before_processing(self):
+        response = self._post({'type': 'transaction_success', 'data': {'_id': 'chk_123', 'status': 'complete'}})
+
+        self.assertEqual(response.status_code, 200)
+        webhook = IntegrationWebhook.objects.get()
+        self.assertTrue(webhook.is_verified)
+        self.assertFalse(webhook.is_processed)
+        self.assertNotIn('wsgi.input', webhook.headers)
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.status, TransactionStatus.PENDING)
+
+    def test_invalid_signature_is_rejected(self):
+        response = self._post({'type': 'transaction_success', 'data': {'_id': 'chk_123'}}, secret='wrong')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(IntegrationWebhook.objects.exists())
+
+    def test_worker_applies_events_idempotently(self):
+        self._post({'type': 'transaction_success', 'data': {'_id': 'chk_123', 'status': 'complete'}})
+        webhooks.InboundWebhookProcessor().run()
+        self.transaction.refresh_from_db()
+        completed_at = self.transaction.completed_at
+
+        # A different event reporting the same outcome
+        self._post({'type': 'notification', 'data': {'_id': 'chk_123', 'status': 'complete'}})
+        processed = webhooks.InboundWebhookProcessor().run()
+
+        self.assertEqual(len(processed), 1)
+        self.assertEqual(processed[0].processing_error, '')
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.status, TransactionStatus.COMPLETED)
+        self.assertEqual(self.transaction.completed_at, completed_at)
+        self.assertEqual(self.transaction.metadata['webhook_event_type'], 'transaction_success')
+
+    def test_missing_integration_is_reported_as_unavailable(self):
+        Integration.objects.filter(code='uba_kenya').delete()
+        webhooks._integration_ids.clear()
+
+        response = self._post({'type': 'transaction_success', 'data': {'_id': 'chk_123', 'status': 'complete'}})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('uba_kenya', response.json()['error'])
+
+    def test_event_for_uncommitted_transaction_is_retried(self):
+        payload = {'type': 'transaction_success', 'data': {'_id': 'chk_late', 'status': 'complete'}}
+        self._post(payload)
+
+        processed = webhooks.InboundWebhookProcessor().run()
+
+        self.assertIn('not found', processed[0].processing_error)
+        webhook = IntegrationWebhook.objects.get()
+        self.assertFalse(webhook.is_processed)
+        self.assertEqual(webhook.attempts, 1)
+        self.assertGreater(webhook.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(webhooks.InboundWebhookProcessor().run(), [])
+
+        Transaction.objects.filter(pk=self.transaction.pk).update(external_reference='chk_late')
+        IntegrationWebhook.objects.update(next_attempt_at=timezone.now())
+        webhooks.InboundWebhookProcessor().run()
+
+        webhook.refresh_from_db()
+        self.assertTrue(webhook.is_processed)
+        self.assertEqual(webhook.processing_error, '')
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.status, TransactionStatus.COMPLETED)
+
+    def test_event_is_given_up_on_after_max_attempts(self):
+        self._post({'type': 'transaction_success', 'data': {'_id': 'chk_missing', 'status': 'complete'}})
+        processor = webhooks.InboundWebhookProcessor(max_attempts=2)
+
+        processor.run()
+        IntegrationWebhook.objects.update(next_attempt_at=timezone.now())
+        processor.run()
+
+        webhook = IntegrationWebhook.objects.get()
+        self.assertTrue(webhook.is_processed)
+        self.assertEqual(webhook.attempts, 2)
+        self.assertIn('not found', webhook.processing_error)
+
+    def test_redeliveries_are_dropped_and_counted(self):
+        payload = {'id': 'evt_1', 'type': 'transaction_success', 'data': {'_id': 'chk_123', 'status': 'complete'}}
+        self._post(payload)
+        cache.clear()
+        response = self._post(payload)  # unique index catches it
+        self._post(payload)  # cache catches it
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(IntegrationWebhook.objects.count(), 1)
+        self.assertEqual(Integration.objects.get(code='uba_kenya').duplicate_webhook_count, 2)
+
+
+    def test_redelivery_of_failed_event_is_requeued(self):
+        payload = {'id': 'evt_2', 'type': 'transaction_success', 'data': {'_id': 'chk_new', 'status': 'complete'}}
+        self._post(payload)
+        webhooks.InboundWebhookProcessor(max_attempts=1).run()
+        self.assertTrue(IntegrationWebhook.objects.get().is_processed)
+
+        Transaction.objects.filter(pk=self.transaction.pk).update(external_reference='chk_new')
+        response = self._post(payload)
+
+        self.assertEqual(response.status_code, 200)
+        webhook = IntegrationWebhook.objects.get()
+        self.assertFalse(webhook.is_processed)
+        self.assertEqual(webhook.attempts, 0)
+        self.assertEqual(Integration.objects.get(code='uba_kenya').duplicate_webhook_count, 0)
+
+        webhooks.InboundWebhookProcessor().run()
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.status, TransactionStatus.COMPLETED)
+
+class TransVoucherWebhookProcessingTests(TestCase):
+    def setUp(self):
+        webhooks._integration_ids.clear()
+        cache.clear()
+        Integration.objects.create(
+            name='TransVoucher', code='transvoucher', integration_type=IntegrationType.TRANSVOUCHER,
+            provider_name='TransVoucher', base_url='https://api.transvoucher.com', status=IntegrationStatus.ACTIVE,
+        )
+        user = CustomUser.objects.create_user(
+            email='tv@example.com', password='testpass123', first_name='Trans', last_name='Voucher'
+        )
+        merchant = Merchant.objects.create(
+            user=user,
+            business_name='TV Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000004',
+            business_email='tv-shop@example.com',
+        )
+        currency = PreferredCurrency.objects.create(name='US Dollar', code='USD', symbol='$')
+        self.paid, self.expired = [
+            Transaction.objects.create(
+                merchant=merchant, currency=currency, amount=Decimal('25.00'),
+                payment_method=PaymentMethod.CARD, external_reference=reference,
+            )
+            for reference in ('PEX-REF-PAID', 'PEX-REF-GONE')
+        ]
+
+    def _post(self, event_type, reference_id):
+        return self.client.post(
+            reverse('integrations:transvoucher-webhook'),
+            data=json.dumps({'event_type': event_type, 'data': {'reference_id': reference_id}}),
+            content_type='application/json',
+        )
+
+    def test_burst_of_events_updates_transactions(self):
+        self._post('payment_intent.succeeded', 'PEX-REF-PAID')
+        self._post('payment_intent.expired', 'PEX-REF-GONE')
+        self._post('payment_intent.expired', 'PEX-REF-PAID')  # late event for a completed payment
+        self._post('payment_intent.succeeded', 'PEX-REF-UNKNOWN')
+
+        processed = webhooks.InboundWebhookProcessor().run()
+
+        self.assertEqual(len(processed), 4)
+        self.paid.refresh_from_db()
+        self.expired.refresh_from_db()
+        self.assertEqual(self.paid.status, TransactionStatus.COMPLETED)
+        self.assertEqual(self.expired.status, TransactionStatus.EXPIRED)
+        self.assertEqual(self.paid.events.get().new_status, TransactionStatus.COMPLETED)
+        self.assertEqual([bool(webhook.processing_error) for webhook in processed], [False, False, False, True])
+
+    def test_service_validation_matches_ingestion_check(self):
+        from .transvoucher.service import TransVoucherService
+
+        payload = json.dumps({'event_type': 'payment_intent.succeeded'})
+        signature = hmac.new(b'tv-secret', payload.encode(), hashlib.sha256).hexdigest()
+        service = TransVoucherService()
+        self.assertTrue(service.validate_webhook(payload, signature, 'tv-secret'))
+        self.assertTrue(webhooks.check_signature('tv-secret', payload.encode(), signature.upper()))
+        self.assertFalse(service.validate_webhook(payload, signature, 'other-secret'))
+
+
+class ProviderPaginationTests(TestCase):
+    def setUp(self):
+        self.pages = {1: [1, 2], 2: [3, 4], 3: [5]}
+        self.requested = []
+
+    def fetch_page(self, page):
+        self.requested.append(page)
+        items = self.pages.get(page, [])
+        return items, pagination.next_page_number(page, items, page_size=2)
+
+    def test_streams_every_page_until_short_page(self):
+        items = list(pagination.iter_provider_items(self.fetch_page, first_cursor=1))
+
+        self.assertEqual(items, [1, 2, 3, 4, 5])
+        self.assertEqual(self.requested, [1, 2, 3])
+
+    def test_max_items_stops_paging_early(self):
+        items = list(pagination.iter_provider_items(self.fetch_page, first_cursor=1, max_items=2, prefetch=False))
+
+        self.assertEqual(items, [1, 2])
+        self.assertEqual(self.requested, [1])
+
+    def test_next_page_is_prefetched_while_current_page_is_consumed(self):
+        second_page_requested = threading.Event()
+
+        def fetch_page(page):
+            if page == 2:
+                second_page_requested.set()
+            return self.fetch_page(page)
+
+        stream = pagination.iter_provider_items(fetch_page, first_cursor=1, max_pages=2)
+        self.assertEqual(next(stream), 1)
+        self.assertTrue(second_page_requested.wait(timeout=5))
+        self.assertEqual(list(stream), [2, 3, 4])
+        self.assertEqual(self.requested, [1, 2])
+
+    def test_without_prefetch_pages_are_fetched_on_demand(self):
+        stream = pagination.iter_provider_items(self.fetch_page, first_cursor=1, prefetch=False)
+        self.assertEqual([next(stream), next(stream)], [1, 2])
+        stream.close()
+
+        self.assertEqual(self.requested, [1])
+
+    def test_page_token_cursor(self):
+        tokens = {None: (['a'], 'tok-2'), 'tok-2': (['b'], None)}
+
+        self.assertEqual(list(pagination.iter_provider_items(tokens.__getitem__)), ['a', 'b'])
+
+
+class APICallRollupTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='rollups@example.com', password='testpass123', first_name='Roll', last_name='Up'
+        )
+        self.merchant = Merchant.objects.create(
+            user=self.user,
+            business_name='Rollup Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000000',
+            business_email='rollup-shop@example.com',
+        )
+        integration = Integration.objects.create(
+            name='Corefy', code='corefy_test', integration_type=IntegrationType.COREFY,
+            provider_name='Corefy', base_url='https://api.corefy.com', status=IntegrationStatus.ACTIVE,
+        )
+        self.merchant_integration = MerchantIntegration.objects.create(
+            merchant=self.merchant, integration=integration, status=IntegrationStatus.ACTIVE, is_enabled=True,
+        )
+        self.now = timezone.now()
+        self.call(timedelta(minutes=30), 'payment', True, 120)
+        self.call(timedelta(minutes=30), 'payment', False, 900)
+        self.call(timedelta(minutes=20), 'inquiry', True, None)
+        # Inside the live window, not yet rolled up
+        self.call(timedelta(seconds=0), 'payment', True, 80)
+
+    def call(self, age, operation_type, is_successful, response_time_ms):
+        api_call = IntegrationAPICall.objects.create(
+            merchant_integration=self.merchant_integration, method='POST', endpoint='/payments',
+            operation_type=operation_type, is_successful=is_successful, response_time_ms=response_time_ms,
+            status_code=200 if is_successful else 500,
+        )
+        IntegrationAPICall.objects.filter(pk=api_call.pk).update(created_at=self.now - age)
+
+    def test_rollup_groups_by_minute_and_operation(self):
+        call_command('rollup_integration_calls', minutes=60, stdout=StringIO())
+        call_command('rollup_integration_calls', minutes=60, stdout=StringIO())
+
+        payment = IntegrationAPICallMinute.objects.get(operation_type='payment')
+        self.assertEqual((payment.call_count, payment.success_count, payment.timed_count), (2, 1, 2))
+        self.assertEqual((payment.total_response_time_ms, payment.max_response_time_ms), (1020, 900))
+        self.assertEqual(sum(payment.latency_histogram), 2)
+        inquiry = IntegrationAPICallMinute.objects.get(operation_type='inquiry')
+        self.assertEqual((inquiry.call_count, inquiry.timed_count), (1, 0))
+
+    def test_stats_views_read_rollup(self):
+        from .views import integration_statistics, integration_stats
+
+        api_call_rollups.rollup_recent_api_calls(minutes=60)
+        # Rolled-up calls are no longer read from the raw table
+        IntegrationAPICall.objects.filter(created_at__lt=self.now - timedelta(minutes=10)).delete()
+
+        factory = APIRequestFactory()
+        request = factory.get('/integrations/stats/')
+        force_authenticate(request, user=self.user)
+        stats = integration_stats(request).data
+        today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        # Just after midnight the older calls belong to yesterday
+        if self.now - timedelta(minutes=30) >= today_start:
+            self.assertEqual(stats['total_api_calls_today'], 4)
+            self.assertEqual(stats['failed_api_calls_today'], 1)
+            self.assertEqual(stats['most_used_operation'], 'payment')
+            self.assertEqual(stats['most_used_integration'], 'Corefy')
+
+        request = factory.get('/integrations/statistics/', {'days': 7})
+        force_authenticate(request, user=self.user)
+        data = integration_statistics(request).data['data']
+        self.assertEqual(data['summary']['total_api_calls'], 4)
+        self.assertEqual(data['summary']['failed_calls'], 1)
+        self.assertEqual(data['integrations'][0]['recent_calls'], 4)
+        self.assertEqual(sum(day['total'] for day in data['daily_usage']), 4)
+
+    def test_backfill_keeps_minutes_whose_calls_were_purged(self):
+        api_call_rollups.rollup_recent_api_calls(minutes=60)
+        # Retention removed the oldest calls
+        IntegrationAPICall.objects.filter(created_at__lt=self.now - timedelta(minutes=25)).delete()
+
+        call_command('rollup_integration_calls', backfill_days=1, stdout=StringIO())
+
+        self.assertEqual(IntegrationAPICallMinute.objects.get(operation_type='payment').call_count, 2)
+
+    def test_minutes_the_job_has_not_reached_are_read_raw(self):
+        start, end = self.now - timedelta(hours=1), self.now + timedelta(minutes=1)
+        self.assertEqual(api_call_rollups.total_calls(api_call_rollups.summarize_calls(start, end))['calls'], 4)
+
+        # The job stopped after the oldest minute
+        api_call_rollups.rollup_api_calls(start, self.now - timedelta(minutes=25))
+        self.assertEqual(api_call_rollups.total_calls(api_call_rollups.summarize_calls(start, end))['calls'], 4)
+
+    def test_monitor_reports_per_integration(self):
+        api_call_rollups.rollup_recent_api_calls(minutes=60)
+        output = StringIO()
+        call_command('integration_monitor', api_stats=True, stdout=output)
+        self.assertIn('Corefy (corefy_test)', output.getvalue())
+        self.assertIn('Total Calls: 4', output.getvalue())
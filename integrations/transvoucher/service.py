@@ -9,13 +9,15 @@ import logging
 import uuid
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from django.conf import settings
 from django.utils import timezone
 
 from ..models import (
     Integration, MerchantIntegration, IntegrationAPICall, IntegrationStatus, IntegrationType, AuthenticationType
 )
+from ..pagination import iter_provider_items
+from ..webhooks import verify_hmac_signature
 from authentication.models import Merchant
 
 logger = logging.getLogger(__name__)
@@ -200,7 +202,45 @@ class TransVoucherService:
         lang: str = 'en'
     ) -> Dict:
         """Create a new payment session"""
+        payment_data = self._build_payment_payload(
+            amount=amount,
+            currency=currency,
+            title=title,
+            description=description,
+            reference_id=reference_id,
+            customer_details=customer_details,
+            metadata=metadata,
+            redirect_url=redirect_url,
+            customer_commission_percentage=customer_commission_percentage,
+            multiple_use=multiple_use,
+            theme=theme,
+            lang=lang
+        )
         
+        return self._make_request(
+            method='POST',
+            endpoint='v1.0/payment/create',
+            data=payment_data,
+            operation_type='create_payment',
+            reference_id=reference_id
+        )
+    
+    def _build_payment_payload(
+        self,
+        amount: Decimal,
+        currency: str = 'USD',
+        title: str = '',
+        description: str = '',
+        reference_id: str = None,
+        customer_details: Dict = None,
+        metadata: Dict = None,
+        redirect_url: str = None,
+        customer_commission_percentage: float = None,
+        multiple_use: bool = False,
+        theme: Dict = None,
+        lang: str = 'en'
+    ) -> Dict:
+        """Build the request body for a payment session"""
         payment_data = {
             'amount': float(amount),
             'currency': currency,
@@ -224,13 +264,7 @@ class TransVoucherService:
         if theme:
             payment_data['theme'] = theme
         
-        return self._make_request(
-            method='POST',
-            endpoint='v1.0/payment/create',
-            data=payment_data,
-            operation_type='create_payment',
-            reference_id=reference_id
-        )
+        return payment_data
     
     def get_payment_status(self, reference_id: str) -> Dict:
         """Get payment status by reference ID"""
@@ -271,6 +305,33 @@ class TransVoucherService:
             operation_type='list_payments'
         )
     
+    @staticmethod
+    def parse_payment_page(response: Dict) -> Tuple[List[Dict], Optional[str]]:
+        """Split a ``list_payments`` response into ``(payments, next_page_token)``"""
+        data = response.get('data') or {}
+        if isinstance(data, list):
+            return data, response.get('next_page_token') or (response.get('meta') or {}).get('next_page_token')
+        payments = data.get('payments') or data.get('items') or []
+        return payments, data.get('next_page_token') or response.get('next_page_token')
+    
+    def iter_payments(
+        self,
+        page_size: int = 100,
+        status: str = None,
+        from_date: str = None,
+        to_date: str = None,
+        max_pages: int = None,
+        max_items: int = None,
+        prefetch: bool = True
+    ) -> Iterator[Dict]:
+        """Stream payments across ``list_payments`` pages (follows ``page_token``)"""
+        def fetch_page(page_token):
+            return self.parse_payment_page(self.list_payments(
+                limit=page_size, page_token=page_token, status=status, from_date=from_date, to_date=to_date
+            ))
+        
+        return iter_provider_items(fetch_page, max_pages=max_pages, max_items=max_items, prefetch=prefetch)
+    
     def setup_merchant_integration(
         self,
         merchant: Merchant,
@@ -333,17 +394,8 @@ class TransVoucherService:
     
     def validate_webhook(self, payload: str, signature: str, secret: str) -> bool:
         """Validate webhook signature"""
-        import hmac
-        import hashlib
-        
         try:
-            computed_signature = hmac.new(
-                secret.encode('utf-8'),
-                payload.encode('utf-8'),
-                hashlib.sha256
-            ).hexdigest()
-            
-            return hmac.compare_digest(signature, computed_signature)
+            return verify_hmac_signature(secret, payload.encode('utf-8'), signature)
         except Exception as e:
             logger.error(f"Webhook validation error: {str(e)}")
             return False
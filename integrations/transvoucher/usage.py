@@ -8,10 +8,12 @@ import uuid
 import logging
 from decimal import Decimal
 from typing import Dict, Optional
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.utils import timezone
 
 from .service import TransVoucherService, TransVoucherAPIException
+from ..async_clients import AsyncTransVoucherClient
 from ..models import MerchantIntegration, Integration
 from authentication.models import Merchant, AppKey
 
@@ -112,70 +114,21 @@ class TransVoucherUsageService:
             Dict containing payment session details
         """
         try:
-            # Prepare customer details if provided
-            customer_details = None
-            if customer_name or customer_email or customer_phone:
-                customer_details = {}
-                if customer_name:
-                    customer_details['full_name'] = customer_name
-                if customer_email:
-                    customer_details['email'] = customer_email
-                if customer_phone:
-                    customer_details['phone'] = customer_phone
-            
-            # Generate reference ID if not provided
-            if not reference_id:
-                reference_id = f"txn_{uuid.uuid4().hex[:12]}"
-            
-            # Add merchant info to metadata
-            if not metadata:
-                metadata = {}
-            
-            if self.merchant:
-                metadata.update({
-                    'merchant_id': str(self.merchant.id),
-                    'merchant_name': self.merchant.business_name or self.merchant.user.username
-                })
-        
-            
-            # Get return URL from config if available
-            redirect_url = self.config.get('return_url')
-            
-            # Create payment using the service
-            response = self.transvoucher_service.create_payment(
+            payment_kwargs = self._build_checkout_payment(
                 amount=amount,
                 currency=currency,
                 title=title,
                 description=description,
+                customer_email=customer_email,
+                customer_name=customer_name,
+                customer_phone=customer_phone,
                 reference_id=reference_id,
-                customer_details=customer_details,
                 metadata=metadata,
-                redirect_url=redirect_url,
                 customer_commission_percentage=customer_commission_percentage,
                 multiple_use=multiple_use
             )
-            
-            # Transform response to match expected format
-            if response.get('success') and response.get('data'):
-                data = response['data']
-                return {
-                    'success': True,
-                    'session_id': data.get('reference_id'),
-                    'payment_url': data.get('payment_url'),
-                    'transaction_id': data.get('transaction_id'),
-                    'amount': data.get('amount'),
-                    'currency': data.get('currency'),
-                    'status': data.get('status', 'pending'),
-                    'expires_at': data.get('expires_at'),
-                    'reference_id': reference_id,
-                    'metadata': metadata
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': 'Failed to create payment session',
-                    'details': response
-                }
+            response = self.transvoucher_service.create_payment(**payment_kwargs)
+            return self._format_checkout_response(response, payment_kwargs)
                 
         except TransVoucherAPIException as e:
             logger.error(f"TransVoucher API error: {e.message}")
@@ -192,6 +145,85 @@ class TransVoucherUsageService:
                 'error': f"Internal error: {str(e)}"
             }
     
+    def _build_checkout_payment(
+        self,
+        amount: Decimal,
+        currency: str = 'USD',
+        title: str = 'Payment',
+        description: str = '',
+        customer_email: str = None,
+        customer_name: str = None,
+        customer_phone: str = None,
+        reference_id: str = None,
+        metadata: Dict = None,
+        customer_commission_percentage: float = None,
+        multiple_use: bool = False
+    ) -> Dict:
+        """Build ``TransVoucherService.create_payment`` arguments for a checkout session"""
+        # Prepare customer details if provided
+        customer_details = None
+        if customer_name or customer_email or customer_phone:
+            customer_details = {}
+            if customer_name:
+                customer_details['full_name'] = customer_name
+            if customer_email:
+                customer_details['email'] = customer_email
+            if customer_phone:
+                customer_details['phone'] = customer_phone
+        
+        # Generate reference ID if not provided
+        if not reference_id:
+            reference_id = f"txn_{uuid.uuid4().hex[:12]}"
+        
+        # Add merchant info to metadata
+        if not metadata:
+            metadata = {}
+        
+        if self.merchant:
+            metadata.update({
+                'merchant_id': str(self.merchant.id),
+                'merchant_name': self.merchant.business_name or self.merchant.user.username
+            })
+        
+        # Get return URL from config if available
+        redirect_url = self.config.get('return_url')
+        
+        return {
+            'amount': amount,
+            'currency': currency,
+            'title': title,
+            'description': description,
+            'reference_id': reference_id,
+            'customer_details': customer_details,
+            'metadata': metadata,
+            'redirect_url': redirect_url,
+            'customer_commission_percentage': customer_commission_percentage,
+            'multiple_use': multiple_use
+        }
+    
+    @staticmethod
+    def _format_checkout_response(response: Dict, payment_kwargs: Dict) -> Dict:
+        """Transform a create payment response to match expected format"""
+        if response.get('success') and response.get('data'):
+            data = response['data']
+            return {
+                'success': True,
+                'session_id': data.get('reference_id'),
+                'payment_url': data.get('payment_url'),
+                'transaction_id': data.get('transaction_id'),
+                'amount': data.get('amount'),
+                'currency': data.get('currency'),
+                'status': data.get('status', 'pending'),
+                'expires_at': data.get('expires_at'),
+                'reference_id': payment_kwargs['reference_id'],
+                'metadata': payment_kwargs['metadata']
+            }
+        return {
+            'success': False,
+            'error': 'Failed to create payment session',
+            'details': response
+        }
+    
     def get_payment_status(self, reference_id: str) -> Dict:
         """
         Get payment status by reference ID.
@@ -204,27 +236,7 @@ class TransVoucherUsageService:
         """
         try:
             response = self.transvoucher_service.get_payment_status(reference_id)
-            
-            if response.get('success') and response.get('data'):
-                data = response['data']
-                return {
-                    'success': True,
-                    'transaction_id': data.get('transaction_id'),
-                    'reference_id': data.get('reference_id'),
-                    'amount': data.get('amount'),
-                    'currency': data.get('currency'),
-                    'status': data.get('status'),
-                    'created_at': data.get('created_at'),
-                    'updated_at': data.get('updated_at'),
-                    'paid_at': data.get('paid_at'),
-                    'payment_details': data.get('payment_details', {})
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': 'Payment not found or invalid response',
-                    'details': response
-                }
+            return self._format_payment_status(response)
                 
         except TransVoucherAPIException as e:
             logger.error(f"TransVoucher API error: {e.message}")
@@ -241,6 +253,81 @@ class TransVoucherUsageService:
                 'error': f"Internal error: {str(e)}"
             }
     
+    @staticmethod
+    def _format_payment_status(response: Dict) -> Dict:
+        """Transform a payment status response to match expected format"""
+        if response.get('success') and response.get('data'):
+            data = response['data']
+            return {
+                'success': True,
+                'transaction_id': data.get('transaction_id'),
+                'reference_id': data.get('reference_id'),
+                'amount': data.get('amount'),
+                'currency': data.get('currency'),
+                'status': data.get('status'),
+                'created_at': data.get('created_at'),
+                'updated_at': data.get('updated_at'),
+                'paid_at': data.get('paid_at'),
+                'payment_details': data.get('payment_details', {})
+            }
+        return {
+            'success': False,
+            'error': 'Payment not found or invalid response',
+            'details': response
+        }
+    
+    async def acreate_checkout_session(self, http_client=None, **kwargs) -> Dict:
+        """
+        Async variant of ``create_checkout_session``.
+        
+        The provider call runs over the shared pooled HTTP client without
+        blocking the event loop. Accepts the same keyword arguments.
+        """
+        try:
+            payment_kwargs = await sync_to_async(self._build_checkout_payment)(**kwargs)
+            client = AsyncTransVoucherClient(self.transvoucher_service, http_client=http_client)
+            response = await client.create_payment(**payment_kwargs)
+            return self._format_checkout_response(response, payment_kwargs)
+        
+        except TransVoucherAPIException as e:
+            logger.error(f"TransVoucher API error: {e.message}")
+            return {
+                'success': False,
+                'error': e.message,
+                'error_code': e.error_code,
+                'status_code': e.status_code
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error creating checkout session: {str(e)}")
+            return {
+                'success': False,
+                'error': f"Internal error: {str(e)}"
+            }
+    
+    async def aget_payment_status(self, reference_id: str, http_client=None) -> Dict:
+        """
+        Async variant of ``get_payment_status``.
+        """
+        try:
+            client = AsyncTransVoucherClient(self.transvoucher_service, http_client=http_client)
+            response = await client.get_payment_status(reference_id)
+            return self._format_payment_status(response)
+        
+        except TransVoucherAPIException as e:
+            logger.error(f"TransVoucher API error: {e.message}")
+            return {
+                'success': False,
+                'error': e.message,
+                'error_code': e.error_code,
+                'status_code': e.status_code
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error getting payment status: {str(e)}")
+            return {
+                'success': False,
+                'error': f"Internal error: {str(e)}"
+            }
+    
     def is_payment_completed(self, payment_data: Dict) -> bool:
         """
         Check if a payment is completed.
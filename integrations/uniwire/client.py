@@ -9,7 +9,7 @@ import hmac
 import json
 import time
 import requests
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Tuple, Union, Any
 
 from django.conf import settings
 
@@ -63,20 +63,15 @@ class UniwireClient:
         """
         return hmac.new(self.api_secret.encode(), msg=msg, digestmod=digestmod).hexdigest()
     
-    def _make_request(self, endpoint: str, payload: Optional[Dict] = None, method: str = 'GET') -> Dict:
-        """Make an authenticated request to the Uniwire API
+    def _build_signed_request(self, endpoint: str, payload: Optional[Dict] = None) -> Tuple[str, Dict]:
+        """Build the request path and signed authentication headers
         
         Args:
             endpoint: API endpoint to call (without the /v1/ prefix)
             payload: Request payload (default: None)
-            method: HTTP method (default: 'GET')
             
         Returns:
-            Dict: JSON response from the API
-            
-        Raises:
-            UniwireAPIException: If the API returns an error
-            requests.RequestException: If the request fails
+            Tuple[str, Dict]: Request path and headers carrying the signed payload
         """
         # Prepare request
         payload_nonce = str(int(time.time() * 1000))
@@ -95,6 +90,24 @@ class UniwireClient:
             'X-CC-PAYLOAD': b64,
             'X-CC-SIGNATURE': signature,
         }
+        return request_path, request_headers
+    
+    def _make_request(self, endpoint: str, payload: Optional[Dict] = None, method: str = 'GET') -> Dict:
+        """Make an authenticated request to the Uniwire API
+        
+        Args:
+            endpoint: API endpoint to call (without the /v1/ prefix)
+            payload: Request payload (default: None)
+            method: HTTP method (default: 'GET')
+            
+        Returns:
+            Dict: JSON response from the API
+            
+        Raises:
+            UniwireAPIException: If the API returns an error
+            requests.RequestException: If the request fails
+        """
+        request_path, request_headers = self._build_signed_request(endpoint, payload)
         
         try:
             # Make request
@@ -172,13 +185,15 @@ class UniwireClient:
         
         return self._make_request('deposit/addresses', payload=payload, method='POST')
     
-    def get_deposit_history(self, profile_id: str, kind: Optional[str] = None, limit: int = 100) -> Dict:
+    def get_deposit_history(self, profile_id: str, kind: Optional[str] = None, limit: int = 100,
+                           page: int = 1) -> Dict:
         """Get deposit history for a profile
         
         Args:
             profile_id: ID of the profile to get history for
             kind: Type of cryptocurrency (optional)
             limit: Maximum number of records to return (default: 100)
+            page: Page number for pagination (default: 1)
             
         Returns:
             Dict: Response containing deposits list
@@ -186,6 +201,8 @@ class UniwireClient:
         payload = {'profile_id': profile_id, 'limit': limit}
         if kind:
             payload['kind'] = kind
+        if page > 1:
+            payload['p'] = page
         
         return self._make_request('deposit/history', payload=payload, method='POST')
     
@@ -211,13 +228,15 @@ class UniwireClient:
         
         return self._make_request('withdrawal/create', payload=payload, method='POST')
     
-    def get_withdrawal_history(self, profile_id: str, kind: Optional[str] = None, limit: int = 100) -> Dict:
+    def get_withdrawal_history(self, profile_id: str, kind: Optional[str] = None, limit: int = 100,
+                              page: int = 1) -> Dict:
         """Get withdrawal history for a profile
         
         Args:
             profile_id: ID of the profile to get history for
             kind: Type of cryptocurrency (optional)
             limit: Maximum number of records to return (default: 100)
+            page: Page number for pagination (default: 1)
             
         Returns:
             Dict: Response containing withdrawals list
@@ -225,6 +244,8 @@ class UniwireClient:
         payload = {'profile_id': profile_id, 'limit': limit}
         if kind:
             payload['kind'] = kind
+        if page > 1:
+            payload['p'] = page
         
         return self._make_request('withdrawal/history', payload=payload, method='POST')
     
@@ -309,6 +330,21 @@ class UniwireClient:
         Returns:
             Dict: Created invoice details
         """
+        payload = self._build_invoice_payload(
+            profile_id, kind, amount=amount, currency=currency, passthrough=passthrough,
+            min_confirmations=min_confirmations, zero_conf_enabled=zero_conf_enabled, notes=notes,
+            fee_amount=fee_amount, exchange_rate_limit=exchange_rate_limit
+        )
+        return self._make_request('invoices', payload=payload, method='POST')
+    
+    def _build_invoice_payload(self, profile_id: str, kind: str, amount: Optional[str] = None,
+                               currency: str = 'USD', passthrough: Optional[str] = None,
+                               min_confirmations: Optional[int] = None,
+                               zero_conf_enabled: Optional[bool] = None,
+                               notes: Optional[str] = None,
+                               fee_amount: Optional[str] = None,
+                               exchange_rate_limit: Optional[str] = None) -> Dict:
+        """Build the request payload for a new invoice (see ``create_invoice``)"""
         payload = {
             'profile_id': profile_id,
             'kind': kind,
@@ -330,4 +366,4 @@ class UniwireClient:
         if exchange_rate_limit:
             payload['exchange_rate_limit'] = exchange_rate_limit
         
-        return self._make_request('invoices', payload=payload, method='POST')
\ No newline at end of file
+        return payload
\ No newline at end of file
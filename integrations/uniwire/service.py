@@ -5,20 +5,28 @@ for cryptocurrency payment processing and management.
 """
 
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
 from django.conf import settings
 from django.utils import timezone
 
-from . import UniwireClient, UniwireAPIException
-from integrations.models import Integration, MerchantIntegration, IntegrationAPICall, IntegrationStatus
+from .client import UniwireClient, UniwireAPIException
+from integrations.credentials import MerchantCredentialsMixin
+from integrations.pagination import iter_provider_items, next_page_number
+from integrations.models import Integration, MerchantIntegration, IntegrationAPICall, IntegrationStatus, IntegrationType
 from authentication.models import Merchant
 
 logger = logging.getLogger(__name__)
 
 
-class UniwireService:
+class UniwireService(MerchantCredentialsMixin):
     """Service class for Uniwire API integration"""
     
+    credential_fields = {
+        'api_key': 'api_key',
+        'api_secret': 'api_secret',
+        'api_url': 'api_url',
+    }
+    
     def __init__(self, merchant: Optional[Merchant] = None):
         """Initialize the Uniwire service
         
@@ -26,6 +34,7 @@ class UniwireService:
             merchant: The merchant using the service (optional)
         """
         self.merchant = merchant
+        self.merchant_integration = None
         self._client = None
         
         # Use sandbox mode by default in development
@@ -51,31 +60,19 @@ class UniwireService:
     
     def _load_merchant_credentials(self):
         """Load merchant-specific credentials if available"""
-        try:
-            # Try to get merchant's Uniwire integration
-            integration = Integration.objects.get(integration_type='uniwire')
-            merchant_integration = MerchantIntegration.objects.get(
-                merchant=self.merchant,
-                integration=integration,
-                status=IntegrationStatus.ACTIVE
-            )
-            
-            # Use merchant-specific credentials if available
-            if merchant_integration.credentials:
-                credentials = merchant_integration.get_decrypted_credentials()
-                self.api_key = credentials.get('api_key', self.api_key)
-                self.api_secret = credentials.get('api_secret', self.api_secret)
-                self.api_url = credentials.get('api_url', self.api_url)
-                
-                # Override sandbox mode if specified in merchant integration
-                if 'sandbox_mode' in credentials:
-                    self.sandbox_mode = credentials.get('sandbox_mode')
-        
-        except (Integration.DoesNotExist, MerchantIntegration.DoesNotExist):
-            # Use default credentials if merchant integration not found
-            pass
-        except Exception as e:
-            logger.error(f"Error loading Uniwire merchant credentials: {str(e)}")
+        # Single query: resolve the Uniwire integration through the join
+        self.merchant_integration = MerchantIntegration.objects.select_related('integration').filter(
+            merchant=self.merchant,
+            integration__integration_type=IntegrationType.UNIWIRE,
+            status=IntegrationStatus.ACTIVE
+        ).first()
+        
+        # Use merchant-specific credentials if available
+        credentials = self._apply_merchant_credentials()
+        
+        # Override sandbox mode if specified in merchant integration
+        if 'sandbox_mode' in credentials:
+            self.sandbox_mode = credentials.get('sandbox_mode')
     
     @property
     def client(self) -> UniwireClient:
@@ -203,13 +200,15 @@ class UniwireService:
             self._log_api_call(endpoint, request_data, {}, 'error', str(e))
             raise
     
-    def get_deposit_history(self, profile_id: str, kind: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    def get_deposit_history(self, profile_id: str, kind: Optional[str] = None, limit: int = 100,
+                           page: int = 1) -> Dict[str, Any]:
         """Get deposit history for a profile
         
         Args:
             profile_id: ID of the profile to get history for
             kind: Type of cryptocurrency (optional, see CRYPTO_KINDS)
             limit: Maximum number of records to return (default: 100)
+            page: Page number for pagination (default: 1)
             
         Returns:
             List of deposit transactions
@@ -218,9 +217,11 @@ class UniwireService:
         request_data = {'profile_id': profile_id, 'limit': limit}
         if kind:
             request_data['kind'] = kind
+        if page > 1:
+            request_data['p'] = page
         
         try:
-            response = self.client.get_deposit_history(profile_id, kind, limit)
+            response = self.client.get_deposit_history(profile_id, kind, limit, page)
             self._log_api_call(endpoint, request_data, response, 'success')
             return response
         except UniwireAPIException as e:
@@ -255,13 +256,15 @@ class UniwireService:
             self._log_api_call(endpoint, request_data, {}, 'error', str(e))
             raise
     
-    def get_withdrawal_history(self, profile_id: str, kind: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    def get_withdrawal_history(self, profile_id: str, kind: Optional[str] = None, limit: int = 100,
+                              page: int = 1) -> Dict[str, Any]:
         """Get withdrawal history for a profile
         
         Args:
             profile_id: ID of the profile to get history for
             kind: Type of cryptocurrency (optional, see CRYPTO_KINDS)
             limit: Maximum number of records to return (default: 100)
+            page: Page number for pagination (default: 1)
             
         Returns:
             List of withdrawal transactions
@@ -270,9 +273,11 @@ class UniwireService:
         request_data = {'profile_id': profile_id, 'limit': limit}
         if kind:
             request_data['kind'] = kind
+        if page > 1:
+            request_data['p'] = page
         
         try:
-            response = self.client.get_withdrawal_history(profile_id, kind, limit)
+            response = self.client.get_withdrawal_history(profile_id, kind, limit, page)
             self._log_api_call(endpoint, request_data, response, 'success')
             return response
         except UniwireAPIException as e:
@@ -337,6 +342,46 @@ class UniwireService:
             self._log_api_call(endpoint, request_data, {}, 'error', str(e))
             raise
     
+    def iter_invoices(self, txid: Optional[str] = None, address: Optional[str] = None,
+                      status: Optional[str] = None, profile_id: Optional[str] = None,
+                      max_pages: Optional[int] = None, max_items: Optional[int] = None,
+                      prefetch: bool = True) -> Iterator[Dict[str, Any]]:
+        """Stream invoices across ``get_invoices`` pages
+        
+        Args:
+            txid, address, status, profile_id: Filters, as for ``get_invoices``
+            max_pages: Stop after this many pages (optional)
+            max_items: Stop after this many invoices (optional)
+            prefetch: Fetch the next page while the current one is consumed
+            
+        Yields:
+            Dict: Invoice records
+        """
+        def fetch_page(page):
+            items = self.get_invoices(page, txid, address, status, profile_id).get('result') or []
+            return items, next_page_number(page, items)
+        
+        return iter_provider_items(fetch_page, first_cursor=1, max_pages=max_pages, max_items=max_items, prefetch=prefetch)
+    
+    def iter_deposit_history(self, profile_id: str, kind: Optional[str] = None, page_size: int = 100,
+                             max_pages: Optional[int] = None, max_items: Optional[int] = None,
+                             prefetch: bool = True) -> Iterator[Dict[str, Any]]:
+        """Stream a profile's deposit history page by page (see ``iter_invoices``)"""
+        return self._iter_history(self.get_deposit_history, profile_id, kind, page_size, max_pages, max_items, prefetch)
+    
+    def iter_withdrawal_history(self, profile_id: str, kind: Optional[str] = None, page_size: int = 100,
+                                max_pages: Optional[int] = None, max_items: Optional[int] = None,
+                                prefetch: bool = True) -> Iterator[Dict[str, Any]]:
+        """Stream a profile's withdrawal history page by page (see ``iter_invoices``)"""
+        return self._iter_history(self.get_withdrawal_history, profile_id, kind, page_size, max_pages, max_items, prefetch)
+    
+    def _iter_history(self, get_history, profile_id, kind, page_size, max_pages, max_items, prefetch):
+        def fetch_page(page):
+            items = get_history(profile_id, kind, page_size, page).get('result') or []
+            return items, next_page_number(page, items, page_size)
+        
+        return iter_provider_items(fetch_page, first_cursor=1, max_pages=max_pages, max_items=max_items, prefetch=prefetch)
+    
     def get_invoice(self, invoice_id: str) -> Dict[str, Any]:
         """Get details of a specific invoice
         
@@ -413,4 +458,30 @@ class UniwireService:
             return response
         except UniwireAPIException as e:
             self._log_api_call(endpoint, request_data, {}, 'error', str(e))
-            raise
\ No newline at end of file
+            raise
+    
+    def test_connection(self) -> Dict[str, Any]:
+        """Test connection to Uniwire API
+        
+        Returns:
+            Dict: Connection test result with a ``success`` flag
+        """
+        try:
+            response = self.get_profiles()
+            return {
+                'success': True,
+                'message': 'Connection successful',
+                'response': response
+            }
+        except UniwireAPIException as e:
+            return {
+                'success': False,
+                'message': f'Connection failed: {e.message}',
+                'error_code': e.error_code,
+                'status_code': e.status_code
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Unexpected error: {str(e)}'
+            }
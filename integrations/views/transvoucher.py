@@ -6,12 +6,13 @@ from drf_spectacular.utils import extend_schema, OpenApiResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.http import JsonResponse
-from django.utils import timezone
+from django.conf import settings
 import json
 
-from ..models import Integration, IntegrationWebhook
+from ..models import Integration
 from ..transvoucher.service import TransVoucherService, TransVoucherAPIException
 from ..transvoucher.usage import TransVoucherUsageService
+from ..webhooks import WebhookSignatureError, check_signature, ingest_webhook
 from authentication.api_auth import APIKeyOrTokenAuthentication
 from authentication.models import Merchant
 from .base import APIKeyPermission
@@ -234,7 +235,11 @@ def transvoucher_list_payments(request):
 @permission_classes([])  # No authentication for webhooks
 @csrf_exempt
 def transvoucher_webhook_handler(request):
-    """Handle TransVoucher webhooks"""
+    """Handle TransVoucher webhooks
+
+    The event is verified and stored, then acknowledged immediately; the
+    ``process_webhooks`` worker applies it to transactions.
+    """
     try:
         # Get webhook signature from headers
         signature = request.META.get('HTTP_X_TRANSVOUCHER_SIGNATURE', '')
@@ -249,12 +254,22 @@ def transvoucher_webhook_handler(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Log webhook receipt
-        logger.info(f"Received TransVoucher webhook: {payload.get('event_type', 'unknown')}")
-        
-        # Get integration for webhook validation
         try:
-            integration = Integration.objects.get(code='transvoucher')
+            secret = getattr(settings, 'TRANSVOUCHER_WEBHOOK_SECRET', '') or getattr(settings, 'TRANSVOUCHER_API_SECRET', '')
+            is_verified = check_signature(secret, request.body, signature)
+        except WebhookSignatureError as e:
+            logger.warning(f"Rejected TransVoucher webhook: {str(e)}")
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        # Store webhook for processing (provider retries are dropped here)
+        payment_data = payload.get('data', {})
+        try:
+            webhook = ingest_webhook(
+                request, 'transvoucher', payload.get('event_type', 'unknown'), payload, is_verified,
+                event_id=payload.get('id') or payload.get('event_id'),
+                reference=payment_data.get('reference_id', ''),
+                status=f"{payload.get('event_type', '')}:{payment_data.get('status', '')}",
+            )
         except Integration.DoesNotExist:
             logger.error("TransVoucher integration not found")
             return Response(
@@ -262,57 +277,8 @@ def transvoucher_webhook_handler(request):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        # Store webhook for processing
-        webhook = IntegrationWebhook.objects.create(
-            integration=integration,
-            event_type=payload.get('event_type', 'unknown'),
-            payload=payload,
-            signature=signature,
-            source_ip=request.META.get('REMOTE_ADDR', ''),
-            headers=dict(request.META)
-        )
-        
-        # Process webhook based on event type
-        event_type = payload.get('event_type')
-        
-        if event_type == 'payment_intent.succeeded':
-            # Handle successful payment
-            payment_data = payload.get('data', {})
-            reference_id = payment_data.get('reference_id')
-            
-            logger.info(f"Payment succeeded: {reference_id}")
-            
-            # Here you would typically:
-            # 1. Update your local transaction records
-            # 2. Send notifications to the merchant
-            # 3. Trigger any post-payment workflows
-            
-        elif event_type == 'payment_intent.failed':
-            # Handle failed payment
-            payment_data = payload.get('data', {})
-            reference_id = payment_data.get('reference_id')
-            
-            logger.info(f"Payment failed: {reference_id}")
-            
-        elif event_type == 'payment_intent.cancelled':
-            # Handle cancelled payment
-            payment_data = payload.get('data', {})
-            reference_id = payment_data.get('reference_id')
-            
-            logger.info(f"Payment cancelled: {reference_id}")
-            
-        elif event_type == 'payment_intent.expired':
-            # Handle expired payment
-            payment_data = payload.get('data', {})
-            reference_id = payment_data.get('reference_id')
-            
-            logger.info(f"Payment expired: {reference_id}")
-        
-        # Mark webhook as processed
-        webhook.processed = True
-        webhook.processed_at = timezone.now()
-        webhook.save()
-        
+        if webhook is None:
+            return Response({'status': 'duplicate'}, status=status.HTTP_200_OK)
         return Response({'status': 'success'}, status=status.HTTP_200_OK)
         
     except Exception as e:
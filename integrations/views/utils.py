@@ -11,6 +11,7 @@ from rest_framework.decorators import api_view, permission_classes, authenticati
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 
+from ..api_call_rollups import summarize_calls, total_calls
 from ..models import Integration, IntegrationType, IntegrationStatus, MerchantIntegration
 from ..serializers import (
     IntegrationChoiceSerializer,
@@ -75,8 +76,9 @@ def integration_choices(request):
 @permission_classes([APIKeyPermission])
 def integration_stats(request):
     """Get integration statistics for merchant"""
-    merchant = request.user.merchant
-    today = timezone.now().date()
+    merchant = getattr(request.user, 'merchant_account', None)
+    if not merchant:
+        return Response({'error': 'Merchant not found or not authorized'}, status=status.HTTP_403_FORBIDDEN)
     
     # Basic counts
     total_integrations = Integration.objects.filter(
@@ -93,45 +95,35 @@ def integration_stats(request):
         is_enabled=True
     ).count()
     
-    # API call statistics for today
-    api_calls_today = IntegrationAPICall.objects.filter(
+    # API call statistics for today, from the minute rollup
+    today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    calls_today = summarize_calls(
+        today_start, timezone.now(),
+        group_by=['merchant_integration__integration__name', 'operation_type'],
         merchant_integration__merchant=merchant,
-        created_at__date=today
     )
-    
-    total_api_calls_today = api_calls_today.count()
-    successful_api_calls_today = api_calls_today.filter(is_successful=True).count()
-    failed_api_calls_today = api_calls_today.filter(is_successful=False).count()
-    
-    success_rate_today = 0
-    if total_api_calls_today > 0:
-        success_rate_today = (successful_api_calls_today / total_api_calls_today) * 100
-    
-    # Average response time
-    avg_response_time = api_calls_today.filter(
-        response_time_ms__isnull=False
-    ).aggregate(avg=Avg('response_time_ms'))['avg'] or 0
+    totals_today = total_calls(calls_today)
     
     # Most used integration and operation
-    most_used_integration = api_calls_today.values(
-        'merchant_integration__integration__name'
-    ).annotate(count=Count('id')).order_by('-count').first()
-    
-    most_used_operation = api_calls_today.values(
-        'operation_type'
-    ).annotate(count=Count('id')).order_by('-count').first()
+    calls_by_integration, calls_by_operation = {}, {}
+    for row in calls_today:
+        name = row['merchant_integration__integration__name']
+        calls_by_integration[name] = calls_by_integration.get(name, 0) + row['calls']
+        calls_by_operation[row['operation_type']] = calls_by_operation.get(row['operation_type'], 0) + row['calls']
+    most_used_integration = max(calls_by_integration, key=calls_by_integration.get, default=None)
+    most_used_operation = max(calls_by_operation, key=calls_by_operation.get, default=None)
     
     stats = {
         'total_integrations': total_integrations,
         'active_integrations': active_integrations,
         'enabled_merchant_integrations': enabled_merchant_integrations,
-        'total_api_calls_today': total_api_calls_today,
-        'successful_api_calls_today': successful_api_calls_today,
-        'failed_api_calls_today': failed_api_calls_today,
-        'success_rate_today': round(success_rate_today, 2),
-        'avg_response_time_ms': round(avg_response_time, 2),
-        'most_used_integration': most_used_integration['merchant_integration__integration__name'] if most_used_integration else 'None',
-        'most_used_operation': most_used_operation['operation_type'] if most_used_operation else 'None'
+        'total_api_calls_today': totals_today['calls'],
+        'successful_api_calls_today': totals_today['successful'],
+        'failed_api_calls_today': totals_today['failed'],
+        'success_rate_today': totals_today['success_rate'],
+        'avg_response_time_ms': totals_today['avg_response_time_ms'],
+        'most_used_integration': most_used_integration or 'None',
+        'most_used_operation': most_used_operation or 'None'
     }
     
     serializer = IntegrationStatsSerializer(stats)
@@ -421,7 +413,7 @@ def integration_statistics(request):
     """Get integration usage statistics"""
     try:
         # Get merchant
-        merchant = request.user.merchant
+        merchant = getattr(request.user, 'merchant_account', None)
         
         if not merchant:
             return Response({
@@ -442,23 +434,25 @@ def integration_statistics(request):
         total_integrations = merchant_integrations.count()
         active_integrations = merchant_integrations.filter(is_enabled=True).count()
         
-        # Get API call statistics
-        api_calls = IntegrationAPICall.objects.filter(
+        # Get API call statistics per integration and day, from the minute rollup
+        calls = summarize_calls(
+            start_date, timezone.now(), group_by=['merchant_integration_id'], by_day=True,
             merchant_integration__merchant=merchant,
-            created_at__gte=start_date
         )
+        totals = total_calls(calls)
+        total_api_calls = totals['calls']
+        successful_calls = totals['successful']
+        failed_calls = totals['failed']
+        success_rate = totals['success_rate']
         
-        total_api_calls = api_calls.count()
-        successful_calls = api_calls.filter(is_successful=True).count()
-        failed_calls = api_calls.filter(is_successful=False).count()
-        
-        # Calculate success rate
-        success_rate = (successful_calls / total_api_calls * 100) if total_api_calls > 0 else 0
+        recent_calls, calls_by_day = {}, {}
+        for row in calls:
+            recent_calls[row['merchant_integration_id']] = recent_calls.get(row['merchant_integration_id'], 0) + row['calls']
+            calls_by_day.setdefault(row['day'], []).append(row)
         
         # Get integration-wise statistics
         integration_stats = []
         for mi in merchant_integrations:
-            integration_calls = api_calls.filter(merchant_integration=mi)
             integration_stats.append({
                 'integration_name': mi.integration.name,
                 'provider_name': mi.integration.provider_name,
@@ -469,19 +463,20 @@ def integration_statistics(request):
                 'failed_requests': mi.failed_requests,
                 'success_rate': mi.get_success_rate(),
                 'last_used_at': mi.last_used_at,
-                'recent_calls': integration_calls.count(),
+                'recent_calls': recent_calls.get(mi.id, 0),
             })
         
         # Get daily usage data for chart
         daily_data = []
+        today = timezone.localdate()
         for i in range(days):
-            date = timezone.now().date() - timedelta(days=i)
-            day_calls = api_calls.filter(created_at__date=date)
+            date = today - timedelta(days=i)
+            day_totals = total_calls(calls_by_day.get(date, []))
             daily_data.append({
                 'date': date.strftime('%Y-%m-%d'),
-                'total': day_calls.count(),
-                'successful': day_calls.filter(is_successful=True).count(),
-                'failed': day_calls.filter(is_successful=False).count(),
+                'total': day_totals['calls'],
+                'successful': day_totals['successful'],
+                'failed': day_totals['failed'],
             })
         
         return Response({
@@ -0,0 +1,435 @@
+"""
+Inbound Provider Webhook Ingestion
+
+Provider webhooks are acknowledged as soon as they are safely stored: the
+endpoint verifies the signature, writes a compact ``IntegrationWebhook`` row
+(the payload plus a handful of relevant headers, not the whole WSGI environ)
+and returns 200. No transaction work happens on the request path, so slow
+database work can no longer push a provider past its timeout and trigger
+redeliveries.
+
+A worker (``process_webhooks`` management command) drains unprocessed rows in
+``created_at`` order through the ``(is_processed, created_at)`` index. Each
+batch is claimed with ``select_for_update(skip_locked=True)`` so several
+workers can run side by side. Each provider's events in the batch are handed
+to its registered processor together, so a burst is applied in one database
+transaction with one lookup of the affected transactions; if that fails the
+events are retried one savepoint at a time. The processed flags are written
+back in one bulk update. Processors are idempotent: replaying an event whose
+transition has already been applied changes nothing.
+
+An event that fails is not marked processed. It keeps its ``processing_error``
+and is retried with exponential backoff (``attempts``/``next_attempt_at``),
+since most failures are transient - a callback can arrive before its
+transaction has been committed. Only after ``INBOUND_WEBHOOK_MAX_ATTEMPTS``
+failures is it marked processed with the error left in place.
+
+Provider retries of events that are queued or applied are dropped before
+they are stored. Each event gets a ``dedupe_key`` - a hash of the provider's
+event id, or of the payment reference and status when the provider sends no
+id - protected by a unique index per integration. A cache entry in front of
+the index answers most redeliveries without a database write; either way a
+duplicate only bumps the integration's ``duplicate_webhook_count`` and is
+acknowledged with 200. A redelivery of an event that failed processing is not
+a duplicate: the stored row is re-queued with a fresh set of attempts, and
+the cache entry is removed whenever processing fails so it cannot hide it.
+"""
+
+import hashlib
+import hmac
+import logging
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Integration, IntegrationWebhook
+
+logger = logging.getLogger(__name__)
+
+# Request headers worth keeping for debugging and auditing
+STORED_HEADERS = (
+    'CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_USER_AGENT', 'HTTP_X_FORWARDED_FOR', 'HTTP_X_REQUEST_ID',
+    'HTTP_X_TRANSVOUCHER_SIGNATURE', 'HTTP_X_PAYDOCK_SIGNATURE',
+)
+
+PROCESSED_FIELDS = ['is_processed', 'processed_at', 'processing_error', 'attempts', 'next_attempt_at']
+
+# Integration ids by code; integrations are never renamed, so ingestion skips the lookup
+_integration_ids: Dict[str, str] = {}
+
+# Event processors by integration code; each takes a list of webhooks and
+# returns error messages for the events it could not apply, keyed by webhook id
+_processors: Dict[str, Callable[[List[IntegrationWebhook]], Dict]] = {}
+
+
+class WebhookSignatureError(Exception):
+    """Raised when an inbound webhook signature is missing or invalid"""
+    pass
+
+
+def register_processor(integration_code: str):
+    """Register the function that applies a batch of a provider's webhook events"""
+    def decorator(func):
+        _processors[integration_code] = func
+        return func
+    return decorator
+
+
+def get_integration_id(code: str):
+    """Get an integration's id, cached in-process"""
+    if code not in _integration_ids:
+        _integration_ids[code] = Integration.objects.values_list('id', flat=True).get(code=code)
+    return _integration_ids[code]
+
+
+def compact_headers(request) -> Dict:
+    """The subset of request headers stored with an inbound webhook"""
+    return {key: request.META[key] for key in STORED_HEADERS if request.META.get(key)}
+
+
+def verify_hmac_signature(secret: str, body: bytes, signature: str) -> bool:
+    """Check a hex HMAC-SHA256 signature of the raw request body"""
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def check_signature(secret: str, body: bytes, signature: str) -> bool:
+    """Verify a webhook signature, returning whether the event is verified
+
+    Raises ``WebhookSignatureError`` for a bad signature, or for a missing one
+    when ``INBOUND_WEBHOOK_REQUIRE_SIGNATURE`` is set.
+    """
+    if signature and secret:
+        if not verify_hmac_signature(secret, body, signature):
+            raise WebhookSignatureError('Invalid webhook signature')
+        return True
+    if getattr(settings, 'INBOUND_WEBHOOK_REQUIRE_SIGNATURE', False):
+        raise WebhookSignatureError('Missing webhook signature')
+    return False
+
+
+def get_dedupe_key(integration_code: str, event_id: str = None, reference: str = '', status: str = '') -> str:
+    """Identity of a provider event: its event id, or its reference and status"""
+    if event_id:
+        identity = f"{integration_code}|id|{event_id}"
+    else:
+        identity = f"{integration_code}|content|{reference}|{status}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def _dedupe_cache_key(integration_id, dedupe_key: str) -> str:
+    return f"inbound_webhook:{integration_id}:{dedupe_key}"
+
+
+def record_duplicate(integration_id):
+    """Count a dropped redelivery against the integration"""
+    Integration.objects.filter(pk=integration_id).update(
+        duplicate_webhook_count=F('duplicate_webhook_count') + 1
+    )
+
+
+def get_retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter before retrying a failed webhook, in seconds"""
+    base_delay = getattr(settings, 'INBOUND_WEBHOOK_RETRY_BASE_DELAY', 30)
+    max_delay = getattr(settings, 'INBOUND_WEBHOOK_RETRY_MAX_DELAY', 3600)
+    delay = min(base_delay * (2 ** max(attempts - 1, 0)), max_delay)
+    return random.uniform(delay / 2, delay)
+
+
+def requeue_failed(integration_id, dedupe_key: str) -> Optional[IntegrationWebhook]:
+    """Re-queue the stored event with this key if its processing failed"""
+    failed = IntegrationWebhook.objects.filter(integration_id=integration_id, dedupe_key=dedupe_key).exclude(
+        processing_error=''
+    )
+    if not failed.update(is_processed=False, processed_at=None, attempts=0, next_attempt_at=None):
+        return None
+    return failed.first()
+
+
+def ingest_webhook(request, integration_code: str, event_type: str, payload: Dict, is_verified: bool,
+                   event_id: str = None, reference: str = '', status: str = '') -> Optional[IntegrationWebhook]:
+    """Store an inbound webhook for asynchronous processing
+
+    Returns ``None`` when the event is a redelivery of one that is still
+    queued or was applied. A redelivery of an event that failed re-queues the
+    stored row and returns it.
+    """
+    integration_id = get_integration_id(integration_code)
+    dedupe_key = get_dedupe_key(integration_code, event_id, reference, status)
+    cache_key = _dedupe_cache_key(integration_id, dedupe_key)
+
+    if cache.get(cache_key):
+        record_duplicate(integration_id)
+        return None
+
+    try:
+        with transaction.atomic():
+            webhook = IntegrationWebhook.objects.create(
+                integration_id=integration_id,
+                event_type=(event_type or 'unknown')[:50],
+                payload=payload,
+                headers=compact_headers(request),
+                dedupe_key=dedupe_key,
+                is_verified=is_verified,
+                verification_method='hmac_sha256' if is_verified else '',
+                source_ip=request.META.get('REMOTE_ADDR') or None,
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            )
+    except IntegrityError:
+        webhook = requeue_failed(integration_id, dedupe_key)
+        if webhook is not None:
+            logger.info(f"Re-queued failed {integration_code} webhook {webhook.id} on redelivery")
+            return webhook
+        record_duplicate(integration_id)
+
+    cache.set(cache_key, True, getattr(settings, 'INBOUND_WEBHOOK_DEDUPE_TTL', 86400))
+    return webhook
+
+
+def forget_failed(webhooks: List[IntegrationWebhook]):
+    """Drop the dedupe cache entries of failed events so their redeliveries reach the database"""
+    keys = [
+        _dedupe_cache_key(webhook.integration_id, webhook.dedupe_key)
+        for webhook in webhooks if webhook.processing_error and webhook.dedupe_key
+    ]
+    if keys:
+        cache.delete_many(keys)
+
+
+class InboundWebhookProcessor:
+    """Drain unprocessed inbound webhooks in batches"""
+
+    def __init__(self, batch_size: int = None, max_attempts: int = None):
+        self.batch_size = batch_size or getattr(settings, 'INBOUND_WEBHOOK_BATCH_SIZE', 100)
+        self.max_attempts = max_attempts or getattr(settings, 'INBOUND_WEBHOOK_MAX_ATTEMPTS', 8)
+
+    def process_events(self, integration_code: str, webhooks: List[IntegrationWebhook]) -> Dict:
+        """Apply a provider's events with its registered processor"""
+        processor = _processors.get(integration_code)
+        if processor is None:
+            raise ValueError(f"No webhook processor registered for {integration_code}")
+        return processor(webhooks)
+
+    def _apply(self, integration_code: str, webhooks: List[IntegrationWebhook]):
+        """Apply a provider's events together, falling back to one at a time"""
+        try:
+            with transaction.atomic():
+                errors = self.process_events(integration_code, webhooks)
+        except Exception as e:
+            if len(webhooks) > 1:
+                for webhook in webhooks:
+                    self._apply(integration_code, [webhook])
+                return
+            errors = {webhooks[0].id: str(e)}
+
+        now = timezone.now()
+        for webhook in webhooks:
+            webhook.processing_error = errors.get(webhook.id, '')
+            if not webhook.processing_error:
+                webhook.is_processed = True
+                webhook.processed_at = now
+                webhook.next_attempt_at = None
+                continue
+
+            webhook.attempts += 1
+            if webhook.attempts >= self.max_attempts:
+                logger.error(
+                    f"Giving up on {integration_code} webhook {webhook.id} after {webhook.attempts} attempts: "
+                    f"{webhook.processing_error}"
+                )
+                webhook.is_processed = True
+                webhook.processed_at = now
+                webhook.next_attempt_at = None
+            else:
+                logger.warning(
+                    f"Failed to process {integration_code} webhook {webhook.id} "
+                    f"(attempt {webhook.attempts}): {webhook.processing_error}"
+                )
+                webhook.next_attempt_at = now + timezone.timedelta(seconds=get_retry_delay(webhook.attempts))
+
+    def run_once(self) -> List[IntegrationWebhook]:
+        """Claim, apply and mark one batch of due, unprocessed webhooks"""
+        with transaction.atomic():
+            webhooks = list(
+                IntegrationWebhook.objects
+                .filter(is_processed=False)
+                .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()))
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('integration')
+                .order_by('created_at')[:self.batch_size]
+            )
+            by_integration = {}
+            for webhook in webhooks:
+                by_integration.setdefault(webhook.integration.code, []).append(webhook)
+            for integration_code, events in by_integration.items():
+                self._apply(integration_code, events)
+            IntegrationWebhook.objects.bulk_update(webhooks, PROCESSED_FIELDS)
+        forget_failed(webhooks)
+        return webhooks
+
+    def run(self, max_batches: Optional[int] = None) -> List[IntegrationWebhook]:
+        """Drain unprocessed webhooks batch by batch"""
+        results = []
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            batch = self.run_once()
+            if not batch:
+                break
+            results.extend(batch)
+            batches += 1
+        return results
+
+    def run_forever(self, poll_interval: float = None, on_batch=None):
+        """Worker loop: process webhooks as they arrive, sleeping when idle"""
+        poll_interval = poll_interval or getattr(settings, 'INBOUND_WEBHOOK_POLL_INTERVAL', 1)
+        while True:
+            close_old_connections()
+            try:
+                batch = self.run_once()
+            except Exception as e:
+                logger.error(f"Inbound webhook batch failed: {str(e)}")
+                batch = []
+            if on_batch and batch:
+                on_batch(batch)
+            if len(batch) < self.batch_size:
+                time.sleep(poll_interval)
+
+
+# ----------------------------------------------------------------------
+# Provider processors
+# ----------------------------------------------------------------------
+
+# TransVoucher payment intent events and the transaction status they lead to
+TRANSVOUCHER_EVENT_STATUSES = {
+    'payment_intent.succeeded': 'completed',
+    'payment_intent.failed': 'failed',
+    'payment_intent.cancelled': 'cancelled',
+    'payment_intent.expired': 'expired',
+}
+
+
+def _transvoucher_references(webhook: IntegrationWebhook) -> List[str]:
+    payment_data = webhook.payload.get('data', {})
+    return [str(ref) for ref in (payment_data.get('reference_id'), payment_data.get('transaction_id')) if ref]
+
+
+@register_processor('transvoucher')
+def process_transvoucher_events(webhooks: List[IntegrationWebhook]) -> Dict:
+    """Apply TransVoucher payment intent events to their transactions
+
+    Transactions are matched on ``reference`` or ``external_reference`` (both
+    indexed) in a single query for the whole burst. Only pending or processing
+    transactions are moved, so late or repeated events are no-ops, and every
+    applied transition is recorded as a ``TransactionEvent``.
+    """
+    from transactions.models import Transaction, TransactionEvent, TransactionStatus
+
+    references = {ref for webhook in webhooks for ref in _transvoucher_references(webhook)}
+    by_reference = {}
+    for txn in Transaction.objects.select_for_update().filter(
+        Q(reference__in=references) | Q(external_reference__in=references)
+    ):
+        by_reference[txn.reference] = txn
+        if txn.external_reference:
+            by_reference.setdefault(txn.external_reference, txn)
+
+    errors = {}
+    events = []
+    for webhook in webhooks:
+        target_status = TRANSVOUCHER_EVENT_STATUSES.get(webhook.event_type)
+        if target_status is None:
+            continue
+
+        references = _transvoucher_references(webhook)
+        txn = next((by_reference[ref] for ref in references if ref in by_reference), None)
+        if txn is None:
+            errors[webhook.id] = f"Transaction {', '.join(references) or '(no reference)'} not found"
+            continue
+        if txn.status not in (TransactionStatus.PENDING, TransactionStatus.PROCESSING):
+            continue
+
+        payment_data = webhook.payload.get('data', {})
+        old_status = txn.status
+        if target_status == TransactionStatus.COMPLETED:
+            txn.mark_as_completed()
+        elif target_status == TransactionStatus.FAILED:
+            txn.mark_as_failed(
+                reason=payment_data.get('failure_reason', 'Payment failed'),
+                code=payment_data.get('failure_code', 'PAYMENT_FAILED')
+            )
+        elif target_status == TransactionStatus.CANCELLED:
+            txn.mark_as_cancelled()
+        else:
+            txn.mark_as_expired()
+
+        events.append(TransactionEvent(
+            transaction=txn,
+            event_type='status_change',
+            old_status=old_status,
+            new_status=txn.status,
+            description=f"Status updated by TransVoucher {webhook.event_type} webhook",
+            source='transvoucher',
+            metadata={'webhook_id': str(webhook.id), 'references': references},
+        ))
+
+    TransactionEvent.objects.bulk_create(events)
+    return errors
+
+
+@register_processor('uba_kenya')
+def process_uba_events(webhooks: List[IntegrationWebhook]) -> Dict:
+    """Apply UBA/PayDock checkout events to their transactions"""
+    errors = {}
+    for webhook in webhooks:
+        try:
+            _process_uba_event(webhook)
+        except ValueError as e:
+            errors[webhook.id] = str(e)
+    return errors
+
+
+def _process_uba_event(webhook: IntegrationWebhook):
+    """Apply a UBA/PayDock checkout event to its transaction"""
+    from transactions.models import Transaction, TransactionStatus
+
+    event_type = webhook.payload.get('type')
+    checkout_data = webhook.payload.get('data', {})
+    status = checkout_data.get('status')
+
+    txn = Transaction.objects.select_for_update().filter(
+        external_reference=checkout_data.get('_id')
+    ).first()
+    if txn is None:
+        raise ValueError(f"Transaction with checkout ID {checkout_data.get('_id')} not found")
+
+    previous_status = txn.status
+    if event_type == 'transaction_success' or status == 'complete':
+        if txn.status != TransactionStatus.COMPLETED:
+            txn.mark_as_completed()
+    elif event_type == 'transaction_failure' or status == 'failed':
+        if txn.status != TransactionStatus.FAILED:
+            txn.mark_as_failed(
+                reason=checkout_data.get('failure_reason', 'Payment failed'),
+                code=checkout_data.get('failure_code', 'PAYMENT_FAILED')
+            )
+    elif status == 'cancelled':
+        if txn.status != TransactionStatus.CANCELLED:
+            txn.mark_as_cancelled()
+
+    # A replayed or repeated event leaves the transaction untouched
+    if txn.status == previous_status:
+        return
+
+    txn.metadata.update({
+        'webhook_received': True,
+        'webhook_event_type': event_type,
+        'webhook_status': status,
+        'webhook_timestamp': webhook.created_at.isoformat(),
+    })
+    txn.save(update_fields=['metadata', 'updated_at'])
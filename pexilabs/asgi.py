@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pexilabs.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup: the integrations app loads models
+from integrations.async_clients import HTTPClientLifespan  # noqa: E402
+
+application = HTTPClientLifespan(django_application)
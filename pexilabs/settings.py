@@ -269,6 +269,15 @@ SERVER_EMAIL = os.getenv('SERVER_EMAIL', 'info@pexipay.com')
 EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '60'))
 EMAIL_DEBUG = os.getenv('EMAIL_DEBUG', 'True').lower() == 'true' 
 
+# Email outbox (queued by the app, sent by `manage.py send_emails`)
+EMAIL_OUTBOX_BACKEND = os.getenv('EMAIL_OUTBOX_BACKEND', '')  # e.g. django.core.mail.backends.console.EmailBackend locally; defaults to EMAIL_BACKEND
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'tmp' / 'emails'))  # used by the file-based backend
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))  # emails sent per connection
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '2'))  # seconds
+EMAIL_OUTBOX_LEASE = int(os.getenv('EMAIL_OUTBOX_LEASE', '3600'))  # seconds a claimed batch stays invisible; keep above batch size x EMAIL_TIMEOUT
+EMAIL_OUTBOX_RETRY_BASE_DELAY = int(os.getenv('EMAIL_OUTBOX_RETRY_BASE_DELAY', '60'))  # seconds, doubled per attempt
+EMAIL_OUTBOX_RETRY_MAX_DELAY = int(os.getenv('EMAIL_OUTBOX_RETRY_MAX_DELAY', '3600'))  # seconds
+
 # Additional settings
 X_FRAME_OPTIONS = os.getenv('X_FRAME_OPTIONS', 'DENY')
 
@@ -322,7 +331,18 @@ MEDIA_URL = os.getenv('MEDIA_URL', 'media/')
 MEDIA_ROOT = BASE_DIR / os.getenv('MEDIA_ROOT', 'media')
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', str(10 * 1024 * 1024)))  # 10MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', str(2 * 1024 * 1024)))  # 2MB, larger uploads stream to a temp file
+DOCUMENT_UPLOAD_MAX_SIZE = int(os.getenv('DOCUMENT_UPLOAD_MAX_SIZE', str(10 * 1024 * 1024)))  # 10MB per merchant document
+DOCUMENT_PREVIEW_ROOT = BASE_DIR / os.getenv('DOCUMENT_PREVIEW_ROOT', 'document_previews')  # Rendered previews, kept outside MEDIA_ROOT
+DOCUMENT_PREVIEW_FORMAT = os.getenv('DOCUMENT_PREVIEW_FORMAT', 'WEBP')  # WEBP or JPEG
+DOCUMENT_PREVIEW_QUALITY = int(os.getenv('DOCUMENT_PREVIEW_QUALITY', '80'))
+DOCUMENT_PREVIEW_WORKERS = int(os.getenv('DOCUMENT_PREVIEW_WORKERS', '2'))  # Background render threads per process
+DOCUMENT_PREVIEW_CACHE_MAX_AGE = int(os.getenv('DOCUMENT_PREVIEW_CACHE_MAX_AGE', str(365 * 24 * 3600)))  # Previews are immutable per content hash
+DOCUMENT_SERVE_MODE = os.getenv('DOCUMENT_SERVE_MODE', 'django')  # django (mmap streaming), x-accel (nginx) or x-sendfile (Apache)
+DOCUMENT_ACCEL_REDIRECT_PREFIXES = {
+    'media': os.getenv('DOCUMENT_ACCEL_MEDIA_PREFIX', '/protected/media/'),  # nginx internal location aliasing MEDIA_ROOT
+    'previews': os.getenv('DOCUMENT_ACCEL_PREVIEWS_PREFIX', '/protected/previews/'),  # nginx internal location aliasing DOCUMENT_PREVIEW_ROOT
+}
 DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('DATA_UPLOAD_MAX_MEMORY_SIZE', str(10 * 1024 * 1024)))  # 10MB
 FILE_UPLOAD_PERMISSIONS = int(os.getenv('FILE_UPLOAD_PERMISSIONS', '0o644'), 8)
 
@@ -386,8 +406,83 @@ ENABLE_COREFY_INTEGRATION = os.getenv('ENABLE_COREFY_INTEGRATION', 'True').lower
 
 # Global Integration Settings
 INTEGRATION_HEALTH_CHECK_INTERVAL = int(os.getenv('INTEGRATION_HEALTH_CHECK_INTERVAL', '300'))  # seconds
+INTEGRATION_HEALTH_CHECK_TIMEOUT = int(os.getenv('INTEGRATION_HEALTH_CHECK_TIMEOUT', '10'))  # per-check deadline, seconds
+INTEGRATION_HEALTH_CHECK_WORKERS = int(os.getenv('INTEGRATION_HEALTH_CHECK_WORKERS', '8'))
+INTEGRATION_HEALTH_CHECK_TICK = int(os.getenv('INTEGRATION_HEALTH_CHECK_TICK', '30'))  # scheduler loop wake-up, seconds
 INTEGRATION_LOG_REQUESTS = os.getenv('INTEGRATION_LOG_REQUESTS', 'True').lower() == 'true'
 INTEGRATION_LOG_RESPONSES = os.getenv('INTEGRATION_LOG_RESPONSES', 'True').lower() == 'true'
+INTEGRATION_CREDENTIALS_CACHE_TTL = int(os.getenv('INTEGRATION_CREDENTIALS_CACHE_TTL', '300'))  # seconds, in-process only
+
+# Pooled async HTTP client used by the ASGI payment initiation views
+INTEGRATION_HTTP_TIMEOUT = float(os.getenv('INTEGRATION_HTTP_TIMEOUT', '30'))  # seconds
+INTEGRATION_HTTP_CONNECT_TIMEOUT = float(os.getenv('INTEGRATION_HTTP_CONNECT_TIMEOUT', '5'))  # seconds
+INTEGRATION_HTTP_MAX_CONNECTIONS = int(os.getenv('INTEGRATION_HTTP_MAX_CONNECTIONS', '100'))
+INTEGRATION_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('INTEGRATION_HTTP_MAX_KEEPALIVE_CONNECTIONS', '20'))
+INTEGRATION_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('INTEGRATION_HTTP_KEEPALIVE_EXPIRY', '30'))  # seconds
+
+# Outbound merchant webhook delivery (transactions.webhooks)
+WEBHOOK_DELIVERY_BATCH_SIZE = int(os.getenv('WEBHOOK_DELIVERY_BATCH_SIZE', '100'))
+WEBHOOK_DELIVERY_WORKERS = int(os.getenv('WEBHOOK_DELIVERY_WORKERS', '16'))  # concurrent deliveries per process
+WEBHOOK_DELIVERY_TIMEOUT = float(os.getenv('WEBHOOK_DELIVERY_TIMEOUT', '10'))  # seconds
+WEBHOOK_DELIVERY_LEASE = int(os.getenv('WEBHOOK_DELIVERY_LEASE', '300'))  # seconds a claimed batch stays invisible
+WEBHOOK_DELIVERY_POLL_INTERVAL = float(os.getenv('WEBHOOK_DELIVERY_POLL_INTERVAL', '2'))  # seconds
+WEBHOOK_RETRY_BASE_DELAY = int(os.getenv('WEBHOOK_RETRY_BASE_DELAY', '60'))  # seconds, doubled per attempt
+WEBHOOK_RETRY_MAX_DELAY = int(os.getenv('WEBHOOK_RETRY_MAX_DELAY', '3600'))  # seconds
+WEBHOOK_ORDERING_RECHECK_DELAY = int(os.getenv('WEBHOOK_ORDERING_RECHECK_DELAY', '5'))  # seconds an out-of-order event waits
+
+# Inbound provider webhooks (stored on receipt, applied by `manage.py process_webhooks`)
+INBOUND_WEBHOOK_REQUIRE_SIGNATURE = os.getenv('INBOUND_WEBHOOK_REQUIRE_SIGNATURE', 'False').lower() == 'true'
+INBOUND_WEBHOOK_BATCH_SIZE = int(os.getenv('INBOUND_WEBHOOK_BATCH_SIZE', '100'))
+INBOUND_WEBHOOK_POLL_INTERVAL = float(os.getenv('INBOUND_WEBHOOK_POLL_INTERVAL', '1'))  # seconds
+INBOUND_WEBHOOK_DEDUPE_TTL = int(os.getenv('INBOUND_WEBHOOK_DEDUPE_TTL', '86400'))  # seconds a seen event stays in the cache
+INBOUND_WEBHOOK_MAX_ATTEMPTS = int(os.getenv('INBOUND_WEBHOOK_MAX_ATTEMPTS', '8'))  # failures before an event is given up on
+INBOUND_WEBHOOK_RETRY_BASE_DELAY = int(os.getenv('INBOUND_WEBHOOK_RETRY_BASE_DELAY', '30'))  # seconds, doubled per attempt
+INBOUND_WEBHOOK_RETRY_MAX_DELAY = int(os.getenv('INBOUND_WEBHOOK_RETRY_MAX_DELAY', '3600'))  # seconds
+
+# Gateway status reconciliation for stale pending transactions (`manage.py reconcile_transactions`)
+RECONCILIATION_STALE_MINUTES = int(os.getenv('RECONCILIATION_STALE_MINUTES', '30'))
+RECONCILIATION_WORKERS = int(os.getenv('RECONCILIATION_WORKERS', '8'))  # concurrent provider calls
+RECONCILIATION_BATCH_SIZE = int(os.getenv('RECONCILIATION_BATCH_SIZE', '500'))  # transactions per run
+RECONCILIATION_MAX_AGE_DAYS = int(os.getenv('RECONCILIATION_MAX_AGE_DAYS', '30'))  # older open transactions are no longer checked (0 = no limit)
+RECONCILIATION_PAGE_SIZE = int(os.getenv('RECONCILIATION_PAGE_SIZE', '100'))  # records per list endpoint page
+RECONCILIATION_MAX_PAGES = int(os.getenv('RECONCILIATION_MAX_PAGES', '20'))  # list pages scanned per gateway and merchant
+
+# Role dashboard headline metrics (authentication.dashboard_metrics)
+DASHBOARD_METRICS_CACHE_TTL = int(os.getenv('DASHBOARD_METRICS_CACHE_TTL', '60'))  # seconds, 0 disables caching
+DASHBOARD_METRICS_STALE_TTL = int(os.getenv('DASHBOARD_METRICS_STALE_TTL', '300'))  # seconds a stale result is served while refreshing
+MERCHANT_DASHBOARD_CACHE_TTL = int(os.getenv('MERCHANT_DASHBOARD_CACHE_TTL', '300'))  # seconds, snapshots are also dropped on change
+NOTIFICATION_STATE_CACHE_TTL = int(os.getenv('NOTIFICATION_STATE_CACHE_TTL', '3600'))  # seconds, per-user unread count and poll ETag
+
+# Admin changelists for large log tables (authentication.admin_pagination)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', '100000'))  # rows; unfiltered lists above this use the PostgreSQL estimate
+ADMIN_COUNT_LIMIT = int(os.getenv('ADMIN_COUNT_LIMIT', '10000'))  # filtered lists stop counting after this many rows
+
+# Background import/export jobs (`manage.py run_data_transfers`)
+DATA_TRANSFER_ROOT = BASE_DIR / os.getenv('DATA_TRANSFER_ROOT', 'data_transfers')  # Uploaded imports and export files, kept outside MEDIA_ROOT
+DATA_TRANSFER_EXPORT_CHUNK_SIZE = int(os.getenv('DATA_TRANSFER_EXPORT_CHUNK_SIZE', '2000'))  # selected rows fetched per query
+DATA_TRANSFER_IMPORT_BATCH_SIZE = int(os.getenv('DATA_TRANSFER_IMPORT_BATCH_SIZE', '1000'))  # rows imported per transaction
+DATA_TRANSFER_POLL_INTERVAL = int(os.getenv('DATA_TRANSFER_POLL_INTERVAL', '5'))  # seconds between checks when idle
+
+# Request log retention (`manage.py apply_log_retention`, `manage.py manage_log_partitions`)
+APP_KEY_USAGE_LOG_RETENTION_DAYS = int(os.getenv('APP_KEY_USAGE_LOG_RETENTION_DAYS', '90'))  # 0 keeps logs forever
+INTEGRATION_API_CALL_RETENTION_DAYS = int(os.getenv('INTEGRATION_API_CALL_RETENTION_DAYS', '30'))  # 0 keeps calls forever
+LOG_ARCHIVE_ENABLED = os.getenv('LOG_ARCHIVE_ENABLED', 'True').lower() == 'true'  # write expired rows to gzipped JSONL before deleting
+LOG_ARCHIVE_ROOT = BASE_DIR / os.getenv('LOG_ARCHIVE_ROOT', 'log_archives')
+LOG_RETENTION_BATCH_SIZE = int(os.getenv('LOG_RETENTION_BATCH_SIZE', '5000'))  # rows archived and deleted per statement
+LOG_PARTITION_MONTHS_AHEAD = int(os.getenv('LOG_PARTITION_MONTHS_AHEAD', '2'))  # future monthly partitions kept ready (PostgreSQL)
+
+# Hourly API-key usage rollups (`manage.py rollup_app_key_usage`)
+APP_KEY_USAGE_ROLLUP_LOOKBACK_HOURS = int(os.getenv('APP_KEY_USAGE_ROLLUP_LOOKBACK_HOURS', '3'))  # closed hours recomputed per run
+APP_KEY_USAGE_ROLLUP_INTERVAL = int(os.getenv('APP_KEY_USAGE_ROLLUP_INTERVAL', '300'))  # seconds between runs with --loop
+
+# Per-minute integration API-call rollups (`manage.py rollup_integration_calls`)
+INTEGRATION_API_CALL_ROLLUP_LOOKBACK_MINUTES = int(os.getenv('INTEGRATION_API_CALL_ROLLUP_LOOKBACK_MINUTES', '15'))  # closed minutes recomputed per run
+INTEGRATION_API_CALL_ROLLUP_INTERVAL = int(os.getenv('INTEGRATION_API_CALL_ROLLUP_INTERVAL', '60'))  # seconds between runs with --loop
+INTEGRATION_API_CALL_ROLLUP_LIVE_MINUTES = int(os.getenv('INTEGRATION_API_CALL_ROLLUP_LIVE_MINUTES', '5'))  # trailing minutes read from raw calls; keep above the interval
+
+# Merchant transaction time series (`/api/v1/transactions/timeseries/`)
+TRANSACTION_TIMESERIES_SETTLE_SECONDS = int(os.getenv('TRANSACTION_TIMESERIES_SETTLE_SECONDS', '3600'))  # after a bucket ends, before it is cached
+TRANSACTION_TIMESERIES_CACHE_TTL = int(os.getenv('TRANSACTION_TIMESERIES_CACHE_TTL', str(30 * 24 * 3600)))  # seconds a closed bucket stays cached
 
 #UNIWIRE
 UNIWIRE_API_URL = os.getenv('UNIWIRE_API_BASE_URL', 'https://api.uniwire.com')
@@ -402,6 +497,7 @@ TRANSVOUCHER_API_KEY = os.getenv('TRANSVOUCHER_API_KEY', 'tvc_3BVABLu73mdNuQh0qm
 TRANSVOUCHER_API_SECRET = os.getenv('TRANSVOUCHER_API_SECRET', 'tvcs_asq28PVyF6ieAn2gaHrG8577EqUU4qdqCx1Y8zs35MhG8cRB')
 TRANSVOUCHER_API_BASE_URL = os.getenv('TRANSVOUCHER_API_BASE_URL', 'https://api.transvoucher.com')
 TRANSVOUCHER_SANDBOX_MODE = os.getenv('TRANSVOUCHER_SANDBOX_MODE', 'True').lower() == 'true' 
+TRANSVOUCHER_WEBHOOK_SECRET = os.getenv('TRANSVOUCHER_WEBHOOK_SECRET', '')  # falls back to TRANSVOUCHER_API_SECRET
 
 # Authentication URLs
 LOGIN_URL = os.getenv('LOGIN_URL', '/')
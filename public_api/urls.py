@@ -10,10 +10,13 @@ urlpatterns = [
     # Checkout endpoints
     path('checkout/make-payment/', checkout.make_payment, name='make_payment'),
     path('checkout/process-payment/', checkout.process_payment, name='process_payment'),
+    path('checkout/process-payment/async/', checkout.process_payment_async, name='process_payment_async'),
+    path('checkout/payment-status/<str:gateway>/<str:reference>/', checkout.payment_status, name='payment_status'),
     
     # Transaction endpoints
     path('transactions/', transactions.list_transactions, name='list_transactions'),
     path('transactions/stats/', transactions.get_transaction_stats, name='transaction_stats'),
+    path('transactions/timeseries/', transactions.get_transaction_timeseries, name='transaction_timeseries'),
     path('transactions/choices/', transactions.get_transaction_choices, name='transaction_choices'),
     path('transactions/<uuid:transaction_id>/', transactions.get_transaction_by_id, name='get_transaction_by_id'),
     path('transactions/reference/<str:reference>/', transactions.get_transaction_by_reference, name='get_transaction_by_reference'),
@@ -1,5 +1,6 @@
 import logging
 from functools import wraps
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
@@ -7,6 +8,43 @@ from authentication.api_auth import APIKeyAuthentication
 
 logger = logging.getLogger(__name__)
 
+
+def _authenticate_api_key(request, require_write_permission=False):
+    """
+    Authenticate a request by API key and attach the authentication context.
+    
+    Returns:
+        JsonResponse: 401/403 error response when authentication fails
+        None: When the request is authenticated
+    """
+    # Initialize API key authentication
+    auth = APIKeyAuthentication()
+    auth_result = auth.authenticate(request)
+    
+    if not auth_result:
+        return JsonResponse({
+            'error': 'Authentication required',
+            'message': 'Please provide a valid API key in Authorization header or X-API-Key header',
+            'authenticated': False
+        }, status=401)
+    
+    user, app_key = auth_result
+    
+    # Check write permissions if required
+    if require_write_permission and not app_key.has_scope('write'):
+        return JsonResponse({
+            'error': 'Insufficient permissions',
+            'message': 'This endpoint requires write permissions',
+            'authenticated': True
+        }, status=403)
+    
+    # Add authentication context to request
+    request.api_user = user
+    request.api_key = app_key
+    request.api_partner = app_key.partner
+    return None
+
+
 def api_key_required(view_func=None, *, require_write_permission=False):
     """
     Decorator that enforces API key authentication for views.
@@ -74,31 +112,9 @@ def api_key_required(view_func=None, *, require_write_permission=False):
         @csrf_exempt
         def wrapper(request, *args, **kwargs):
             try:
-                # Initialize API key authentication
-                auth = APIKeyAuthentication()
-                auth_result = auth.authenticate(request)
-                
-                if not auth_result:
-                    return JsonResponse({
-                        'error': 'Authentication required',
-                        'message': 'Please provide a valid API key in Authorization header or X-API-Key header',
-                        'authenticated': False
-                    }, status=401)
-                
-                user, app_key = auth_result
-                
-                # Check write permissions if required
-                if require_write_permission and not app_key.has_scope('write'):
-                    return JsonResponse({
-                        'error': 'Insufficient permissions',
-                        'message': 'This endpoint requires write permissions',
-                        'authenticated': True
-                    }, status=403)
-                
-                # Add authentication context to request
-                request.api_user = user
-                request.api_key = app_key
-                request.api_partner = app_key.partner
+                error_response = _authenticate_api_key(request, require_write_permission)
+                if error_response:
+                    return error_response
                 
                 # Call the original view function
                 return func(request, *args, **kwargs)
@@ -120,6 +136,44 @@ def api_key_required(view_func=None, *, require_write_permission=False):
         return decorator(view_func)
 
 
+def async_api_key_required(view_func=None, *, require_write_permission=False):
+    """
+    Async counterpart of ``api_key_required`` for ``async def`` views.
+    
+    Authentication runs off the event loop (it queries the database) and the
+    same attributes are added to the request: ``api_user``, ``api_key`` and
+    ``api_partner``. The decorated view is CSRF exempt.
+    
+    Usage:
+        @async_api_key_required
+        async def my_view(request):
+            return JsonResponse({'partner': request.api_partner.name})
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                error_response = await sync_to_async(_authenticate_api_key)(request, require_write_permission)
+            except Exception as e:
+                logger.error(f"API key authentication error: {str(e)}")
+                return JsonResponse({
+                    'error': 'Internal server error',
+                    'message': 'An error occurred during authentication verification',
+                    'authenticated': False
+                }, status=500)
+            if error_response:
+                return error_response
+            return await func(request, *args, **kwargs)
+        
+        wrapper.csrf_exempt = True
+        return wrapper
+    
+    if view_func is None:
+        return decorator
+    else:
+        return decorator(view_func)
+
+
 def get_api_context(request):
     """
     Helper function to extract API authentication context from request.
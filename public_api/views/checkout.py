@@ -1,4 +1,4 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotAllowed
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
@@ -15,14 +15,25 @@ from transactions.models import Transaction, TransactionStatus, TransactionType,
 from integrations.transvoucher.service import TransVoucherAPIException
 from integrations.transvoucher.usage import TransVoucherUsageService
 import logging
-from ..utils import api_key_required
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from ..utils import api_key_required, async_api_key_required
 from pexilabs import settings
 from integrations.uniwire.client import UniwireClient, UniwireAPIException
+from integrations.services import UBAAPIException
+from integrations.async_clients import (
+    AsyncUniwireClient, get_async_uba_client, get_async_uniwire_client, releases_async_http_client,
+)
 from integrations.uniwire.utils import format_amount, is_supported_cryptocurrency, get_network_for_token, validate_address
 from integrations.uniwire.constants import COIN_BTC, COIN_ETH, TOKEN_ETH_USDT
 
 
 logger = logging.getLogger(__name__)
+
+# Gateways whose payment status can be queried through ``payment_status``
+PAYMENT_STATUS_GATEWAYS = ('transvoucher', 'uniwire', 'uba')
+
+
 @api_key_required
 @require_http_methods(["POST"])
 def make_payment(request):
@@ -338,6 +349,7 @@ def make_payment(request):
             
             transaction = Transaction.objects.create(
                 reference=payment_session['session_id'],  # Use session_id as unique reference
+                external_reference=payment_session['reference_id'],  # Gateways report this back in webhooks
                 merchant=merchant,
                 customer_email=data['customer_email'],
                 transaction_type=TransactionType.PAYMENT,
@@ -530,7 +542,216 @@ def process_payment(request):
         - make_payment_api: API endpoint for creating payments
         - Payment success/cancel handlers (callback_url/cancel_url)
     """
-    # Get session data from query parameters
+    context, error = _parse_process_payment_request(request)
+    if error:
+        return render(request, 'checkout/payment_error.html', error)
+    payment_method = context['payment_method']
+
+    merchant_partner = _get_process_payment_merchant(context)
+    _add_payment_methods(context)
+    
+    # Check if the selected payment method is transvoucher and render different view
+    if _is_card_payment(context):
+        try:
+            transvoucher_service = TransVoucherUsageService(merchant=merchant_partner)
+            result = transvoucher_service.create_checkout_session(**_build_card_payment_data(context))
+            if result.get('success'):
+                context['result'] = result
+                print("Result: ", result)
+                return render(request, 'checkout/card_payment.html', context)
+
+            else:
+                return render(request, 'checkout/payment_error.html', {
+                    'error': 'Payment creation error',
+                    'message': 'Payment creation failed'
+                })
+        except TransVoucherAPIException as e:
+            logger.error(f"TransVoucher API error: {e.message}")
+            return render(request, 'checkout/payment_error.html', {
+                    'error': 'Payment creation error',
+                    'message': e.message
+            })
+        except Exception as e:
+            logger.error(f"Unexpected error in TransVoucher payment creation: {str(e)}")
+            return render(request, 'checkout/payment_error.html', {
+                    'error': 'Internal server error',
+                    'message': "Internal server error"
+            })
+
+    if payment_method == 'crypto':
+        try:
+            logger.info("Initializing Uniwire client with credentials from environment variables")
+            client = UniwireClient(
+                api_key=settings.UNIWIRE_API_KEY,
+                api_secret=settings.UNIWIRE_API_SECRET,
+                api_url=settings.UNIWIRE_API_URL
+            )
+            logger.info("Making API call for network invoice creation")
+            logger.info(f"Client configured with API URL: {client.api_url}, Sandbox Mode: {client.sandbox_mode}")
+            response = client.create_invoice(**_build_crypto_invoice_data(context))
+            if response.get('result'):
+                context['result'] = _format_crypto_invoice_result(response, context)
+                return render(request, 'checkout/card_payment.html', context)
+            else:
+                logger.error("Network invoice creation failed")
+                return render(request, 'checkout/payment_error.html', {
+                    'error': 'Payment Processing Error',
+                    'message': 'Payment Processing Error'
+                })
+        except UniwireAPIException as e:
+            logger.error(f"Uniwire API error: {e.message}")
+            return render(request, 'checkout/payment_error.html', {
+                    'error': 'Payment Processing Error',
+                    'message': e.message
+            })
+        except Exception as e:
+            logger.error(f"Unexpected error in Uniwire payment creation: {str(e)}")                
+    # Handle the usage for the UBA PayDock payment
+    return render(request, 'checkout/process_payment.html', context)
+
+
+@releases_async_http_client
+async def process_payment_async(request):
+    """
+    Async variant of ``process_payment`` for ASGI deployments.
+    
+    Accepts the same query parameters and renders the same templates. The
+    TransVoucher checkout session and Uniwire invoice are created over the
+    shared pooled HTTP client (``integrations.async_clients``), so a worker
+    is not blocked while the provider responds.
+    """
+    context, error = _parse_process_payment_request(request)
+    if error:
+        return render(request, 'checkout/payment_error.html', error)
+    payment_method = context['payment_method']
+
+    merchant_partner = await sync_to_async(_get_process_payment_merchant)(context)
+    _add_payment_methods(context)
+
+    if _is_card_payment(context):
+        transvoucher_service = await sync_to_async(TransVoucherUsageService)(merchant=merchant_partner)
+        result = await transvoucher_service.acreate_checkout_session(**_build_card_payment_data(context))
+        if result.get('success'):
+            context['result'] = result
+            return render(request, 'checkout/card_payment.html', context)
+        return render(request, 'checkout/payment_error.html', {
+            'error': 'Payment creation error',
+            'message': result.get('error', 'Payment creation failed')
+        })
+
+    if payment_method == 'crypto':
+        try:
+            client = AsyncUniwireClient(UniwireClient(
+                api_key=settings.UNIWIRE_API_KEY,
+                api_secret=settings.UNIWIRE_API_SECRET,
+                api_url=settings.UNIWIRE_API_URL
+            ))
+            response = await client.create_invoice(**_build_crypto_invoice_data(context))
+            if response.get('result'):
+                context['result'] = _format_crypto_invoice_result(response, context)
+                return render(request, 'checkout/card_payment.html', context)
+            logger.error("Network invoice creation failed")
+            return render(request, 'checkout/payment_error.html', {
+                'error': 'Payment Processing Error',
+                'message': 'Payment Processing Error'
+            })
+        except UniwireAPIException as e:
+            logger.error(f"Uniwire API error: {e.message}")
+            return render(request, 'checkout/payment_error.html', {
+                'error': 'Payment Processing Error',
+                'message': e.message
+            })
+        except Exception as e:
+            logger.error(f"Unexpected error in Uniwire payment creation: {str(e)}")
+    return render(request, 'checkout/process_payment.html', context)
+
+
+def _provider_error_status(status_code):
+    """Response status for a failed provider call (``status_code`` is None when unreachable)"""
+    if status_code is None:
+        return 503
+    if status_code == 404:
+        return 404
+    return 502
+
+
+@releases_async_http_client
+@async_api_key_required
+async def payment_status(request, gateway, reference):
+    """
+    Get the live payment status of a checkout from its gateway.
+    
+    **Path Parameters:**
+        - gateway: One of 'transvoucher', 'uniwire' or 'uba'
+        - reference: TransVoucher reference ID, Uniwire invoice ID or UBA payment ID
+    
+    The provider is queried over the shared pooled HTTP client using the
+    credentials of the merchant that owns the API key, when configured.
+    
+    **Response:**
+        200: {"success": true, "gateway": ..., "data": {...}}
+        400: Unsupported gateway
+        404: Payment not found
+        502: Provider error
+        503: Provider unreachable
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if gateway not in PAYMENT_STATUS_GATEWAYS:
+        return JsonResponse({
+            'success': False,
+            'error': 'Unsupported gateway',
+            'message': f"Gateway must be one of: {', '.join(PAYMENT_STATUS_GATEWAYS)}"
+        }, status=400)
+
+    merchant = await _get_api_merchant(request.api_partner)
+    try:
+        if gateway == 'transvoucher':
+            service = await sync_to_async(TransVoucherUsageService)(merchant=merchant)
+            result = await service.aget_payment_status(reference)
+            if not result.get('success'):
+                if 'status_code' in result:
+                    status = _provider_error_status(result['status_code'])
+                elif 'details' in result:
+                    # The provider answered without a payment
+                    status = 404
+                else:
+                    status = 500
+                return JsonResponse({
+                    'success': False,
+                    'error': result.get('error', 'Failed to get payment status'),
+                    'error_code': result.get('error_code')
+                }, status=status)
+            data = result
+        elif gateway == 'uniwire':
+            client = await get_async_uniwire_client(merchant)
+            data = await client.get_invoice(reference)
+        else:
+            client = await get_async_uba_client(merchant)
+            data = await client.get_payment_status(reference)
+    except (UniwireAPIException, UBAAPIException) as e:
+        logger.error(f"{gateway} payment status error: {e.message}")
+        return JsonResponse({
+            'success': False,
+            'error': e.message,
+            'error_code': e.error_code
+        }, status=_provider_error_status(e.status_code))
+    except Exception as e:
+        logger.error(f"Unexpected error getting {gateway} payment status: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': 'Internal server error'
+        }, status=500)
+
+    return JsonResponse({'success': True, 'gateway': gateway, 'data': data})
+
+
+def _parse_process_payment_request(request):
+    """Read the payment session from query parameters
+    
+    Returns a ``(context, error)`` tuple; ``error`` is the payment error
+    template context when the session is invalid.
+    """
     session_id = request.GET.get('session_id')
     amount = request.GET.get('amount')
     currency = request.GET.get('currency')
@@ -538,7 +759,6 @@ def process_payment(request):
     description = request.GET.get('description')
     payment_method = request.GET.get('payment_method', 'card')
     customer_name = request.GET.get('customer_name', '')
-    merchant_id = request.GET.get('merchant_id', '')
     merchant  =  request.GET.get("merchant", {})
     metadata  = request.GET.get('metadata', {})
     customer_phone = request.GET.get('customer_phone', '')
@@ -565,18 +785,18 @@ def process_payment(request):
         callback_url, 
         cancel_url, 
         payment_method]):
-        return render(request, 'checkout/payment_error.html', {
+        return None, {
             'error': 'Invalid payment session',
             'message': 'Missing required payment information'
-        })
+        }
     
     try:
         amount = float(amount)
     except (ValueError, TypeError):
-        return render(request, 'checkout/payment_error.html', {
+        return None, {
             'error': 'Invalid amount',
             'message': 'Payment amount is not valid'
-        })
+        }
     merchant_data = json.loads(merchant)
 
     context = {
@@ -598,19 +818,35 @@ def process_payment(request):
         'cancel_url': cancel_url,
         'created_at': created_at,
     }
+    return context, None
 
 
+def _get_process_payment_merchant(context):
+    """Resolve the merchant behind the payment session's partner"""
+    merchant_data = context['merchant']
 
     # Extract merchant ID from the code field (format: merchant_{merchant_id})
     merchant_code = merchant_data["code"]
     if merchant_code.startswith('merchant_'):
         actual_merchant_id = merchant_code.replace('merchant_', '')
         context["metadata"]["api_key_id"] =  str(actual_merchant_id)
-        merchant_partner = Merchant.objects.get(id=actual_merchant_id)
-    else:
-        # Fallback to using the id field if code doesn't follow expected format
-        merchant_partner = Merchant.objects.get(id=merchant_data["id"])
+        return Merchant.objects.get(id=actual_merchant_id)
+    # Fallback to using the id field if code doesn't follow expected format
+    return Merchant.objects.get(id=merchant_data["id"])
+
 
+async def _get_api_merchant(partner):
+    """Resolve the merchant behind an API key's partner (``merchant_{merchant_id}``)"""
+    if partner is None or not partner.code.startswith('merchant_'):
+        return None
+    try:
+        return await Merchant.objects.filter(id=partner.code.replace('merchant_', '', 1)).afirst()
+    except (ValueError, ValidationError):
+        return None
+
+
+def _add_payment_methods(context):
+    """Add the payment methods offered on the payment page"""
     payment_methods = []
     payment_methods.append({
         'payment_method': 'uba',
@@ -642,109 +878,53 @@ def process_payment(request):
         context['payment_methods'] = [pm for pm in context['payment_methods'] if pm['payment_method'] in allowed_methods['card'].keys()]            
     if allowed_methods['crypto']:
         context['payment_methods'] = [pm for pm in context['payment_methods'] if pm['payment_method'] in allowed_methods['crypto'].keys()]
-    
-    # Check if the selected payment method is transvoucher and render different view
-    if payment_method == 'card' or (context['payment_methods'] and any(pm['payment_method'] == 'transvoucher' for pm in context['payment_methods'])):
-        try:
-            transvoucher_service = TransVoucherUsageService(merchant=merchant_partner)
-            payment_data = {
-                'amount': context['amount'],
-                'currency': context.get('currency', 'USD'),
-                'title': "PEXI - Process Payment",
-                'description': context.get('description', ''),
-                'customer_email': context['customer_email'],
-                'customer_name': context['customer_name'],
-                'customer_phone': context['customer_phone'],
-                'reference_id': context['reference_id'],
-                'metadata': context.get('metadata', {}),
-                'customer_commission_percentage': context['customer_commission_percentage'],
-                'multiple_use': context['multiple_use'] if isinstance(context['multiple_use'], bool) else context['multiple_use'] == "True"
-            }
-            result = transvoucher_service.create_checkout_session(**payment_data)
-            if result.get('success'):
-                context['result'] = result
-                print("Result: ", result)
-                return render(request, 'checkout/card_payment.html', context)
 
-            else:
-                return render(request, 'checkout/payment_error.html', {
-                    'error': 'Payment creation error',
-                    'message': 'Payment creation failed'
-                })
-        except TransVoucherAPIException as e:
-            logger.error(f"TransVoucher API error: {e.message}")
-            return render(request, 'checkout/payment_error.html', {
-                    'error': 'Payment creation error',
-                    'message': e.message
-            })
-        except Exception as e:
-            logger.error(f"Unexpected error in TransVoucher payment creation: {str(e)}")
-            return render(request, 'checkout/payment_error.html', {
-                    'error': 'Internal server error',
-                    'message': "Internal server error"
-            })
 
-    if payment_method == 'crypto':
-        try:
-            logger.info("Initializing Uniwire client with credentials from environment variables")
-            client = UniwireClient(
-                api_key=settings.UNIWIRE_API_KEY,
-                api_secret=settings.UNIWIRE_API_SECRET,
-                api_url=settings.UNIWIRE_API_URL
-            )
-            logger.info("Making API call for network invoice creation")
-            print(f"Client configured with:")
-            print(f"  API Key: {client.api_key}")
-            print(f"  API Key: {client.api_secret}")
-            print(f"  API URL: {client.api_url}")
-            print(f"  Sandbox Mode: {client.sandbox_mode}")
-            logger.info(f"Client configured with API URL: {client.api_url}, Sandbox Mode: {client.sandbox_mode}")
-            passthrough_data = {
-                'amount': context['amount'],
-                'currency': context.get('currency', 'USD'),
-                'title': "PEXI - Process Payment",
-                'description': context.get('description', ''),
-                'customer_email': context['customer_email'],
-                'customer_name': context['customer_name'],
-                'customer_phone': context['customer_phone'],
-                'reference_id': context['reference_id'],
-                'metadata': context.get('metadata', {}),
-                'customer_commission_percentage': context['customer_commission_percentage'],
-                'multiple_use': context['multiple_use'] if isinstance(context['multiple_use'], bool) else context['multiple_use'] == "True",
-                'callback_url': callback_url,
-                'cancel_url': cancel_url,
-                'created_at': created_at,
-            }
-            response = client.create_invoice(
-                profile_id=settings.UNIWIRE_PROFILE_ID,
-                kind=COIN_ETH,  # Using ETH as the network coin
-                passthrough=json.dumps(passthrough_data),
-                notes="The resuable wallet",
-            )         
-            if response.get('result'):
-                result  =  {
-                    "reference": response.get('result').get('id'),
-                    "invoice_number": response.get('result').get('id').replace("-", "").upper(),
-                    "payment_url": f"https://uniwire.com/invoice/" + response.get('result').get('id').replace("-", "").upper(),
-                    "amount": context["amount"],
-                    "currency": context["currency"],
-                }
-                context['result'] = result
-                print(result)
-                return render(request, 'checkout/card_payment.html', context)
-            else:
-                logger.error("Network invoice creation failed")
-                return render(request, 'checkout/payment_error.html', {
-                    'error': 'Payment Processing Error',
-                    'message': 'Payment Processing Error'
-                })
-        except UniwireAPIException as e:
-            logger.error(f"Uniwire API error: {e.message}")
-            return render(request, 'checkout/payment_error.html', {
-                    'error': 'Payment Processing Error',
-                    'message': e.message
-            })
-        except Exception as e:
-            logger.error(f"Unexpected error in Uniwire payment creation: {str(e)}")                
-    # Handle the usage for the UBA PayDock payment
-    return render(request, 'checkout/process_payment.html', context)
+def _is_card_payment(context):
+    return context['payment_method'] == 'card' or (
+        context['payment_methods'] and any(pm['payment_method'] == 'transvoucher' for pm in context['payment_methods'])
+    )
+
+
+def _build_card_payment_data(context):
+    """TransVoucher checkout session arguments for the payment session"""
+    return {
+        'amount': context['amount'],
+        'currency': context.get('currency', 'USD'),
+        'title': "PEXI - Process Payment",
+        'description': context.get('description', ''),
+        'customer_email': context['customer_email'],
+        'customer_name': context['customer_name'],
+        'customer_phone': context['customer_phone'],
+        'reference_id': context['reference_id'],
+        'metadata': context.get('metadata', {}),
+        'customer_commission_percentage': context['customer_commission_percentage'],
+        'multiple_use': context['multiple_use'] if isinstance(context['multiple_use'], bool) else context['multiple_use'] == "True"
+    }
+
+
+def _build_crypto_invoice_data(context):
+    """Uniwire invoice arguments for the payment session"""
+    passthrough_data = _build_card_payment_data(context)
+    passthrough_data.update({
+        'callback_url': context['callback_url'],
+        'cancel_url': context['cancel_url'],
+        'created_at': context['created_at'],
+    })
+    return {
+        'profile_id': settings.UNIWIRE_PROFILE_ID,
+        'kind': COIN_ETH,  # Using ETH as the network coin
+        'passthrough': json.dumps(passthrough_data),
+        'notes': "The resuable wallet",
+    }
+
+
+def _format_crypto_invoice_result(response, context):
+    invoice_id = response.get('result').get('id')
+    return {
+        "reference": invoice_id,
+        "invoice_number": invoice_id.replace("-", "").upper(),
+        "payment_url": f"https://uniwire.com/invoice/" + invoice_id.replace("-", "").upper(),
+        "amount": context["amount"],
+        "currency": context["currency"],
+    }
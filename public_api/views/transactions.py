@@ -9,6 +9,7 @@ import json
 
 from ..utils import api_key_required
 from transactions.models import Transaction, TransactionStatus, TransactionType, PaymentMethod
+from transactions.timeseries import TimeseriesError, get_timeseries
 from transactions.serializers import (
     TransactionListSerializer,
     TransactionDetailSerializer,
@@ -607,6 +608,125 @@ def get_transaction_stats(request):
         }, status=500)
 
 
+@api_key_required
+@require_http_methods(["GET"])
+def get_transaction_timeseries(request):
+    """
+    Get bucketed transaction series for the authenticated merchant.
+    
+    This endpoint returns transaction counts, volume, fees and success rate
+    per hour, day or week, broken down by currency and payment method, for
+    drawing volume and success-rate charts in a single call.
+    
+    Query Parameters:
+        interval (str): Bucket size: hour, day or week (default: day)
+        date_from (str): First day of the range (YYYY-MM-DD)
+        date_to (str): Last day of the range, inclusive (YYYY-MM-DD)
+        currency (str): Only include this currency code
+        payment_method (str): Only include this payment method
+    
+    Without a date range, the last 24 hours (hour), 30 days (day) or
+    12 weeks (week) are returned.
+    
+    Returns:
+        JsonResponse: Bucket starts and one series row per bucket, currency
+        and payment method that has transactions
+        
+    Example Response:
+        {
+            "success": true,
+            "data": {
+                "interval": "day",
+                "buckets": ["2023-12-01T00:00:00+00:00", "2023-12-02T00:00:00+00:00"],
+                "series": [
+                    {
+                        "bucket": "2023-12-01T00:00:00+00:00",
+                        "currency": "USD",
+                        "payment_method": "card",
+                        "count": 12,
+                        "completed": 11,
+                        "failed": 1,
+                        "volume": "1100.00",
+                        "fees": "31.90",
+                        "success_rate": 91.67
+                    }
+                ]
+            }
+        }
+    """
+    try:
+        # Get authenticated merchant from the partner relationship
+        partner = request.api_partner
+        
+        # Get merchant associated with this partner
+        # Partner codes follow the pattern: merchant_{merchant_id}
+        if not partner.code.startswith('merchant_'):
+            return JsonResponse({
+                'success': False,
+                'error': 'Invalid partner',
+                'message': 'This API key is not associated with a merchant account'
+            }, status=403)
+        
+        try:
+            merchant_id = partner.code.replace('merchant_', '')
+            merchant = Merchant.objects.get(id=merchant_id)
+        except (ValueError, Merchant.DoesNotExist):
+            return JsonResponse({
+                'success': False,
+                'error': 'Merchant not found',
+                'message': 'No merchant account associated with this API key'
+            }, status=404)
+        
+        interval = request.GET.get('interval', 'day')
+        default_span = {'hour': timedelta(hours=24), 'day': timedelta(days=30), 'week': timedelta(weeks=12)}
+        
+        # Determine date range; date_to is inclusive, so the range ends at the next midnight
+        try:
+            now = timezone.now()
+            if request.GET.get('date_to'):
+                end = timezone.make_aware(datetime.strptime(request.GET['date_to'], '%Y-%m-%d') + timedelta(days=1))
+            else:
+                end = now
+            if request.GET.get('date_from'):
+                start = timezone.make_aware(datetime.strptime(request.GET['date_from'], '%Y-%m-%d'))
+            else:
+                start = end - default_span.get(interval, default_span['day'])
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Invalid date format',
+                'message': 'date_from and date_to must be in YYYY-MM-DD format'
+            }, status=400)
+        
+        try:
+            timeseries = get_timeseries(
+                merchant,
+                interval,
+                start,
+                end,
+                currency=request.GET.get('currency'),
+                payment_method=request.GET.get('payment_method'),
+            )
+        except TimeseriesError as e:
+            return JsonResponse({
+                'success': False,
+                'error': 'Invalid range',
+                'message': str(e)
+            }, status=400)
+        
+        return JsonResponse({
+            'success': True,
+            'data': timeseries
+        }, status=200)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': 'Internal server error',
+            'message': 'An error occurred while fetching transaction time series'
+        }, status=500)
+
+
 @api_key_required
 @require_http_methods(["GET"])
 def get_transaction_choices(request):
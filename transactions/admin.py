@@ -11,8 +11,13 @@ from .models import (
     Transaction,
     PaymentLink,
     TransactionEvent,
+    TransactionStatus,
     Webhook
 )
+from authentication.admin_pagination import EstimatedCountAdminMixin
+from .fees import recalculate_fees
+from .transitions import bulk_transition
+from .webhooks import retry_webhooks
 
 
 @admin.register(PaymentGateway)
@@ -47,7 +52,7 @@ class PaymentGatewayAdmin(admin.ModelAdmin):
         }),
         ('Limits & Fees', {
             'fields': (
-                'min_amount', 'max_amount', 'transaction_fee_percentage', 'transaction_fee_fixed'
+                'min_amount', 'max_amount', 'transaction_fee_percentage', 'transaction_fee_fixed', 'fee_rules'
             )
         }),
         ('Status', {
@@ -59,14 +64,18 @@ class PaymentGatewayAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_transactions=Count('transactions'))
+
     def transaction_count(self, obj):
         """Display transaction count for this gateway"""
-        count = obj.transactions.count()
+        count = obj.num_transactions if hasattr(obj, 'num_transactions') else obj.transactions.count()
         if count > 0:
             url = reverse('admin:transactions_transaction_changelist')
             return format_html('<a href="{}?gateway__id__exact={}">{}</a>', url, obj.id, count)
         return count
     transaction_count.short_description = 'Transactions'
+    transaction_count.admin_order_field = 'num_transactions'
 
 
 class TransactionEventInline(admin.TabularInline):
@@ -86,12 +95,13 @@ class WebhookInline(admin.TabularInline):
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """Admin interface for Transaction"""
     list_display = [
         'reference', 'merchant', 'customer_display', 'amount_display',
         'status_badge', 'payment_method', 'gateway', 'created_at'
     ]
+    list_select_related = ['merchant__user', 'customer', 'currency', 'gateway']
     list_filter = [
         'status', 'transaction_type', 'payment_method', 'gateway',
         'is_settled', 'is_flagged', 'created_at', 'merchant'
@@ -202,26 +212,25 @@ class TransactionAdmin(admin.ModelAdmin):
         return obj.get_transaction_hash()
     transaction_hash.short_description = 'Hash'
 
-    actions = ['mark_as_completed', 'mark_as_failed', 'flag_for_review']
+    actions = ['mark_as_completed', 'mark_as_failed', 'flag_for_review', 'recalculate_selected_fees']
 
     def mark_as_completed(self, request, queryset):
         """Mark selected transactions as completed"""
-        updated = 0
-        for transaction in queryset:
-            if transaction.status in ['pending', 'processing']:
-                transaction.mark_as_completed()
-                updated += 1
-        self.message_user(request, f"{updated} transactions marked as completed.")
+        moved = bulk_transition(
+            queryset, TransactionStatus.COMPLETED, source='admin', user=request.user,
+            description='Manually marked as completed by admin',
+        )
+        self.message_user(request, f"{len(moved)} transactions marked as completed.")
     mark_as_completed.short_description = "Mark selected transactions as completed"
 
     def mark_as_failed(self, request, queryset):
         """Mark selected transactions as failed"""
-        updated = 0
-        for transaction in queryset:
-            if transaction.status in ['pending', 'processing']:
-                transaction.mark_as_failed("Manually marked as failed by admin")
-                updated += 1
-        self.message_user(request, f"{updated} transactions marked as failed.")
+        moved = bulk_transition(
+            queryset, TransactionStatus.FAILED, source='admin', user=request.user,
+            failure_reason='Manually marked as failed by admin',
+            description='Manually marked as failed by admin',
+        )
+        self.message_user(request, f"{len(moved)} transactions marked as failed.")
     mark_as_failed.short_description = "Mark selected transactions as failed"
 
     def flag_for_review(self, request, queryset):
@@ -230,6 +239,15 @@ class TransactionAdmin(admin.ModelAdmin):
         self.message_user(request, f"{updated} transactions flagged for review.")
     flag_for_review.short_description = "Flag selected transactions for review"
 
+    def recalculate_selected_fees(self, request, queryset):
+        """Reprice selected open transactions with their gateway's current fee schedule"""
+        updated = recalculate_fees(queryset, source='admin', user=request.user)
+        self.message_user(
+            request,
+            f"Fees recalculated for {updated} transactions. Settled and closed transactions were left unchanged."
+        )
+    recalculate_selected_fees.short_description = "Recalculate fees for selected open transactions"
+
 
 @admin.register(PaymentLink)
 class PaymentLinkAdmin(admin.ModelAdmin):
@@ -238,6 +256,7 @@ class PaymentLinkAdmin(admin.ModelAdmin):
         'title', 'merchant', 'amount_display', 'slug', 'is_active',
         'usage_display', 'expires_at', 'created_at'
     ]
+    list_select_related = ['merchant__user', 'currency']
     list_filter = [
         'is_active', 'is_amount_flexible', 'require_name', 'require_email',
         'require_phone', 'created_at', 'merchant'
@@ -313,6 +332,7 @@ class TransactionEventAdmin(admin.ModelAdmin):
         'transaction', 'event_type', 'old_status', 'new_status',
         'source', 'user', 'created_at'
     ]
+    list_select_related = ['transaction__currency', 'user']
     list_filter = [
         'event_type', 'old_status', 'new_status', 'source', 'created_at'
     ]
@@ -346,6 +366,7 @@ class WebhookAdmin(admin.ModelAdmin):
         'transaction', 'event_type', 'url', 'attempts', 'is_delivered',
         'status_code', 'response_time_ms', 'created_at'
     ]
+    list_select_related = ['transaction__currency']
     list_filter = [
         'event_type', 'is_delivered', 'status_code', 'created_at'
     ]
@@ -386,12 +407,10 @@ class WebhookAdmin(admin.ModelAdmin):
 
     def retry_webhooks(self, request, queryset):
         """Retry failed webhooks"""
-        failed_webhooks = queryset.filter(is_delivered=False)
-        for webhook in failed_webhooks:
-            webhook.schedule_retry()
+        scheduled = retry_webhooks(queryset)
         self.message_user(
             request,
-            f"{failed_webhooks.count()} webhooks scheduled for retry."
+            f"{scheduled} webhooks scheduled for retry."
         )
     retry_webhooks.short_description = "Retry failed webhooks"
 
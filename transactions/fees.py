@@ -0,0 +1,253 @@
+"""
+Fee Engine
+
+Fees used to be computed one amount at a time with Decimal arithmetic that
+was never quantised (``10.00 * 0.0290`` gave ``0.290000``). ``FeeSchedule``
+computes them in integer minor units instead:
+
+- A schedule is parsed once from a gateway (``transaction_fee_percentage``,
+  ``transaction_fee_fixed`` and the optional ``fee_rules``) or from a bank
+  integration's transfer fees. Rates become integers in millionths, and
+  fixed, minimum, maximum and tier amounts become integers in minor units.
+- ``fee_rules`` can add ``min_fee``/``max_fee`` clamps and amount ``tiers``
+  (``[{"up_to": "1000.00", "percentage": "0.0290", "fixed": "0.30"}, ...]``,
+  the last with ``"up_to": null``). In ``"volume"`` mode (the default) the
+  tier that contains the amount prices the whole amount. In ``"graduated"``
+  mode each tier's rate applies to the part of the amount inside it, and the
+  tier fixed fees are ignored in favour of the gateway's fixed fee.
+- ``calculate_minor`` prices a whole list of amounts with integer arithmetic
+  only, rounding half up once per amount, so bulk and single-amount results
+  always agree. ``calculate`` wraps it for one Decimal amount and returns the
+  same keys ``PaymentGateway.calculate_fees`` always has.
+- ``recalculate_fees(queryset)`` loads every gateway schedule it needs in one
+  query. It reprices the transactions in chunks and writes the changed
+  ``fee_amount``/``net_amount`` values with ``bulk_update``, together with a
+  ``fee_recalculated`` ``TransactionEvent`` holding the old and new amounts
+  for every changed row. Only open (pending or processing) transactions are
+  repriced unless ``include_closed`` is set, and settled transactions never are.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db import transaction
+from django.utils import timezone
+
+# Stored amounts have two decimal places
+MINOR_UNIT_EXPONENT = 2
+MINOR_UNITS = 10 ** MINOR_UNIT_EXPONENT
+
+# Rates are held as integer millionths (0.0290 -> 29000)
+RATE_SCALE = 10 ** 6
+
+TIER_MODES = ('volume', 'graduated')
+
+RECALCULATE_BATCH_SIZE = 1000
+
+
+def to_minor(amount) -> int:
+    """Decimal amount to integer minor units, rounding half up"""
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(units: int) -> Decimal:
+    return Decimal(units).scaleb(-MINOR_UNIT_EXPONENT)
+
+
+def to_rate(value) -> int:
+    """Fractional rate to integer millionths
+
+    Raises:
+        ValueError: If the rate is more precise than a millionth
+    """
+    scaled = Decimal(str(value)) * RATE_SCALE
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"Fee rate {value} has more than six decimal places")
+    return int(scaled)
+
+
+def _round_div(numerator: int, denominator: int) -> int:
+    """``numerator / denominator`` rounded half away from zero"""
+    quotient = (2 * abs(numerator) + denominator) // (2 * denominator)
+    return quotient if numerator >= 0 else -quotient
+
+
+class FeeSchedule:
+    """A fee schedule in integer minor units"""
+
+    def __init__(self, percentage=0, fixed=0, min_fee=None, max_fee=None, tiers=None, tier_mode: str = 'volume'):
+        if tier_mode not in TIER_MODES:
+            raise ValueError(f"Unknown tier mode: {tier_mode}")
+        self.rate = to_rate(percentage)
+        self.fixed = to_minor(fixed)
+        self.min_fee = to_minor(min_fee) if min_fee not in (None, '') else None
+        self.max_fee = to_minor(max_fee) if max_fee not in (None, '') else None
+        if self.min_fee is not None and self.max_fee is not None and self.min_fee > self.max_fee:
+            raise ValueError('min_fee is greater than max_fee')
+        self.tier_mode = tier_mode
+        self.tiers = self._parse_tiers(tiers or [])
+
+    @staticmethod
+    def _parse_tiers(tiers) -> List[tuple]:
+        parsed = []
+        for tier in tiers:
+            up_to = tier.get('up_to')
+            parsed.append((
+                to_minor(up_to) if up_to not in (None, '') else None,
+                to_rate(tier.get('percentage', 0)),
+                to_minor(tier.get('fixed', 0)),
+            ))
+        bounds = [up_to for up_to, _, _ in parsed]
+        closed = bounds[:-1]
+        if None in closed or any(lower >= upper for lower, upper in zip(bounds, bounds[1:]) if upper is not None):
+            raise ValueError('Fee tiers must be in increasing order, with only the last one open-ended')
+        if bounds and bounds[-1] is not None:
+            # Amounts above the last tier keep its pricing
+            parsed.append((None,) + parsed[-1][1:])
+        return parsed
+
+    @classmethod
+    def for_gateway(cls, gateway) -> 'FeeSchedule':
+        rules = gateway.fee_rules or {}
+        return cls(
+            percentage=gateway.transaction_fee_percentage,
+            fixed=gateway.transaction_fee_fixed,
+            min_fee=rules.get('min_fee'),
+            max_fee=rules.get('max_fee'),
+            tiers=rules.get('tiers'),
+            tier_mode=rules.get('tier_mode', 'volume'),
+        )
+
+    @classmethod
+    def for_bank(cls, bank) -> 'FeeSchedule':
+        return cls(percentage=bank.transfer_fee_percentage, fixed=bank.transfer_fee_fixed)
+
+    def _flat(self, amount: int):
+        return _round_div(amount * self.rate, RATE_SCALE), self.fixed
+
+    def _volume(self, amount: int):
+        for up_to, rate, fixed in self.tiers:
+            if up_to is None or amount <= up_to:
+                return _round_div(amount * rate, RATE_SCALE), fixed
+        return self._flat(amount)
+
+    def _graduated(self, amount: int):
+        scaled, lower = 0, 0
+        for up_to, rate, _ in self.tiers:
+            upper = amount if up_to is None else min(amount, up_to)
+            if upper > lower:
+                scaled += (upper - lower) * rate
+            if up_to is None or amount <= up_to:
+                break
+            lower = up_to
+        return _round_div(scaled, RATE_SCALE), self.fixed
+
+    def calculate_minor(self, amounts: Sequence[int]) -> List[tuple]:
+        """``(percentage_fee, fixed_fee, total_fee)`` in minor units for each amount in minor units"""
+        if not self.tiers:
+            price = self._flat
+        elif self.tier_mode == 'graduated':
+            price = self._graduated
+        else:
+            price = self._volume
+        min_fee, max_fee = self.min_fee, self.max_fee
+
+        results = []
+        for amount in amounts:
+            percentage_fee, fixed_fee = price(amount)
+            total = percentage_fee + fixed_fee
+            if min_fee is not None and total < min_fee:
+                total = min_fee
+            if max_fee is not None and total > max_fee:
+                total = max_fee
+            results.append((percentage_fee, fixed_fee, total))
+        return results
+
+    def calculate(self, amount) -> dict:
+        """Fee breakdown for a single Decimal amount"""
+        minor = to_minor(amount)
+        percentage_fee, fixed_fee, total_fee = self.calculate_minor([minor])[0]
+        return {
+            'percentage_fee': from_minor(percentage_fee),
+            'fixed_fee': from_minor(fixed_fee),
+            'total_fee': from_minor(total_fee),
+            'net_amount': from_minor(minor - total_fee),
+        }
+
+
+def load_gateway_schedules(gateway_ids: Iterable) -> Dict:
+    """Fee schedules for the given gateways, by id, from one query"""
+    from .models import PaymentGateway
+
+    gateways = PaymentGateway.objects.filter(pk__in=set(gateway_ids)).only(
+        'id', 'transaction_fee_percentage', 'transaction_fee_fixed', 'fee_rules',
+    )
+    return {gateway.pk: FeeSchedule.for_gateway(gateway) for gateway in gateways}
+
+
+def recalculate_fees(queryset, batch_size: Optional[int] = None, include_closed: bool = False,
+                     source: str = 'system', user=None) -> int:
+    """Reprice ``queryset``'s transactions with their gateway's schedule; returns the number changed
+
+    Transactions without a gateway and settled transactions are left alone,
+    and so are completed, failed and other closed ones unless
+    ``include_closed`` is set. ``source`` and ``user`` are recorded on the
+    ``TransactionEvent`` written for each changed transaction.
+    """
+    from .transitions import OPEN_STATUSES
+
+    batch_size = batch_size or RECALCULATE_BATCH_SIZE
+    queryset = queryset.filter(gateway__isnull=False, is_settled=False).order_by()
+    if not include_closed:
+        queryset = queryset.filter(status__in=OPEN_STATUSES)
+    schedules = load_gateway_schedules(queryset.values_list('gateway_id', flat=True).distinct())
+
+    changed = 0
+    rows = queryset.only(
+        'id', 'gateway_id', 'status', 'amount', 'fee_amount', 'net_amount', 'updated_at',
+    ).iterator(chunk_size=batch_size)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            changed += _reprice(batch, schedules, batch_size, source, user)
+            batch = []
+    if batch:
+        changed += _reprice(batch, schedules, batch_size, source, user)
+    return changed
+
+
+def _reprice(batch, schedules, batch_size: int, source: str, user) -> int:
+    from .models import Transaction, TransactionEvent
+
+    by_gateway = {}
+    for row in batch:
+        by_gateway.setdefault(row.gateway_id, []).append(row)
+
+    updated, events, now = [], [], timezone.now()
+    for gateway_id, rows in by_gateway.items():
+        amounts = [to_minor(row.amount) for row in rows]
+        for row, amount, (_, _, total) in zip(rows, amounts, schedules[gateway_id].calculate_minor(amounts)):
+            fee_amount, net_amount = from_minor(total), from_minor(amount - total)
+            if row.fee_amount != fee_amount or row.net_amount != net_amount:
+                events.append(TransactionEvent(
+                    transaction=row,
+                    event_type='fee_recalculated',
+                    old_status=row.status,
+                    new_status=row.status,
+                    description=f"Fee recalculated from {row.fee_amount} to {fee_amount}",
+                    metadata={
+                        'old_fee_amount': str(row.fee_amount), 'new_fee_amount': str(fee_amount),
+                        'old_net_amount': str(row.net_amount), 'new_net_amount': str(net_amount),
+                    },
+                    source=source,
+                    user=user,
+                ))
+                row.fee_amount, row.net_amount, row.updated_at = fee_amount, net_amount, now
+                updated.append(row)
+
+    if updated:
+        with transaction.atomic():
+            Transaction.objects.bulk_update(updated, ['fee_amount', 'net_amount', 'updated_at'], batch_size=batch_size)
+            TransactionEvent.objects.bulk_create(events, batch_size=batch_size)
+    return len(updated)
@@ -0,0 +1,95 @@
+"""
+Deliver outbound merchant webhooks
+"""
+
+from django.core.management.base import BaseCommand
+
+from transactions.webhooks import WebhookDeliveryEngine, due_webhooks, get_webhook_backlog
+
+
+class Command(BaseCommand):
+    help = 'Deliver due transaction webhooks to merchant endpoints (run several processes to scale out)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a delivery worker instead of draining due webhooks once',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Webhooks claimed per batch (default: WEBHOOK_DELIVERY_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Concurrent deliveries per process (default: WEBHOOK_DELIVERY_WORKERS)',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=None,
+            help='Per-request timeout in seconds (default: WEBHOOK_DELIVERY_TIMEOUT)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Seconds to sleep when no webhooks are due (with --loop)',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches (without --loop)',
+        )
+        parser.add_argument(
+            '--backlog',
+            action='store_true',
+            help='Show the webhook backlog depth and exit without delivering',
+        )
+
+    def handle(self, *args, **options):
+        if options['backlog']:
+            self.show_backlog()
+            return
+
+        engine = WebhookDeliveryEngine(
+            batch_size=options['batch_size'],
+            max_workers=options['workers'],
+            timeout=options['timeout'],
+        )
+
+        if options['loop']:
+            self.stdout.write(self.style.SUCCESS('🚚 Webhook delivery worker started'))
+            try:
+                engine.run_forever(poll_interval=options['poll_interval'], on_batch=self.report_batch)
+            except KeyboardInterrupt:
+                self.stdout.write('Webhook delivery worker stopped')
+            return
+
+        results = engine.run(max_batches=options['max_batches'])
+        if results:
+            self.report_batch(results)
+        self.stdout.write(f"Webhooks still due: {due_webhooks().count()}")
+
+    def show_backlog(self):
+        backlog = get_webhook_backlog()
+        self.stdout.write(self.style.SUCCESS('📬 Webhook backlog'))
+        self.stdout.write(f"  Pending: {backlog['depth']}")
+        self.stdout.write(f"  Due now: {backlog['due']}")
+        self.stdout.write(f"  Oldest pending: {backlog['oldest_age_seconds']}s")
+        self.stdout.write(f"  Out of retries: {backlog['exhausted']}")
+
+    def report_batch(self, webhooks):
+        delivered = sum(1 for webhook in webhooks if webhook.is_delivered)
+        failed = len(webhooks) - delivered
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"Delivered {delivered} webhook(s), {failed} failed"))
+        for webhook in webhooks:
+            if not webhook.is_delivered:
+                retry = webhook.next_attempt_at.isoformat() if webhook.next_attempt_at else 'no retries left'
+                self.stdout.write(f"  ❌ {webhook.id} → {webhook.url}: {webhook.error_message} ({retry})")
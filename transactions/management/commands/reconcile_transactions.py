@@ -0,0 +1,71 @@
+"""
+Reconcile stale pending transactions with their payment gateways
+"""
+
+from django.core.management.base import BaseCommand
+
+from transactions.reconciliation import RECONCILERS, ReconciliationEngine
+
+
+class Command(BaseCommand):
+    help = 'Query gateways for transactions still pending after N minutes and apply their real status'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without updating any transaction',
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=None,
+            help='Only reconcile transactions older than this (default: RECONCILIATION_STALE_MINUTES)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Concurrent provider calls (default: RECONCILIATION_WORKERS)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Maximum transactions per run (default: RECONCILIATION_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--gateway',
+            action='append',
+            choices=sorted(RECONCILERS),
+            help='Only reconcile this gateway (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        engine = ReconciliationEngine(
+            stale_minutes=options['stale_minutes'],
+            max_workers=options['workers'],
+            limit=options['limit'],
+            gateways=options['gateway'],
+            dry_run=options['dry_run'],
+        )
+        results = engine.run()
+
+        title = '🔍 Reconciliation dry run' if options['dry_run'] else '🔄 Reconciliation'
+        self.stdout.write(self.style.SUCCESS(f"{title}: {len(results)} stale transaction(s) checked"))
+
+        changes = [result for result in results if result.is_change]
+        errors = [result for result in results if result.error_message]
+        for result in changes:
+            txn = result.transaction
+            marker = '✅' if result.applied or options['dry_run'] else '⏭️'
+            self.stdout.write(
+                f"  {marker} {txn.reference} [{result.gateway}] {txn.status} → {result.new_status} "
+                f"(provider: {result.provider_status})"
+            )
+        for result in errors:
+            self.stdout.write(f"  ❌ {result.transaction.reference} [{result.gateway or '-'}]: {result.error_message}")
+
+        unchanged = len(results) - len(changes) - len(errors)
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(f"Summary: {len(changes)} {verb}, {unchanged} still open, {len(errors)} error(s)")
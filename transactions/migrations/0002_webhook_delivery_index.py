@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='webhook',
+            index=models.Index(fields=['is_delivered', 'next_attempt_at'], name='transaction_is_deli_6e80b9_idx'),
+        ),
+    ]
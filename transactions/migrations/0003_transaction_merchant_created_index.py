@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_webhook_delivery_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['merchant', 'created_at'], name='transaction_merchan_bb64b2_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_transaction_merchant_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentgateway',
+            name='fee_rules',
+            field=models.JSONField(blank=True, default=dict, help_text='Optional min_fee, max_fee, tiers and tier_mode (see transactions.fees)'),
+        ),
+    ]
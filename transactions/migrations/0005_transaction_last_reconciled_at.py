@@ -0,0 +1,22 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_payment_gateway_fee_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='last_reconciled_at',
+            field=models.DateTimeField(blank=True, help_text="When the reconciliation job last asked the gateway for this transaction's status", null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'last_reconciled_at'], name='transaction_status_fec938_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_transaction_last_reconciled_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, help_text='Set while a delivery worker holds the webhook; other workers skip it until then', null=True),
+        ),
+    ]
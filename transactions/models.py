@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
+import random
 import decimal
 from decimal import Decimal
 import hashlib
@@ -11,6 +13,8 @@ import json
 
 # Import from authentication app
 from authentication.models import CustomUser, Merchant, PreferredCurrency
+from .fees import FeeSchedule
+from .signals import transaction_status_changed
 
 
 class PaymentMethod(models.TextChoices):
@@ -106,6 +110,11 @@ class PaymentGateway(models.Model):
         default=Decimal('0.30'),
         help_text='Fixed transaction fee amount'
     )
+    fee_rules = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Optional min_fee, max_fee, tiers and tier_mode (see transactions.fees)'
+    )
     
     # Status and settings
     is_active = models.BooleanField(default=True)
@@ -140,16 +149,21 @@ class PaymentGateway(models.Model):
         """Check if gateway supports a currency"""
         return currency_code in self.get_supported_currencies_list()
     
+    def clean(self):
+        """Validate the fee rules"""
+        super().clean()
+        try:
+            FeeSchedule.for_gateway(self)
+        except (ValueError, TypeError, AttributeError, ArithmeticError) as e:
+            raise ValidationError({'fee_rules': f"Invalid fee rules: {e}"})
+    
+    def get_fee_schedule(self):
+        """Fee schedule built from this gateway's fee fields"""
+        return FeeSchedule.for_gateway(self)
+    
     def calculate_fees(self, amount):
         """Calculate transaction fees for given amount"""
-        percentage_fee = amount * self.transaction_fee_percentage
-        total_fee = percentage_fee + self.transaction_fee_fixed
-        return {
-            'percentage_fee': percentage_fee,
-            'fixed_fee': self.transaction_fee_fixed,
-            'total_fee': total_fee,
-            'net_amount': amount - total_fee
-        }
+        return self.get_fee_schedule().calculate(amount)
 
 
 class Transaction(models.Model):
@@ -281,6 +295,11 @@ class Transaction(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     failed_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField(null=True, blank=True)
+    last_reconciled_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='When the reconciliation job last asked the gateway for this transaction\'s status'
+    )
     
     # Failure information
     failure_reason = models.TextField(blank=True)
@@ -323,10 +342,13 @@ class Transaction(models.Model):
             models.Index(fields=['reference']),
             models.Index(fields=['external_reference']),
             models.Index(fields=['merchant', 'status']),
+            models.Index(fields=['merchant', 'created_at']),
             models.Index(fields=['customer', 'status']),
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['gateway', 'status']),
             models.Index(fields=['settlement_date']),
+            # Reconciliation picks the least recently checked open transactions
+            models.Index(fields=['status', 'last_reconciled_at']),
         ]
     
     def __str__(self):
@@ -380,12 +402,14 @@ class Transaction(models.Model):
         self.status = TransactionStatus.PROCESSING
         self.processed_at = timezone.now()
         self.save(update_fields=['status', 'processed_at', 'updated_at'])
+        self._send_status_changed('transaction.processing')
     
     def mark_as_completed(self):
         """Mark transaction as completed"""
         self.status = TransactionStatus.COMPLETED
         self.completed_at = timezone.now()
         self.save(update_fields=['status', 'completed_at', 'updated_at'])
+        self._send_status_changed('transaction.completed')
     
     def mark_as_failed(self, reason="", code=""):
         """Mark transaction as failed"""
@@ -394,6 +418,21 @@ class Transaction(models.Model):
         self.failure_reason = reason
         self.failure_code = code
         self.save(update_fields=['status', 'failed_at', 'failure_reason', 'failure_code', 'updated_at'])
+        self._send_status_changed('transaction.failed')
+    
+    def mark_as_cancelled(self):
+        """Mark transaction as cancelled"""
+        self.status = TransactionStatus.CANCELLED
+        self.save(update_fields=['status', 'updated_at'])
+        self._send_status_changed('transaction.cancelled')
+    
+    def mark_as_expired(self, reason="Payment session expired"):
+        """Mark transaction as expired"""
+        self.status = TransactionStatus.EXPIRED
+        self.failed_at = timezone.now()
+        self.failure_reason = reason
+        self.save(update_fields=['status', 'failed_at', 'failure_reason', 'updated_at'])
+        self._send_status_changed('transaction.expired')
     
     def mark_as_settled(self, settlement_reference="", settlement_date=None):
         """Mark transaction as settled"""
@@ -401,6 +440,11 @@ class Transaction(models.Model):
         self.settlement_reference = settlement_reference
         self.settlement_date = settlement_date or timezone.now().date()
         self.save(update_fields=['is_settled', 'settlement_reference', 'settlement_date', 'updated_at'])
+        self._send_status_changed('transaction.settled')
+    
+    def _send_status_changed(self, event_type):
+        """Notify listeners (e.g. webhook fan-out) of a state transition"""
+        transaction_status_changed.send(sender=Transaction, transaction=self, event_type=event_type)
     
     def create_refund(self, amount, reason="", created_by=None):
         """Create a refund transaction"""
@@ -429,7 +473,7 @@ class Transaction(models.Model):
     
     def get_transaction_hash(self):
         """Generate hash for transaction integrity verification"""
-        data = f"{self.reference}{self.amount}{self.currency.code}{self.merchant.id}{self.created_at}"
+        data = f"{self.reference}{self.amount}{self.currency.code}{self.merchant_id}{self.created_at}"
         return hashlib.sha256(data.encode()).hexdigest()
     
     @classmethod
@@ -701,6 +745,11 @@ class Webhook(models.Model):
     is_delivered = models.BooleanField(default=False)
     delivered_at = models.DateTimeField(null=True, blank=True)
     next_attempt_at = models.DateTimeField(null=True, blank=True)
+    leased_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Set while a delivery worker holds the webhook; other workers skip it until then'
+    )
     
     # Error tracking
     error_message = models.TextField(blank=True)
@@ -712,6 +761,10 @@ class Webhook(models.Model):
         verbose_name = 'Webhook'
         verbose_name_plural = 'Webhooks'
         ordering = ['-created_at']
+        indexes = [
+            # Delivery workers claim due webhooks with this index
+            models.Index(fields=['is_delivered', 'next_attempt_at']),
+        ]
     
     def __str__(self):
         return f"Webhook for {self.transaction.reference} - {self.event_type}"
@@ -722,10 +775,21 @@ class Webhook(models.Model):
         self.delivered_at = timezone.now()
         self.save(update_fields=['is_delivered', 'delivered_at', 'updated_at'])
     
-    def schedule_retry(self):
+    def get_retry_delay(self):
+        """Exponential backoff with jitter for the next attempt, in seconds
+        
+        The base delay doubles per attempt (capped at WEBHOOK_RETRY_MAX_DELAY)
+        and a random value between half and all of it is used, so retries of
+        webhooks that failed together do not hit the endpoint together.
+        """
+        base_delay = getattr(settings, 'WEBHOOK_RETRY_BASE_DELAY', 60)
+        max_delay = getattr(settings, 'WEBHOOK_RETRY_MAX_DELAY', 3600)
+        delay = min(base_delay * (2 ** max(self.attempts - 1, 0)), max_delay)
+        return random.uniform(delay / 2, delay)
+    
+    def schedule_retry(self, save=True):
         """Schedule next retry attempt"""
         if self.attempts < self.max_attempts:
-            # Exponential backoff: 1min, 5min, 30min
-            delay_minutes = [1, 5, 30][min(self.attempts, 2)]
-            self.next_attempt_at = timezone.now() + timezone.timedelta(minutes=delay_minutes)
-            self.save(update_fields=['next_attempt_at', 'updated_at'])
+            self.next_attempt_at = timezone.now() + timezone.timedelta(seconds=self.get_retry_delay())
+            if save:
+                self.save(update_fields=['next_attempt_at', 'updated_at'])
@@ -0,0 +1,357 @@
+"""
+Gateway Status Reconciliation
+
+Finds transactions that are still pending (or processing) well after they
+were created, most often because a provider webhook was missed, and asks the
+gateway for their real outcome.
+
+Stale transactions are grouped per gateway and merchant, so each group is
+queried with the merchant's own credentials. Gateways with a list endpoint
+(TransVoucher payments, Uniwire invoices) resolve a whole group by paging
+through recent records, and fall back to per-reference status calls only for
+what the pages did not cover; the others are queried one reference at a time.
+All provider calls run concurrently on a bounded thread pool. The gateway
+service is built once per group, since building it reads the integration and
+the merchant's credentials from the database, and the single-reference jobs of
+a group share it.
+
+Each run takes the least recently reconciled open transactions first
+(``last_reconciled_at``, never-checked ones before all others) and stamps
+every transaction it checked. Transactions the provider still reports as
+pending, or that cannot be resolved at all, move to the back of the queue
+instead of being picked again on every run, so newer stale transactions
+always get their turn. Transactions older than
+``RECONCILIATION_MAX_AGE_DAYS`` are no longer checked.
+
+The outcomes are then applied in bulk through ``transactions.transitions``,
+one conditional update per target status. In dry-run mode nothing is written
+and the results are returned as a report.
+"""
+
+import json
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import PaymentMethod, Transaction, TransactionStatus
+from .transitions import OPEN_STATUSES, bulk_transition
+
+logger = logging.getLogger(__name__)
+
+
+class ReconciliationResult:
+    """Provider outcome for one stale transaction"""
+
+    def __init__(self, transaction: Transaction, gateway: str, provider_status: str = '',
+                 new_status: Optional[str] = None, error_message: str = ''):
+        self.transaction = transaction
+        self.gateway = gateway
+        self.provider_status = provider_status
+        self.new_status = new_status
+        self.error_message = error_message
+        self.applied = False
+
+    @property
+    def is_change(self) -> bool:
+        return bool(self.new_status) and self.new_status != self.transaction.status
+
+    def __repr__(self):
+        return f"<ReconciliationResult {self.transaction.reference} {self.provider_status!r} -> {self.new_status}>"
+
+
+class GatewayReconciler(ABC):
+    """Resolves provider statuses for one gateway and merchant
+
+    Subclasses set ``service_path`` and ``status_map`` and implement
+    ``lookup``; gateways with a list endpoint also implement ``scan``.
+    """
+
+    gateway = ''
+    service_path = ''
+    status_map: Dict[str, str] = {}
+    supports_listing = False
+
+    def __init__(self, merchant=None):
+        self.merchant = merchant
+        self.page_size = getattr(settings, 'RECONCILIATION_PAGE_SIZE', 100)
+        self.max_pages = getattr(settings, 'RECONCILIATION_MAX_PAGES', 20)
+        self.service = import_string(self.service_path)(merchant=merchant)
+
+    @staticmethod
+    def get_reference(txn: Transaction) -> str:
+        """The reference the gateway knows the transaction by"""
+        return txn.external_reference or txn.metadata.get('reference_id') or txn.reference
+
+    def result(self, txn: Transaction, provider_status) -> ReconciliationResult:
+        provider_status = str(provider_status or '').lower()
+        return ReconciliationResult(txn, self.gateway, provider_status, self.status_map.get(provider_status))
+
+    @abstractmethod
+    def lookup(self, txn: Transaction) -> ReconciliationResult:
+        """Query the status of a single transaction"""
+
+    def scan(self, transactions: List[Transaction]) -> Dict:
+        """Resolve many transactions from list pages, keyed by transaction pk"""
+        return {}
+
+    def reconcile(self, transactions: List[Transaction]) -> List[ReconciliationResult]:
+        """Resolve a group: list pages first, then single lookups for the rest"""
+        found = self.scan(transactions) if self.supports_listing else {}
+        results = list(found.values())
+        for txn in transactions:
+            if txn.pk not in found:
+                try:
+                    results.append(self.lookup(txn))
+                except Exception as e:
+                    results.append(ReconciliationResult(txn, self.gateway, error_message=str(e)))
+        return results
+
+
+class TransVoucherReconciler(GatewayReconciler):
+    gateway = 'transvoucher'
+    service_path = 'integrations.transvoucher.service.TransVoucherService'
+    status_map = {
+        'completed': TransactionStatus.COMPLETED,
+        'paid': TransactionStatus.COMPLETED,
+        'succeeded': TransactionStatus.COMPLETED,
+        'success': TransactionStatus.COMPLETED,
+        'failed': TransactionStatus.FAILED,
+        'cancelled': TransactionStatus.CANCELLED,
+        'canceled': TransactionStatus.CANCELLED,
+        'expired': TransactionStatus.EXPIRED,
+    }
+    supports_listing = True
+
+    def scan(self, transactions: List[Transaction]) -> Dict:
+        by_reference = {self.get_reference(txn): txn for txn in transactions}
+        from_date = min(txn.created_at for txn in transactions).date().isoformat()
+        found = {}
+        for payment in self.service.iter_payments(
+            page_size=self.page_size, from_date=from_date, max_pages=self.max_pages
+        ):
+            txn = by_reference.get(payment.get('reference_id'))
+            if txn is not None:
+                found[txn.pk] = self.result(txn, payment.get('status'))
+                if len(found) == len(by_reference):
+                    break
+        return found
+
+    def lookup(self, txn: Transaction) -> ReconciliationResult:
+        response = self.service.get_payment_status(self.get_reference(txn))
+        return self.result(txn, (response.get('data') or {}).get('status'))
+
+
+class UniwireReconciler(GatewayReconciler):
+    gateway = 'uniwire'
+    service_path = 'integrations.uniwire.service.UniwireService'
+    status_map = {
+        'complete': TransactionStatus.COMPLETED,
+        'expired': TransactionStatus.EXPIRED,
+    }
+    supports_listing = True
+
+    @staticmethod
+    def get_invoice_reference(invoice: Dict) -> Optional[str]:
+        """Our reference, carried in the invoice passthrough"""
+        try:
+            return json.loads(invoice.get('passthrough') or '{}').get('reference_id')
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    def scan(self, transactions: List[Transaction]) -> Dict:
+        by_reference = {self.get_reference(txn): txn for txn in transactions}
+        found = {}
+        for invoice in self.service.iter_invoices(max_pages=self.max_pages):
+            txn = by_reference.get(self.get_invoice_reference(invoice))
+            if txn is not None:
+                found[txn.pk] = self.result(txn, invoice.get('status'))
+                if len(found) == len(by_reference):
+                    break
+        return found
+
+    @staticmethod
+    def get_invoice_id(txn: Transaction) -> Optional[str]:
+        """The Uniwire invoice id recorded for a transaction"""
+        return txn.metadata.get('invoice_id') or txn.metadata.get('uniwire_invoice_id') or txn.external_reference
+
+    def lookup(self, txn: Transaction) -> ReconciliationResult:
+        """Fetch an invoice the recent invoice pages did not cover by its id"""
+        invoice_id = self.get_invoice_id(txn)
+        if not invoice_id:
+            return ReconciliationResult(txn, self.gateway, error_message='Invoice not found in recent invoices')
+        response = self.service.get_invoice(invoice_id)
+        return self.result(txn, (response.get('result') or {}).get('status'))
+
+
+class UBAReconciler(GatewayReconciler):
+    gateway = 'uba'
+    service_path = 'integrations.services.UBABankService'
+    status_map = {
+        'complete': TransactionStatus.COMPLETED,
+        'completed': TransactionStatus.COMPLETED,
+        'success': TransactionStatus.COMPLETED,
+        'failed': TransactionStatus.FAILED,
+        'declined': TransactionStatus.FAILED,
+        'cancelled': TransactionStatus.CANCELLED,
+        'expired': TransactionStatus.EXPIRED,
+    }
+
+    def lookup(self, txn: Transaction) -> ReconciliationResult:
+        response = self.service.get_payment_status(self.get_reference(txn))
+        data = (response.get('resource') or {}).get('data') or response
+        return self.result(txn, data.get('status'))
+
+
+class CorefyReconciler(GatewayReconciler):
+    gateway = 'corefy'
+    service_path = 'integrations.services.CorefyService'
+    status_map = {
+        'processed': TransactionStatus.COMPLETED,
+        'success': TransactionStatus.COMPLETED,
+        'completed': TransactionStatus.COMPLETED,
+        'process_failed': TransactionStatus.FAILED,
+        'failed': TransactionStatus.FAILED,
+        'declined': TransactionStatus.FAILED,
+        'cancelled': TransactionStatus.CANCELLED,
+        'canceled': TransactionStatus.CANCELLED,
+        'expired': TransactionStatus.EXPIRED,
+    }
+
+    def lookup(self, txn: Transaction) -> ReconciliationResult:
+        response = self.service.get_payment_status(self.get_reference(txn))
+        data = response.get('data') or response
+        return self.result(txn, data.get('status'))
+
+
+RECONCILERS = {
+    reconciler.gateway: reconciler
+    for reconciler in (TransVoucherReconciler, UniwireReconciler, UBAReconciler, CorefyReconciler)
+}
+
+
+def get_reconciler_class(txn: Transaction):
+    """Pick the gateway that processed a transaction"""
+    gateway_code = txn.gateway.code if txn.gateway_id else ''
+    if gateway_code.startswith('uba'):
+        return UBAReconciler
+    if gateway_code == 'corefy':
+        return CorefyReconciler
+    if txn.payment_method == PaymentMethod.CRYPTO:
+        return UniwireReconciler
+    if txn.payment_method == PaymentMethod.CARD:
+        return TransVoucherReconciler
+    return None
+
+
+class ReconciliationEngine:
+    """Reconcile stale open transactions against their gateways"""
+
+    def __init__(self, stale_minutes: int = None, max_workers: int = None, limit: int = None,
+                 gateways: Iterable[str] = None, dry_run: bool = False):
+        self.stale_minutes = stale_minutes or getattr(settings, 'RECONCILIATION_STALE_MINUTES', 30)
+        self.max_workers = max_workers or getattr(settings, 'RECONCILIATION_WORKERS', 8)
+        self.limit = limit or getattr(settings, 'RECONCILIATION_BATCH_SIZE', 500)
+        self.max_age_days = getattr(settings, 'RECONCILIATION_MAX_AGE_DAYS', 30)
+        self.gateways = set(gateways) if gateways else None
+        self.dry_run = dry_run
+
+    def get_stale_transactions(self) -> List[Transaction]:
+        """Open transactions older than the staleness threshold, least recently reconciled first"""
+        now = timezone.now()
+        queryset = Transaction.objects.filter(
+            status__in=OPEN_STATUSES, created_at__lte=now - timezone.timedelta(minutes=self.stale_minutes),
+        )
+        if self.max_age_days:
+            queryset = queryset.filter(created_at__gte=now - timezone.timedelta(days=self.max_age_days))
+        return list(
+            queryset.select_related('gateway', 'merchant')
+            .order_by(F('last_reconciled_at').asc(nulls_first=True), 'created_at')[:self.limit]
+        )
+
+    def build_jobs(self, transactions: List[Transaction]):
+        """Group transactions per gateway and merchant into provider jobs
+
+        Reconcilers, and with them the gateway services, are built here, on
+        the calling thread, because they read merchant credentials from the
+        database. One is built per group; gateways without a list endpoint
+        split the group into single-reference jobs that all share it.
+        """
+        groups = {}
+        unmatched = []
+        for txn in transactions:
+            reconciler_class = get_reconciler_class(txn)
+            if reconciler_class is None:
+                unmatched.append(ReconciliationResult(txn, '', error_message='No gateway to reconcile with'))
+                continue
+            if self.gateways and reconciler_class.gateway not in self.gateways:
+                continue
+            groups.setdefault((reconciler_class, txn.merchant_id), []).append(txn)
+
+        jobs = []
+        for (reconciler_class, _), group in groups.items():
+            try:
+                reconciler = reconciler_class(merchant=group[0].merchant)
+            except Exception as e:
+                unmatched.extend(
+                    ReconciliationResult(txn, reconciler_class.gateway, error_message=str(e)) for txn in group
+                )
+                continue
+            batches = [group] if reconciler_class.supports_listing else [[txn] for txn in group]
+            jobs.extend((reconciler, batch) for batch in batches)
+        return jobs, unmatched
+
+    def _run_job(self, job) -> List[ReconciliationResult]:
+        """Worker entry point: query the provider and release the thread's DB connection"""
+        reconciler, group = job
+        try:
+            return reconciler.reconcile(group)
+        except Exception as e:
+            logger.error(f"{reconciler.gateway} reconciliation failed: {str(e)}")
+            return [ReconciliationResult(txn, reconciler.gateway, error_message=str(e)) for txn in group]
+        finally:
+            connections.close_all()
+
+    def apply(self, results: List[ReconciliationResult]):
+        """Apply changed statuses in bulk, one conditional update per target status"""
+        by_status = {}
+        for result in results:
+            if result.is_change:
+                by_status.setdefault(result.new_status, []).append(result)
+
+        for new_status, status_results in by_status.items():
+            moved = bulk_transition(
+                [result.transaction.pk for result in status_results],
+                new_status,
+                source='reconciliation',
+                description=f"Status reconciled with gateway ({new_status})",
+                failure_reason='Payment failed at gateway' if new_status == TransactionStatus.FAILED else '',
+                failure_code='GATEWAY_RECONCILED' if new_status == TransactionStatus.FAILED else '',
+            )
+            moved_ids = {txn.pk for txn in moved}
+            for result in status_results:
+                result.applied = result.transaction.pk in moved_ids
+
+    def run(self) -> List[ReconciliationResult]:
+        """Reconcile one batch of stale transactions"""
+        transactions = self.get_stale_transactions()
+        jobs, results = self.build_jobs(transactions)
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs)),
+                                    thread_name_prefix='reconciliation') as executor:
+                for job_results in executor.map(self._run_job, jobs):
+                    results.extend(job_results)
+
+        if not self.dry_run:
+            self.apply(results)
+            # Checked transactions go to the back of the queue, whatever the outcome
+            Transaction.objects.filter(pk__in=[result.transaction.pk for result in results]).update(
+                last_reconciled_at=timezone.now()
+            )
+        return results
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.utils import timezone
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from .fees import FeeSchedule
 
 from .models import (
     PaymentGateway,
@@ -31,7 +32,7 @@ class PaymentGatewaySerializer(serializers.ModelSerializer):
             'merchant_id', 'supports_payments', 'supports_refunds', 'supports_payouts',
             'supports_webhooks', 'supports_recurring', 'supported_payment_methods',
             'supported_currencies', 'supported_payment_methods_list', 'supported_currencies_list',
-            'min_amount', 'max_amount', 'transaction_fee_percentage', 'transaction_fee_fixed',
+            'min_amount', 'max_amount', 'transaction_fee_percentage', 'transaction_fee_fixed', 'fee_rules',
             'is_active', 'is_sandbox', 'priority', 'transaction_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -40,8 +41,23 @@ class PaymentGatewaySerializer(serializers.ModelSerializer):
             'public_key': {'write_only': True}
         }
 
+    def validate_fee_rules(self, value):
+        """Validate min/max fees and tiers"""
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Fee rules must be an object.')
+        try:
+            FeeSchedule(
+                min_fee=value.get('min_fee'), max_fee=value.get('max_fee'),
+                tiers=value.get('tiers'), tier_mode=value.get('tier_mode', 'volume'),
+            )
+        except (ValueError, TypeError, AttributeError, ArithmeticError) as e:
+            raise serializers.ValidationError(f"Invalid fee rules: {e}")
+        return value
+
     def get_transaction_count(self, obj):
-        """Get transaction count for this gateway"""
+        """Get transaction count for this gateway (annotated by the list and detail views)"""
+        if hasattr(obj, 'num_transactions'):
+            return obj.num_transactions
         return obj.transactions.count()
 
 
@@ -0,0 +1,42 @@
+"""
+Django signals for transactions app
+
+``transaction_status_changed`` is sent by the ``Transaction.mark_as_*``
+transition methods, and ``transactions_status_changed`` once per batch of a
+bulk transition (``transactions.transitions.bulk_transition``). The fan-out
+stage below turns every transition into an outbound merchant webhook event;
+other consumers can connect to the same signals.
+"""
+
+from django.dispatch import Signal, receiver
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sent with ``transaction`` and ``event_type`` (e.g. 'transaction.completed')
+transaction_status_changed = Signal()
+
+# Sent with ``transactions`` (a batch moved to one status) and ``event_type``
+transactions_status_changed = Signal()
+
+
+@receiver(transaction_status_changed)
+def enqueue_webhook_event(sender, transaction, event_type, **kwargs):
+    """Enqueue an outbound webhook for the merchant's endpoint"""
+    from .webhooks import enqueue_transaction_event
+
+    try:
+        enqueue_transaction_event(transaction, event_type)
+    except Exception as e:
+        logger.error(f"Failed to enqueue {event_type} webhook for {transaction.reference}: {str(e)}")
+
+
+@receiver(transactions_status_changed)
+def enqueue_webhook_events(sender, transactions, event_type, **kwargs):
+    """Enqueue outbound webhooks for a batch of bulk-transitioned transactions"""
+    from .webhooks import enqueue_transaction_events
+
+    try:
+        enqueue_transaction_events(transactions, event_type)
+    except Exception as e:
+        logger.error(f"Failed to enqueue {event_type} webhooks for {len(transactions)} transactions: {str(e)}")
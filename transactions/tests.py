@@ -1,3 +1,612 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.exceptions import ValidationError
+from django.db.models import Count
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.admin_pagination import EstimatedCountPaginator
+from authentication.models import CustomUser, Merchant, PreferredCurrency, WhitelabelPartner
+from .fees import FeeSchedule, recalculate_fees
+from .models import PaymentGateway, Transaction, TransactionEvent, TransactionStatus, Webhook, PaymentMethod
+from .reconciliation import ReconciliationEngine
+from .serializers import PaymentGatewaySerializer
+from .timeseries import TimeseriesError, get_timeseries
+from .webhooks import WebhookDeliveryEngine, get_webhook_backlog, verify_signature, SIGNATURE_HEADER
+
+
+class WebhookDeliveryEngineTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(
+            email='hooks@example.com', password='testpass123', first_name='Hook', last_name='Owner'
+        )
+        merchant = Merchant.objects.create(
+            user=user,
+            business_name='Hook Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000002',
+            business_email='hook-shop@example.com',
+        )
+        currency = PreferredCurrency.objects.create(name='US Dollar', code='USD', symbol='$')
+        self.merchant = merchant
+        self.currency = currency
+        self.transaction = Transaction.objects.create(
+            merchant=merchant, currency=currency, amount=Decimal('10.00'), payment_method=PaymentMethod.CARD,
+        )
+        self.partner = WhitelabelPartner.objects.create(
+            name='Hook Shop', code=f"merchant_{merchant.id}", contact_email='hook-shop@example.com',
+            webhook_url='https://merchant.example.com/hooks', webhook_secret='whsec_test',
+        )
+        self.webhook = Webhook.objects.create(
+            transaction=self.transaction, url='https://merchant.example.com/hooks',
+            event_type='transaction.completed', payload={'reference': self.transaction.reference},
+        )
+
+    def _response(self, status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        response.reason = 'OK' if status_code < 400 else 'Server Error'
+        response._content = b'{}'
+        return response
+
+    def test_delivers_signed_payload(self):
+        engine = WebhookDeliveryEngine()
+        with mock.patch.object(engine.session, 'post', return_value=self._response(200)) as post:
+            engine.run()
+
+        body = post.call_args.kwargs['data'].decode()
+        signature = post.call_args.kwargs['headers'][SIGNATURE_HEADER]
+        self.assertTrue(verify_signature('whsec_test', body, signature))
+        self.webhook.refresh_from_db()
+        self.assertTrue(self.webhook.is_delivered)
+        self.assertEqual(self.webhook.status_code, 200)
+        self.assertEqual(self.webhook.attempts, 1)
+        self.assertIsNotNone(self.webhook.response_time_ms)
+
+    def test_failure_schedules_backoff_retry(self):
+        engine = WebhookDeliveryEngine()
+        with mock.patch.object(engine.session, 'post', return_value=self._response(500)):
+            engine.run()
+
+        self.webhook.refresh_from_db()
+        self.assertFalse(self.webhook.is_delivered)
+        self.assertEqual(self.webhook.attempts, 1)
+        self.assertEqual(self.webhook.status_code, 500)
+        delay = (self.webhook.next_attempt_at - timezone.now()).total_seconds()
+        self.assertTrue(25 <= delay <= 60)
+
+    def test_unexpected_error_fails_only_its_webhook(self):
+        other = Transaction.objects.create(
+            merchant=self.merchant, currency=self.currency, amount=Decimal('5.00'), payment_method=PaymentMethod.CARD,
+        )
+        broken = Webhook.objects.create(
+            transaction=other, url='https://broken.example.com/hooks', event_type='transaction.completed', payload={},
+        )
+
+        def post(url, **kwargs):
+            if 'broken' in url:
+                raise UnicodeError('label too long')
+            return self._response(200)
+
+        engine = WebhookDeliveryEngine()
+        with mock.patch.object(engine.session, 'post', side_effect=post):
+            engine.run()
+
+        self.webhook.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertTrue(self.webhook.is_delivered)
+        self.assertFalse(broken.is_delivered)
+        self.assertEqual(broken.attempts, 1)
+        self.assertIn('label too long', broken.error_message)
+        self.assertIsNone(broken.leased_until)
+
+    def test_claimed_webhooks_are_leased(self):
+        engine = WebhookDeliveryEngine()
+        self.assertEqual(len(engine.claim_batch()), 1)
+        self.assertEqual(engine.claim_batch(), [])
+
+    def test_status_change_fans_out_to_webhook(self):
+        self.transaction.mark_as_completed()
+
+        webhook = Webhook.objects.exclude(pk=self.webhook.pk).get()
+        self.assertEqual(webhook.event_type, 'transaction.completed')
+        self.assertEqual(webhook.url, self.partner.webhook_url)
+        self.assertEqual(webhook.payload['data']['status'], 'completed')
+        self.assertEqual(get_webhook_backlog()['depth'], 2)
+
+    def test_later_event_waits_for_earlier_event(self):
+        self.transaction.mark_as_processing()
+        later = Webhook.objects.exclude(pk=self.webhook.pk).get()
+        self.webhook.next_attempt_at = timezone.now() + timezone.timedelta(minutes=5)
+        self.webhook.save(update_fields=['next_attempt_at'])
+
+        engine = WebhookDeliveryEngine()
+        self.assertEqual(engine.claim_batch(), [])
+        later.refresh_from_db()
+        self.assertGreater(later.next_attempt_at, timezone.now())
+
+    def test_batching_endpoint_receives_one_coalesced_post(self):
+        self.webhook.delete()
+        self.partner.webhook_batching_enabled = True
+        self.partner.save()
+        other = Transaction.objects.create(
+            merchant=self.merchant, currency=self.currency, amount=Decimal('5.00'), payment_method=PaymentMethod.CARD,
+        )
+        self.transaction.mark_as_completed()
+        other.mark_as_failed(reason='Declined')
+        self.assertEqual(len(set(Webhook.objects.values_list('next_attempt_at', flat=True))), 1)
+        Webhook.objects.update(next_attempt_at=timezone.now())
+
+        engine = WebhookDeliveryEngine()
+        with mock.patch.object(engine.session, 'post', return_value=self._response(200)) as post:
+            engine.run()
+
+        self.assertEqual(post.call_count, 1)
+        body = json.loads(post.call_args.kwargs['data'])
+        self.assertEqual([event['type'] for event in body['data']], ['transaction.completed', 'transaction.failed'])
+        self.assertFalse(Webhook.objects.filter(is_delivered=False).exists())
+
+
+class ReconciliationEngineTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(
+            email='recon@example.com', password='testpass123', first_name='Re', last_name='Con'
+        )
+        merchant = Merchant.objects.create(
+            user=user,
+            business_name='Recon Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000005',
+            business_email='recon-shop@example.com',
+        )
+        currency = PreferredCurrency.objects.create(name='US Dollar', code='USD', symbol='$')
+        self.merchant, self.currency = merchant, currency
+        self.paid, self.open = [
+            Transaction.objects.create(
+                merchant=merchant, currency=currency, amount=Decimal('15.00'),
+                payment_method=PaymentMethod.CARD, external_reference=reference,
+            )
+            for reference in ('PEX-REF-PAID', 'PEX-REF-OPEN')
+        ]
+        Transaction.objects.update(created_at=timezone.now() - timezone.timedelta(hours=2))
+
+        self.service = mock.Mock()
+        self.service.iter_payments.return_value = iter([
+            {'reference_id': 'PEX-REF-PAID', 'status': 'completed'},
+            {'reference_id': 'PEX-REF-OTHER', 'status': 'failed'},
+        ])
+        self.service.get_payment_status.return_value = {'success': True, 'data': {'status': 'pending'}}
+        patcher = mock.patch('transactions.reconciliation.import_string', return_value=lambda merchant: self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_dry_run_reports_without_applying(self):
+        results = ReconciliationEngine(dry_run=True).run()
+
+        changes = [result for result in results if result.is_change]
+        self.assertEqual([result.transaction.pk for result in changes], [self.paid.pk])
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.status, TransactionStatus.PENDING)
+
+    def test_list_page_resolves_group_and_changes_are_applied(self):
+        results = ReconciliationEngine().run()
+
+        self.assertEqual(self.service.iter_payments.call_count, 1)
+        self.service.get_payment_status.assert_called_once_with('PEX-REF-OPEN')
+        self.assertTrue(next(result for result in results if result.transaction.pk == self.paid.pk).applied)
+        self.paid.refresh_from_db()
+        self.open.refresh_from_db()
+        self.assertEqual(self.paid.status, TransactionStatus.COMPLETED)
+        self.assertIsNotNone(self.paid.completed_at)
+        self.assertEqual(self.paid.events.get().source, 'reconciliation')
+        self.assertEqual(self.open.status, TransactionStatus.PENDING)
+
+
+    def test_unresolved_transactions_move_to_the_back_of_the_queue(self):
+        self.service.iter_payments.side_effect = lambda **kwargs: iter([])
+
+        first = ReconciliationEngine(limit=1).run()
+        second = ReconciliationEngine(limit=1).run()
+
+        self.assertEqual({first[0].transaction.pk, second[0].transaction.pk}, {self.paid.pk, self.open.pk})
+        self.assertFalse(Transaction.objects.filter(last_reconciled_at__isnull=True).exists())
+
+    def test_uniwire_falls_back_to_invoice_lookup(self):
+        Transaction.objects.update(status=TransactionStatus.COMPLETED)
+        crypto = Transaction.objects.create(
+            merchant=self.merchant, currency=self.currency, amount=Decimal('15.00'),
+            payment_method=PaymentMethod.CRYPTO, metadata={'invoice_id': 'inv-42'},
+        )
+        Transaction.objects.filter(pk=crypto.pk).update(created_at=timezone.now() - timezone.timedelta(hours=2))
+        self.service.iter_invoices.return_value = iter([])
+        self.service.get_invoice.return_value = {'result': {'id': 'inv-42', 'status': 'complete'}}
+
+        ReconciliationEngine().run()
+
+        self.service.get_invoice.assert_called_once_with('inv-42')
+        crypto.refresh_from_db()
+        self.assertEqual(crypto.status, TransactionStatus.COMPLETED)
+
+    def test_single_reference_jobs_share_one_service_per_merchant(self):
+        gateway = PaymentGateway.objects.create(name='UBA', code='uba_kenya', api_endpoint='https://gw.example.com')
+        user = CustomUser.objects.create_user(
+            email='recon-other@example.com', password='testpass123', first_name='Other', last_name='Shop'
+        )
+        other_merchant = Merchant.objects.create(
+            user=user,
+            business_name='Other Recon Shop',
+            business_address='2 Test Street',
+            business_phone='+254700000015',
+            business_email='other-recon-shop@example.com',
+        )
+        Transaction.objects.create(
+            merchant=other_merchant, currency=self.currency, amount=Decimal('15.00'),
+            payment_method=PaymentMethod.CARD, external_reference='PEX-REF-OTHER-SHOP',
+        )
+        Transaction.objects.update(gateway=gateway, created_at=timezone.now() - timezone.timedelta(hours=2))
+        services = {}
+
+        def build(merchant):
+            services[merchant.pk] = mock.Mock(**{'get_payment_status.return_value': {'status': 'pending'}})
+            return services[merchant.pk]
+
+        with mock.patch('transactions.reconciliation.import_string', return_value=build):
+            ReconciliationEngine().run()
+
+        self.assertEqual(set(services), {self.merchant.pk, other_merchant.pk})
+        self.assertEqual(services[self.merchant.pk].get_payment_status.call_count, 2)
+        self.assertEqual(services[other_merchant.pk].get_payment_status.call_count, 1)
+
+class TransactionTimeseriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user('series@example.com', 'pass-1234', first_name='Series', last_name='Owner')
+        self.merchant = Merchant.objects.create(
+            user=user,
+            business_name='Series Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000006',
+            business_email='series-shop@example.com',
+        )
+        self.usd = PreferredCurrency.objects.create(name='US Dollar', code='USD', symbol='$')
+        self.kes = PreferredCurrency.objects.create(name='Kenyan Shilling', code='KES', symbol='KSh')
+        self.today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def create_transaction(self, days_ago, currency, status=TransactionStatus.COMPLETED, amount='10.00'):
+        txn = Transaction.objects.create(
+            merchant=self.merchant, currency=currency, amount=Decimal(amount),
+            payment_method=PaymentMethod.CARD, status=status,
+        )
+        Transaction.objects.filter(pk=txn.pk).update(created_at=self.today - timezone.timedelta(days=days_ago, hours=-1))
+        return txn
+
+    def test_daily_series_grouped_by_currency(self):
+        self.create_transaction(2, self.usd)
+        self.create_transaction(2, self.usd, status=TransactionStatus.FAILED)
+        self.create_transaction(2, self.kes, amount='500.00')
+        self.create_transaction(1, self.usd, amount='7.50')
+
+        result = get_timeseries(self.merchant, 'day', self.today - timezone.timedelta(days=2), self.today)
+
+        self.assertEqual(len(result['buckets']), 2)
+        usd = [row for row in result['series'] if row['currency'] == 'USD']
+        self.assertEqual([(row['count'], row['volume'], row['success_rate']) for row in usd], [
+            (2, Decimal('10.00'), 50.0),
+            (1, Decimal('7.50'), 100.0),
+        ])
+        filtered = get_timeseries(self.merchant, 'day', self.today - timezone.timedelta(days=2), self.today, currency='KES')
+        self.assertEqual([row['volume'] for row in filtered['series']], [Decimal('500.00')])
+
+    def test_closed_buckets_are_served_from_cache(self):
+        self.create_transaction(3, self.usd)
+        start = self.today - timezone.timedelta(days=3)
+        get_timeseries(self.merchant, 'day', start, self.today)
+        self.create_transaction(3, self.usd)
+
+        with self.assertNumQueries(0):
+            cached = get_timeseries(self.merchant, 'day', start, self.today)
+        self.assertEqual(cached['series'][0]['count'], 1)
+
+        with self.assertNumQueries(1):
+            get_timeseries(self.merchant, 'day', start, self.today + timezone.timedelta(days=1))
+
+    def test_rejects_unknown_interval_and_oversized_ranges(self):
+        with self.assertRaises(TimeseriesError):
+            get_timeseries(self.merchant, 'month', self.today - timezone.timedelta(days=1), self.today)
+        with self.assertRaises(TimeseriesError):
+            get_timeseries(self.merchant, 'hour', self.today - timezone.timedelta(days=60), self.today)
+
+
+class BulkAdminActionTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser('root@example.com', 'pass-1234', first_name='Root', last_name='Admin')
+        self.client.force_login(self.admin)
+        user = CustomUser.objects.create_user('bulk@example.com', 'pass-1234', first_name='Bulk', last_name='Owner')
+        merchant = Merchant.objects.create(
+            user=user,
+            business_name='Bulk Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000007',
+            business_email='bulk-shop@example.com',
+        )
+        currency = PreferredCurrency.objects.create(name='US Dollar', code='USD', symbol='$')
+        self.transactions = [
+            Transaction.objects.create(
+                merchant=merchant, currency=currency, amount=Decimal('5.00'),
+                payment_method=PaymentMethod.CARD, status=status,
+            )
+            for status in [TransactionStatus.PENDING, TransactionStatus.PROCESSING, TransactionStatus.COMPLETED]
+        ]
+
+    def run_action(self, model, action, objects):
+        return self.client.post(reverse(f'admin:transactions_{model}_changelist'), {
+            'action': action,
+            '_selected_action': [str(obj.pk) for obj in objects],
+        }, follow=True)
+
+    def test_mark_as_failed_moves_only_open_transactions(self):
+        response = self.run_action('transaction', 'mark_as_failed', self.transactions)
+
+        self.assertContains(response, '2 transactions marked as failed.')
+        statuses = dict(Transaction.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[self.transactions[0].pk], TransactionStatus.FAILED)
+        self.assertEqual(statuses[self.transactions[1].pk], TransactionStatus.FAILED)
+        self.assertEqual(statuses[self.transactions[2].pk], TransactionStatus.COMPLETED)
+
+        events = TransactionEvent.objects.filter(new_status=TransactionStatus.FAILED)
+        self.assertEqual(events.count(), 2)
+        self.assertTrue(all(event.source == 'admin' and event.user_id == self.admin.pk for event in events))
+        self.assertEqual(
+            Transaction.objects.get(pk=self.transactions[0].pk).failure_reason, 'Manually marked as failed by admin'
+        )
+
+    def test_bulk_transition_fans_out_webhooks_in_bulk(self):
+        from .transitions import bulk_transition
+
+        merchant = self.transactions[0].merchant
+        WhitelabelPartner.objects.create(
+            name='Bulk Shop', code=f"merchant_{merchant.id}", contact_email='bulk-shop@example.com',
+            webhook_url='https://merchant.example.com/hooks', webhook_secret='whsec_test',
+        )
+
+        def transition_queries(count):
+            ids = [
+                Transaction.objects.create(
+                    merchant=merchant, currency=self.transactions[0].currency, amount=Decimal('5.00'),
+                    payment_method=PaymentMethod.CARD,
+                ).pk
+                for _ in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                moved = bulk_transition(ids, TransactionStatus.FAILED)
+            self.assertEqual(len(moved), count)
+            return len(queries)
+
+        self.assertEqual(transition_queries(2), transition_queries(6))
+        webhooks = Webhook.objects.filter(event_type='transaction.failed')
+        self.assertEqual(webhooks.count(), 8)
+        self.assertTrue(all(webhook.payload['data']['status'] == TransactionStatus.FAILED for webhook in webhooks))
+
+    def test_retry_webhooks_skips_delivered_and_exhausted(self):
+        later = timezone.now() + timezone.timedelta(hours=1)
+        retryable, delivered, exhausted = [
+            Webhook.objects.create(
+                transaction=self.transactions[0], url='https://merchant.example.com/hooks',
+                event_type='transaction.failed', payload={}, next_attempt_at=later, **fields,
+            )
+            for fields in [{'attempts': 1}, {'is_delivered': True}, {'attempts': 3}]
+        ]
+
+        response = self.run_action('webhook', 'retry_webhooks', [retryable, delivered, exhausted])
+
+        self.assertContains(response, '1 webhooks scheduled for retry.')
+        retryable.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertLessEqual(retryable.next_attempt_at, timezone.now())
+        self.assertEqual(exhausted.next_attempt_at, later)
+
+    def test_retry_webhooks_leaves_in_flight_deliveries_alone(self):
+        webhook = Webhook.objects.create(
+            transaction=self.transactions[0], url='https://merchant.example.com/hooks',
+            event_type='transaction.failed', payload={},
+        )
+        claimed = WebhookDeliveryEngine().claim_batch()
+        self.assertEqual(claimed, [webhook])
+
+        self.run_action('webhook', 'retry_webhooks', [webhook])
+
+        self.assertEqual(WebhookDeliveryEngine().claim_batch(), [])
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            CustomUser.objects.create_superuser('lists@example.com', 'pass-1234', first_name='List', last_name='Admin')
+        )
+        user = CustomUser.objects.create_user('gw@example.com', 'pass-1234', first_name='Gate', last_name='Owner')
+        self.merchant = Merchant.objects.create(
+            user=user,
+            business_name='Gateway Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000008',
+            business_email='gateway-shop@example.com',
+        )
+        self.currency = PreferredCurrency.objects.create(name='US Dollar', code='USD', symbol='$')
+
+    def create_gateway(self, code, transactions=0):
+        gateway = PaymentGateway.objects.create(name=code.title(), code=code, api_endpoint='https://gw.example.com')
+        for _ in range(transactions):
+            Transaction.objects.create(
+                merchant=self.merchant, currency=self.currency, amount=Decimal('1.00'),
+                payment_method=PaymentMethod.CARD, gateway=gateway,
+            )
+        return gateway
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:transactions_{model}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_gateway_counts_are_annotated(self):
+        self.create_gateway('alpha', transactions=2)
+        one_gateway = self.changelist_queries('paymentgateway')
+        self.create_gateway('beta', transactions=1)
+        self.create_gateway('gamma')
+
+        self.assertEqual(self.changelist_queries('paymentgateway'), one_gateway)
+        gateway = PaymentGateway.objects.annotate(num_transactions=Count('transactions')).get(code='alpha')
+        with self.assertNumQueries(0):
+            self.assertEqual(PaymentGatewaySerializer(gateway).data['transaction_count'], 2)
+
+    def test_transaction_changelist_query_count_is_constant(self):
+        gateway = self.create_gateway('alpha', transactions=1)
+        one_transaction = self.changelist_queries('transaction')
+        for _ in range(5):
+            Transaction.objects.create(
+                merchant=self.merchant, currency=self.currency, amount=Decimal('1.00'),
+                payment_method=PaymentMethod.CARD, gateway=gateway,
+            )
+
+        self.assertEqual(self.changelist_queries('transaction'), one_transaction)
+
+    @override_settings(ADMIN_COUNT_LIMIT=3)
+    def test_paginator_caps_count(self):
+        self.create_gateway('alpha', transactions=5)
+
+        paginator = EstimatedCountPaginator(Transaction.objects.all(), 2)
+        self.assertEqual(paginator.count, 3)
+        self.assertTrue(paginator.count_is_capped)
+        self.assertEqual(EstimatedCountPaginator(Transaction.objects.all(), 2, exact=True).count, 5)
+        paginator = EstimatedCountPaginator(Transaction.objects.filter(amount=Decimal('2.00')), 2)
+        self.assertEqual(paginator.count, 0)
+        self.assertFalse(paginator.count_is_capped)
+
+    @override_settings(ADMIN_COUNT_LIMIT=3)
+    def test_capped_changelist_offers_exact_count(self):
+        from .admin import TransactionAdmin
+
+        self.create_gateway('alpha', transactions=5)
+        url = reverse('admin:transactions_transaction_changelist')
+
+        with mock.patch.object(TransactionAdmin, 'list_per_page', 2):
+            response = self.client.get(url)
+            self.assertContains(response, '3+ Transactions')
+            self.assertContains(response, 'href="?exact_count=1"')
+            # The last page is past the cap until the rows are counted
+            self.assertEqual(self.client.get(url, {'p': '3'}).status_code, 302)
+
+            response = self.client.get(url, {'exact_count': '1', 'p': '3'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '5 Transactions')
+
+
+class FeeEngineTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user('fees@example.com', 'pass-1234', first_name='Fee', last_name='Owner')
+        self.merchant = Merchant.objects.create(
+            user=user,
+            business_name='Fee Shop',
+            business_address='1 Test Street',
+            business_phone='+254700000009',
+            business_email='fee-shop@example.com',
+        )
+        self.currency = PreferredCurrency.objects.create(name='US Dollar', code='USD', symbol='$')
+        self.gateway = PaymentGateway.objects.create(name='Fee Gateway', code='feegw', api_endpoint='https://gw.example.com')
+
+    def test_default_gateway_fees_are_quantised(self):
+        fees = self.gateway.calculate_fees(Decimal('10.00'))
+        self.assertEqual(fees, {
+            'percentage_fee': Decimal('0.29'),
+            'fixed_fee': Decimal('0.30'),
+            'total_fee': Decimal('0.59'),
+            'net_amount': Decimal('9.41'),
+        })
+        self.assertEqual(str(fees['total_fee']), '0.59')
+        # 2.9% of 0.50 is 0.0145, rounded half up
+        self.assertEqual(self.gateway.calculate_fees(Decimal('0.50'))['percentage_fee'], Decimal('0.01'))
+
+    def test_tiers_and_clamps(self):
+        tiers = [
+            {'up_to': '100.00', 'percentage': '0.0300', 'fixed': '0.30'},
+            {'up_to': None, 'percentage': '0.0200', 'fixed': '0.00'},
+        ]
+        volume = FeeSchedule(tiers=tiers, min_fee='0.50', max_fee='10.00')
+        self.assertEqual(volume.calculate_minor([1000, 10000, 20000, 100000]), [
+            (30, 30, 60), (300, 30, 330), (400, 0, 400), (2000, 0, 1000),
+        ])
+        self.assertEqual(volume.calculate(Decimal('1.00'))['total_fee'], Decimal('0.50'))
+
+        graduated = FeeSchedule(tiers=tiers, fixed='0.25', tier_mode='graduated')
+        # 3% of the first 100.00 plus 2% of the remaining 100.00, plus the fixed fee
+        self.assertEqual(graduated.calculate(Decimal('200.00'))['total_fee'], Decimal('5.25'))
+
+        with self.assertRaises(ValueError):
+            FeeSchedule(tiers=[{'up_to': None, 'percentage': '0.01'}, {'up_to': '5.00', 'percentage': '0.02'}])
+
+    def test_invalid_fee_rules_fail_validation(self):
+        self.gateway.fee_rules = {'min_fee': '5.00', 'max_fee': '1.00'}
+        with self.assertRaises(ValidationError):
+            self.gateway.full_clean()
+        serializer = PaymentGatewaySerializer(self.gateway, data={'fee_rules': {'tier_mode': 'sliding'}}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('fee_rules', serializer.errors)
+
+    def test_recalculate_fees_uses_bulk_update(self):
+        other = PaymentGateway.objects.create(
+            name='Flat Gateway', code='flatgw', api_endpoint='https://gw.example.com',
+            transaction_fee_percentage=Decimal('0.0100'), transaction_fee_fixed=Decimal('0.00'),
+        )
+        transactions = [
+            Transaction.objects.create(
+                merchant=self.merchant, currency=self.currency, amount=amount, gateway=gateway,
+                payment_method=PaymentMethod.CARD,
+            )
+            for amount, gateway in [
+                (Decimal('10.00'), self.gateway), (Decimal('250.00'), self.gateway),
+                (Decimal('99.99'), other), (Decimal('5.00'), None),
+            ]
+        ]
+        self.gateway.fee_rules = {'max_fee': '5.00'}
+        self.gateway.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            updated = recalculate_fees(Transaction.objects.all())
+        self.assertEqual(updated, 3)
+        self.assertLessEqual(len(queries), 8)
+
+        fees = dict(Transaction.objects.values_list('pk', 'fee_amount'))
+        self.assertEqual(fees[transactions[0].pk], Decimal('0.59'))
+        self.assertEqual(fees[transactions[1].pk], Decimal('5.00'))
+        self.assertEqual(fees[transactions[2].pk], Decimal('1.00'))
+        self.assertEqual(fees[transactions[3].pk], Decimal('0.00'))
+        self.assertEqual(Transaction.objects.get(pk=transactions[1].pk).net_amount, Decimal('245.00'))
+        self.assertEqual(recalculate_fees(Transaction.objects.all()), 0)
+
+        event = TransactionEvent.objects.get(transaction=transactions[1], event_type='fee_recalculated')
+        self.assertEqual(event.metadata['new_fee_amount'], '5.00')
+        self.assertEqual(event.metadata['old_fee_amount'], str(transactions[1].fee_amount))
+
+    def test_recalculate_fees_leaves_settled_and_closed_transactions(self):
+        completed, settled = [
+            Transaction.objects.create(
+                merchant=self.merchant, currency=self.currency, amount=Decimal('10.00'), gateway=self.gateway,
+                payment_method=PaymentMethod.CARD, status=TransactionStatus.COMPLETED, is_settled=is_settled,
+            )
+            for is_settled in (False, True)
+        ]
+        Transaction.objects.update(fee_amount=Decimal('9.00'))
+
+        self.assertEqual(recalculate_fees(Transaction.objects.all()), 0)
+        self.assertEqual(recalculate_fees(Transaction.objects.all(), include_closed=True), 1)
+
+        fees = dict(Transaction.objects.values_list('pk', 'fee_amount'))
+        self.assertEqual(fees[completed.pk], Decimal('0.59'))
+        self.assertEqual(fees[settled.pk], Decimal('9.00'))
@@ -0,0 +1,157 @@
+"""
+Transaction Time Series
+
+Bucketed transaction analytics for merchant charts: count, completed and failed
+counts, volume, fees and success rate per time bucket (hour, day or week),
+broken down by currency and payment method.
+
+Every bucket in the requested range is served from the cache when possible.
+The remaining buckets are computed together with a single ``Trunc*`` group-by
+over the range they span. A bucket counts as closed once it ended more than
+``TRANSACTION_TIMESERIES_SETTLE_SECONDS`` ago (long enough for late gateway
+outcomes and reconciliation to land); closed buckets are cached for
+``TRANSACTION_TIMESERIES_CACHE_TTL`` seconds and never recomputed while cached,
+and the still-open buckets at the end of the range are always computed fresh.
+
+Currency and payment method filters are applied to the cached rows, so all
+filter combinations share the same per-bucket cache entries.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+
+from .models import Transaction, TransactionStatus, TransactionType
+
+CACHE_KEY_PREFIX = 'txn_timeseries'
+
+INTERVALS = {
+    'hour': (TruncHour, timedelta(hours=1)),
+    'day': (TruncDay, timedelta(days=1)),
+    'week': (TruncWeek, timedelta(weeks=1)),
+}
+
+# Upper bound on buckets per request, e.g. ~41 days of hourly buckets
+MAX_BUCKETS = 1000
+
+
+class TimeseriesError(ValueError):
+    """Invalid time series request (bad interval or range)"""
+
+
+def floor_to_bucket(moment: datetime, interval: str) -> datetime:
+    """Start of the bucket containing ``moment``, in the current time zone"""
+    moment = timezone.localtime(moment)
+    if interval == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def get_buckets(interval: str, start: datetime, end: datetime) -> List[datetime]:
+    """Bucket starts covering ``[start, end)``"""
+    if interval not in INTERVALS:
+        raise TimeseriesError(f"Interval must be one of: {', '.join(INTERVALS)}")
+    if end <= start:
+        raise TimeseriesError("The end of the range must be after its start")
+
+    step = INTERVALS[interval][1]
+    buckets = []
+    bucket = floor_to_bucket(start, interval)
+    while bucket < end:
+        buckets.append(bucket)
+        if len(buckets) > MAX_BUCKETS:
+            raise TimeseriesError(f"Range spans more than {MAX_BUCKETS} {interval} buckets")
+        if interval == 'hour':
+            bucket = timezone.localtime(bucket + step)
+        else:
+            # Step in local wall-clock time so DST changes do not shift day/week buckets
+            bucket = timezone.make_aware(timezone.make_naive(bucket) + step)
+    return buckets
+
+
+def _cache_key(merchant_id, interval: str, bucket: datetime) -> str:
+    return f"{CACHE_KEY_PREFIX}:{merchant_id}:{interval}:{int(bucket.timestamp())}"
+
+
+def _compute_buckets(merchant, interval: str, start: datetime, end: datetime) -> Dict[datetime, List[Dict]]:
+    """Rows per bucket for ``[start, end)`` from one group-by query"""
+    trunc = INTERVALS[interval][0]
+    completed = Q(status=TransactionStatus.COMPLETED)
+    rows = (
+        Transaction.objects.filter(merchant=merchant, created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=trunc('created_at'))
+        .values('bucket', 'currency__code', 'payment_method')
+        .annotate(
+            count=Count('id'),
+            completed=Count('id', filter=completed),
+            failed=Count('id', filter=Q(status=TransactionStatus.FAILED)),
+            volume=Sum('amount', filter=completed & Q(transaction_type=TransactionType.PAYMENT)),
+            fees=Sum('fee_amount', filter=completed),
+        )
+        .order_by('bucket', 'currency__code', 'payment_method')
+    )
+
+    by_bucket = {}
+    for row in rows:
+        by_bucket.setdefault(timezone.localtime(row['bucket']), []).append({
+            'currency': row['currency__code'],
+            'payment_method': row['payment_method'],
+            'count': row['count'],
+            'completed': row['completed'],
+            'failed': row['failed'],
+            'volume': row['volume'] or Decimal('0'),
+            'fees': row['fees'] or Decimal('0'),
+        })
+    return by_bucket
+
+
+def get_timeseries(merchant, interval: str, start: datetime, end: datetime,
+                   currency: Optional[str] = None, payment_method: Optional[str] = None) -> Dict:
+    """Bucketed transaction series for ``merchant`` over ``[start, end)``"""
+    buckets = get_buckets(interval, start, end)
+    step = INTERVALS[interval][1]
+    settle = timedelta(seconds=getattr(settings, 'TRANSACTION_TIMESERIES_SETTLE_SECONDS', 3600))
+    closed_before = timezone.now() - settle
+
+    keys = {bucket: _cache_key(merchant.id, interval, bucket) for bucket in buckets}
+    cached = cache.get_many(list(keys.values()))
+    rows = {bucket: cached[key] for bucket, key in keys.items() if key in cached}
+
+    missing = [bucket for bucket in buckets if bucket not in rows]
+    if missing:
+        computed = _compute_buckets(merchant, interval, missing[0], missing[-1] + step)
+        closed = {}
+        for bucket in missing:
+            rows[bucket] = computed.get(bucket, [])
+            if bucket + step <= closed_before:
+                closed[keys[bucket]] = rows[bucket]
+        if closed:
+            cache.set_many(closed, getattr(settings, 'TRANSACTION_TIMESERIES_CACHE_TTL', 30 * 24 * 3600))
+
+    series = []
+    for bucket in buckets:
+        for row in rows[bucket]:
+            if currency and row['currency'] != currency:
+                continue
+            if payment_method and row['payment_method'] != payment_method:
+                continue
+            series.append({
+                'bucket': bucket.isoformat(),
+                **row,
+                'success_rate': round(row['completed'] / row['count'] * 100, 2) if row['count'] else 0,
+            })
+
+    return {
+        'interval': interval,
+        'buckets': [bucket.isoformat() for bucket in buckets],
+        'series': series,
+    }
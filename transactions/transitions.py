@@ -0,0 +1,107 @@
+"""
+Bulk Transaction State Transitions
+
+Moves many transactions to a new status with conditional bulk ``UPDATE``
+statements instead of a ``save()`` per row. Only transactions still in one
+of the allowed source statuses are moved (the rows are locked first, so the
+set that is reported as changed is exactly the set that was updated), the
+status timestamps the ``mark_as_*`` methods would set are written in the same
+statement, and a ``TransactionEvent`` is bulk-created for every change.
+
+Instead of ``transaction_status_changed`` per row, ``transactions_status_changed``
+is sent once per batch. Its webhook fan-out queues the same events as the
+``mark_as_*`` methods, but it looks up each merchant's partner and batch
+window once and inserts the batch's webhooks with one ``bulk_create``, so the
+query count grows with the number of batches and merchants, not rows.
+
+The transactions can be given as ids or as a queryset (e.g. an admin action's
+selection); a queryset is applied as a subquery when locking. Updates, events
+and reloads are issued in batches of ``BATCH_SIZE`` rows, and each ``UPDATE``
+repeats the source-status guard in SQL.
+"""
+
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .models import Transaction, TransactionEvent, TransactionStatus
+from .signals import transactions_status_changed
+
+# Statuses a transaction can still leave through a gateway outcome
+OPEN_STATUSES = (TransactionStatus.PENDING, TransactionStatus.PROCESSING)
+
+# Rows per TransactionEvent insert and per reload for webhook fan-out
+BATCH_SIZE = 500
+
+
+def _status_fields(new_status: str, now, failure_reason: str = '', failure_code: str = '') -> Dict:
+    """Columns written alongside the status, mirroring ``Transaction.mark_as_*``"""
+    fields = {'status': new_status, 'updated_at': now}
+    if new_status == TransactionStatus.PROCESSING:
+        fields['processed_at'] = now
+    elif new_status == TransactionStatus.COMPLETED:
+        fields['completed_at'] = now
+    elif new_status == TransactionStatus.FAILED:
+        fields.update(failed_at=now, failure_reason=failure_reason, failure_code=failure_code)
+    elif new_status == TransactionStatus.EXPIRED:
+        fields.update(failed_at=now, failure_reason=failure_reason or 'Payment session expired')
+    return fields
+
+
+def bulk_transition(
+    transaction_ids: Iterable,
+    new_status: str,
+    from_statuses: Iterable[str] = OPEN_STATUSES,
+    source: str = 'system',
+    description: str = '',
+    user=None,
+    failure_reason: str = '',
+    failure_code: str = '',
+    metadata: Dict = None,
+) -> List[Transaction]:
+    """Move transactions to ``new_status`` and return the ones that changed"""
+    if isinstance(transaction_ids, QuerySet):
+        selected = Q(pk__in=transaction_ids.values('pk'))
+    else:
+        selected = Q(pk__in=list(transaction_ids))
+    eligible = (
+        Transaction.objects.filter(selected, status__in=list(from_statuses))
+        .exclude(status=new_status)
+    )
+
+    with transaction.atomic():
+        moved = list(eligible.select_for_update().only('id', 'status').order_by())
+        if not moved:
+            return []
+
+        now = timezone.now()
+        fields = _status_fields(new_status, now, failure_reason, failure_code)
+        pk_batches = [[txn.pk for txn in moved[start:start + BATCH_SIZE]] for start in range(0, len(moved), BATCH_SIZE)]
+        for batch in pk_batches:
+            # Conditional on the locked pks, so rows inserted meanwhile are never moved without an event
+            eligible.filter(pk__in=batch).update(**fields)
+
+        TransactionEvent.objects.bulk_create([
+            TransactionEvent(
+                transaction=txn,
+                event_type='status_change',
+                old_status=txn.status,
+                new_status=new_status,
+                description=description or f"Status changed to {new_status}",
+                source=source,
+                user=user,
+                metadata=metadata or {},
+            )
+            for txn in moved
+        ], batch_size=BATCH_SIZE)
+
+        updated = []
+        for batch in pk_batches:
+            reloaded = list(Transaction.objects.filter(pk__in=batch).select_related('currency'))
+            transactions_status_changed.send(
+                sender=Transaction, transactions=reloaded, event_type=f"transaction.{new_status}"
+            )
+            updated.extend(reloaded)
+    return updated
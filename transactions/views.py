@@ -51,7 +51,7 @@ class StandardResultsSetPagination(PageNumberPagination):
 # Payment Gateway Views
 class PaymentGatewayListCreateView(generics.ListCreateAPIView):
     """List and create payment gateways"""
-    queryset = PaymentGateway.objects.all()
+    queryset = PaymentGateway.objects.annotate(num_transactions=Count('transactions'))
     serializer_class = PaymentGatewaySerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -77,7 +77,7 @@ class PaymentGatewayListCreateView(generics.ListCreateAPIView):
 
 class PaymentGatewayDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a payment gateway"""
-    queryset = PaymentGateway.objects.all()
+    queryset = PaymentGateway.objects.annotate(num_transactions=Count('transactions'))
     serializer_class = PaymentGatewaySerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -0,0 +1,523 @@
+"""
+Outbound Webhook Delivery Engine
+
+This module turns transaction state changes into ``Webhook`` rows and delivers
+them to merchant endpoints.
+
+Fan-out: ``Transaction.mark_as_*`` sends ``transaction_status_changed`` and
+``enqueue_transaction_event`` writes one ``Webhook`` per event for the
+merchant's ``WhitelabelPartner.webhook_url``. Bulk transitions send
+``transactions_status_changed`` once per batch instead, and
+``enqueue_transaction_events`` resolves partners and batch windows once per
+merchant and inserts the batch's webhooks with one ``bulk_create``. When the partner opts in to
+batching, new events take the due time of the endpoint's open batch window so
+they are claimed together and coalesced into a single POST.
+
+Delivery: a worker claims a batch of due webhooks with
+``select_for_update(skip_locked=True)`` and leases them by setting
+``leased_until`` before the lock is released, so any number of worker
+processes can run side by side without delivering the same webhook twice.
+The lease is kept apart from ``next_attempt_at``, so making a webhook due
+again (``retry_webhooks``) can never hand an in-flight delivery to a second
+worker. Events of one transaction are delivered in order: a webhook is held
+back while an earlier event of its transaction is still pending outside the
+batch, and a transaction's events within a batch are sent one after another.
+Independent units are POSTed concurrently over a pooled HTTP session, and the
+outcome of every attempt is written back in one bulk update.
+
+Payloads are signed with the merchant's ``WhitelabelPartner.webhook_secret``:
+
+    Pexilabs-Signature: t=<unix timestamp>,v1=<hex HMAC-SHA256 of "<t>.<body>">
+
+Failed deliveries are retried with exponential backoff and jitter
+(``Webhook.get_retry_delay``) until ``max_attempts`` is reached. If a worker
+dies mid-batch, its lease expires and the webhooks are claimed again.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from authentication.models import WhitelabelPartner
+from .models import Webhook
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'Pexilabs-Signature'
+
+# Response bodies are stored for debugging only; keep rows small
+MAX_RESPONSE_BODY_LENGTH = 2000
+
+RESULT_FIELDS = [
+    'headers', 'status_code', 'response_body', 'response_time_ms', 'attempts', 'is_delivered',
+    'delivered_at', 'next_attempt_at', 'leased_until', 'error_message', 'updated_at',
+]
+
+
+def sign_payload(secret: str, body: str, timestamp: int = None) -> str:
+    """Build the ``Pexilabs-Signature`` header value for a request body"""
+    timestamp = timestamp or int(time.time())
+    signature = hmac.new(
+        secret.encode('utf-8'),
+        f"{timestamp}.{body}".encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def verify_signature(secret: str, body: str, header: str, tolerance: int = 300) -> bool:
+    """Verify a ``Pexilabs-Signature`` header (for merchants and tests)"""
+    try:
+        parts = dict(item.split('=', 1) for item in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if tolerance and abs(time.time() - timestamp) > tolerance:
+        return False
+    expected = sign_payload(secret, body, timestamp)
+    return hmac.compare_digest(expected, header)
+
+
+def pending_webhooks():
+    """Undelivered webhooks that still have attempts left"""
+    return Webhook.objects.filter(is_delivered=False, attempts__lt=F('max_attempts'))
+
+
+def due_webhooks():
+    """Undelivered webhooks with attempts left whose next attempt is due and that no worker holds"""
+    now = timezone.now()
+    return pending_webhooks().filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+        Q(leased_until__isnull=True) | Q(leased_until__lte=now),
+    )
+
+
+def get_webhook_backlog() -> Dict:
+    """Outbound webhook backlog depth (pending, due now, oldest age, exhausted)"""
+    now = timezone.now()
+    stats = pending_webhooks().aggregate(
+        depth=Count('id'),
+        due=Count('id', filter=Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)),
+        oldest=Min('created_at'),
+    )
+    return {
+        'depth': stats['depth'],
+        'due': stats['due'],
+        'oldest_age_seconds': int((now - stats['oldest']).total_seconds()) if stats['oldest'] else 0,
+        'exhausted': Webhook.objects.filter(is_delivered=False, attempts__gte=F('max_attempts')).count(),
+    }
+
+
+def retry_webhooks(webhooks) -> int:
+    """Make undelivered webhooks with attempts left due now, in one ``UPDATE``; return how many
+
+    Webhooks a worker is delivering right now are left alone.
+    """
+    now = timezone.now()
+    return (
+        pending_webhooks()
+        .filter(pk__in=webhooks.values('pk'))
+        .exclude(leased_until__gt=now)
+        .update(next_attempt_at=now, updated_at=now)
+    )
+
+
+# ----------------------------------------------------------------------
+# Fan-out
+# ----------------------------------------------------------------------
+
+def get_merchant_partner(merchant_id) -> Optional[WhitelabelPartner]:
+    """The merchant's active partner, if it has a webhook endpoint configured"""
+    return WhitelabelPartner.objects.filter(
+        code=f"merchant_{merchant_id}", is_active=True
+    ).exclude(webhook_url='').first()
+
+
+def build_event_payload(txn, event_type: str, event_id) -> Dict:
+    """Webhook body for a transaction event"""
+    return {
+        'id': str(event_id),
+        'type': event_type,
+        'created': timezone.now().isoformat(),
+        'data': {
+            'id': str(txn.id),
+            'reference': txn.reference,
+            'external_reference': txn.external_reference,
+            'status': txn.status,
+            'transaction_type': txn.transaction_type,
+            'payment_method': txn.payment_method,
+            'amount': str(txn.amount),
+            'fee_amount': str(txn.fee_amount),
+            'net_amount': str(txn.net_amount),
+            'currency': txn.currency.code,
+            'is_settled': txn.is_settled,
+            'settlement_reference': txn.settlement_reference,
+            'failure_reason': txn.failure_reason,
+            'failure_code': txn.failure_code,
+            'metadata': txn.metadata,
+        },
+    }
+
+
+def get_batch_due_time(partner: WhitelabelPartner):
+    """Due time of the endpoint's open batch window, opening a new one if needed
+
+    Only unattempted webhooks due within one window count as an open batch,
+    so leased or retrying rows never hold new events back.
+    """
+    now = timezone.now()
+    window_end = now + timezone.timedelta(seconds=partner.webhook_batch_window)
+    open_batch = pending_webhooks().filter(
+        url=partner.webhook_url,
+        attempts=0,
+        next_attempt_at__gt=now,
+        next_attempt_at__lte=window_end,
+    ).aggregate(due=Min('next_attempt_at'))['due']
+    return open_batch or window_end
+
+
+def enqueue_transaction_event(txn, event_type: str) -> Optional[Webhook]:
+    """Queue the outbound webhook for a transaction event
+
+    Runs inside the caller's database transaction, so the event is only
+    queued if the state change is committed; the savepoint keeps a failed
+    insert from breaking the caller's transaction.
+    """
+    partner = get_merchant_partner(txn.merchant_id)
+    if partner is None:
+        return None
+
+    event_id = uuid.uuid4()
+    with transaction.atomic():
+        return Webhook.objects.create(
+            id=event_id,
+            transaction=txn,
+            url=partner.webhook_url,
+            event_type=event_type,
+            payload=build_event_payload(txn, event_type, event_id),
+            next_attempt_at=get_batch_due_time(partner) if partner.webhook_batching_enabled else None,
+        )
+
+
+def get_merchant_partners(merchant_ids: Iterable) -> Dict:
+    """Active partners with a webhook endpoint configured, by merchant id"""
+    codes = {f"merchant_{merchant_id}": merchant_id for merchant_id in merchant_ids}
+    partners = {}
+    for partner in (
+        WhitelabelPartner.objects.filter(code__in=list(codes), is_active=True)
+        .exclude(webhook_url='').order_by('pk')
+    ):
+        partners.setdefault(codes[partner.code], partner)
+    return partners
+
+
+def enqueue_transaction_events(txns: Iterable, event_type: str) -> List[Webhook]:
+    """Queue outbound webhooks for many transactions of a bulk transition
+
+    Same rows as ``enqueue_transaction_event`` per transaction, but each
+    merchant's partner and open batch window are looked up once and the
+    webhooks are inserted together, inside a savepoint.
+    """
+    txns = list(txns)
+    partners = get_merchant_partners({txn.merchant_id for txn in txns})
+    due_times = {
+        merchant_id: get_batch_due_time(partner) if partner.webhook_batching_enabled else None
+        for merchant_id, partner in partners.items()
+    }
+
+    webhooks = []
+    for txn in txns:
+        partner = partners.get(txn.merchant_id)
+        if partner is None:
+            continue
+        event_id = uuid.uuid4()
+        webhooks.append(Webhook(
+            id=event_id,
+            transaction=txn,
+            url=partner.webhook_url,
+            event_type=event_type,
+            payload=build_event_payload(txn, event_type, event_id),
+            next_attempt_at=due_times[txn.merchant_id],
+        ))
+    if not webhooks:
+        return []
+    with transaction.atomic():
+        return Webhook.objects.bulk_create(webhooks)
+
+
+class WebhookDeliveryEngine:
+    """Claim due webhooks in batches and deliver them concurrently"""
+
+    def __init__(self, batch_size: int = None, max_workers: int = None, timeout: float = None,
+                 lease_seconds: int = None):
+        self.batch_size = batch_size or getattr(settings, 'WEBHOOK_DELIVERY_BATCH_SIZE', 100)
+        self.max_workers = max_workers or getattr(settings, 'WEBHOOK_DELIVERY_WORKERS', 16)
+        self.timeout = timeout or getattr(settings, 'WEBHOOK_DELIVERY_TIMEOUT', 10)
+        self.lease_seconds = lease_seconds or getattr(settings, 'WEBHOOK_DELIVERY_LEASE', 300)
+        self.ordering_recheck_delay = getattr(settings, 'WEBHOOK_ORDERING_RECHECK_DELAY', 5)
+        self.session = self._build_session()
+
+    def _build_session(self) -> requests.Session:
+        """HTTP session whose connection pool is shared by all delivery threads"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'Content-Type': 'application/json',
+            'User-Agent': 'PexiLabs-Webhooks/1.0',
+        })
+        return session
+
+    # ------------------------------------------------------------------
+    # Claiming
+    # ------------------------------------------------------------------
+
+    def claim_batch(self) -> List[Webhook]:
+        """Lock and lease a batch of due webhooks
+
+        Rows locked by another worker are skipped, and the lease keeps them
+        invisible to other workers while they are delivered outside the
+        transaction. Webhooks queued behind an earlier pending event of the
+        same transaction are pushed back briefly instead of being claimed.
+        """
+        with transaction.atomic():
+            webhooks = list(
+                due_webhooks()
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('transaction')
+                .order_by('created_at')[:self.batch_size]
+            )
+            if not webhooks:
+                return []
+
+            ready, blocked = self._split_out_of_order(webhooks)
+            now = timezone.now()
+            if blocked:
+                Webhook.objects.filter(pk__in=[webhook.pk for webhook in blocked]).update(
+                    next_attempt_at=now + timezone.timedelta(seconds=self.ordering_recheck_delay)
+                )
+            if ready:
+                Webhook.objects.filter(pk__in=[webhook.pk for webhook in ready]).update(
+                    leased_until=now + timezone.timedelta(seconds=self.lease_seconds)
+                )
+        return ready
+
+    def _split_out_of_order(self, webhooks: List[Webhook]) -> Tuple[List[Webhook], List[Webhook]]:
+        """Separate webhooks that have an earlier pending event outside the batch"""
+        earliest_pending = dict(
+            pending_webhooks()
+            .filter(transaction_id__in={webhook.transaction_id for webhook in webhooks})
+            .exclude(pk__in=[webhook.pk for webhook in webhooks])
+            .order_by()
+            .values('transaction_id')
+            .annotate(first=Min('created_at'))
+            .values_list('transaction_id', 'first')
+        )
+        ready, blocked = [], []
+        for webhook in webhooks:
+            first = earliest_pending.get(webhook.transaction_id)
+            (blocked if first and first < webhook.created_at else ready).append(webhook)
+        return ready, blocked
+
+    def get_partners(self, webhooks: List[Webhook]) -> Dict:
+        """The merchants' partners (secret and batching opt-in), keyed by merchant id"""
+        codes = {f"merchant_{webhook.transaction.merchant_id}" for webhook in webhooks}
+        partners = WhitelabelPartner.objects.filter(code__in=codes)
+        return {partner.code[len('merchant_'):]: partner for partner in partners}
+
+    def build_units(self, webhooks: List[Webhook], partners: Dict) -> List[Tuple[str, List[Webhook], Optional[str]]]:
+        """Group a claimed batch into delivery units, keeping creation order
+
+        Returns ``(kind, webhooks, secret)`` tuples: a ``'batch'`` unit is one
+        coalesced POST to an opted-in endpoint, a ``'sequence'`` unit is one
+        transaction's events delivered one after another.
+        """
+        units = {}
+        for webhook in sorted(webhooks, key=lambda webhook: webhook.created_at):
+            partner = partners.get(str(webhook.transaction.merchant_id))
+            secret = partner.webhook_secret if partner and partner.webhook_secret else None
+            if partner and partner.webhook_batching_enabled and webhook.url == partner.webhook_url:
+                key = ('batch', webhook.url)
+            else:
+                key = ('sequence', webhook.transaction_id)
+            units.setdefault(key, (key[0], [], secret))[1].append(webhook)
+        return list(units.values())
+
+    # ------------------------------------------------------------------
+    # Delivery
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _failure(headers: Dict, error_message: str, response_time_ms: int = 0) -> Dict:
+        """Outcome of an attempt that got no HTTP response"""
+        return {
+            'status_code': None, 'response_body': '', 'error_message': error_message,
+            'headers': headers, 'response_time_ms': response_time_ms,
+        }
+
+    def _post(self, url: str, body: str, headers: Dict, secret: Optional[str]) -> Dict:
+        """Sign and POST a body, returning the outcome of the attempt (no DB access)
+
+        Any error is returned as a failed outcome rather than raised, so one
+        bad webhook cannot abort the rest of its batch.
+        """
+        started = time.monotonic()
+        try:
+            if secret:
+                headers[SIGNATURE_HEADER] = sign_payload(secret, body)
+            response = self.session.post(url, data=body.encode('utf-8'), headers=headers,
+                                         timeout=self.timeout, allow_redirects=False)
+        except requests.exceptions.RequestException as e:
+            outcome = {'status_code': None, 'response_body': '', 'error_message': f"Request failed: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Unexpected error delivering webhook to {url}: {str(e)}")
+            outcome = {'status_code': None, 'response_body': '', 'error_message': f"Delivery failed: {str(e)}"}
+        else:
+            is_success = 200 <= response.status_code < 300
+            outcome = {
+                'status_code': response.status_code,
+                'response_body': response.text[:MAX_RESPONSE_BODY_LENGTH],
+                'error_message': '' if is_success else f"HTTP {response.status_code}: {response.reason}",
+            }
+        outcome['headers'] = headers
+        outcome['response_time_ms'] = int((time.monotonic() - started) * 1000)
+        return outcome
+
+    def _record_attempt(self, webhook: Webhook, outcome: Dict) -> Webhook:
+        """Apply the outcome of an attempt to a webhook instance"""
+        webhook.attempts += 1
+        webhook.headers = outcome['headers']
+        webhook.status_code = outcome['status_code']
+        webhook.response_body = outcome['response_body']
+        webhook.response_time_ms = outcome['response_time_ms']
+        webhook.error_message = outcome['error_message']
+
+        now = timezone.now()
+        webhook.updated_at = now
+        webhook.next_attempt_at = None
+        if webhook.status_code is not None and 200 <= webhook.status_code < 300:
+            webhook.is_delivered = True
+            webhook.delivered_at = now
+        else:
+            webhook.schedule_retry(save=False)
+        return webhook
+
+    def deliver(self, webhook: Webhook, secret: Optional[str]) -> Webhook:
+        """POST one webhook and record the attempt on the instance (no DB access)"""
+        headers = {
+            'Pexilabs-Event': webhook.event_type,
+            'Pexilabs-Webhook-Id': str(webhook.id),
+            'Pexilabs-Delivery-Attempt': str(webhook.attempts + 1),
+        }
+        try:
+            body = json.dumps(webhook.payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+        except (TypeError, ValueError) as e:
+            return self._record_attempt(webhook, self._failure(headers, f"Payload could not be encoded: {str(e)}"))
+        return self._record_attempt(webhook, self._post(webhook.url, body, headers, secret))
+
+    def deliver_sequence(self, webhooks: List[Webhook], secret: Optional[str]) -> List[Webhook]:
+        """Deliver one transaction's events in order, stopping at the first failure"""
+        for index, webhook in enumerate(webhooks):
+            self.deliver(webhook, secret)
+            if not webhook.is_delivered:
+                # Later events wait for this one's retry without using up attempts
+                for later in webhooks[index + 1:]:
+                    later.next_attempt_at = webhook.next_attempt_at or timezone.now()
+                    later.updated_at = webhook.updated_at
+                break
+        return webhooks
+
+    def deliver_batch(self, webhooks: List[Webhook], secret: Optional[str]) -> List[Webhook]:
+        """Deliver several events for one endpoint as a single POST"""
+        headers = {
+            'Pexilabs-Event': 'batch',
+            'Pexilabs-Batch-Size': str(len(webhooks)),
+            'Pexilabs-Delivery-Attempt': str(max(webhook.attempts for webhook in webhooks) + 1),
+        }
+        try:
+            body = json.dumps(
+                {'object': 'list', 'data': [webhook.payload for webhook in webhooks]},
+                cls=DjangoJSONEncoder, separators=(',', ':')
+            )
+        except (TypeError, ValueError):
+            # Send the events one by one so only the ones that cannot be encoded fail
+            for webhook in webhooks:
+                self.deliver(webhook, secret)
+            return webhooks
+        outcome = self._post(webhooks[0].url, body, headers, secret)
+        for webhook in webhooks:
+            self._record_attempt(webhook, outcome)
+        return webhooks
+
+    def _deliver_unit(self, unit) -> List[Webhook]:
+        kind, webhooks, secret = unit
+        if kind == 'batch':
+            return self.deliver_batch(webhooks, secret)
+        return self.deliver_sequence(webhooks, secret)
+
+    def process_batch(self, webhooks: List[Webhook]) -> List[Webhook]:
+        """Deliver a claimed batch concurrently and save every attempt"""
+        if not webhooks:
+            return []
+        units = self.build_units(webhooks, self.get_partners(webhooks))
+        workers = min(self.max_workers, len(units))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook-delivery') as executor:
+            results = [webhook for unit in executor.map(self._deliver_unit, units) for webhook in unit]
+        for webhook in results:
+            webhook.leased_until = None
+        Webhook.objects.bulk_update(results, RESULT_FIELDS)
+
+        failed = [webhook for webhook in results if not webhook.is_delivered]
+        if failed:
+            logger.warning(f"{len(failed)} of {len(results)} webhook deliveries failed or were deferred")
+        return results
+
+    def run_once(self) -> List[Webhook]:
+        """Claim and deliver a single batch"""
+        return self.process_batch(self.claim_batch())
+
+    def run(self, max_batches: Optional[int] = None) -> List[Webhook]:
+        """Drain due webhooks batch by batch"""
+        results = []
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            batch = self.run_once()
+            if not batch:
+                break
+            results.extend(batch)
+            batches += 1
+        return results
+
+    def run_forever(self, poll_interval: float = None, on_batch=None):
+        """Worker loop: deliver due webhooks, sleeping when there are none"""
+        poll_interval = poll_interval or getattr(settings, 'WEBHOOK_DELIVERY_POLL_INTERVAL', 2)
+        while True:
+            close_old_connections()
+            try:
+                batch = self.run_once()
+            except Exception as e:
+                logger.error(f"Webhook delivery batch failed: {str(e)}")
+                batch = []
+            if on_batch and batch:
+                on_batch(batch)
+            if len(batch) < self.batch_size:
+                backlog = get_webhook_backlog()
+                logger.info(
+                    f"Webhook backlog: {backlog['depth']} pending, {backlog['due']} due, "
+                    f"oldest {backlog['oldest_age_seconds']}s, {backlog['exhausted']} exhausted"
+                )
+                time.sleep(poll_interval)